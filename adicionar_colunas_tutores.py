@@ -1,70 +1,14 @@
 """
-Script para adicionar TODAS as colunas que faltam na tabela tutores
-Execute: python adicionar_colunas_tutores.py
+Script para adicionar as colunas que faltam na tabela tutores (numero, complemento, whatsapp)
+Agora é a migração 0001_tutores_contato de app/migracoes.py: roda pelo executor de migrações (migrar_banco.py),
+junto com as anteriores ainda pendentes, e fica registrada em migracoes_banco (não repete se já foi aplicada).
+Execute: python adicionar_colunas_tutores.py [--banco "C:\\caminho\\fortcordis.db"]
+Sem --banco usa o banco do app (data/fortcordis.db ou FORTCORDIS_DB_PATH).
 """
 
-import sqlite3
-from pathlib import Path
+import sys
 
-DB_PATH = Path.home() / "FortCordis" / "data" / "fortcordis.db"
+from migrar_banco import main
 
-print("\n" + "="*70)
-print(" ADICIONAR COLUNAS FALTANTES - TUTORES ".center(70))
-print("="*70 + "\n")
-
-conn = sqlite3.connect(str(DB_PATH))
-cursor = conn.cursor()
-
-print("🔍 Verificando estrutura da tabela tutores...\n")
-
-# Verifica colunas atuais
-cursor.execute("PRAGMA table_info(tutores)")
-colunas_atuais = {col[1] for col in cursor.fetchall()}
-
-print(f"📋 Colunas existentes: {len(colunas_atuais)}")
-for col in sorted(colunas_atuais):
-    print(f"   ✅ {col}")
-
-print("\n" + "-"*70 + "\n")
-
-# Lista de colunas que DEVEM existir
-colunas_necessarias = {
-    'numero': 'TEXT',
-    'complemento': 'TEXT',
-    'whatsapp': 'TEXT'
-}
-
-print("🔧 Adicionando colunas faltantes...\n")
-
-adicionadas = 0
-ja_existentes = 0
-
-for coluna, tipo in colunas_necessarias.items():
-    if coluna not in colunas_atuais:
-        try:
-            sql = f"ALTER TABLE tutores ADD COLUMN {coluna} {tipo}"
-            cursor.execute(sql)
-            conn.commit()
-            print(f"   ✅ Adicionada: {coluna} ({tipo})")
-            adicionadas += 1
-        except Exception as e:
-            print(f"   ❌ Erro ao adicionar {coluna}: {e}")
-    else:
-        print(f"   ⏭️  Já existe: {coluna}")
-        ja_existentes += 1
-
-conn.close()
-
-print("\n" + "="*70)
-print("✅ PROCESSO CONCLUÍDO!")
-print("="*70)
-
-print(f"\n📊 Resumo:")
-print(f"   ✅ Colunas adicionadas: {adicionadas}")
-print(f"   ⏭️  Já existiam: {ja_existentes}")
-print(f"   📋 Total de colunas necessárias: {len(colunas_necessarias)}")
-
-print("\n🎯 Próximo passo:")
-print("   1. Recarregue a página do Streamlit (aperte R)")
-print("   2. Tente cadastrar o tutor novamente")
-print("   3. Deve funcionar agora!\n")
+if __name__ == "__main__":
+    main(["--ate", "0001_tutores_contato"] + sys.argv[1:])
@@ -0,0 +1,249 @@
+# Armazém de bytes por sessão: as imagens do exame em edição (arquivado ou enviadas) e o último PDF gerado ficam
+# em arquivos temporários em PASTA_SESSOES/<sessão>/<sha256>, e o session_state guarda só {"name", "chave",
+# "tamanho", "miniatura"}. Os bytes completos são lidos do disco quando o PDF é gerado/baixado; os mais recentes
+# ficam num LRU em memória limitado a SESSAO_MEMORIA_MAX_MB. A pasta da sessão é apagada quando o armazém sai do
+# session_state (fim da sessão) e, para sessões de um servidor que parou, na varredura de pastas paradas
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from app.config import PASTA_SESSOES, SESSAO_DISCO_MAX_MB, SESSAO_MEMORIA_MAX_MB, SESSAO_TTL_H
+from app.laudos_miniaturas import obter_miniatura
+
+logger = logging.getLogger(__name__)
+
+CHAVE_SESSION_STATE = "__armazem_sessao"
+
+_vivos = weakref.WeakSet()
+_varredura = {"feita": False}
+_varredura_lock = threading.Lock()
+
+
+class LimiteSessaoExcedido(ValueError):
+    """A sessão passaria de SESSAO_DISCO_MAX_MB em disco."""
+
+
+class ArmazemSessao:
+    """
+    Bytes de uma sessão por conteúdo (sha256): guardar() grava em disco uma vez por conteúdo, ler() devolve os
+    bytes (do LRU em memória ou do arquivo), liberar()/manter() apagam o que a sessão não usa mais.
+    """
+
+    def __init__(self, pasta=None, memoria_max_mb: Optional[float] = None, disco_max_mb: Optional[float] = None):
+        self.pasta = Path(pasta) if pasta else Path(PASTA_SESSOES) / uuid.uuid4().hex
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.memoria_max = int((SESSAO_MEMORIA_MAX_MB if memoria_max_mb is None else memoria_max_mb) * 1024 * 1024)
+        self.disco_max = int((SESSAO_DISCO_MAX_MB if disco_max_mb is None else disco_max_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._bytes_memoria = 0
+        self._tamanhos = {}
+        self._estat = {"leituras_memoria": 0, "leituras_disco": 0, "removidos_memoria": 0}
+        # Fim da sessão (armazém coletado) ou do processo: apaga a pasta
+        self._finalizador = weakref.finalize(self, shutil.rmtree, str(self.pasta), True)
+        _vivos.add(self)
+
+    # --- gravação / leitura ---
+
+    def _caminho(self, chave: str) -> Path:
+        return self.pasta / chave
+
+    def _lembrar(self, chave: str, dados: bytes) -> None:
+        """Põe no LRU em memória (com o lock) e remove os menos usados acima do limite."""
+        if len(dados) > self.memoria_max:
+            return
+        if chave in self._lru:
+            self._lru.move_to_end(chave)
+            return
+        self._lru[chave] = dados
+        self._bytes_memoria += len(dados)
+        while self._bytes_memoria > self.memoria_max and self._lru:
+            _, antigo = self._lru.popitem(last=False)
+            self._bytes_memoria -= len(antigo)
+            self._estat["removidos_memoria"] += 1
+
+    def guardar(self, dados: bytes) -> str:
+        """Grava o conteúdo (se ainda não estiver na sessão) e retorna a chave (sha256)."""
+        dados = bytes(dados)
+        chave = hashlib.sha256(dados).hexdigest()
+        with self._lock:
+            if chave in self._tamanhos:
+                self._lembrar(chave, dados)
+                return chave
+            if sum(self._tamanhos.values()) + len(dados) > self.disco_max:
+                raise LimiteSessaoExcedido(
+                    f"Limite de {self.disco_max // (1024 * 1024)} MB de arquivos desta sessão atingido; "
+                    "remova imagens que não vão para o laudo."
+                )
+        fd, tmp = tempfile.mkstemp(dir=str(self.pasta), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(dados)
+            os.replace(tmp, self._caminho(chave))
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._tamanhos[chave] = len(dados)
+            self._lembrar(chave, dados)
+        return chave
+
+    def ler(self, chave: str) -> Optional[bytes]:
+        """Bytes da chave, ou None se não está (mais) na sessão."""
+        with self._lock:
+            dados = self._lru.get(chave)
+            if dados is not None:
+                self._lru.move_to_end(chave)
+                self._estat["leituras_memoria"] += 1
+                return dados
+        try:
+            dados = self._caminho(chave).read_bytes()
+        except OSError:
+            return None
+        with self._lock:
+            self._estat["leituras_disco"] += 1
+            if chave in self._tamanhos:
+                self._lembrar(chave, dados)
+        return dados
+
+    def contem(self, chave: str) -> bool:
+        with self._lock:
+            return chave in self._tamanhos
+
+    # --- limpeza ---
+
+    def liberar(self, chave: str) -> None:
+        """Apaga o conteúdo da sessão (memória e disco)."""
+        with self._lock:
+            self._tamanhos.pop(chave, None)
+            dados = self._lru.pop(chave, None)
+            if dados is not None:
+                self._bytes_memoria -= len(dados)
+        try:
+            self._caminho(chave).unlink()
+        except OSError:
+            pass
+
+    def manter(self, chaves: Iterable[str]) -> int:
+        """Apaga tudo o que não está em chaves (o que a sessão ainda referencia). Retorna quantos saíram."""
+        manter = set(chaves)
+        with self._lock:
+            sobra = [c for c in self._tamanhos if c not in manter]
+        for chave in sobra:
+            self.liberar(chave)
+        return len(sobra)
+
+    def fechar(self) -> None:
+        """Apaga a pasta da sessão agora (sem esperar o armazém ser coletado)."""
+        with self._lock:
+            self._lru.clear()
+            self._bytes_memoria = 0
+            self._tamanhos.clear()
+        self._finalizador()
+
+    @property
+    def fechado(self) -> bool:
+        return not self._finalizador.alive
+
+    def estatisticas(self) -> dict:
+        """{"itens", "bytes_disco", "bytes_memoria", "itens_memoria", "leituras_memoria", "leituras_disco", "removidos_memoria"}."""
+        with self._lock:
+            return {
+                "itens": len(self._tamanhos),
+                "bytes_disco": sum(self._tamanhos.values()),
+                "bytes_memoria": self._bytes_memoria,
+                "itens_memoria": len(self._lru),
+                **self._estat,
+            }
+
+
+def varrer_sessoes_paradas(pasta=None, ttl_h: Optional[float] = None) -> int:
+    """
+    Apaga as pastas de sessão sem armazém vivo neste processo e sem alteração há ttl_h horas (sessões de um
+    servidor que parou sem limpar). Retorna quantas pastas saíram.
+    """
+    base = Path(pasta or PASTA_SESSOES)
+    limite = time.time() - (SESSAO_TTL_H if ttl_h is None else ttl_h) * 3600
+    vivas = {a.pasta.resolve() for a in list(_vivos)}
+    removidas = 0
+    try:
+        entradas = list(os.scandir(str(base)))
+    except OSError:
+        return 0
+    for entrada in entradas:
+        try:
+            if not entrada.is_dir() or Path(entrada.path).resolve() in vivas or entrada.stat().st_mtime > limite:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(entrada.path, ignore_errors=True)
+        removidas += 1
+    return removidas
+
+
+def estatisticas_sessoes() -> dict:
+    """Soma dos armazéns vivos neste processo: {"sessoes", "itens", "bytes_disco", "bytes_memoria"} (aba Diagnóstico)."""
+    total = {"sessoes": 0, "itens": 0, "bytes_disco": 0, "bytes_memoria": 0}
+    for arm in list(_vivos):
+        if arm.fechado:
+            continue
+        e = arm.estatisticas()
+        total["sessoes"] += 1
+        for k in ("itens", "bytes_disco", "bytes_memoria"):
+            total[k] += e[k]
+    return total
+
+
+# ----------------------------------------------------------------------------
+# Sessão do Streamlit
+# ----------------------------------------------------------------------------
+
+def armazem_da_sessao() -> ArmazemSessao:
+    """Armazém da sessão atual (criado na primeira chamada; a primeira do processo varre as pastas paradas)."""
+    import streamlit as st
+
+    arm = st.session_state.get(CHAVE_SESSION_STATE)
+    if arm is None or arm.fechado:
+        with _varredura_lock:
+            varrer = not _varredura["feita"]
+            _varredura["feita"] = True
+        if varrer:
+            try:
+                varrer_sessoes_paradas()
+            except Exception as e:
+                logger.warning("Falha ao varrer %s: %s", PASTA_SESSOES, e)
+        arm = ArmazemSessao()
+        st.session_state[CHAVE_SESSION_STATE] = arm
+    return arm
+
+
+def guardar_imagem(nome: str, dados: bytes, armazem: Optional[ArmazemSessao] = None) -> dict:
+    """Grava a imagem no armazém da sessão e retorna o item leve de imagens_carregadas (miniatura do cache por sha256)."""
+    arm = armazem or armazem_da_sessao()
+    chave = arm.guardar(dados)
+    return {"name": nome, "chave": chave, "tamanho": len(dados), "miniatura": obter_miniatura(dados, hash_conteudo=chave)}
+
+
+def bytes_imagem(item: dict, armazem: Optional[ArmazemSessao] = None) -> Optional[bytes]:
+    """Bytes completos de um item de imagens_carregadas (itens antigos com "bytes" continuam valendo)."""
+    if not isinstance(item, dict):
+        return None
+    if item.get("bytes"):
+        return bytes(item["bytes"])
+    if item.get("chave"):
+        return (armazem or armazem_da_sessao()).ler(item["chave"])
+    return None
@@ -0,0 +1,443 @@
+# Armazenamento plugável dos conteúdos de exames (JSON/PDF/imagens) e PDFs arquivados: backend "banco"
+# (BLOB na própria linha, pelo codec de compressão) ou "local" (object store endereçado por sha256;
+# a linha guarda só uma referência de 45 bytes). A leitura resolve os dois formatos, qualquer que seja
+# o backend configurado, então um banco pode ter linhas nos dois durante a migração.
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from app.config import BLOB_BACKEND, DB_PATH, PASTA_OBJETOS
+from app.exceptions import BlobError, ConfigError
+from app.sql_safe import validar_coluna, validar_tabela
+from fortcordis_modules.blob_codec import DecodificadorIncremental, codificar, decodificar
+
+logger = logging.getLogger(__name__)
+
+# Referência gravada na coluna quando o conteúdo está no object store:
+# MAGICO_REF (4 bytes: \x00FCR) | versão (1 byte) | tamanho original (8 bytes, big-endian) | sha256 (32 bytes)
+MAGICO_REF = b"\x00FCR"
+VERSAO_REF = 1
+_REFERENCIA = struct.Struct(">4sBQ32s")
+TAMANHO_REFERENCIA = _REFERENCIA.size
+
+# Colunas cujo conteúdo passa pelo backend (tabela, coluna)
+COLUNAS_ARMAZENADAS = (
+    ("laudos_arquivos", "conteudo_json"),
+    ("laudos_arquivos", "conteudo_pdf"),
+    ("laudos_arquivos_imagens", "conteudo"),
+    ("prescricoes_pdfs", "conteudo"),
+)
+
+TAMANHO_BLOCO = 256 * 1024
+# Linhas por transação na migração (PDFs e imagens: lotes pequenos seguram o banco por pouco tempo)
+LOTE_MIGRACAO = 50
+
+
+def ler_referencia(valor) -> Optional[dict]:
+    """{"hash", "tamanho"} se o valor da coluna for uma referência ao object store; senão None."""
+    if not isinstance(valor, (bytes, bytearray, memoryview)) or len(valor) != TAMANHO_REFERENCIA:
+        return None
+    magico, versao, tamanho, digest = _REFERENCIA.unpack(bytes(valor))
+    if magico != MAGICO_REF:
+        return None
+    if versao > VERSAO_REF:
+        raise BlobError(f"Versão de referência não suportada: {versao}")
+    return {"hash": digest.hex(), "tamanho": tamanho}
+
+
+def _referencia(sha256_hex: str, tamanho: int) -> bytes:
+    return _REFERENCIA.pack(MAGICO_REF, VERSAO_REF, tamanho, bytes.fromhex(sha256_hex))
+
+
+def _bytes_originais(dados) -> bytes:
+    if isinstance(dados, str):
+        return dados.encode("utf-8")
+    return decodificar(dados)
+
+
+# ----------------------------------------------------------------------------
+# Backends
+# ----------------------------------------------------------------------------
+
+class BackendBanco:
+    """Conteúdo na própria coluna (comprimido pelo codec acima do limiar)."""
+
+    nome = "banco"
+
+    def gravar(self, dados) -> bytes:
+        return codificar(dados)
+
+
+class BackendLocal:
+    """
+    Object store em disco endereçado pelo sha256 do conteúdo original: PASTA/ab/cd/<hash>.
+    Conteúdo idêntico ocupa um único objeto; o arquivo guarda os bytes já passados pelo codec.
+    Gravação atômica (temporário na mesma pasta + os.replace) e hash conferido na leitura.
+    """
+
+    nome = "local"
+
+    def __init__(self, pasta: Path):
+        self.pasta = Path(pasta)
+
+    def caminho(self, sha256_hex: str) -> Path:
+        return self.pasta / sha256_hex[:2] / sha256_hex[2:4] / sha256_hex
+
+    def existe(self, sha256_hex: str) -> bool:
+        return self.caminho(sha256_hex).exists()
+
+    def gravar(self, dados) -> bytes:
+        original = _bytes_originais(dados)
+        sha = hashlib.sha256(original).hexdigest()
+        destino = self.caminho(sha)
+        try:
+            # Já existe: renova o mtime, senão remover_orfaos poderia levar um objeto antigo recém-referenciado
+            os.utime(destino)
+            return _referencia(sha, len(original))
+        except FileNotFoundError:
+            pass
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(destino.parent), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(codificar(original))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, destino)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        return _referencia(sha, len(original))
+
+    def iterar(self, sha256_hex: str, tamanho_bloco: int = TAMANHO_BLOCO, verificar: bool = True) -> Iterator[bytes]:
+        """Conteúdo original em blocos; com verificar, o sha256 é conferido ao final (BlobError se divergir)."""
+        try:
+            f = open(self.caminho(sha256_hex), "rb")
+        except FileNotFoundError:
+            raise BlobError(f"Objeto ausente no armazenamento local: {sha256_hex}", str(self.caminho(sha256_hex)))
+        h = hashlib.sha256()
+        dec = DecodificadorIncremental()
+        try:
+            with f:
+                while True:
+                    bloco = f.read(tamanho_bloco)
+                    if not bloco:
+                        break
+                    saida = dec.alimentar(bloco)
+                    if saida:
+                        h.update(saida)
+                        yield saida
+            resto = dec.finalizar()
+        except ValueError as e:
+            raise BlobError(f"Objeto corrompido no armazenamento local: {sha256_hex}", str(e)) from e
+        if resto:
+            h.update(resto)
+            yield resto
+        if verificar and h.hexdigest() != sha256_hex:
+            raise BlobError(f"Objeto corrompido no armazenamento local: {sha256_hex}", str(self.caminho(sha256_hex)))
+
+    def ler(self, sha256_hex: str, verificar: bool = True) -> bytes:
+        return b"".join(self.iterar(sha256_hex, verificar=verificar))
+
+    def verificar(self, sha256_hex: str) -> bool:
+        try:
+            for _ in self.iterar(sha256_hex):
+                pass
+        except BlobError:
+            return False
+        return True
+
+    def hashes(self) -> Iterator[str]:
+        """Hashes de todos os objetos gravados (ignora temporários de gravações em andamento)."""
+        if not self.pasta.exists():
+            return
+        for arq in self.pasta.glob("??/??/*"):
+            if len(arq.name) == 64 and arq.is_file():
+                yield arq.name
+
+    def remover(self, sha256_hex: str) -> int:
+        """Apaga o objeto. Retorna bytes liberados."""
+        arq = self.caminho(sha256_hex)
+        try:
+            tamanho = arq.stat().st_size
+            arq.unlink()
+        except FileNotFoundError:
+            return 0
+        return tamanho
+
+    def remover_se_antigo(self, sha256_hex: str, limite: float) -> Optional[int]:
+        """
+        Apaga o objeto se o mtime continua anterior a `limite`. O objeto sai do lugar antes da conferência:
+        um gravar() anterior aparece no mtime (e o objeto volta), um posterior não o acha e grava de novo.
+        Retorna bytes liberados, ou None se o objeto ficou (ou já não existia).
+        """
+        arq = self.caminho(sha256_hex)
+        quarentena = arq.with_name(arq.name + ".rm")
+        try:
+            os.replace(arq, quarentena)
+        except FileNotFoundError:
+            return None
+        st_obj = quarentena.stat()
+        if st_obj.st_mtime > limite:
+            os.replace(quarentena, arq)
+            return None
+        quarentena.unlink()
+        return st_obj.st_size
+
+
+_lock = threading.Lock()
+_backends = {}
+
+
+def obter_backend(nome: Optional[str] = None):
+    """Backend pelo nome ("banco" ou "local"); sem nome, o de BLOB_BACKEND."""
+    nome = nome or BLOB_BACKEND
+    with _lock:
+        if nome not in _backends:
+            if nome == "banco":
+                _backends[nome] = BackendBanco()
+            elif nome == "local":
+                _backends[nome] = BackendLocal(PASTA_OBJETOS)
+            else:
+                raise ConfigError(f"Backend de armazenamento desconhecido: {nome!r}", "use 'banco' ou 'local'")
+        return _backends[nome]
+
+
+def armazenamento_externo(backend: Optional[str] = None) -> bool:
+    """True se as gravações vão para o object store (a coluna guarda só a referência)."""
+    return obter_backend(backend).nome == "local"
+
+
+# ----------------------------------------------------------------------------
+# Gravação e leitura
+# ----------------------------------------------------------------------------
+
+def gravar_blob(dados, backend: Optional[str] = None):
+    """
+    Valor a gravar na coluna: o conteúdo (pelo codec) no backend "banco" ou a referência no "local".
+    None continua None; referência ou conteúdo já codificado (cópia de outro banco) também são aceitos.
+    """
+    if dados is None:
+        return None
+    if ler_referencia(dados):
+        return bytes(dados)
+    return obter_backend(backend).gravar(dados)
+
+
+def ler_blob(valor, verificar: bool = True):
+    """Conteúdo original de um valor lido da coluna (referência, comprimido ou bruto). Texto e None passam direto."""
+    ref = ler_referencia(valor)
+    if ref:
+        return obter_backend("local").ler(ref["hash"], verificar=verificar)
+    return decodificar(valor)
+
+
+def iterar_referencia(ref: dict, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[bytes]:
+    """Conteúdo de uma referência (ler_referencia) em blocos, direto do object store."""
+    return obter_backend("local").iterar(ref["hash"], tamanho_bloco)
+
+
+def materializar(valor):
+    """Referência vira o conteúdo (pelo codec), para backups levarem os bytes; outros valores não mudam."""
+    if ler_referencia(valor):
+        return codificar(ler_blob(valor))
+    return valor
+
+
+def materializar_linha(tabela: str, colunas: list, valores) -> list:
+    """Valores de uma linha de `tabela` com as referências das COLUNAS_ARMAZENADAS trocadas pelo conteúdo."""
+    alvo = {c for t, c in COLUNAS_ARMAZENADAS if t == tabela}
+    return [materializar(v) if c in alvo else v for c, v in zip(colunas, valores)]
+
+
+# ----------------------------------------------------------------------------
+# Migração entre backends, verificação e limpeza do object store
+# ----------------------------------------------------------------------------
+
+def _tamanho_arquivo(caminho: str) -> int:
+    return sum(os.path.getsize(caminho + suf) for suf in ("", "-wal") if os.path.exists(caminho + suf))
+
+
+def _colunas_existentes(conn: sqlite3.Connection) -> list:
+    existentes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [(validar_tabela(t), validar_coluna(c)) for t, c in COLUNAS_ARMAZENADAS if t in existentes]
+
+
+def migrar_blobs(
+    destino: Optional[str] = None,
+    db_path: Optional[str] = None,
+    lote: int = LOTE_MIGRACAO,
+    vacuum: bool = True,
+    progresso: Optional[Callable[[int, int], None]] = None,
+    cancelar: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Move o conteúdo já gravado para o backend `destino` (padrão: BLOB_BACKEND): "local" tira os BLOBs do
+    banco (grava o objeto e troca o valor pela referência); "banco" traz os objetos de volta.
+    Os objetos são gravados fora da transação; a troca é feita em transação curta por lote e só se a
+    linha não mudou nesse meio tempo. Ao final, VACUUM devolve ao disco o espaço liberado no banco.
+    Retorna {"destino", "colunas": {"tabela.coluna": {linhas, movidas, ignoradas, bytes}}, "bytes_movidos",
+    "arquivo_antes", "arquivo_depois", "cancelado", "segundos"}.
+    """
+    alvo = obter_backend(destino)
+    caminho = str(db_path or DB_PATH)
+    t0 = time.perf_counter()
+    arquivo_antes = _tamanho_arquivo(caminho)
+    conn = sqlite3.connect(caminho, timeout=60)
+    colunas = {}
+    cancelado = False
+    try:
+        alvos = _colunas_existentes(conn)
+        total = sum(conn.execute(f"SELECT COUNT(*) FROM {t} WHERE {c} IS NOT NULL").fetchone()[0] for t, c in alvos)
+        feitos = 0
+        for tab, col in alvos:
+            stats = {"linhas": 0, "movidas": 0, "ignoradas": 0, "bytes": 0}
+            ultimo = 0
+            while True:
+                if cancelar is not None and cancelar.is_set():
+                    cancelado = True
+                    break
+                rows = conn.execute(
+                    f"SELECT rowid, {col} FROM {tab} WHERE rowid > ? AND {col} IS NOT NULL ORDER BY rowid LIMIT ?",
+                    (ultimo, int(lote)),
+                ).fetchall()
+                if not rows:
+                    break
+                trocas = []
+                for rowid, valor in rows:
+                    ref = ler_referencia(valor)
+                    if alvo.nome == "local" and ref is None:
+                        novo = alvo.gravar(valor)
+                        trocas.append((novo, rowid, valor, ler_referencia(novo)["tamanho"]))
+                    elif alvo.nome == "banco" and ref is not None:
+                        trocas.append((codificar(ler_blob(valor)), rowid, valor, ref["tamanho"]))
+                conn.execute("BEGIN IMMEDIATE")
+                for novo, rowid, antigo, tamanho in trocas:
+                    cur = conn.execute(
+                        f"UPDATE {tab} SET {col} = ? WHERE rowid = ? AND {col} = ?",
+                        (sqlite3.Binary(novo), rowid, antigo),
+                    )
+                    if cur.rowcount:
+                        stats["movidas"] += 1
+                        stats["bytes"] += tamanho
+                    else:
+                        stats["ignoradas"] += 1  # linha regravada pelo app durante o lote
+                conn.commit()
+                stats["linhas"] += len(rows)
+                ultimo = rows[-1][0]
+                feitos += len(rows)
+                if progresso:
+                    progresso(feitos, total)
+            colunas[f"{tab}.{col}"] = stats
+            if cancelado:
+                break
+        if vacuum and not cancelado and any(s["movidas"] for s in colunas.values()):
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # em WAL, o VACUUM passa pelo -wal
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {
+        "destino": alvo.nome,
+        "colunas": colunas,
+        "bytes_movidos": sum(s["bytes"] for s in colunas.values()),
+        "arquivo_antes": arquivo_antes,
+        "arquivo_depois": _tamanho_arquivo(caminho),
+        "cancelado": cancelado,
+        "segundos": round(time.perf_counter() - t0, 1),
+    }
+
+
+def _referencias_no_banco(conn: sqlite3.Connection) -> dict:
+    """hash -> quantidade de linhas que apontam para ele (só lê valores do tamanho de uma referência)."""
+    refs = {}
+    for tab, col in _colunas_existentes(conn):
+        for (valor,) in conn.execute(f"SELECT {col} FROM {tab} WHERE length({col}) = ?", (TAMANHO_REFERENCIA,)):
+            ref = ler_referencia(valor)
+            if ref:
+                refs[ref["hash"]] = refs.get(ref["hash"], 0) + 1
+    return refs
+
+
+def _referenciado(conn: sqlite3.Connection, sha256_hex: str) -> bool:
+    """True se alguma linha aponta para o objeto agora (o sha256 fica nos 32 bytes finais da referência)."""
+    digest = bytes.fromhex(sha256_hex)
+    for tab, col in _colunas_existentes(conn):
+        if conn.execute(
+            f"SELECT 1 FROM {tab} WHERE length({col}) = ? AND substr({col}, 1, 4) = ? AND substr({col}, 14) = ? LIMIT 1",
+            (TAMANHO_REFERENCIA, MAGICO_REF, digest),
+        ).fetchall():
+            return True
+    return False
+
+
+def verificar_objetos(db_path: Optional[str] = None) -> dict:
+    """Confere cada objeto referenciado no banco (existe e o sha256 bate). {"verificados", "ausentes", "corrompidos"}."""
+    conn = sqlite3.connect(str(db_path or DB_PATH), timeout=30)
+    try:
+        refs = _referencias_no_banco(conn)
+    finally:
+        conn.close()
+    local = obter_backend("local")
+    ausentes, corrompidos = [], []
+    for sha in refs:
+        if not local.existe(sha):
+            ausentes.append(sha)
+        elif not local.verificar(sha):
+            corrompidos.append(sha)
+    return {"verificados": len(refs), "ausentes": ausentes, "corrompidos": corrompidos}
+
+
+def remover_orfaos(db_path: Optional[str] = None, aplicar: bool = False, idade_minima_s: int = 3600) -> dict:
+    """
+    Objetos do object store sem nenhuma linha apontando para eles (exame excluído, laudo regravado).
+    Só considera objetos com mais de idade_minima_s (uma gravação pode estar entre o objeto e o commit).
+    Com aplicar=True, cada órfão tem as referências conferidas de novo logo antes de sair (uma linha
+    gravada durante a varredura pode ter passado a apontar para ele) e só é apagado se ninguém o
+    gravou nesse meio tempo (remover_se_antigo). Com aplicar=False apenas conta.
+    Retorna {"objetos", "orfaos", "bytes", "removidos"}.
+    """
+    conn = sqlite3.connect(str(db_path or DB_PATH), timeout=30)
+    try:
+        refs = _referencias_no_banco(conn)
+        local = obter_backend("local")
+        limite = time.time() - idade_minima_s
+        objetos = orfaos = removidos = total_bytes = 0
+        for sha in local.hashes():
+            objetos += 1
+            if sha in refs:
+                continue
+            try:
+                st_obj = local.caminho(sha).stat()
+            except FileNotFoundError:
+                continue
+            if st_obj.st_mtime > limite:
+                continue
+            if aplicar:
+                if _referenciado(conn, sha):
+                    continue
+                liberados = local.remover_se_antigo(sha, limite)
+                if liberados is None:
+                    continue
+                removidos += 1
+                total_bytes += liberados
+            else:
+                total_bytes += st_obj.st_size
+            orfaos += 1
+    finally:
+        conn.close()
+    return {"objetos": objetos, "orfaos": orfaos, "bytes": total_bytes, "removidos": removidos}
@@ -1,5 +1,7 @@
 # Configuração central: versão, caminhos, CSS, logging
 import logging
+import os
+import tempfile
 from datetime import date, datetime
 from pathlib import Path
 
@@ -46,12 +48,136 @@ _setup_app_logging()
 _ROOT = Path(__file__).resolve().parent.parent
 PASTA_DB = _ROOT / "data"
 DB_PATH = _ROOT / "data" / "fortcordis.db"
+# Mesma variável de fortcordis_modules.database e modules.rbac: aponta o app inteiro para outro banco
+# (benchmarks, testes manuais com cópia do banco)
+if os.environ.get("FORTCORDIS_DB_PATH"):
+    DB_PATH = Path(os.environ["FORTCORDIS_DB_PATH"])
 
 # Laudos: pastas e arquivos de referência (centralizado para Fase B)
 PASTA_LAUDOS = Path.home() / "FortCordis" / "Laudos"
 PASTA_LAUDOS.mkdir(parents=True, exist_ok=True)
 ARQUIVO_REF = "tabela_referencia_caninos.csv"
 ARQUIVO_REF_FELINOS = "tabela_referencia_felinos.csv"
+# Manifesto de PASTA_LAUDOS (app.laudos_manifesto): a pasta é varrida de novo quando muda (mtime) ou,
+# no máximo, a cada MANIFESTO_REVALIDAR_S (JSON editados no lugar não mudam o mtime da pasta)
+MANIFESTO_REVALIDAR_S = 60
+
+# Onde ficam os conteúdos de exames (JSON/PDF/imagens) e os PDFs de prescrição: "banco" (BLOB na própria
+# linha) ou "local" (object store por sha256 em PASTA_OBJETOS/ab/cd/<hash>; a linha guarda só a referência).
+# Vale para as próximas gravações; migrar_blobs.py move o que já está gravado (nos dois sentidos)
+BLOB_BACKEND = os.environ.get("FORTCORDIS_BLOB_BACKEND", "banco")
+PASTA_OBJETOS = Path(os.environ.get("FORTCORDIS_PASTA_OBJETOS") or (Path.home() / "FortCordis" / "Objetos"))
+
+# Imagens do exame: reduzidas para a área de impressão do PDF nesta resolução e recomprimidas em JPEG;
+# com LAUDOS_IMAGENS_MANTER_ORIGINAL o arquivo enviado também fica em PASTA_LAUDOS (__ORIG_NN)
+LAUDOS_IMAGENS_DPI = 300
+LAUDOS_IMAGENS_QUALIDADE_JPEG = 85
+LAUDOS_IMAGENS_MANTER_ORIGINAL = False
+LAUDOS_IMAGENS_WORKERS = 4
+
+# Cache de renderização do PDF do eco (app.laudos_pdf_cache): PASTA_CACHE_PDF/ab/<chave>.pdf, chave = sha256 das
+# entradas normalizadas do laudo; os menos usados saem acima de PDF_CACHE_MAX_MB. Mude PDF_LAUDO_VERSAO ao
+# alterar o layout de criar_pdf (invalida os PDFs em cache)
+PASTA_CACHE_PDF = Path(os.environ.get("FORTCORDIS_PASTA_CACHE_PDF") or (Path.home() / "FortCordis" / "CachePDF"))
+PDF_CACHE_MAX_MB = 200
+PDF_LAUDO_VERSAO = 1
+
+# Armazém por sessão (app.armazem_sessao): imagens do exame em edição e o último PDF gerado ficam em arquivos
+# temporários em PASTA_SESSOES/<sessão>/<sha256>; no session_state só a miniatura (app.laudos_miniaturas).
+# Os bytes lidos ficam num LRU de até SESSAO_MEMORIA_MAX_MB por sessão e o disco de uma sessão vai até
+# SESSAO_DISCO_MAX_MB. A pasta sai quando a sessão termina; a de sessões de um servidor que parou, depois de
+# SESSAO_TTL_H horas sem uso
+PASTA_SESSOES = Path(os.environ.get("FORTCORDIS_PASTA_SESSOES") or (Path(tempfile.gettempdir()) / "fortcordis_sessoes"))
+SESSAO_MEMORIA_MAX_MB = 16
+SESSAO_DISCO_MAX_MB = 512
+SESSAO_TTL_H = 12
+
+# Miniaturas das imagens do exame (app.laudos_miniaturas): geradas uma vez por conteúdo (sha256) em
+# PASTA_MINIATURAS/ab/<hash>_<lado>.webp (JPEG se o Pillow não tiver WebP); a grade da aba Imagens mostra só
+# elas, os bytes completos vão apenas para o PDF e o arquivo. As menos usadas saem acima de MINIATURAS_CACHE_MAX_MB
+PASTA_MINIATURAS = Path(os.environ.get("FORTCORDIS_PASTA_MINIATURAS") or (Path.home() / "FortCordis" / "Miniaturas"))
+MINIATURA_PX = 320
+MINIATURA_QUALIDADE = 75
+MINIATURAS_CACHE_MAX_MB = 100
+
+# Cache de cadastros de referência (clínicas, serviços, preços, descontos): recarrega no máximo
+# a cada N segundos mesmo sem invalidação explícita (escritas feitas fora do app)
+REFERENCIAS_TTL_SEGUNDOS = 300
+
+# Busca de pacientes para vínculo (app.services.busca_pacientes): índice em memória (listas ordenadas de nomes e
+# palavras normalizados + um texto único para "contém") de pacientes cadastrados e nomes que só aparecem em laudos.
+# As gravações do app atualizam o índice na hora; ele é remontado em segundo plano a cada N segundos (escritas
+# feitas fora do app)
+BUSCA_PACIENTES_TTL_SEGUNDOS = 300
+
+# Prescrições: PDFs arquivados por conteúdo (sha256) em PASTA_PRESCRICOES/<2 primeiros>/<hash>.pdf;
+# com PRESCRICOES_PDF_NO_BANCO os bytes também ficam no banco (nuvem sem disco persistente)
+PASTA_PRESCRICOES = Path.home() / "FortCordis" / "Prescricoes"
+PRESCRICOES_PDF_NO_BANCO = True
+PRESCRICOES_POR_PAGINA = 25
+
+# Documentos em lote (termos, receituários, atestados, GTA): processos de trabalho do pool
+DOCUMENTOS_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+
+# Medidas de ecocardiograma extraídas do JSON para laudos_medidas: processos do backfill e
+# tamanho do lote de exames entregue a cada processo
+MEDIDAS_WORKERS = DOCUMENTOS_WORKERS
+MEDIDAS_LOTE = 200
+
+# Interpretação clínica em lote (app.laudos_interpretacao: reestadiamento do arquivo histórico):
+# processos do pool e exames entregues a cada processo por vez
+INTERPRETACAO_WORKERS = DOCUMENTOS_WORKERS
+INTERPRETACAO_LOTE = 500
+
+# Instrumentação de desempenho (Configurações > Diagnóstico): tempo de render por página, cada SQL
+# (duração/linhas) e acertos do st.cache_data num buffer circular em memória de PERF_BUFFER eventos;
+# FORTCORDIS_PERF=0 desliga; com FORTCORDIS_PERF_JSONL os eventos também são anexados a esse arquivo
+PERF_ATIVO = os.environ.get("FORTCORDIS_PERF", "1") != "0"
+PERF_BUFFER = 5000
+PERF_JSONL = os.environ.get("FORTCORDIS_PERF_JSONL") or None
+
+# Compressão de BLOBs (fortcordis_modules.blob_codec): limiar e algoritmo vêm de FORTCORDIS_BLOB_LIMIAR /
+# FORTCORDIS_BLOB_ALGORITMO (zlib, lzma ou nenhum); a recompressão das linhas antigas grava em lotes
+# de BLOB_RECOMPRESSAO_LOTE linhas por transação
+BLOB_RECOMPRESSAO_LOTE = 100
+
+# Manutenção do banco (app.services.manutencao): uma thread do servidor confere o banco a cada
+# MANUTENCAO_INTERVALO_S; checkpoint PASSIVE quando o -wal passa de WAL_LIMIAR_CHECKPOINT e TRUNCATE
+# (devolve o -wal ao disco) acima de WAL_LIMIAR_TRUNCATE; PRAGMA optimize a cada MANUTENCAO_OTIMIZAR_S;
+# com auto_vacuum=INCREMENTAL devolve até VACUUM_INCREMENTAL_PAGINAS páginas livres por rodada quando
+# há mais de VACUUM_INCREMENTAL_MIN_PAGINAS. FORTCORDIS_MANUTENCAO=0 desliga a thread
+MANUTENCAO_ATIVA = os.environ.get("FORTCORDIS_MANUTENCAO", "1") != "0"
+MANUTENCAO_INTERVALO_S = 60
+MANUTENCAO_OTIMIZAR_S = 6 * 3600
+WAL_LIMIAR_CHECKPOINT = 8 * 1024 * 1024
+WAL_LIMIAR_TRUNCATE = 64 * 1024 * 1024
+VACUUM_INCREMENTAL_MIN_PAGINAS = 256
+VACUUM_INCREMENTAL_PAGINAS = 2000
+
+# Ingestão automática de PASTA_LAUDOS em laudos_arquivos (app.services.ingestao): uma thread do servidor
+# observa a pasta (watchdog, se instalado; senão varre a cada INGESTAO_POLL_S) e grava os exames novos ou
+# alterados em lotes de INGESTAO_LOTE; um exame só entra quando o arquivo mais novo dele está parado há
+# INGESTAO_DEBOUNCE_S (evita ler JSON/PDF ainda sendo escritos). Com watchdog, a pasta ainda é varrida
+# a cada INGESTAO_REVARRER_S. FORTCORDIS_INGESTAO=0 desliga a thread
+INGESTAO_ATIVA = os.environ.get("FORTCORDIS_INGESTAO", "1") != "0"
+INGESTAO_DEBOUNCE_S = 3
+INGESTAO_POLL_S = 10
+INGESTAO_REVARRER_S = 300
+INGESTAO_LOTE = 20
+
+# Migrações de esquema (app.migracoes, migrar_banco.py): tabelas reconstruídas são copiadas em lotes de
+# MIGRACAO_LOTE linhas (paginação por rowid), cada lote numa transação com o checkpoint da migração
+MIGRACAO_LOTE = 2000
+
+# Jobs em segundo plano (app.services.jobs): threads do pool (1 = um job por vez, na ordem de submissão; todos
+# gravam bastante no banco), intervalo mínimo entre gravações do progresso em jobs_background, dias que os jobs
+# terminados ficam na tabela, quantos terminados ficam em memória com o resultado e de quanto em quanto tempo a
+# página relê o progresso (fragmento, sem rerun da página inteira)
+JOBS_WORKERS = 1
+JOBS_PROGRESSO_INTERVALO_S = 2
+JOBS_RETENCAO_DIAS = 30
+JOBS_MEMORIA = 50
+JOBS_ATUALIZAR_S = 2
 
 CSS_GLOBAL = """
 <style>
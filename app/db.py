@@ -11,6 +11,9 @@ import streamlit as st
 from app.config import DB_PATH
 from app.utils import nome_proprio_ptbr, _norm_key
 from app.sql_safe import validar_coluna
+from app.laudos_dedup import garantir_fingerprints
+from app.laudos_medidas import garantir_tabela_medidas
+from fortcordis_modules.escritor import escrever
 
 logger = logging.getLogger(__name__)
 
@@ -105,6 +108,59 @@ def _db_conn():
     return _db_conn_safe()
 
 
+# Tabela consultas (prontuário — aba Consultas); também é o esquema alvo da migração
+# 0004_consultas_esquema_atual (app.migracoes)
+SQL_TABELA_CONSULTAS = """
+    CREATE TABLE IF NOT EXISTS consultas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER NOT NULL,
+        tutor_id INTEGER NOT NULL,
+        data_consulta TEXT NOT NULL,
+        hora_consulta TEXT,
+        tipo_atendimento TEXT,
+        motivo_consulta TEXT,
+        anamnese TEXT,
+        historico_atual TEXT,
+        alimentacao TEXT,
+        ambiente TEXT,
+        comportamento TEXT,
+        peso_kg REAL,
+        temperatura_c REAL,
+        frequencia_cardiaca INTEGER,
+        frequencia_respiratoria INTEGER,
+        tpc TEXT,
+        mucosas TEXT,
+        hidratacao TEXT,
+        linfonodos TEXT,
+        auscultacao_cardiaca TEXT,
+        auscultacao_respiratoria TEXT,
+        palpacao_abdominal TEXT,
+        exame_fisico_geral TEXT,
+        diagnostico_presuntivo TEXT,
+        diagnostico_diferencial TEXT,
+        diagnostico_definitivo TEXT,
+        conduta_terapeutica TEXT,
+        prescricao_id INTEGER,
+        exames_solicitados TEXT,
+        procedimentos_realizados TEXT,
+        orientacoes TEXT,
+        prognostico TEXT,
+        data_retorno TEXT,
+        observacoes TEXT,
+        veterinario_id INTEGER NOT NULL,
+        status TEXT DEFAULT 'finalizado',
+        data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
+        data_modificacao TEXT,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+        FOREIGN KEY (tutor_id) REFERENCES tutores(id),
+        FOREIGN KEY (veterinario_id) REFERENCES usuarios(id)
+    )
+"""
+
+
+_fingerprints_ok = False
+
+
 def _db_init():
     conn = sqlite3.connect(str(DB_PATH), timeout=DB_TIMEOUT)
     try:
@@ -171,55 +227,21 @@ def _db_init():
             )
         """)
         # Tabela consultas (prontuário — aba Consultas)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS consultas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                paciente_id INTEGER NOT NULL,
-                tutor_id INTEGER NOT NULL,
-                data_consulta TEXT NOT NULL,
-                hora_consulta TEXT,
-                tipo_atendimento TEXT,
-                motivo_consulta TEXT,
-                anamnese TEXT,
-                historico_atual TEXT,
-                alimentacao TEXT,
-                ambiente TEXT,
-                comportamento TEXT,
-                peso_kg REAL,
-                temperatura_c REAL,
-                frequencia_cardiaca INTEGER,
-                frequencia_respiratoria INTEGER,
-                tpc TEXT,
-                mucosas TEXT,
-                hidratacao TEXT,
-                linfonodos TEXT,
-                auscultacao_cardiaca TEXT,
-                auscultacao_respiratoria TEXT,
-                palpacao_abdominal TEXT,
-                exame_fisico_geral TEXT,
-                diagnostico_presuntivo TEXT,
-                diagnostico_diferencial TEXT,
-                diagnostico_definitivo TEXT,
-                conduta_terapeutica TEXT,
-                prescricao_id INTEGER,
-                exames_solicitados TEXT,
-                procedimentos_realizados TEXT,
-                orientacoes TEXT,
-                prognostico TEXT,
-                data_retorno TEXT,
-                observacoes TEXT,
-                veterinario_id INTEGER NOT NULL,
-                status TEXT DEFAULT 'finalizado',
-                data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
-                data_modificacao TEXT,
-                FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
-                FOREIGN KEY (tutor_id) REFERENCES tutores(id),
-                FOREIGN KEY (veterinario_id) REFERENCES usuarios(id)
-            )
-        """)
+        conn.execute(SQL_TABELA_CONSULTAS)
         conn.commit()
     finally:
         conn.close()
+    global _fingerprints_ok
+    if not _fingerprints_ok:
+        # Uma vez por processo: fingerprint dos exames (coluna, índice, linhas antigas) e tabela de medidas,
+        # pelo escritor único para não disputar o lock com as gravações dos usuários
+        escrever(_garantir_fingerprints_e_medidas, db_path=DB_PATH, chaves_estrangeiras=False)
+        _fingerprints_ok = True
+
+
+def _garantir_fingerprints_e_medidas(conn) -> None:
+    garantir_fingerprints(conn)
+    garantir_tabela_medidas(conn)
 
 
 def db_upsert_clinica(nome: str) -> int | None:
@@ -279,6 +301,8 @@ def db_upsert_tutor(nome: str, telefone: str = None) -> int | None:
             params.append(row["id"])
             conn.execute(f"UPDATE tutores SET {', '.join(updates)} WHERE id=?", params)
             conn.commit()
+            from app.services.busca_pacientes import registrar_tutor_busca  # app.services importa app.db
+            registrar_tutor_busca(row["id"])
         return row["id"]
     now = datetime.now().isoformat(timespec="seconds")
     conn.execute("INSERT INTO tutores(nome, nome_key, telefone, created_at) VALUES(?,?,?,?)",
@@ -343,7 +367,10 @@ def db_upsert_paciente(
     conn.execute("INSERT INTO pacientes(tutor_id, nome, nome_key, especie, raca, sexo, nascimento, created_at) VALUES(?,?,?,?,?,?,?,?)",
                  (tutor_id, nome, key, especie, raca, sexo, nascimento, now))
     conn.commit()
-    return conn.execute(
+    paciente_id = conn.execute(
         "SELECT id FROM pacientes WHERE tutor_id=? AND nome_key=? AND especie=?",
         (tutor_id, key, especie)
     ).fetchone()["id"]
+    from app.services.busca_pacientes import registrar_paciente_busca  # app.services importa app.db
+    registrar_paciente_busca(paciente_id)
+    return paciente_id
@@ -0,0 +1,284 @@
+# Instrumentação de desempenho: render por página, SQL (duração/linhas) e acertos do st.cache_data
+# num buffer circular em memória; resumo top-N com percentis e exportação JSONL (aba Diagnóstico)
+import functools
+import json
+import logging
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+import streamlit as st
+
+from app.config import PERF_ATIVO, PERF_BUFFER, PERF_JSONL
+
+logger = logging.getLogger(__name__)
+
+TIPOS = ("pagina", "sql", "cache")
+
+_lock = threading.Lock()
+_eventos: deque = deque(maxlen=PERF_BUFFER)
+_pendentes_jsonl: List[dict] = []
+_local = threading.local()
+# __wrapped__: se o módulo for recarregado com a instrumentação instalada, não embrulha de novo
+_connect_original = getattr(sqlite3.connect, "__wrapped__", sqlite3.connect)
+_instalado = False
+_ESPACOS = re.compile(r"\s+")
+
+
+def _pagina_atual() -> Optional[str]:
+    return getattr(_local, "pagina", None)
+
+
+def _registrar(tipo: str, nome: str, ms: float, **extra) -> dict:
+    ev = {"ts": datetime.now().isoformat(timespec="milliseconds"), "tipo": tipo, "nome": nome,
+          "ms": round(ms, 3), "pagina": _pagina_atual(), **extra}
+    with _lock:
+        _eventos.append(ev)
+        if PERF_JSONL:
+            _pendentes_jsonl.append(ev)
+    return ev
+
+
+# ----------------------------------------------------------------------------
+# SQL: conexão/cursor que medem cada comando
+# ----------------------------------------------------------------------------
+
+def _texto_sql(sql: str) -> str:
+    return _ESPACOS.sub(" ", str(sql)).strip()[:240]
+
+
+class CursorMedido(sqlite3.Cursor):
+    """Cursor que registra duração de execute (+ leituras) e linhas lidas/afetadas."""
+
+    _ev = None
+
+    def _medir(self, metodo, sql, *args):
+        t0 = time.perf_counter()
+        try:
+            return metodo(sql, *args)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self._ev = _registrar("sql", _texto_sql(sql), ms, linhas=max(self.rowcount, 0))
+
+    def execute(self, sql, parameters=()):
+        return self._medir(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._medir(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._medir(super().executescript, sql_script)
+
+    def _ler(self, metodo, *args):
+        t0 = time.perf_counter()
+        out = metodo(*args)
+        ev = self._ev
+        if ev is not None:
+            ev["ms"] = round(ev["ms"] + (time.perf_counter() - t0) * 1000, 3)
+            ev["linhas"] += len(out) if isinstance(out, list) else (out is not None)
+        return out
+
+    def fetchone(self):
+        return self._ler(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._ler(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._ler(super().fetchall)
+
+    def __next__(self):
+        row = super().__next__()
+        if self._ev is not None:
+            self._ev["linhas"] += 1
+        return row
+
+
+class ConexaoMedida(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os atalhos conn.execute*) são CursorMedido."""
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+@functools.wraps(_connect_original)
+def _connect_medido(*args, **kwargs):
+    if "factory" not in kwargs and len(args) < 6:
+        kwargs["factory"] = ConexaoMedida
+    return _connect_original(*args, **kwargs)
+
+
+def instalar() -> bool:
+    """
+    Passa a medir toda conexão aberta com sqlite3.connect (app, modules, fortcordis_modules).
+    Idempotente; não faz nada com PERF_ATIVO desligado. Retorna se a instrumentação está ativa.
+    """
+    global _instalado
+    if not PERF_ATIVO:
+        return False
+    if not _instalado:
+        sqlite3.connect = _connect_medido
+        _instalado = True
+    return True
+
+
+def ativo() -> bool:
+    return _instalado
+
+
+# ----------------------------------------------------------------------------
+# Páginas e st.cache_data
+# ----------------------------------------------------------------------------
+
+@contextmanager
+def medir_pagina(nome: str):
+    """Mede o render de uma página do menu; SQL e cache executados dentro ficam atribuídos a ela."""
+    if not _instalado:
+        yield
+        return
+    anterior = _pagina_atual()
+    _local.pagina = nome
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.pagina = anterior
+        # st.stop()/st.rerun() também passam por aqui: o tempo até a interrupção é registrado
+        _registrar("pagina", nome, (time.perf_counter() - t0) * 1000)
+        if anterior is None:
+            descarregar_jsonl()
+
+
+def cache_data_medido(func: Optional[Callable] = None, **opcoes):
+    """
+    Igual a @st.cache_data(**opcoes), registrando acerto/falta a cada chamada.
+    A falta é detectada quando o corpo da função roda; .clear() continua disponível.
+    """
+    def decorar(fn):
+        nome = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def _calcular(*args, **kwargs):
+            pilha = getattr(_local, "cache", None)
+            if pilha:
+                pilha[-1] = True
+            return fn(*args, **kwargs)
+
+        em_cache = st.cache_data(**opcoes)(_calcular)
+
+        @functools.wraps(fn)
+        def chamar(*args, **kwargs):
+            if not _instalado:
+                return em_cache(*args, **kwargs)
+            pilha = getattr(_local, "cache", None)
+            if pilha is None:
+                pilha = _local.cache = []
+            pilha.append(False)
+            t0 = time.perf_counter()
+            try:
+                return em_cache(*args, **kwargs)
+            finally:
+                calculou = pilha.pop()
+                _registrar("cache", nome, (time.perf_counter() - t0) * 1000, acerto=not calculou)
+
+        chamar.clear = em_cache.clear
+        return chamar
+
+    return decorar(func) if func is not None else decorar
+
+
+# ----------------------------------------------------------------------------
+# Relatórios
+# ----------------------------------------------------------------------------
+
+def eventos(tipo: Optional[str] = None) -> List[dict]:
+    with _lock:
+        lista = list(_eventos)
+    return [e for e in lista if e["tipo"] == tipo] if tipo else lista
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    k = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[k]
+
+
+def resumo(tipo: str, top: int = 10, ordenar_por: str = "p95") -> List[dict]:
+    """
+    Agrupa os eventos do tipo por nome (página, SQL normalizado ou função em cache).
+    Cada item: nome, n, total_ms, p50, p95, p99, max_ms, linhas_media (sql), acertos/taxa_acerto (cache).
+    ordenar_por: "p95", "total_ms" ou "n".
+    """
+    grupos = {}
+    for e in eventos(tipo):
+        grupos.setdefault(e["nome"], []).append(e)
+    out = []
+    for nome, evs in grupos.items():
+        tempos = sorted(e["ms"] for e in evs)
+        item = {
+            "nome": nome,
+            "n": len(evs),
+            "total_ms": round(sum(tempos), 1),
+            "p50": round(_percentil(tempos, 50), 2),
+            "p95": round(_percentil(tempos, 95), 2),
+            "p99": round(_percentil(tempos, 99), 2),
+            "max_ms": round(tempos[-1], 2),
+        }
+        if tipo == "sql":
+            item["linhas_media"] = round(sum(e.get("linhas", 0) for e in evs) / len(evs), 1)
+        if tipo == "cache":
+            item["acertos"] = sum(1 for e in evs if e.get("acerto"))
+            item["taxa_acerto"] = round(item["acertos"] / len(evs), 3)
+        out.append(item)
+    out.sort(key=lambda i: i.get(ordenar_por, 0), reverse=True)
+    return out[:top]
+
+
+def limpar() -> None:
+    with _lock:
+        _eventos.clear()
+
+
+def exportar_jsonl(caminho: Optional[Union[str, Path]] = None) -> Union[bytes, int]:
+    """Eventos do buffer em JSONL: retorna os bytes ou, com caminho, anexa ao arquivo e retorna a quantidade."""
+    linhas = [json.dumps(e, ensure_ascii=False) for e in eventos()]
+    if caminho is None:
+        return ("\n".join(linhas) + "\n").encode("utf-8") if linhas else b""
+    with open(caminho, "a", encoding="utf-8") as f:
+        for linha in linhas:
+            f.write(linha + "\n")
+    return len(linhas)
+
+
+def descarregar_jsonl() -> None:
+    """Anexa a PERF_JSONL os eventos acumulados desde o último render (chamado ao fim de cada página)."""
+    if not PERF_JSONL:
+        return
+    with _lock:
+        pendentes = _pendentes_jsonl[:]
+        _pendentes_jsonl.clear()
+    if not pendentes:
+        return
+    try:
+        with open(PERF_JSONL, "a", encoding="utf-8") as f:
+            for e in pendentes:
+                f.write(json.dumps(e, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logger.warning("Não foi possível gravar eventos de desempenho em %s: %s", PERF_JSONL, e)
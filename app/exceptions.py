@@ -23,3 +23,8 @@ class LaudoNotFoundError(AppError):
 class ConfigError(AppError):
     """Erro de configuração (path inexistente, valor inválido)."""
     pass
+
+
+class BlobError(AppError):
+    """Conteúdo armazenado ausente ou corrompido (object store de exames/PDFs)."""
+    pass
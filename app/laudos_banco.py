@@ -1,5 +1,6 @@
 # Operações de banco para laudos (ecocardiograma, eletro, pressão arterial)
 # Fase B: extraído do fortcordis_app.py
+import hashlib
 import json
 import logging
 import sqlite3
@@ -7,8 +8,16 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, List, Optional, Tuple, Union
 
+from app.blob_store import gravar_blob, ler_blob, ler_referencia
 from app.config import DB_PATH
+from app.exceptions import BlobError
+from app.laudos_dedup import garantir_fingerprints, upsert_exame, upsert_laudo_arquivo
+from app.laudos_medidas import atualizar_medidas_exame, garantir_tabela_medidas
+from app.services.busca_pacientes import obter_indice_busca, registrar_laudo_busca
+from app.services.manutencao import solicitar_manutencao
+from app.services.timeline import registrar_evento_exame, remover_eventos_da_origem
 from app.sql_safe import validar_tabela
+from fortcordis_modules.escritor import escrever
 
 logger = logging.getLogger(__name__)
 
@@ -60,13 +69,11 @@ def salvar_laudo_no_banco(
     caminho_json: str,
     caminho_pdf: str,
 ) -> Tuple[Optional[int], Optional[str]]:
-    """Salva o laudo no banco de dados. Retorna (laudo_id, None) ou (None, mensagem_erro)."""
+    """
+    Salva o laudo no banco de dados. Retorna (laudo_id, None) ou (None, mensagem_erro).
+    A gravação passa pelo escritor único do processo (fortcordis_modules.escritor).
+    """
     try:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        _criar_tabelas_laudos_se_nao_existirem(cursor)
-        conn.commit()
-
         tabelas = {
             "ecocardiograma": "laudos_ecocardiograma",
             "eletrocardiograma": "laudos_eletrocardiograma",
@@ -79,8 +86,6 @@ def salvar_laudo_no_banco(
             return None, f"Tipo inválido: {tipo_exame}"
 
         tabela = validar_tabela(tabela)
-        cursor.execute(f"PRAGMA table_info({tabela})")
-        colunas_existentes = [col[1] for col in cursor.fetchall()]
 
         # Aceita dados no topo ou dentro de dados_laudo["paciente"] (ex.: JSON da página Laudos)
         _pac = dados_laudo.get('paciente') or {}
@@ -128,31 +133,36 @@ def salvar_laudo_no_banco(
             'status': 'finalizado'
         }
 
-        colunas_usar = []
-        valores_usar = []
-
-        for col in colunas_existentes:
-            if col in ['id', 'data_criacao', 'data_modificacao']:
-                continue
-            if col in dados_possiveis:
-                valor = dados_possiveis[col]
-                colunas_usar.append(col)
-                valores_usar.append(valor)
-
-        if not colunas_usar:
-            conn.close()
-            return None, "Nenhuma coluna para inserir"
-
-        placeholders = ', '.join(['?' for _ in colunas_usar])
-        colunas_str = ', '.join(colunas_usar)
-        query = f"INSERT INTO {tabela} ({colunas_str}) VALUES ({placeholders})"
-        cursor.execute(query, valores_usar)
-
-        laudo_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-
-        return laudo_id, None
+        def _gravar(conn):
+            cursor = conn.cursor()
+            _criar_tabelas_laudos_se_nao_existirem(cursor)
+            garantir_fingerprints(conn)
+            cursor.execute(f"PRAGMA table_info({tabela})")
+            colunas_existentes = [col[1] for col in cursor.fetchall()]
+
+            colunas_usar = []
+            valores_usar = []
+
+            for col in colunas_existentes:
+                if col in ['id', 'data_criacao', 'data_modificacao', 'fingerprint']:
+                    continue
+                if col in dados_possiveis:
+                    valor = dados_possiveis[col]
+                    colunas_usar.append(col)
+                    valores_usar.append(valor)
+
+            if not colunas_usar:
+                return None, "Nenhuma coluna para inserir"
+
+            # Mesmo exame (fingerprint) salvo de novo atualiza a linha existente em vez de duplicar
+            laudo_id, _criado = upsert_exame(cursor, tabela, colunas_usar, valores_usar)
+            if laudo_id:
+                registrar_evento_exame(cursor, tabela, laudo_id)
+                if tabela == "laudos_ecocardiograma":
+                    registrar_laudo_busca(_nome)
+            return laudo_id, None
+
+        return escrever(_gravar, db_path=DB_PATH, chaves_estrangeiras=False)
 
     except Exception as e:
         logger.exception("Falha ao salvar laudo no banco: tipo=%s", tipo_exame)
@@ -168,6 +178,13 @@ def listar_animais_tutores_de_laudos(termo: Optional[str] = None, limite: int =
     """
     if not termo or not str(termo).strip():
         return []
+    try:
+        return [
+            {"paciente": r["paciente"], "tutor": r["tutor"], "fonte": "laudo"}
+            for r in obter_indice_busca().buscar(termo=str(termo), fontes=("laudo",), limite=limite)
+        ]
+    except sqlite3.Error as e:
+        logger.warning("Busca em laudos sem índice: %s", e)
     termo = f"%{str(termo).strip()}%"
     out = []
     try:
@@ -335,8 +352,9 @@ def excluir_laudo_do_banco(laudo_id: int, tipo_exame: str) -> Tuple[bool, Option
         conn = sqlite3.connect(str(DB_PATH))
         cursor = conn.cursor()
         cursor.execute(f"DELETE FROM {tabela} WHERE id = ?", (laudo_id,))
-        conn.commit()
         removidos = cursor.rowcount
+        remover_eventos_da_origem(cursor, tabela, laudo_id)
+        conn.commit()
         conn.close()
         if removidos == 0:
             return False, "Laudo não encontrado no banco."
@@ -358,21 +376,145 @@ def excluir_laudo_arquivo_do_banco(laudo_arquivo_id: int) -> Tuple[bool, Optiona
             "DELETE FROM laudos_arquivos_imagens WHERE laudo_arquivo_id = ?",
             (laudo_arquivo_id,),
         )
+        for tabela_medidas in ("laudos_medidas", "laudos_medidas_extraidas"):
+            try:
+                cursor.execute(f"DELETE FROM {tabela_medidas} WHERE exame_id = ?", (laudo_arquivo_id,))
+            except sqlite3.OperationalError:
+                pass
         cursor.execute(
             "DELETE FROM laudos_arquivos WHERE id = ?",
             (laudo_arquivo_id,),
         )
-        conn.commit()
         removidos = cursor.rowcount
+        remover_eventos_da_origem(cursor, "laudos_arquivos", laudo_arquivo_id)
+        conn.commit()
         conn.close()
         if removidos == 0:
             return False, "Laudo não encontrado no banco."
+        solicitar_manutencao()  # PDF e imagens liberam páginas: vacuum incremental na próxima rodada
         return True, None
     except Exception as e:
         logger.exception("Falha ao excluir laudo_arquivo id=%s", laudo_arquivo_id)
         return False, str(e)
 
 
+def _hash_conteudo(valor) -> Optional[str]:
+    """sha256 do conteúdo original de um valor gravado (referência: lido da própria referência)."""
+    ref = ler_referencia(valor)
+    if ref:
+        return ref["hash"]
+    try:
+        original = ler_blob(valor)
+    except BlobError:
+        return None
+    if original is None:
+        return None
+    if isinstance(original, str):
+        original = original.encode("utf-8")
+    return hashlib.sha256(bytes(original)).hexdigest()
+
+
+def sincronizar_imagens_laudo(
+    cursor: sqlite3.Cursor,
+    laudo_arquivo_id: int,
+    imagens: Optional[List[Tuple[str, bytes]]],
+) -> dict:
+    """
+    Deixa laudos_arquivos_imagens do laudo igual à lista (ordem, nome, conteúdo), regravando só as linhas que
+    mudaram: imagem igual na mesma ordem não é reescrita (regerar o PDF sem mexer nas imagens não grava BLOB).
+    Retorna {"iguais", "atualizadas", "inseridas", "removidas"}.
+    """
+    existentes = {}
+    sobras = []
+    for row_id, ordem, nome_arquivo, conteudo in cursor.execute(
+        "SELECT id, ordem, nome_arquivo, conteudo FROM laudos_arquivos_imagens WHERE laudo_arquivo_id = ? ORDER BY id",
+        (laudo_arquivo_id,),
+    ).fetchall():
+        if ordem in existentes:
+            sobras.append(row_id)
+        else:
+            existentes[ordem] = (row_id, nome_arquivo, conteudo)
+    res = {"iguais": 0, "atualizadas": 0, "inseridas": 0, "removidas": 0}
+    for ordem, (nome_arquivo, img_bytes) in enumerate(imagens or []):
+        atual = existentes.pop(ordem, None)
+        if atual is None:
+            cursor.execute(
+                "INSERT INTO laudos_arquivos_imagens (laudo_arquivo_id, ordem, nome_arquivo, conteudo) VALUES (?, ?, ?, ?)",
+                (laudo_arquivo_id, ordem, nome_arquivo, gravar_blob(img_bytes)),
+            )
+            res["inseridas"] += 1
+        elif atual[1] == nome_arquivo and _hash_conteudo(atual[2]) == hashlib.sha256(bytes(img_bytes)).hexdigest():
+            res["iguais"] += 1
+        else:
+            cursor.execute(
+                "UPDATE laudos_arquivos_imagens SET nome_arquivo = ?, conteudo = ? WHERE id = ?",
+                (nome_arquivo, gravar_blob(img_bytes), atual[0]),
+            )
+            res["atualizadas"] += 1
+    sobras.extend(row_id for row_id, _nome, _conteudo in existentes.values())
+    for row_id in sobras:
+        cursor.execute("DELETE FROM laudos_arquivos_imagens WHERE id = ?", (row_id,))
+    res["removidas"] = len(sobras)
+    return res
+
+
+def gravar_laudo_arquivo(
+    conn: sqlite3.Connection,
+    nome_base: str,
+    data_exame: str,
+    nome_animal: str,
+    nome_tutor: str,
+    nome_clinica: str,
+    tipo_exame: str,
+    conteudo_json: Union[bytes, str],
+    conteudo_pdf: Optional[bytes],
+    imagens: Optional[List[Tuple[str, bytes]]] = None,
+) -> Optional[int]:
+    """
+    Grava um laudo completo (upsert + imagens + medidas + evento da timeline) na conexão de quem chama,
+    sem commit: usado por salvar_laudo_arquivo_no_banco e pela ingestão em lote da pasta (app.services.ingestao).
+    laudos_arquivos já deve existir (_db_init) e garantir_fingerprints(conn) já ter rodado (uma vez por lote).
+    Retorna o id em laudos_arquivos.
+    """
+    if isinstance(conteudo_json, str):
+        conteudo_json = conteudo_json.encode("utf-8")
+    cursor = conn.cursor()
+    # Upsert pelo fingerprint do exame (ou nome_base): reimportar/regravar não duplica
+    laudo_arquivo_id, _criado = upsert_laudo_arquivo(
+        cursor,
+        nome_base,
+        data_exame,
+        nome_animal,
+        nome_tutor,
+        nome_clinica,
+        tipo_exame,
+        conteudo_json,
+        conteudo_pdf,
+    )
+
+    if laudo_arquivo_id:
+        sincronizar_imagens_laudo(cursor, laudo_arquivo_id, imagens)
+        if (tipo_exame or "ecocardiograma") == "ecocardiograma":
+            # Medidas do JSON para laudos_medidas (tendências/coortes sem decodificar o BLOB)
+            garantir_tabela_medidas(conn)
+            atualizar_medidas_exame(cursor, laudo_arquivo_id)
+        registrar_evento_exame(cursor, "laudos_arquivos", laudo_arquivo_id)
+        registrar_laudo_busca(nome_animal, nome_tutor)
+    return laudo_arquivo_id
+
+
+def garantir_tabela_laudos_arquivos() -> None:
+    """Cria laudos_arquivos/imagens (via _db_init) se ainda não existirem; fora do escritor, que não espera DDL de outra conexão."""
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        existe = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='laudos_arquivos'").fetchone()
+    finally:
+        conn.close()
+    if not existe:
+        from app.db import _db_init
+        _db_init()
+
+
 def salvar_laudo_arquivo_no_banco(
     nome_base: str,
     data_exame: str,
@@ -387,57 +529,18 @@ def salvar_laudo_arquivo_no_banco(
     """
     Salva laudo completo (JSON + PDF + imagens) na tabela laudos_arquivos.
     Tudo fica no banco em um único lugar; na nuvem, use um DB persistente (volume ou DB externo).
+    JSON, PDF e imagens passam pelo backend de armazenamento (app.blob_store): no banco, comprimidos
+    pelo codec acima do limiar; no object store local, a linha guarda só a referência ao conteúdo.
     Retorna (id_laudo_arquivo, None) ou (None, mensagem_erro).
     """
-    try:
-        if isinstance(conteudo_json, str):
-            conteudo_json = conteudo_json.encode("utf-8")
-        imagens = imagens or []
+    def _gravar(conn):
+        garantir_fingerprints(conn)
+        return gravar_laudo_arquivo(conn, nome_base, data_exame, nome_animal, nome_tutor, nome_clinica,
+                                    tipo_exame, conteudo_json, conteudo_pdf, imagens)
 
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='laudos_arquivos'"
-        )
-        if not cursor.fetchone():
-            from app.db import _db_init
-            _db_init()
-            conn = sqlite3.connect(str(DB_PATH))
-            cursor = conn.cursor()
-
-        cursor.execute(
-            """INSERT OR REPLACE INTO laudos_arquivos
-               (data_exame, nome_animal, nome_tutor, nome_clinica, tipo_exame, nome_base, conteudo_json, conteudo_pdf, created_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                data_exame,
-                nome_animal or "",
-                nome_tutor or "",
-                nome_clinica or "",
-                tipo_exame or "ecocardiograma",
-                nome_base,
-                conteudo_json,
-                conteudo_pdf,
-                datetime.now().isoformat(),
-            ),
-        )
-        laudo_arquivo_id = cursor.lastrowid
-        if laudo_arquivo_id == 0:
-            cursor.execute("SELECT id FROM laudos_arquivos WHERE nome_base = ?", (nome_base,))
-            row = cursor.fetchone()
-            laudo_arquivo_id = row[0] if row else None
-
-        if laudo_arquivo_id:
-            cursor.execute("DELETE FROM laudos_arquivos_imagens WHERE laudo_arquivo_id = ?", (laudo_arquivo_id,))
-            for ordem, (nome_arquivo, img_bytes) in enumerate(imagens):
-                cursor.execute(
-                    "INSERT INTO laudos_arquivos_imagens (laudo_arquivo_id, ordem, nome_arquivo, conteudo) VALUES (?, ?, ?, ?)",
-                    (laudo_arquivo_id, ordem, nome_arquivo, img_bytes),
-                )
-
-        conn.commit()
-        conn.close()
+    try:
+        garantir_tabela_laudos_arquivos()
+        laudo_arquivo_id = escrever(_gravar, db_path=DB_PATH, chaves_estrangeiras=False)
         return (laudo_arquivo_id, None)
     except Exception as e:
         logger.exception("Falha ao salvar laudo em laudos_arquivos: nome_base=%s", nome_base)
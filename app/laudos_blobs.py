@@ -0,0 +1,216 @@
+# Acesso preguiçoso a BLOBs de exames arquivados (laudos_arquivos / laudos_arquivos_imagens):
+# a listagem devolve só handles (tamanho, tipo); os bytes são lidos em blocos quando pedidos
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.blob_store import TAMANHO_REFERENCIA, iterar_referencia, ler_referencia
+from app.config import DB_PATH
+from app.sql_safe import validar_tabela
+from fortcordis_modules.blob_codec import TAMANHO_CABECALHO, DecodificadorIncremental, ler_cabecalho
+
+# Colunas BLOB acessíveis por handle (tabela, coluna)
+_COLUNAS_BLOB = frozenset({
+    ("laudos_arquivos", "conteudo_json"),
+    ("laudos_arquivos", "conteudo_pdf"),
+    ("laudos_arquivos_imagens", "conteudo"),
+})
+
+TAMANHO_BLOCO = 256 * 1024
+
+# Tamanho em bytes sem ler o BLOB (length() de BLOB usa só o cabeçalho do registro);
+# JSON gravado como TEXT por scripts antigos é convertido para contar bytes, não caracteres
+_TAMANHO_SQL = "CASE WHEN typeof({col}) = 'text' THEN length(CAST({col} AS BLOB)) ELSE length({col}) END"
+
+_MIME_POR_EXT = {
+    ".json": "application/json",
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+
+
+def _mime_por_nome(nome: str) -> str:
+    return _MIME_POR_EXT.get(Path(nome or "").suffix.lower(), "application/octet-stream")
+
+
+class BlobHandle:
+    """
+    Referência a um BLOB no banco (tabela, coluna, rowid) com tamanho e tipo conhecidos,
+    sem os bytes. ler() / iterar() / copiar_para() abrem o BLOB com Connection.blobopen
+    (leitura incremental em blocos); em Python < 3.11 cai para substr() em blocos.
+    Conteúdo comprimido pelo codec (fortcordis_modules.blob_codec) é descomprimido em blocos e
+    referência ao object store (app.blob_store) é lida do arquivo do objeto: iterar() e hash se
+    referem sempre ao conteúdo original. tamanho_armazenado é o que ocupa no banco; tamanho
+    (original) lê só o cabeçalho/referência, na primeira consulta.
+    O hash (sha256) é calculado na primeira consulta, também em blocos, e memorizado.
+    """
+
+    __slots__ = ("tabela", "coluna", "rowid", "tamanho_armazenado", "nome", "mime", "_hash", "_tamanho")
+
+    def __init__(self, tabela: str, coluna: str, rowid: int, tamanho: int, nome: str, mime: Optional[str] = None):
+        if (tabela, coluna) not in _COLUNAS_BLOB:
+            raise ValueError(f"Coluna BLOB não permitida: {tabela}.{coluna}")
+        self.tabela = validar_tabela(tabela)
+        self.coluna = coluna
+        self.rowid = int(rowid)
+        self.tamanho_armazenado = int(tamanho or 0)
+        self.nome = nome
+        self.mime = mime or _mime_por_nome(nome)
+        self._hash = None
+        self._tamanho = None
+
+    def __repr__(self) -> str:
+        return f"BlobHandle({self.tabela}.{self.coluna}#{self.rowid}, {self.tamanho_armazenado} bytes, {self.mime})"
+
+    @property
+    def tamanho(self) -> int:
+        """Tamanho do conteúdo original (o do cabeçalho, se estiver comprimido)."""
+        if self._tamanho is None:
+            cab = None
+            if self.tamanho_armazenado >= TAMANHO_CABECALHO:
+                try:
+                    inicio = self._inicio()
+                    cab = ler_referencia(inicio) or ler_cabecalho(inicio)
+                except (sqlite3.Error, ValueError):
+                    cab = None
+            self._tamanho = cab["tamanho"] if cab else self.tamanho_armazenado
+        return self._tamanho
+
+    def _inicio(self) -> bytes:
+        """Primeiros bytes gravados (cabeçalho do codec ou a referência inteira)."""
+        blocos = self._iterar_armazenado(max(TAMANHO_CABECALHO, TAMANHO_REFERENCIA))
+        try:
+            return next(blocos, b"")
+        finally:
+            blocos.close()
+
+    def iterar(self, tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[bytes]:
+        """Gera o conteúdo original em blocos (de até tamanho_bloco bytes lidos do banco ou do objeto)."""
+        if self.tamanho_armazenado == TAMANHO_REFERENCIA:
+            ref = ler_referencia(self._inicio())
+            if ref:
+                yield from iterar_referencia(ref, tamanho_bloco)
+                return
+        dec = DecodificadorIncremental()
+        for bloco in self._iterar_armazenado(tamanho_bloco):
+            saida = dec.alimentar(bloco)
+            if saida:
+                yield saida
+        resto = dec.finalizar()
+        if resto:
+            yield resto
+
+    def _iterar_armazenado(self, tamanho_bloco: int) -> Iterator[bytes]:
+        """Bytes como estão gravados no banco, em blocos."""
+        conn = sqlite3.connect(str(DB_PATH))
+        try:
+            if hasattr(conn, "blobopen"):
+                with conn.blobopen(self.tabela, self.coluna, self.rowid, readonly=True) as blob:
+                    while True:
+                        bloco = blob.read(tamanho_bloco)
+                        if not bloco:
+                            break
+                        yield bloco
+            else:
+                sql = f"SELECT substr(CAST({self.coluna} AS BLOB), ?, ?) FROM {self.tabela} WHERE rowid = ?"
+                pos = 1
+                while pos <= self.tamanho_armazenado:
+                    row = conn.execute(sql, (pos, tamanho_bloco, self.rowid)).fetchone()
+                    if not row or not row[0]:
+                        break
+                    yield bytes(row[0])
+                    pos += tamanho_bloco
+        finally:
+            conn.close()
+
+    def ler(self) -> bytes:
+        """Conteúdo completo (use só quando for de fato entregar/usar os bytes)."""
+        buf = bytearray()
+        for bloco in self.iterar():
+            buf += bloco
+        return bytes(buf)
+
+    def copiar_para(self, destino) -> int:
+        """
+        Grava o conteúdo em arquivo sem carregar tudo em memória. Retorna bytes gravados.
+        Escreve num temporário ao lado e renomeia: se a leitura falhar, o destino não fica pela metade.
+        """
+        destino = Path(destino)
+        tmp = destino.with_name(destino.name + ".tmp")
+        total = 0
+        try:
+            with open(tmp, "wb") as f:
+                for bloco in self.iterar():
+                    f.write(bloco)
+                    total += len(bloco)
+            os.replace(tmp, destino)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        return total
+
+    @property
+    def hash(self) -> str:
+        if self._hash is None:
+            h = hashlib.sha256()
+            for bloco in self.iterar():
+                h.update(bloco)
+            self._hash = h.hexdigest()
+        return self._hash
+
+
+def handles_laudo_arquivo(laudo_arquivo_id: int) -> Optional[dict]:
+    """
+    Metadados de um exame arquivado sem ler os BLOBs: {"id", "nome_base", "json": BlobHandle|None,
+    "pdf": BlobHandle|None}.
+    """
+    try:
+        conn = sqlite3.connect(str(DB_PATH))
+        try:
+            row = conn.execute(
+                f"SELECT id, nome_base, {_TAMANHO_SQL.format(col='conteudo_json')}, {_TAMANHO_SQL.format(col='conteudo_pdf')} "
+                "FROM laudos_arquivos WHERE id = ?",
+                (int(laudo_arquivo_id),),
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    if not row:
+        return None
+    rid, nome_base, tam_json, tam_pdf = row
+    nome_base = nome_base or f"laudo_{rid}"
+    return {
+        "id": rid,
+        "nome_base": nome_base,
+        "json": BlobHandle("laudos_arquivos", "conteudo_json", rid, tam_json, f"{nome_base}.json") if tam_json else None,
+        "pdf": BlobHandle("laudos_arquivos", "conteudo_pdf", rid, tam_pdf, f"{nome_base}.pdf") if tam_pdf else None,
+    }
+
+
+def handles_imagens_laudo_arquivo(laudo_arquivo_id: int) -> list:
+    """Handles das imagens de um exame arquivado (na ordem), sem ler os BLOBs."""
+    try:
+        conn = sqlite3.connect(str(DB_PATH))
+        try:
+            rows = conn.execute(
+                f"SELECT id, nome_arquivo, {_TAMANHO_SQL.format(col='conteudo')} FROM laudos_arquivos_imagens "
+                "WHERE laudo_arquivo_id = ? ORDER BY ordem, id",
+                (int(laudo_arquivo_id),),
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+    return [
+        BlobHandle("laudos_arquivos_imagens", "conteudo", rid, tam, nome or f"imagem_{i}.jpg")
+        for i, (rid, nome, tam) in enumerate(rows)
+        if tam
+    ]
@@ -0,0 +1,368 @@
+# Impressão digital (fingerprint) de exames: chave natural por conteúdo para importações idempotentes
+# e compactação de laudos repetidos (backup importado mais de uma vez, pasta reimportada etc.)
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from app.blob_store import gravar_blob, ler_blob
+from app.config import DB_PATH
+from app.sql_safe import validar_coluna, validar_tabela
+from app.utils import _norm_key
+
+logger = logging.getLogger(__name__)
+
+TABELAS_EXAMES = ("laudos_ecocardiograma", "laudos_eletrocardiograma", "laudos_pressao_arterial")
+
+# Colunas que entram no hash de medidas de cada tabela de exame
+_CAMPOS_MEDIDAS = {
+    "laudos_ecocardiograma": ("modo_m", "modo_bidimensional", "doppler", "achados_normais", "achados_alterados", "conclusao"),
+    "laudos_eletrocardiograma": ("ritmo", "frequencia_cardiaca", "conclusao"),
+    "laudos_pressao_arterial": ("pressao_sistolica", "pressao_diastolica", "conclusao"),
+}
+
+
+def fingerprint_exame(paciente: str, tutor: str, clinica: str, data_exame: str, tipo_exame: str, medidas: Any) -> str:
+    """
+    sha256 de paciente/tutor/clínica normalizados (_norm_key), data (AAAA-MM-DD), tipo e das medidas
+    serializadas de forma canônica. Mesmo exame => mesmo fingerprint, em qualquer banco.
+    """
+    medidas_txt = json.dumps(medidas, sort_keys=True, ensure_ascii=False, default=str) if medidas is not None else ""
+    partes = (
+        _norm_key(paciente),
+        _norm_key(tutor),
+        _norm_key(clinica),
+        str(data_exame or "")[:10],
+        _norm_key(tipo_exame),
+        hashlib.sha256(medidas_txt.encode("utf-8")).hexdigest(),
+    )
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+def _nomes_vinculados(cur: sqlite3.Cursor, paciente_id, clinica_id) -> Tuple[str, str, str]:
+    """(paciente, tutor, clínica) a partir dos ids, como na listagem de laudos."""
+    paciente = tutor = clinica = ""
+    try:
+        if paciente_id:
+            r = cur.execute(
+                "SELECT p.nome, t.nome FROM pacientes p LEFT JOIN tutores t ON t.id = p.tutor_id WHERE p.id = ?",
+                (paciente_id,),
+            ).fetchone()
+            if r:
+                paciente, tutor = r[0] or "", r[1] or ""
+        if clinica_id:
+            r = cur.execute(
+                "SELECT COALESCE((SELECT nome FROM clinicas WHERE id = ?), (SELECT nome FROM clinicas_parceiras WHERE id = ?))",
+                (clinica_id, clinica_id),
+            ).fetchone()
+            if r and r[0]:
+                clinica = r[0]
+    except sqlite3.OperationalError:
+        pass
+    return paciente, tutor, clinica
+
+
+def fingerprint_linha_exame(cur: sqlite3.Cursor, tabela: str, linha: dict) -> str:
+    """
+    Fingerprint de uma linha de laudos_ecocardiograma/eletro/pressão. Nomes vazios na linha são
+    resolvidos pelos vínculos (paciente_id/clinica_id), para que o laudo salvo pelo app e a mesma
+    linha vinda de um backup (com nomes preenchidos) gerem a mesma chave.
+    """
+    pac_v, tut_v, cli_v = _nomes_vinculados(cur, linha.get("paciente_id"), linha.get("clinica_id"))
+    paciente = (linha.get("nome_paciente") or "").strip() or pac_v
+    tutor = (linha.get("nome_tutor") or "").strip() or tut_v
+    clinica = (linha.get("nome_clinica") or "").strip() or cli_v
+    medidas = {c: linha.get(c) for c in _CAMPOS_MEDIDAS.get(tabela, ())}
+    tipo = linha.get("tipo_exame") or tabela.replace("laudos_", "")
+    return fingerprint_exame(paciente, tutor, clinica, linha.get("data_exame"), tipo, medidas)
+
+
+def fingerprint_laudo_arquivo(nome_animal, nome_tutor, nome_clinica, data_exame, tipo_exame, conteudo_json) -> str:
+    """Fingerprint de laudos_arquivos: cadastro + bloco "medidas" do JSON (ou o JSON inteiro se não houver)."""
+    medidas: Any = None
+    conteudo_json = ler_blob(conteudo_json)
+    if conteudo_json:
+        bruto = conteudo_json if isinstance(conteudo_json, (bytes, bytearray)) else str(conteudo_json).encode("utf-8")
+        try:
+            obj = json.loads(bytes(bruto).decode("utf-8"))
+            medidas = obj.get("medidas") if isinstance(obj, dict) and obj.get("medidas") else obj
+        except (ValueError, UnicodeDecodeError):
+            medidas = hashlib.sha256(bytes(bruto)).hexdigest()
+    return fingerprint_exame(nome_animal, nome_tutor, nome_clinica, data_exame, tipo_exame or "ecocardiograma", medidas)
+
+
+# ----------------------------------------------------------------------------
+# Esquema: coluna fingerprint + índice (único quando não houver repetidos)
+# ----------------------------------------------------------------------------
+
+def _colunas(cur: sqlite3.Cursor, tabela: str) -> list:
+    cur.execute(f"PRAGMA table_info({validar_tabela(tabela)})")
+    return [r[1] for r in cur.fetchall()]
+
+
+def _preencher_fingerprints(cur: sqlite3.Cursor, tabela: str) -> int:
+    """Calcula o fingerprint das linhas que ainda não têm. Retorna quantas foram preenchidas."""
+    tab = validar_tabela(tabela)
+    if tabela == "laudos_arquivos":
+        rows = cur.execute(
+            "SELECT id, nome_animal, nome_tutor, nome_clinica, data_exame, tipo_exame, conteudo_json "
+            "FROM laudos_arquivos WHERE fingerprint IS NULL"
+        ).fetchall()
+        novos = [(fingerprint_laudo_arquivo(*r[1:]), r[0]) for r in rows]
+    else:
+        cols = _colunas(cur, tabela)
+        rows = cur.execute(f"SELECT * FROM {tab} WHERE fingerprint IS NULL").fetchall()
+        novos = [(fingerprint_linha_exame(cur, tabela, dict(zip(cols, r))), r[cols.index("id")]) for r in rows]
+    if novos:
+        cur.executemany(f"UPDATE {tab} SET fingerprint = ? WHERE id = ?", novos)
+    return len(novos)
+
+
+def _criar_indice_fingerprint(cur: sqlite3.Cursor, tabela: str, tentar_unico: bool) -> bool:
+    """
+    Índice único em fingerprint; se ainda houver repetidos, fica um índice comum. Retorna se é único.
+    Com um índice comum já criado, só tenta o único quando tentar_unico (a tentativa varre a tabela).
+    """
+    tab = validar_tabela(tabela)
+    existentes = {r[0] for r in cur.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", (tab,)
+    ).fetchall()}
+    if f"ux_{tab}_fingerprint" in existentes:
+        return True
+    if f"ix_{tab}_fingerprint" in existentes and not tentar_unico:
+        return False
+    try:
+        cur.execute(f"CREATE UNIQUE INDEX ux_{tab}_fingerprint ON {tab}(fingerprint)")
+        cur.execute(f"DROP INDEX IF EXISTS ix_{tab}_fingerprint")
+        return True
+    except sqlite3.IntegrityError:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS ix_{tab}_fingerprint ON {tab}(fingerprint)")
+        return False
+
+
+def garantir_fingerprints(conn: sqlite3.Connection, tentar_unico: bool = False) -> dict:
+    """
+    Garante a coluna fingerprint (e índice) em todas as tabelas de exame e em laudos_arquivos,
+    preenchendo as linhas sem fingerprint. Retorna {tabela: índice é único?} das tabelas existentes.
+    Repetidos antigos impedem o índice único até rodar compactar_exames_duplicados().
+    """
+    cur = conn.cursor()
+    status = {}
+    for tabela in TABELAS_EXAMES + ("laudos_arquivos",):
+        try:
+            cols = _colunas(cur, tabela)
+            if not cols:
+                continue
+            if "fingerprint" not in cols:
+                cur.execute(f"ALTER TABLE {validar_tabela(tabela)} ADD COLUMN {validar_coluna('fingerprint')} TEXT")
+            _preencher_fingerprints(cur, tabela)
+            status[tabela] = _criar_indice_fingerprint(cur, tabela, tentar_unico)
+        except (sqlite3.OperationalError, ValueError) as e:
+            logger.warning("fingerprint indisponível em %s: %s", tabela, e)
+    conn.commit()
+    return status
+
+
+def buscar_por_fingerprint(cur: sqlite3.Cursor, tabela: str, fingerprint: str) -> Optional[int]:
+    try:
+        r = cur.execute(f"SELECT id FROM {validar_tabela(tabela)} WHERE fingerprint = ? ORDER BY id LIMIT 1", (fingerprint,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return r[0] if r else None
+
+
+def upsert_exame(cur: sqlite3.Cursor, tabela: str, colunas: list, valores: list) -> Tuple[int, bool]:
+    """
+    Insere a linha de exame ou, se já existir uma com o mesmo fingerprint, atualiza essa linha.
+    colunas/valores não devem conter id nem fingerprint (calculado aqui). Retorna (id, criado).
+    """
+    tab = validar_tabela(tabela)
+    linha = dict(zip(colunas, valores))
+    fp = fingerprint_linha_exame(cur, tabela, linha)
+    existente = buscar_por_fingerprint(cur, tabela, fp)
+    if existente is not None:
+        sets = ", ".join(f"{c} = ?" for c in colunas)
+        cur.execute(f"UPDATE {tab} SET {sets} WHERE id = ?", list(valores) + [existente])
+        return existente, False
+    cur.execute(
+        f"INSERT INTO {tab} ({', '.join(colunas)}, fingerprint) VALUES ({', '.join('?' for _ in colunas)}, ?)",
+        list(valores) + [fp],
+    )
+    return cur.lastrowid, True
+
+
+def upsert_laudo_arquivo(
+    cur: sqlite3.Cursor,
+    nome_base: str,
+    data_exame: str,
+    nome_animal: str,
+    nome_tutor: str,
+    nome_clinica: str,
+    tipo_exame: str,
+    conteudo_json,
+    conteudo_pdf,
+    created_at: Optional[str] = None,
+) -> Tuple[int, bool]:
+    """
+    Insere em laudos_arquivos ou atualiza a linha existente com o mesmo fingerprint (ou, na falta,
+    o mesmo nome_base). Ao contrário do INSERT OR REPLACE, mantém o id (e as imagens vinculadas).
+    JSON e PDF vão para o backend de armazenamento (app.blob_store: BLOB comprimido ou referência ao
+    object store); aceita também conteúdo já codificado (cópia de outro banco). Retorna (id, criado).
+    """
+    tipo_exame = tipo_exame or "ecocardiograma"
+    fp = fingerprint_laudo_arquivo(nome_animal, nome_tutor, nome_clinica, data_exame, tipo_exame, conteudo_json)
+    conteudo_json, conteudo_pdf = gravar_blob(conteudo_json), gravar_blob(conteudo_pdf)
+    existente = buscar_por_fingerprint(cur, "laudos_arquivos", fp)
+    if existente is None:
+        r = cur.execute("SELECT id FROM laudos_arquivos WHERE nome_base = ?", (nome_base,)).fetchone()
+        existente = r[0] if r else None
+    valores = (
+        data_exame, nome_animal or "", nome_tutor or "", nome_clinica or "", tipo_exame,
+        conteudo_json, conteudo_pdf, fp,
+    )
+    if existente is not None:
+        # nome_base da linha existente é mantido (outro nome_base pode já estar em uso); PDF vazio não apaga o atual.
+        # Linha já igual (mesmo laudo regravado) não é reescrita: JSON e PDF são BLOBs grandes
+        cur.execute(
+            """UPDATE laudos_arquivos SET data_exame = ?, nome_animal = ?, nome_tutor = ?, nome_clinica = ?,
+                   tipo_exame = ?, conteudo_json = ?, conteudo_pdf = COALESCE(?, conteudo_pdf), fingerprint = ?
+               WHERE id = ?
+                 AND (data_exame IS NOT ? OR nome_animal IS NOT ? OR nome_tutor IS NOT ? OR nome_clinica IS NOT ?
+                      OR tipo_exame IS NOT ? OR conteudo_json IS NOT ? OR (? IS NOT NULL AND conteudo_pdf IS NOT ?)
+                      OR fingerprint IS NOT ?)""",
+            valores + (existente,) + valores[:6] + (conteudo_pdf, conteudo_pdf, fp),
+        )
+        return existente, False
+    cur.execute(
+        """INSERT INTO laudos_arquivos
+           (data_exame, nome_animal, nome_tutor, nome_clinica, tipo_exame, conteudo_json, conteudo_pdf,
+            fingerprint, nome_base, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        valores + (nome_base, created_at or datetime.now().isoformat()),
+    )
+    return cur.lastrowid, True
+
+
+def ha_exames_repetidos(db_path: Optional[str] = None) -> bool:
+    """
+    True se alguma tabela de exame ainda está só com o índice comum de fingerprint (havia repetidos
+    quando o índice foi criado). Consulta apenas sqlite_master; não varre as tabelas.
+    """
+    try:
+        conn = sqlite3.connect(str(db_path or DB_PATH))
+        try:
+            nomes = {r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE '%_fingerprint'"
+            ).fetchall()}
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return any(
+        f"ix_{t}_fingerprint" in nomes and f"ux_{t}_fingerprint" not in nomes
+        for t in TABELAS_EXAMES + ("laudos_arquivos",)
+    )
+
+
+# ----------------------------------------------------------------------------
+# Compactação (job único): une repetidos e cria os índices únicos
+# ----------------------------------------------------------------------------
+
+def _unir_repetidos(cur: sqlite3.Cursor, tabela: str) -> int:
+    """
+    Para cada fingerprint repetido mantém a linha mais antiga, completa as colunas vazias dela com
+    os valores das repetidas (mais recentes primeiro) e apaga as demais. Retorna linhas removidas.
+    """
+    tab = validar_tabela(tabela)
+    cols = [c for c in _colunas(cur, tabela) if c not in ("id", "fingerprint")]
+    grupos = cur.execute(
+        f"SELECT fingerprint, GROUP_CONCAT(id) FROM {tab} WHERE fingerprint IS NOT NULL "
+        f"GROUP BY fingerprint HAVING COUNT(*) > 1"
+    ).fetchall()
+    removidas = 0
+    for _fp, ids_txt in grupos:
+        ids = sorted(int(x) for x in ids_txt.split(","))
+        manter, repetidos = ids[0], ids[1:]
+        marcas = ", ".join("?" for _ in repetidos)
+        if tabela == "laudos_arquivos":
+            _unir_laudo_arquivo(cur, manter, repetidos)
+        else:
+            # Preenche só o que está vazio na linha mantida
+            for c in cols:
+                cur.execute(
+                    f"""UPDATE {tab} SET {c} = (
+                            SELECT {c} FROM {tab} WHERE id IN ({marcas})
+                              AND {c} IS NOT NULL AND TRIM(CAST({c} AS TEXT)) <> ''
+                            ORDER BY id DESC LIMIT 1)
+                        WHERE id = ? AND ({c} IS NULL OR TRIM(CAST({c} AS TEXT)) = '')
+                          AND EXISTS (SELECT 1 FROM {tab} WHERE id IN ({marcas})
+                                      AND {c} IS NOT NULL AND TRIM(CAST({c} AS TEXT)) <> '')""",
+                    repetidos + [manter] + repetidos,
+                )
+        cur.execute(f"DELETE FROM {tab} WHERE id IN ({marcas})", repetidos)
+        removidas += len(repetidos)
+    return removidas
+
+
+def _unir_laudo_arquivo(cur: sqlite3.Cursor, manter: int, repetidos: list) -> None:
+    """laudos_arquivos: PDF e imagens vêm da repetida mais recente que tiver, se faltarem na mantida."""
+    marcas = ", ".join("?" for _ in repetidos)
+    cur.execute(
+        f"""UPDATE laudos_arquivos SET conteudo_pdf = (
+                SELECT conteudo_pdf FROM laudos_arquivos WHERE id IN ({marcas}) AND conteudo_pdf IS NOT NULL
+                ORDER BY id DESC LIMIT 1)
+            WHERE id = ? AND conteudo_pdf IS NULL""",
+        repetidos + [manter],
+    )
+    tem_imgs = cur.execute("SELECT 1 FROM laudos_arquivos_imagens WHERE laudo_arquivo_id = ? LIMIT 1", (manter,)).fetchone()
+    if not tem_imgs:
+        origem = cur.execute(
+            f"SELECT laudo_arquivo_id FROM laudos_arquivos_imagens WHERE laudo_arquivo_id IN ({marcas}) "
+            f"ORDER BY laudo_arquivo_id DESC LIMIT 1",
+            repetidos,
+        ).fetchone()
+        if origem:
+            cur.execute("UPDATE laudos_arquivos_imagens SET laudo_arquivo_id = ? WHERE laudo_arquivo_id = ?", (manter, origem[0]))
+    cur.execute(f"DELETE FROM laudos_arquivos_imagens WHERE laudo_arquivo_id IN ({marcas})", repetidos)
+
+
+def compactar_exames_duplicados(db_path: Optional[str] = None, vacuum: bool = True) -> dict:
+    """
+    Job único: calcula fingerprints, une os exames repetidos de cada tabela numa transação,
+    cria os índices únicos e (opcional) roda VACUUM para devolver o espaço ao disco.
+    Retorna {"removidos": {tabela: n}, "indices_unicos": {tabela: bool}, "bytes_antes", "bytes_depois"}.
+    """
+    caminho = str(db_path or DB_PATH)
+    bytes_antes = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+    conn = sqlite3.connect(caminho, timeout=60)
+    removidos = {}
+    try:
+        garantir_fingerprints(conn)
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        for tabela in TABELAS_EXAMES + ("laudos_arquivos",):
+            try:
+                if "fingerprint" in _colunas(cur, tabela):
+                    removidos[tabela] = _unir_repetidos(cur, tabela)
+            except (sqlite3.OperationalError, ValueError) as e:
+                logger.warning("Compactação de %s falhou: %s", tabela, e)
+        conn.commit()
+        indices = garantir_fingerprints(conn, tentar_unico=True)
+        if vacuum and any(removidos.values()):
+            conn.execute("VACUUM")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {
+        "removidos": removidos,
+        "indices_unicos": indices,
+        "bytes_antes": bytes_antes,
+        "bytes_depois": os.path.getsize(caminho) if os.path.exists(caminho) else 0,
+    }
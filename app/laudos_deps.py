@@ -31,10 +31,10 @@ from app.laudos_banco import salvar_laudo_no_banco, salvar_laudo_arquivo_no_banc
 try:
     from app.laudos_helpers import (
         montar_qualitativa,
-        montar_chave_frase,
         carregar_frases as _carregar_frases_impl,
         ARQUIVO_FRASES,
     )
+    from app.laudos_interpretacao import montar_chave_frase
 except ImportError:
     from app.laudos_helpers import (
         montar_qualitativa,
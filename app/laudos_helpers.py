@@ -15,7 +15,11 @@ import streamlit as st
 
 from app.config import DB_PATH
 from app.utils import _norm_key
-from app.laudos_refs import calcular_referencia_tabela
+from app.laudos_interpretacao import indice_frases, interpretar_exame
+from app.laudos_interpretacao import separar_patologia_grau as _split_pat_grau
+from app.laudos_blobs import handles_imagens_laudo_arquivo, handles_laudo_arquivo
+from app.blob_store import ler_blob
+from app.exceptions import BlobError
 from app.sql_safe import validar_tabela
 
 logger = logging.getLogger(__name__)
@@ -214,16 +218,6 @@ def inferir_layout(entry: dict, chave: str) -> str:
     return "detalhado"
 
 
-def _split_pat_grau(chave: str):
-    """Quebra 'Patologia (Grau)' em (base, grau)."""
-    s = (chave or "").strip()
-    if s.endswith(")") and " (" in s:
-        base, resto = s.rsplit(" (", 1)
-        grau = resto[:-1].strip()
-        return base.strip(), grau
-    return s, ""
-
-
 def _variantes_grau(grau: str) -> list:
     """Variações de grau para match robusto (Moderado/Moderada, etc.)."""
     g = (grau or "").strip()
@@ -239,14 +233,6 @@ def _variantes_grau(grau: str) -> list:
     return [g] + trocas.get(g, [])
 
 
-def montar_chave_frase(patologia: str, grau_refluxo: str, grau_geral: str) -> str:
-    if patologia == "Normal":
-        return "Normal (Normal)"
-    if patologia == "Endocardiose Mitral":
-        return f"{patologia} ({grau_refluxo})"
-    return f"{patologia} ({grau_geral})"
-
-
 def obter_entry_frase(db: dict, chave: str) -> Optional[dict[str, Any]]:
     """Obtém a entry do banco tentando (1) exato, (2) normalizado e (3) variações de grau."""
     if not isinstance(db, dict):
@@ -334,47 +320,16 @@ def complementar_regurgitacoes_nas_valvas(patologia: str = "", grau_mitral: str
 
 
 def analisar_criterios_clinicos(dados, peso, patologia, grau_refluxo, tem_congestao, grau_geral):
-    """Gera texto qualitativo automático a partir de patologia/grau e medidas; preenche session_state."""
-    chave = montar_chave_frase(patologia, grau_refluxo, grau_geral)
-    db_frases = st.session_state.get("db_frases") or {}
-    res_base = db_frases.get(chave, {})
-    if not res_base and patologia != "Normal":
-        for k, v in db_frases.items():
-            if patologia in k:
-                res_base = v.copy()
-                break
-    if not res_base:
-        res_base = {"conclusao": f"{patologia}"}
-    txt = res_base.copy()
-
-    if patologia == "Endocardiose Mitral":
-        conclusao_editor = (txt.get("conclusao") or "").strip()
-        try:
-            r_lvidd = calcular_referencia_tabela("LVIDd", peso)[0]
-            l_lvidd = r_lvidd[1] if r_lvidd[1] else 999
-            r_laao = calcular_referencia_tabela("LA_Ao", peso)[0]
-            l_laao = r_laao[1] if r_laao[1] else 1.6
-        except Exception:
-            l_lvidd, l_laao = 999, 1.6
-        val_laao, val_lvidd = dados.get("LA_Ao", 0), dados.get("LVIDd", 0)
-        aum_ae, aum_ve = (val_laao >= l_laao), (val_lvidd > l_lvidd)
-        if not (txt.get("valvas") or "").strip():
-            txt["valvas"] = f"Valva mitral espessada. Insuficiência {grau_refluxo.lower()}."
-        if not conclusao_editor:
-            if tem_congestao:
-                txt["conclusao"] = f"Endocardiose Mitral Estágio C (ACVIM). Refluxo {grau_refluxo}. Sinais de ICC."
-            elif aum_ae and aum_ve:
-                txt["conclusao"] = f"Endocardiose Mitral Estágio B2 (ACVIM). Refluxo {grau_refluxo} com remodelamento."
-            elif aum_ae:
-                txt["conclusao"] = f"Endocardiose Mitral (Refluxo {grau_refluxo}) com aumento atrial esquerdo."
-            else:
-                txt["conclusao"] = f"Endocardiose Mitral Estágio B1 (ACVIM). Refluxo {grau_refluxo}."
-
+    """Gera texto qualitativo automático a partir de patologia/grau e medidas; preenche session_state.
+    As regras ficam em app.laudos_interpretacao.interpretar_exame (sem sessão); aqui só se aplica o resultado."""
+    medidas = dict(dados or {})
     dados_atual = st.session_state.get("dados_atuais", {}) or {}
-    mr = float(dados_atual.get("MR_Vmax", 0.0) or 0.0)
-    tr = float(dados_atual.get("TR_Vmax", 0.0) or 0.0)
-    ar = float(dados_atual.get("AR_Vmax", 0.0) or 0.0)
-    pr = float(dados_atual.get("PR_Vmax", 0.0) or 0.0)
+    for param in ("MR_Vmax", "TR_Vmax", "AR_Vmax", "PR_Vmax"):
+        medidas[param] = dados_atual.get(param, 0.0)
+    res = interpretar_exame(
+        medidas, peso, st.session_state.get("cad_especie", ""), patologia, grau_refluxo, tem_congestao, grau_geral,
+        frases=indice_frases(st.session_state.get("db_frases") or {}), df_ref=st.session_state.get("df_ref"),
+    )
 
     def append_if_needed(key: str, extra: str):
         extra = (extra or "").strip()
@@ -385,16 +340,9 @@ def analisar_criterios_clinicos(dados, peso, patologia, grau_refluxo, tem_conges
             return
         st.session_state[key] = (atual + ("\n" if atual else "") + extra).strip()
 
-    if mr > 0:
-        append_if_needed("q_valvas_mitral", f"Refluxo mitral presente ao Doppler (Vmax {mr:.2f} m/s).")
-    if mr > 0 and patologia == "Endocardiose Mitral" and grau_refluxo:
-        append_if_needed("q_valvas_mitral", f"Refluxo mitral {grau_refluxo.lower()} ao Doppler (Vmax {mr:.2f} m/s).")
-    if tr > 0:
-        append_if_needed("q_valvas_tricuspide", f"Refluxo tricúspide presente ao Doppler (Vmax {tr:.2f} m/s).")
-    if ar > 0:
-        append_if_needed("q_valvas_aortica", f"Refluxo aórtico presente ao Doppler (Vmax {ar:.2f} m/s).")
-    if pr > 0:
-        append_if_needed("q_valvas_pulmonar", f"Refluxo pulmonar presente ao Doppler (Vmax {pr:.2f} m/s).")
+    for valva, frases_valva in res["doppler"].items():
+        for extra in frases_valva:
+            append_if_needed(f"q_valvas_{valva}", extra)
 
     def set_if_empty(key, value):
         value = (value or "").strip()
@@ -677,7 +625,12 @@ def obter_laudo_arquivo_por_id(laudo_arquivo_id):
         )
         row = cur.fetchone()
         conn.close()
-        return dict(row) if row else None
+        if not row:
+            return None
+        out = dict(row)
+        out["conteudo_json"] = ler_blob(out["conteudo_json"])
+        out["conteudo_pdf"] = ler_blob(out["conteudo_pdf"])
+        return out
     except Exception:
         return None
 
@@ -692,7 +645,7 @@ def obter_imagens_laudo_arquivo(laudo_arquivo_id):
         )
         rows = cur.fetchall()
         conn.close()
-        return [{"nome_arquivo": r[0] or f"imagem_{i}.jpg", "conteudo": r[1] or b""} for i, r in enumerate(rows)]
+        return [{"nome_arquivo": r[0] or f"imagem_{i}.jpg", "conteudo": ler_blob(r[1]) or b""} for i, r in enumerate(rows)]
     except Exception:
         return []
 
@@ -706,36 +659,28 @@ def restaurar_laudo_para_pasta(laudo_arquivo_id: int, pasta_destino: str) -> tup
     pasta = _P(pasta_destino)
     pasta.mkdir(parents=True, exist_ok=True)
 
-    blob_row = obter_laudo_arquivo_por_id(laudo_arquivo_id)
-    if not blob_row:
+    # Copia em blocos do banco ou do object store (app.blob_store) para o arquivo, sem carregar
+    # PDF/imagens inteiros na memória
+    blobs = handles_laudo_arquivo(laudo_arquivo_id)
+    if not blobs:
         return False, "Laudo não encontrado no banco."
 
-    nome_base = blob_row.get("nome_base") or f"laudo_{laudo_arquivo_id}"
+    nome_base = blobs["nome_base"]
     arquivos_criados = []
 
-    # JSON
-    if blob_row.get("conteudo_json"):
-        json_path = pasta / f"{nome_base}.json"
-        raw = blob_row["conteudo_json"]
-        json_path.write_bytes(raw if isinstance(raw, bytes) else raw.encode("utf-8"))
-        arquivos_criados.append(json_path.name)
-
-    # PDF
-    if blob_row.get("conteudo_pdf"):
-        pdf_path = pasta / f"{nome_base}.pdf"
-        pdf_path.write_bytes(blob_row["conteudo_pdf"])
-        arquivos_criados.append(pdf_path.name)
-
-    # Imagens
-    imagens = obter_imagens_laudo_arquivo(laudo_arquivo_id)
-    for i, img in enumerate(imagens):
-        conteudo = img.get("conteudo") or b""
-        if not conteudo:
-            continue
-        nome_img = img.get("nome_arquivo") or f"{nome_base}__IMG_{i:02d}.jpg"
-        img_path = pasta / nome_img
-        img_path.write_bytes(conteudo)
-        arquivos_criados.append(nome_img)
+    try:
+        for handle in (blobs["json"], blobs["pdf"]):
+            if handle is not None:
+                handle.copiar_para(pasta / handle.nome)
+                arquivos_criados.append(handle.nome)
+
+        # Imagens
+        for i, handle in enumerate(handles_imagens_laudo_arquivo(laudo_arquivo_id)):
+            nome_img = handle.nome or f"{nome_base}__IMG_{i:02d}.jpg"
+            handle.copiar_para(pasta / nome_img)
+            arquivos_criados.append(nome_img)
+    except BlobError as e:
+        return False, f"{e.message} (restaurados antes do erro: {', '.join(arquivos_criados) or 'nenhum'})"
 
     if not arquivos_criados:
         return False, "Laudo sem conteúdo (JSON, PDF e imagens vazios)."
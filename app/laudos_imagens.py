@@ -0,0 +1,146 @@
+# Pipeline de imagens do exame: orientação EXIF, redução para a resolução de impressão,
+# recompressão e deduplicação por hash antes de ir para o PDF, a pasta e o banco
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.config import (
+    LAUDOS_IMAGENS_DPI,
+    LAUDOS_IMAGENS_MANTER_ORIGINAL,
+    LAUDOS_IMAGENS_QUALIDADE_JPEG,
+    LAUDOS_IMAGENS_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tamanho em que cada imagem é impressa no PDF do laudo (pdf.image(..., w=90, h=65), em mm)
+IMAGEM_PDF_LARGURA_MM = 90
+IMAGEM_PDF_ALTURA_MM = 65
+
+# Resultados já processados (chave: hash do original + parâmetros). As imagens do exame são
+# pedidas várias vezes por geração (preview, PDF, arquivamento); o cache evita reprocessar.
+_CACHE_MAX = 64
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def tamanho_impressao_px(dpi: int = LAUDOS_IMAGENS_DPI) -> Tuple[int, int]:
+    """(largura, altura) máximas em pixels para a área da imagem no PDF na resolução dada."""
+    return (
+        int(round(IMAGEM_PDF_LARGURA_MM / 25.4 * dpi)),
+        int(round(IMAGEM_PDF_ALTURA_MM / 25.4 * dpi)),
+    )
+
+
+def _codificar(img: Image.Image, qualidade: int) -> Tuple[bytes, str]:
+    """JPEG para fotos/capturas; PNG só quando há transparência real."""
+    buf = io.BytesIO()
+    tem_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+    if tem_alpha:
+        img.save(buf, format="PNG", optimize=True)
+        return buf.getvalue(), ".png"
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.save(buf, format="JPEG", quality=int(qualidade), optimize=True, progressive=True)
+    return buf.getvalue(), ".jpg"
+
+
+def processar_imagem(
+    dados: bytes,
+    nome: str = "imagem",
+    dpi: int = LAUDOS_IMAGENS_DPI,
+    qualidade: int = LAUDOS_IMAGENS_QUALIDADE_JPEG,
+    manter_original: bool = LAUDOS_IMAGENS_MANTER_ORIGINAL,
+) -> dict:
+    """
+    Normaliza uma imagem: aplica a orientação EXIF, reduz para caber na área de impressão
+    (nunca amplia) e recomprime. Se o resultado ficar maior que o original sem ter sido
+    preciso girar/reduzir, mantém os bytes originais.
+    Retorna {"name", "bytes", "ext", "hash", "hash_original", "bytes_original", "original"?}.
+    """
+    hash_original = hashlib.sha256(dados).hexdigest()
+    chave = (hash_original, dpi, qualidade)
+    with _cache_lock:
+        pronto = _cache.get(chave)
+        if pronto is not None:
+            _cache.move_to_end(chave)
+    if pronto is None:
+        pronto = _processar_bytes(dados, dpi, qualidade)
+        with _cache_lock:
+            _cache[chave] = pronto
+            while len(_cache) > _CACHE_MAX:
+                _cache.popitem(last=False)
+    saida, ext = pronto
+    out = {
+        "name": nome,
+        "bytes": saida,
+        "ext": ext,
+        "hash": hashlib.sha256(saida).hexdigest() if saida is not dados else hash_original,
+        "hash_original": hash_original,
+        "bytes_original": len(dados),
+    }
+    if manter_original:
+        out["original"] = dados
+    return out
+
+
+def _processar_bytes(dados: bytes, dpi: int, qualidade: int) -> Tuple[bytes, str]:
+    try:
+        with Image.open(io.BytesIO(dados)) as aberta:
+            formato = (aberta.format or "").upper()
+            girou = aberta.getexif().get(0x0112, 1) not in (0, 1)  # tag EXIF Orientation
+            img = ImageOps.exif_transpose(aberta)  # devolve cópia: pode ser alterada
+            limite = tamanho_impressao_px(dpi)
+            reduziu = img.width > limite[0] or img.height > limite[1]
+            if reduziu:
+                img.thumbnail(limite, Image.LANCZOS)
+            saida, ext = _codificar(img, qualidade)
+    except Exception as e:
+        # Arquivo que o PIL não abre: segue como veio (o PDF decide se aceita)
+        logger.warning("Imagem não processada (%s); usando original", e)
+        return dados, ".jpg"
+    if len(saida) >= len(dados) and not girou and not reduziu and formato in ("JPEG", "PNG"):
+        return dados, ".png" if formato == "PNG" else ".jpg"
+    return saida, ext
+
+
+def processar_imagens(imagens: List[dict], workers: Optional[int] = None, **opcoes) -> Tuple[List[dict], dict]:
+    """
+    Processa uma lista de imagens ({"name", "bytes", ...}) em pool de threads (o PIL libera o GIL
+    na decodificação/codificação), removendo repetidas (mesmo conteúdo original ou final) e
+    preservando a ordem. Retorna (imagens_processadas, relatorio).
+    relatorio: qtd_entrada, qtd_saida, duplicadas, bytes_antes, bytes_depois, bytes_economizados.
+    """
+    validas = [it for it in imagens if it.get("bytes")]
+    workers = workers or LAUDOS_IMAGENS_WORKERS
+    if len(validas) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(validas)), thread_name_prefix="laudo_img") as ex:
+            processadas = list(ex.map(lambda it: processar_imagem(bytes(it["bytes"]), it.get("name") or "imagem", **opcoes), validas))
+    else:
+        processadas = [processar_imagem(bytes(it["bytes"]), it.get("name") or "imagem", **opcoes) for it in validas]
+
+    vistos = set()
+    saida = []
+    bytes_antes = 0
+    for it in processadas:
+        bytes_antes += it["bytes_original"]
+        if it["hash_original"] in vistos or it["hash"] in vistos:
+            continue
+        vistos.update((it["hash_original"], it["hash"]))
+        saida.append(it)
+    bytes_depois = sum(len(it["bytes"]) for it in saida)
+    relatorio = {
+        "qtd_entrada": len(validas),
+        "qtd_saida": len(saida),
+        "duplicadas": len(validas) - len(saida),
+        "bytes_antes": bytes_antes,
+        "bytes_depois": bytes_depois,
+        "bytes_economizados": max(bytes_antes - bytes_depois, 0),
+    }
+    return saida, relatorio
@@ -0,0 +1,335 @@
+# Interpretação clínica dos laudos de eco (motor puro): a partir das medidas, peso, espécie e da patologia/grau
+# escolhidos, devolve o estadiamento (ACVIM na endocardiose mitral) e os textos sugeridos, sem ler nem gravar
+# st.session_state. A tela aplica o resultado (laudos_helpers.analisar_criterios_clinicos); interpretar_lote e
+# reestadiar_arquivo rodam o mesmo motor num pool de processos sobre o arquivo histórico
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+from app.blob_store import ler_blob
+from app.config import DB_PATH, INTERPRETACAO_LOTE, INTERPRETACAO_WORKERS
+from app.exceptions import BlobError
+from app.laudos_medidas import _numero, referencia_e_status
+from app.laudos_refs import calcular_referencia_tabela, normalizar_especie_label
+
+logger = logging.getLogger(__name__)
+
+# Limites usados quando a tabela por peso não tem o parâmetro (ou o peso não foi informado)
+LIMITE_LVIDD_PADRAO = 999
+LIMITE_LA_AO_PADRAO = 1.6
+
+# Refluxos ao Doppler: (parâmetro Vmax, subcampo de valvas, rótulo no texto)
+REFLUXOS = (
+    ("MR_Vmax", "mitral", "mitral"),
+    ("TR_Vmax", "tricuspide", "tricúspide"),
+    ("AR_Vmax", "aortica", "aórtico"),
+    ("PR_Vmax", "pulmonar", "pulmonar"),
+)
+
+SECOES_TEXTO = ("valvas", "camaras", "funcao", "pericardio", "vasos", "ad_vd", "conclusao")
+
+
+def separar_patologia_grau(chave: str):
+    """Quebra 'Patologia (Grau)' em (base, grau)."""
+    s = (chave or "").strip()
+    if s.endswith(")") and " (" in s:
+        base, resto = s.rsplit(" (", 1)
+        grau = resto[:-1].strip()
+        return base.strip(), grau
+    return s, ""
+
+
+def montar_chave_frase(patologia: str, grau_refluxo: str, grau_geral: str) -> str:
+    if patologia == "Normal":
+        return "Normal (Normal)"
+    if patologia == "Endocardiose Mitral":
+        return f"{patologia} ({grau_refluxo})"
+    return f"{patologia} ({grau_geral})"
+
+
+class IndiceFrases:
+    """
+    Frases por chave exata e por patologia, montado uma vez por banco de frases. A busca por patologia devolve
+    a primeira chave (na ordem do banco) que contém o nome da patologia, como a varredura antiga; as patologias
+    das chaves existentes são resolvidas na montagem e as demais na primeira consulta.
+    """
+
+    def __init__(self, db_frases: Optional[dict]):
+        self.db = db_frases if isinstance(db_frases, dict) else {}
+        self._chaves = tuple(self.db)
+        self._por_patologia = {}
+        for chave in self._chaves:
+            base, _ = separar_patologia_grau(chave)
+            if base and base not in self._por_patologia:
+                self._por_patologia[base] = self._primeira_que_contem(base)
+
+    def _primeira_que_contem(self, patologia: str) -> Optional[str]:
+        return next((k for k in self._chaves if patologia in k), None)
+
+    def mesmo_banco(self, db_frases) -> bool:
+        return db_frases is self.db and tuple(db_frases) == self._chaves
+
+    def buscar(self, chave: str, patologia: str) -> dict:
+        """Entry da chave exata; sem ela (e fora de "Normal"), a da primeira chave com a patologia; senão {}."""
+        entry = self.db.get(chave)
+        if entry:
+            return entry
+        if patologia == "Normal":
+            return {}
+        if patologia not in self._por_patologia:
+            self._por_patologia[patologia] = self._primeira_que_contem(patologia)
+        k = self._por_patologia[patologia]
+        return self.db.get(k) or {} if k is not None else {}
+
+
+_indice_atual: Optional[IndiceFrases] = None
+
+
+def indice_frases(db_frases: Optional[dict]) -> IndiceFrases:
+    """Índice do banco de frases, remontado só quando o dict muda (outro objeto ou chaves diferentes)."""
+    global _indice_atual
+    if _indice_atual is None or not _indice_atual.mesmo_banco(db_frases):
+        _indice_atual = IndiceFrases(db_frases)
+    return _indice_atual
+
+
+def _limite_superior(param: str, peso, especie: str, df_ref, padrao: float) -> float:
+    """Máximo da referência por peso: da tabela df_ref, se dada (a da tela); senão a da espécie, em cache."""
+    try:
+        if df_ref is not None:
+            ref = calcular_referencia_tabela(param, peso, df=df_ref)[0]
+            maximo = ref[1] if ref else None
+        else:
+            peso_num = _numero(peso)
+            maximo = referencia_e_status(param, 1.0, peso_num, especie)[1] if peso_num else None
+    except Exception:
+        # Tabela mal formada não impede o texto: usa os limites padrão, como antes
+        maximo = None
+    return maximo if maximo else padrao
+
+
+def interpretar_exame(
+    medidas: Optional[dict],
+    peso,
+    especie: str,
+    patologia: str,
+    grau_refluxo: str = "",
+    tem_congestao: bool = False,
+    grau_geral: str = "",
+    frases=None,
+    df_ref=None,
+) -> dict:
+    """
+    Estadiamento e textos de um exame. frases: IndiceFrases ou o dict de frases (db_frases); df_ref: tabela
+    de referência por peso a usar (padrão: a da espécie). Na endocardiose mitral, estágio C com congestão,
+    B2 com AE/Ao e DIVEd acima da referência, B1 sem remodelamento ("" quando só o AE está aumentado).
+    Retorna {"chave", "estagio", "aumento_ae", "aumento_ve", "limites": {"LA_Ao", "LVIDd"},
+    "textos": {seção: texto}, "doppler": {subcampo de valvas: frase}}.
+    """
+    medidas = medidas if isinstance(medidas, dict) else {}
+    indice = frases if isinstance(frases, IndiceFrases) else indice_frases(frases)
+    chave = montar_chave_frase(patologia, grau_refluxo, grau_geral)
+    base = indice.buscar(chave, patologia)
+    textos = {k: v for k, v in (base or {"conclusao": f"{patologia}"}).items() if k in SECOES_TEXTO}
+    res = {"chave": chave, "estagio": "", "aumento_ae": None, "aumento_ve": None, "limites": {},
+           "textos": textos, "doppler": {}}
+
+    if patologia == "Endocardiose Mitral":
+        conclusao_editor = (textos.get("conclusao") or "").strip()
+        l_lvidd = _limite_superior("LVIDd", peso, especie, df_ref, LIMITE_LVIDD_PADRAO)
+        l_laao = _limite_superior("LA_Ao", peso, especie, df_ref, LIMITE_LA_AO_PADRAO)
+        aum_ae = (_numero(medidas.get("LA_Ao")) or 0) >= l_laao
+        aum_ve = (_numero(medidas.get("LVIDd")) or 0) > l_lvidd
+        if tem_congestao:
+            estagio, conclusao = "C", f"Endocardiose Mitral Estágio C (ACVIM). Refluxo {grau_refluxo}. Sinais de ICC."
+        elif aum_ae and aum_ve:
+            estagio, conclusao = "B2", f"Endocardiose Mitral Estágio B2 (ACVIM). Refluxo {grau_refluxo} com remodelamento."
+        elif aum_ae:
+            estagio, conclusao = "", f"Endocardiose Mitral (Refluxo {grau_refluxo}) com aumento atrial esquerdo."
+        else:
+            estagio, conclusao = "B1", f"Endocardiose Mitral Estágio B1 (ACVIM). Refluxo {grau_refluxo}."
+        res.update(estagio=estagio, aumento_ae=aum_ae, aumento_ve=aum_ve, limites={"LA_Ao": l_laao, "LVIDd": l_lvidd})
+        if not (textos.get("valvas") or "").strip():
+            textos["valvas"] = f"Valva mitral espessada. Insuficiência {(grau_refluxo or '').lower()}."
+        if not conclusao_editor:
+            # A conclusão escrita no editor de frases tem prioridade sobre a automática
+            textos["conclusao"] = conclusao
+
+    for param, valva, rotulo in REFLUXOS:
+        vmax = _numero(medidas.get(param)) or 0.0
+        if vmax <= 0:
+            continue
+        frases_valva = [f"Refluxo {rotulo} presente ao Doppler (Vmax {vmax:.2f} m/s)."]
+        if valva == "mitral" and patologia == "Endocardiose Mitral" and grau_refluxo:
+            frases_valva.append(f"Refluxo mitral {grau_refluxo.lower()} ao Doppler (Vmax {vmax:.2f} m/s).")
+        res["doppler"][valva] = frases_valva
+    return res
+
+
+# ----------------------------------------------------------------------------
+# Lote (pool de processos)
+# ----------------------------------------------------------------------------
+
+_indice_processo: Optional[IndiceFrases] = None
+
+
+def _iniciar_processo(db_frases: Optional[dict]) -> None:
+    # Uma vez por processo de trabalho: o banco de frases viaja uma vez só, não a cada lote
+    global _indice_processo
+    _indice_processo = IndiceFrases(db_frases)
+
+
+def _interpretar_um(exame: dict, indice: IndiceFrases) -> dict:
+    res = interpretar_exame(
+        exame.get("medidas"), exame.get("peso"), exame.get("especie") or "", exame.get("patologia") or "Normal",
+        exame.get("grau_refluxo") or "", bool(exame.get("congestao")), exame.get("grau_geral") or "", frases=indice,
+    )
+    if "id" in exame:
+        res["id"] = exame["id"]
+    return res
+
+
+def _interpretar_lote_processo(exames: List[dict]) -> List[dict]:
+    return [_interpretar_um(e, _indice_processo) for e in exames]
+
+
+def interpretar_lote(
+    exames: Iterable[dict],
+    db_frases: Optional[dict] = None,
+    workers: Optional[int] = None,
+    lote: int = INTERPRETACAO_LOTE,
+) -> List[dict]:
+    """
+    interpretar_exame sobre muitos exames, na ordem de entrada. Cada exame é um dict com medidas, peso,
+    especie, patologia, grau_refluxo, congestao, grau_geral (e id, devolvido no resultado). Com mais de um
+    lote e workers > 1 os lotes vão para um pool de processos ('spawn'); as referências por peso ficam em
+    cache em cada processo.
+    """
+    exames = list(exames)
+    lotes = [exames[i:i + lote] for i in range(0, len(exames), max(1, int(lote)))]
+    workers = max(1, workers or INTERPRETACAO_WORKERS)
+    if workers == 1 or len(lotes) <= 1:
+        indice = IndiceFrases(db_frases)
+        return [_interpretar_um(e, indice) for e in exames]
+    with ProcessPoolExecutor(max_workers=min(workers, len(lotes)), mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_iniciar_processo, initargs=(db_frases,)) as ex:
+        return [r for resultado in ex.map(_interpretar_lote_processo, lotes) for r in resultado]
+
+
+# ----------------------------------------------------------------------------
+# Reestadiamento do arquivo histórico (laudos_arquivos)
+# ----------------------------------------------------------------------------
+
+def exame_do_json(exame_id: int, conteudo_json) -> Optional[dict]:
+    """Entrada de interpretar_exame a partir do JSON arquivado (qualitativa_meta + medidas); None se não der."""
+    if not conteudo_json:
+        return None
+    try:
+        conteudo_json = ler_blob(conteudo_json)
+        obj = json.loads(conteudo_json if isinstance(conteudo_json, str) else bytes(conteudo_json).decode("utf-8"))
+    except (ValueError, UnicodeDecodeError, BlobError):
+        return None
+    if not isinstance(obj, dict) or not isinstance(obj.get("qualitativa_meta"), dict):
+        return None  # laudos antigos, sem a patologia/grau escolhidos
+    pac = obj.get("paciente") if isinstance(obj.get("paciente"), dict) else {}
+    meta = obj["qualitativa_meta"]
+    textos = obj.get("textos") if isinstance(obj.get("textos"), dict) else {}
+    return {
+        "id": exame_id,
+        "medidas": obj.get("medidas") if isinstance(obj.get("medidas"), dict) else {},
+        "peso": obj.get("peso") or pac.get("peso"),
+        "especie": normalizar_especie_label(obj.get("especie") or pac.get("especie") or ""),
+        "patologia": meta.get("patologia") or "Normal",
+        "grau_refluxo": meta.get("grau_refluxo") or "",
+        "congestao": bool(meta.get("congestao")),
+        "grau_geral": meta.get("grau_geral") or "",
+        "conclusao_arquivada": (textos.get("conclusao") or "").strip(),
+    }
+
+
+def _ler_exames(db_path: str, ids: List[int]) -> List[dict]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+    try:
+        out = []
+        for exame_id in ids:
+            row = conn.execute("SELECT conteudo_json FROM laudos_arquivos WHERE id = ?", (exame_id,)).fetchone()
+            exame = exame_do_json(exame_id, row[0]) if row else None
+            if exame:
+                out.append(exame)
+        return out
+    finally:
+        conn.close()
+
+
+def _reestadiar_lote(db_path: str, ids: List[int]) -> List[dict]:
+    """Executado no processo de trabalho: lê os exames do lote (somente leitura) e interpreta."""
+    return [dict(_interpretar_um(e, _indice_processo), conclusao_arquivada=e["conclusao_arquivada"])
+            for e in _ler_exames(db_path, ids)]
+
+
+def reestadiar_arquivo(
+    db_frases: Optional[dict] = None,
+    db_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    lote: int = INTERPRETACAO_LOTE,
+    progresso: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Reinterpreta os ecocardiogramas arquivados com as referências atuais, sem alterar os laudos: cada exame com
+    qualitativa_meta no JSON é estadiado de novo e comparado com a conclusão arquivada.
+    Retorna {"exames", "ignorados", "mudaram": [{id, estagio, conclusao, conclusao_arquivada}], "por_estagio",
+    "segundos"}.
+    """
+    caminho = str(db_path or DB_PATH)
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True, timeout=30)
+    try:
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM laudos_arquivos WHERE COALESCE(tipo_exame, 'ecocardiograma') = 'ecocardiograma' ORDER BY id"
+        )]
+    except sqlite3.OperationalError:
+        ids = []
+    finally:
+        conn.close()
+    lotes = [ids[i:i + lote] for i in range(0, len(ids), max(1, int(lote)))]
+    workers = max(1, workers or INTERPRETACAO_WORKERS)
+    resultados, feitos = [], 0
+
+    def _registrar(parcial, n_ids):
+        nonlocal feitos
+        resultados.extend(parcial)
+        feitos += n_ids
+        if progresso:
+            progresso(feitos, len(ids))
+
+    if workers > 1 and len(lotes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(lotes)), mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_iniciar_processo, initargs=(db_frases,)) as ex:
+            for ids_lote, parcial in zip(lotes, ex.map(_reestadiar_lote, [caminho] * len(lotes), lotes)):
+                _registrar(parcial, len(ids_lote))
+    else:
+        _iniciar_processo(db_frases)
+        for ids_lote in lotes:
+            _registrar(_reestadiar_lote(caminho, ids_lote), len(ids_lote))
+
+    por_estagio, mudaram = {}, []
+    for r in resultados:
+        if r["estagio"]:
+            por_estagio[r["estagio"]] = por_estagio.get(r["estagio"], 0) + 1
+        conclusao = (r["textos"].get("conclusao") or "").strip()
+        if r["aumento_ae"] is not None and conclusao != r["conclusao_arquivada"]:
+            mudaram.append({"id": r["id"], "estagio": r["estagio"], "conclusao": conclusao,
+                            "conclusao_arquivada": r["conclusao_arquivada"]})
+    return {
+        "exames": len(resultados),
+        "ignorados": len(ids) - len(resultados),
+        "mudaram": mudaram,
+        "por_estagio": por_estagio,
+        "segundos": round(time.perf_counter() - inicio, 2),
+    }
@@ -0,0 +1,237 @@
+# Manifesto da pasta de laudos (PASTA_LAUDOS): metadados de cada JSON arquivado numa tabela indexada,
+# atualizada de forma incremental (só arquivos novos ou com mtime/tamanho diferentes são lidos de novo)
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import DB_PATH, MANIFESTO_REVALIDAR_S
+from fortcordis_modules.escritor import escrever
+
+logger = logging.getLogger(__name__)
+
+# Linhas gravadas por transação do escritor na sincronização
+LOTE_MANIFESTO = 500
+
+_locks = {}
+_locks_guard = threading.Lock()
+# pasta -> (mtime_ns da pasta, time.monotonic() da última varredura)
+_ultima_varredura = {}
+
+
+def garantir_tabela_manifesto(conn: sqlite3.Connection) -> None:
+    """laudos_pasta_arquivos: uma linha por JSON da pasta; valido=0 para JSON ilegível (não é relido até mudar)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS laudos_pasta_arquivos (
+            caminho TEXT PRIMARY KEY,
+            pasta TEXT NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            tamanho INTEGER NOT NULL,
+            valido INTEGER NOT NULL DEFAULT 1,
+            data TEXT,
+            data_exame TEXT,
+            clinica TEXT,
+            animal TEXT,
+            tutor TEXT,
+            arquivo_pdf TEXT,
+            animal_busca TEXT,
+            tutor_busca TEXT,
+            busca TEXT,
+            indexado_em TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pasta_arquivos_data ON laudos_pasta_arquivos(pasta, data_exame DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pasta_arquivos_clinica ON laudos_pasta_arquivos(pasta, clinica)")
+
+
+def _data_iso(valor) -> Optional[str]:
+    try:
+        return datetime.strptime(str(valor)[:10], "%Y-%m-%d").date().isoformat()
+    except (ValueError, TypeError):
+        return None
+
+
+def _texto(valor) -> str:
+    return "" if valor is None else str(valor)
+
+
+def _ler_registro(caminho: str, pasta: str, mtime_ns: int, tamanho: int, agora: str) -> tuple:
+    """Linha do manifesto para um JSON (mesmos campos que a listagem antiga lia de paciente{})."""
+    try:
+        obj = json.loads(Path(caminho).read_text(encoding="utf-8"))
+        pac = obj.get("paciente", {}) if isinstance(obj, dict) else {}
+        if not isinstance(pac, dict):
+            pac = {}
+    except (OSError, ValueError) as e:
+        logger.debug("JSON ilegível na pasta de laudos %s: %s", caminho, e)
+        return (caminho, pasta, mtime_ns, tamanho, 0, None, None, None, None, None, None, None, None, None, agora)
+    data = _texto(pac.get("data_exame", ""))
+    clinica, animal, tutor = _texto(pac.get("clinica", "")), _texto(pac.get("nome", "")), _texto(pac.get("tutor", ""))
+    arquivo_pdf = str(Path(pasta) / (Path(caminho).stem + ".pdf"))
+    return (caminho, pasta, mtime_ns, tamanho, 1, data, _data_iso(data), clinica, animal, tutor, arquivo_pdf,
+            animal.lower(), tutor.lower(), f"{animal.lower()} {tutor.lower()} {clinica.lower()}", agora)
+
+
+def _lock_da_pasta(pasta: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(pasta, threading.Lock())
+
+
+def sincronizar_manifesto(pasta, forcar: bool = False) -> dict:
+    """
+    Atualiza o manifesto da pasta: lê só os JSON novos ou alterados (mtime/tamanho) e remove os que sumiram.
+    Sem forcar, não varre de novo se a pasta não mudou (mtime) e a última varredura tem menos de
+    MANIFESTO_REVALIDAR_S (arquivos editados no lugar não mudam o mtime da pasta).
+    Retorna {"varrido", "arquivos", "lidos", "removidos", "segundos"}.
+    """
+    pasta_str = str(pasta)
+    t0 = time.perf_counter()
+    rel = {"varrido": False, "arquivos": 0, "lidos": 0, "removidos": 0, "segundos": 0.0}
+    try:
+        mtime_pasta = os.stat(pasta_str).st_mtime_ns
+    except OSError:
+        return rel  # pasta não existe (ex.: sistema online)
+
+    with _lock_da_pasta(pasta_str):
+        anterior = _ultima_varredura.get(pasta_str)
+        if (not forcar and anterior and anterior[0] == mtime_pasta
+                and time.monotonic() - anterior[1] < MANIFESTO_REVALIDAR_S):
+            return rel
+
+        atuais = {}
+        with os.scandir(pasta_str) as it:
+            for entrada in it:
+                if entrada.name.endswith(".json") and entrada.is_file():
+                    st_ = entrada.stat()
+                    atuais[os.path.join(pasta_str, entrada.name)] = (st_.st_mtime_ns, st_.st_size)
+
+        conn = sqlite3.connect(str(DB_PATH), timeout=10)
+        try:
+            conhecidos = {
+                c: (m, t) for c, m, t in conn.execute(
+                    "SELECT caminho, mtime_ns, tamanho FROM laudos_pasta_arquivos WHERE pasta = ?", (pasta_str,)
+                )
+            }
+        except sqlite3.OperationalError:
+            conhecidos = {}  # primeira sincronização: a tabela é criada abaixo
+        finally:
+            conn.close()
+
+        mudados = [c for c, assinatura in atuais.items() if conhecidos.get(c) != assinatura]
+        removidos = [c for c in conhecidos if c not in atuais]
+        agora = datetime.now().isoformat(timespec="seconds")
+
+        def _gravar(conn_escrita, linhas, apagar):
+            garantir_tabela_manifesto(conn_escrita)
+            if linhas:
+                conn_escrita.executemany(
+                    "INSERT OR REPLACE INTO laudos_pasta_arquivos (caminho, pasta, mtime_ns, tamanho, valido, data, "
+                    "data_exame, clinica, animal, tutor, arquivo_pdf, animal_busca, tutor_busca, busca, indexado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    linhas,
+                )
+            if apagar:
+                conn_escrita.executemany("DELETE FROM laudos_pasta_arquivos WHERE caminho = ?", [(c,) for c in apagar])
+
+        if not conhecidos and not mudados:
+            escrever(_gravar, [], [], db_path=DB_PATH, chaves_estrangeiras=False)
+        for i in range(0, max(len(mudados), len(removidos)), LOTE_MANIFESTO):
+            linhas = [_ler_registro(c, pasta_str, *atuais[c], agora) for c in mudados[i:i + LOTE_MANIFESTO]]
+            escrever(_gravar, linhas, removidos[i:i + LOTE_MANIFESTO], db_path=DB_PATH, chaves_estrangeiras=False)
+
+        _ultima_varredura[pasta_str] = (mtime_pasta, time.monotonic())
+    rel.update(varrido=True, arquivos=len(atuais), lidos=len(mudados), removidos=len(removidos),
+               segundos=round(time.perf_counter() - t0, 3))
+    return rel
+
+
+def _colunas_registro(row: sqlite3.Row) -> dict:
+    return {"data": row["data"], "data_exame": row["data_exame"], "clinica": row["clinica"], "animal": row["animal"],
+            "tutor": row["tutor"], "arquivo_json": row["caminho"], "arquivo_pdf": row["arquivo_pdf"]}
+
+
+def _consultar(sql: str, params: tuple) -> list:
+    conn = sqlite3.connect(str(DB_PATH), timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        return []  # manifesto ainda não criado
+    finally:
+        conn.close()
+
+
+def contar_manifesto(pasta) -> int:
+    """Quantidade de exames legíveis no manifesto da pasta."""
+    rows = _consultar("SELECT COUNT(*) AS n FROM laudos_pasta_arquivos WHERE pasta = ? AND valido = 1", (str(pasta),))
+    return rows[0]["n"] if rows else 0
+
+
+def clinicas_manifesto(pasta) -> List[str]:
+    """Clínicas distintas (não vazias) dos exames da pasta, em ordem alfabética."""
+    rows = _consultar(
+        "SELECT DISTINCT clinica FROM laudos_pasta_arquivos WHERE pasta = ? AND valido = 1 AND TRIM(COALESCE(clinica, '')) != '' "
+        "ORDER BY clinica",
+        (str(pasta),),
+    )
+    return [r["clinica"] for r in rows]
+
+
+def buscar_manifesto(
+    pasta,
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    clinica: Optional[str] = None,
+    animal: str = "",
+    tutor: str = "",
+    busca_livre: str = "",
+    limite: Optional[int] = None,
+) -> List[dict]:
+    """
+    Exames da pasta filtrados no SQLite (índice por pasta+data): período (exames sem data válida ficam de fora
+    quando há período), clínica exata, animal/tutor "contém" e busca livre com todos os termos em
+    animal+tutor+clínica. Sem diferenciar maiúsculas. Ordem: data desc, clínica, animal.
+    Retorna [{data, data_exame, clinica, animal, tutor, arquivo_json, arquivo_pdf}].
+    """
+    sql = ["SELECT * FROM laudos_pasta_arquivos WHERE pasta = ? AND valido = 1"]
+    params: list = [str(pasta)]
+    if data_inicio is not None or data_fim is not None:
+        sql.append("AND data_exame IS NOT NULL")
+    if data_inicio is not None:
+        sql.append("AND data_exame >= ?")
+        params.append(data_inicio.isoformat())
+    if data_fim is not None:
+        sql.append("AND data_exame <= ?")
+        params.append(data_fim.isoformat())
+    if clinica:
+        sql.append("AND clinica = ?")
+        params.append(str(clinica))
+    if animal.strip():
+        sql.append("AND instr(animal_busca, ?) > 0")
+        params.append(animal.strip().lower())
+    if tutor.strip():
+        sql.append("AND instr(tutor_busca, ?) > 0")
+        params.append(tutor.strip().lower())
+    for termo in busca_livre.strip().lower().split():
+        sql.append("AND instr(busca, ?) > 0")
+        params.append(termo)
+    sql.append("ORDER BY data_exame DESC, clinica, animal")
+    if limite:
+        sql.append("LIMIT ?")
+        params.append(int(limite))
+    return [_colunas_registro(r) for r in _consultar(" ".join(sql), tuple(params))]
+
+
+def listar_manifesto(pasta) -> List[dict]:
+    """Todos os exames legíveis da pasta, na ordem da listagem antiga (nome do arquivo, decrescente)."""
+    rows = _consultar(
+        "SELECT * FROM laudos_pasta_arquivos WHERE pasta = ? AND valido = 1 ORDER BY caminho DESC", (str(pasta),)
+    )
+    return [_colunas_registro(r) for r in rows]
@@ -0,0 +1,442 @@
+# Medidas de ecocardiograma em tabela própria (laudos_medidas): cada exame arquivado tem o JSON
+# decodificado uma vez; tendências por paciente e buscas por coorte consultam só o índice
+from __future__ import annotations
+
+import json
+import logging
+import math
+import multiprocessing
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.blob_store import ler_blob
+from app.exceptions import BlobError
+from app.config import DB_PATH, MEDIDAS_LOTE, MEDIDAS_WORKERS
+from app.laudos_dedup import garantir_fingerprints
+from app.laudos_refs import (
+    DIVEDN_REF_MAX,
+    DIVEDN_REF_MIN,
+    PARAMS,
+    _PATH_REF_FELINOS,
+    TabelaReferenciaIndexada,
+    carregar_tabela_referencia,
+    especie_is_felina,
+    gerar_tabela_padrao_felinos,
+    interpretar,
+    interpretar_divedn,
+    limpar_e_converter_tabela_felinos,
+    normalizar_especie_label,
+)
+from app.utils import _norm_key
+
+logger = logging.getLogger(__name__)
+
+# Referências fixas usadas no PDF para parâmetros sem coluna na tabela por peso (mín, máx)
+_REF_FIXAS = {
+    "DIVEdN": (DIVEDN_REF_MIN, DIVEDN_REF_MAX),
+    "LA_FS": (21.0, 25.0),
+    "AURICULAR_FLOW": (0.25, None),
+    "EEp": (None, 12.0),
+}
+
+
+def garantir_tabela_medidas(conn: sqlite3.Connection) -> None:
+    """
+    laudos_medidas: uma linha por (exame, parâmetro), com espécie e data copiadas do exame para
+    que as buscas por coorte não precisem do JSON. laudos_medidas_extraidas registra o fingerprint
+    do exame na extração (exame regravado com outro conteúdo volta a ficar pendente).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS laudos_medidas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            exame_id INTEGER NOT NULL,
+            paciente_id INTEGER,
+            especie TEXT,
+            data_exame TEXT,
+            param TEXT NOT NULL,
+            valor REAL NOT NULL,
+            ref_min REAL,
+            ref_max REAL,
+            status TEXT,
+            FOREIGN KEY(exame_id) REFERENCES laudos_arquivos(id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS laudos_medidas_extraidas (
+            exame_id INTEGER PRIMARY KEY,
+            fingerprint TEXT,
+            qtd INTEGER NOT NULL DEFAULT 0,
+            extraido_em TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medidas_exame ON laudos_medidas(exame_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medidas_paciente ON laudos_medidas(paciente_id, param, data_exame)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_medidas_param_valor ON laudos_medidas(param, especie, valor)")
+
+
+# ----------------------------------------------------------------------------
+# Extração (pura: usada no salvamento e nos processos do backfill)
+# ----------------------------------------------------------------------------
+
+def _numero(valor) -> Optional[float]:
+    try:
+        v = float(str(valor).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+    return v if math.isfinite(v) else None
+
+
+@lru_cache(maxsize=2)
+def _tabela_referencia(felina: bool) -> Optional[pd.DataFrame]:
+    """Tabela por peso (caninos ou felinos), carregada uma vez por processo, sem depender da sessão."""
+    try:
+        if not felina:
+            return carregar_tabela_referencia()
+        if _PATH_REF_FELINOS.exists():
+            return limpar_e_converter_tabela_felinos(pd.read_csv(_PATH_REF_FELINOS))
+        return gerar_tabela_padrao_felinos()
+    except Exception as e:
+        logger.warning("Tabela de referência indisponível (felina=%s): %s", felina, e)
+        return None
+
+
+@lru_cache(maxsize=2)
+def _tabela_indexada(felina: bool) -> Optional[TabelaReferenciaIndexada]:
+    df = _tabela_referencia(felina)
+    return TabelaReferenciaIndexada(df) if df is not None else None
+
+
+@lru_cache(maxsize=8192)
+def _referencia_por_peso(felina: bool, ref_key: str, peso: float) -> Tuple[Optional[float], Optional[float]]:
+    tabela = _tabela_indexada(felina)
+    if tabela is None:
+        return None, None
+    ref, _txt = tabela.referencia(ref_key, peso)
+    if not ref or (ref[0] == 0 and ref[1] == 0):
+        return None, None
+    return ref
+
+
+def _status(valor: float, ref_min: Optional[float], ref_max: Optional[float]) -> str:
+    if ref_min is not None and valor < ref_min:
+        return "Reduzido"
+    if ref_max is not None and valor > ref_max:
+        return "Aumentado"
+    return "Normal"
+
+
+def referencia_e_status(param: str, valor: float, peso: Optional[float], especie: str) -> Tuple[Optional[float], Optional[float], str]:
+    """(ref_min, ref_max, status) com as mesmas regras do PDF: tabela por peso da espécie
+    (felinos na tabela felina, demais na canina) ou as referências fixas."""
+    if param == "DIVEdN":
+        return DIVEDN_REF_MIN, DIVEDN_REF_MAX, interpretar_divedn(valor)
+    if param in _REF_FIXAS:
+        mn, mx = _REF_FIXAS[param]
+        return mn, mx, _status(valor, mn, mx)
+    ref_key = PARAMS.get(param, (None, None, None))[2]
+    if not ref_key or not peso or peso <= 0:
+        return None, None, ""
+    mn, mx = _referencia_por_peso(especie_is_felina(especie), ref_key, round(float(peso), 2))
+    if mn is None:
+        return None, None, ""
+    return mn, mx, interpretar(valor, (mn, mx))
+
+
+def _paciente_id_por_nome(cur: sqlite3.Cursor, nome_animal: str, nome_tutor: str) -> Optional[int]:
+    """Paciente cadastrado com o mesmo nome (normalizado) e tutor; None se ambíguo ou inexistente."""
+    k_animal, k_tutor = _norm_key(nome_animal), _norm_key(nome_tutor)
+    if not k_animal or not k_tutor:
+        return None
+    try:
+        rows = cur.execute(
+            "SELECT p.id FROM tutores t JOIN pacientes p ON p.tutor_id = t.id WHERE t.nome_key = ? AND p.nome_key = ? LIMIT 2",
+            (k_tutor, k_animal),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return rows[0][0] if len(rows) == 1 else None
+
+
+def _paciente_confere(cur: sqlite3.Cursor, paciente_id: int, nome_animal: str) -> bool:
+    """O paciente_id gravado no JSON existe neste banco e tem o mesmo nome do exame?"""
+    try:
+        row = cur.execute("SELECT nome_key FROM pacientes WHERE id = ?", (paciente_id,)).fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return bool(row) and (not nome_animal or row[0] == _norm_key(nome_animal))
+
+
+def extrair_medidas(cur: sqlite3.Cursor, exame_id: int, nome_animal: str, nome_tutor: str,
+                    data_exame: str, conteudo_json) -> List[tuple]:
+    """
+    Linhas de laudos_medidas de um exame: (exame_id, paciente_id, especie, data_exame, param,
+    valor, ref_min, ref_max, status). Só parâmetros de PARAMS com valor numérico > 0 (0 = não medido).
+    """
+    if not conteudo_json:
+        return []
+    try:
+        conteudo_json = ler_blob(conteudo_json)
+        bruto = conteudo_json if isinstance(conteudo_json, str) else bytes(conteudo_json).decode("utf-8")
+        obj = json.loads(bruto)
+    except (ValueError, UnicodeDecodeError, BlobError):
+        return []
+    if not isinstance(obj, dict) or not isinstance(obj.get("medidas"), dict):
+        return []
+    pac = obj.get("paciente") if isinstance(obj.get("paciente"), dict) else {}
+    especie_txt = obj.get("especie") or pac.get("especie") or ""
+    especie = normalizar_especie_label(especie_txt)
+    peso = _numero(obj.get("peso") or pac.get("peso"))
+    data = str(data_exame or pac.get("data_exame") or obj.get("data") or "")[:10]
+    nome_animal = nome_animal or pac.get("nome") or ""
+    paciente_id = obj.get("paciente_id")
+    try:
+        paciente_id = int(paciente_id) if paciente_id not in (None, "") else None
+    except (TypeError, ValueError):
+        paciente_id = None
+    if paciente_id is not None and not _paciente_confere(cur, paciente_id, nome_animal):
+        paciente_id = None  # id de outro banco (JSON vindo de backup/pasta)
+    if paciente_id is None:
+        paciente_id = _paciente_id_por_nome(cur, nome_animal, nome_tutor or pac.get("tutor") or "")
+
+    linhas = []
+    for param, bruto_valor in obj["medidas"].items():
+        if param not in PARAMS:
+            continue
+        valor = _numero(bruto_valor)
+        if valor is None or valor <= 0:
+            continue
+        ref_min, ref_max, status = referencia_e_status(param, valor, peso, especie_txt)
+        linhas.append((exame_id, paciente_id, especie, data, param, valor, ref_min, ref_max, status or None))
+    return linhas
+
+
+_SQL_EXAME = (
+    "SELECT id, nome_animal, nome_tutor, data_exame, conteudo_json, fingerprint FROM laudos_arquivos WHERE id = ?"
+)
+
+
+def _extrair_lote(db_path: str, ids: List[int]) -> List[tuple]:
+    """Executado no processo de trabalho: lê os exames do lote (somente leitura) e devolve
+    [(exame_id, fingerprint, linhas)]."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+    try:
+        cur = conn.cursor()
+        out = []
+        for exame_id in ids:
+            row = cur.execute(_SQL_EXAME, (exame_id,)).fetchone()
+            if row:
+                out.append((row[0], row[5], extrair_medidas(cur, row[0], row[1], row[2], row[3], row[4])))
+        return out
+    finally:
+        conn.close()
+
+
+def _gravar(cur: sqlite3.Cursor, resultados: Iterable[tuple]) -> int:
+    """Substitui as medidas de cada exame e registra a extração. Retorna linhas gravadas."""
+    agora = datetime.now().isoformat(timespec="seconds")
+    total = 0
+    for exame_id, fingerprint, linhas in resultados:
+        cur.execute("DELETE FROM laudos_medidas WHERE exame_id = ?", (exame_id,))
+        if linhas:
+            cur.executemany(
+                "INSERT INTO laudos_medidas (exame_id, paciente_id, especie, data_exame, param, valor, ref_min, ref_max, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                linhas,
+            )
+        cur.execute(
+            "INSERT OR REPLACE INTO laudos_medidas_extraidas (exame_id, fingerprint, qtd, extraido_em) VALUES (?, ?, ?, ?)",
+            (exame_id, fingerprint, len(linhas), agora),
+        )
+        total += len(linhas)
+    return total
+
+
+def atualizar_medidas_exame(cur: sqlite3.Cursor, exame_id: int) -> int:
+    """Reextrai as medidas de um exame de laudos_arquivos (chamar após gravar o JSON, na mesma transação)."""
+    row = cur.execute(_SQL_EXAME, (exame_id,)).fetchone()
+    if not row:
+        return 0
+    linhas = extrair_medidas(cur, row[0], row[1], row[2], row[3], row[4])
+    return _gravar(cur, [(row[0], row[5], linhas)])
+
+
+# ----------------------------------------------------------------------------
+# Backfill dos exames já arquivados
+# ----------------------------------------------------------------------------
+
+_SQL_PENDENTES = """
+    SELECT a.id FROM laudos_arquivos a
+    LEFT JOIN laudos_medidas_extraidas e ON e.exame_id = a.id
+    WHERE COALESCE(a.tipo_exame, 'ecocardiograma') = 'ecocardiograma'
+      AND (e.exame_id IS NULL OR e.fingerprint IS NOT a.fingerprint)
+    ORDER BY a.id
+"""
+
+
+def contar_medidas_pendentes(db_path: Optional[str] = None) -> int:
+    """Exames de eco ainda não extraídos (ou regravados desde a última extração)."""
+    try:
+        conn = sqlite3.connect(str(db_path or DB_PATH))
+        try:
+            garantir_fingerprints(conn)
+            garantir_tabela_medidas(conn)
+            return conn.execute(f"SELECT COUNT(*) FROM ({_SQL_PENDENTES})").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.OperationalError:
+        return 0
+
+
+def backfill_medidas(
+    db_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    lote: int = MEDIDAS_LOTE,
+    progresso: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Extrai as medidas de todos os exames pendentes. Os lotes de ids são decodificados em um pool
+    de processos ('spawn'; cada processo lê o banco em modo somente leitura) e gravados aqui, um
+    commit por lote. progresso(feitos, total) é chamado a cada lote.
+    Retorna {"exames", "medidas", "removidas_orfas", "segundos"}.
+    """
+    caminho = str(db_path or DB_PATH)
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(caminho, timeout=60)
+    try:
+        garantir_fingerprints(conn)
+        garantir_tabela_medidas(conn)
+        cur = conn.cursor()
+        # Exames excluídos ou unidos pela compactação
+        cur.execute("DELETE FROM laudos_medidas WHERE exame_id NOT IN (SELECT id FROM laudos_arquivos)")
+        orfas = cur.rowcount
+        cur.execute("DELETE FROM laudos_medidas_extraidas WHERE exame_id NOT IN (SELECT id FROM laudos_arquivos)")
+        conn.commit()
+        ids = [r[0] for r in cur.execute(_SQL_PENDENTES).fetchall()]
+        lotes = [ids[i:i + lote] for i in range(0, len(ids), lote)]
+        workers = max(1, workers or MEDIDAS_WORKERS)
+        feitos = medidas = 0
+
+        def _registrar(resultados):
+            nonlocal feitos, medidas
+            medidas += _gravar(cur, resultados)
+            conn.commit()
+            feitos += len(resultados)
+            if progresso:
+                progresso(feitos, len(ids))
+
+        if workers > 1 and len(lotes) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(lotes)),
+                                     mp_context=multiprocessing.get_context("spawn")) as ex:
+                futures = [ex.submit(_extrair_lote, caminho, ids_lote) for ids_lote in lotes]
+                for fut in as_completed(futures):
+                    _registrar(fut.result())
+        else:
+            for ids_lote in lotes:
+                _registrar(_extrair_lote(caminho, ids_lote))
+    finally:
+        conn.close()
+    return {
+        "exames": feitos,
+        "medidas": medidas,
+        "removidas_orfas": orfas,
+        "segundos": round(time.perf_counter() - inicio, 2),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Consultas (índices idx_medidas_paciente / idx_medidas_param_valor)
+# ----------------------------------------------------------------------------
+
+def _linhas_dict(cur: sqlite3.Cursor, rows) -> List[dict]:
+    nomes = [d[0] for d in cur.description]
+    return [dict(zip(nomes, r)) for r in rows]
+
+
+def tendencia_paciente(paciente_id: int, params: Optional[List[str]] = None, db_path: Optional[str] = None) -> List[dict]:
+    """Evolução das medidas de um paciente: [{data_exame, param, valor, ref_min, ref_max, status, exame_id}]."""
+    sql = ("SELECT data_exame, param, valor, ref_min, ref_max, status, exame_id FROM laudos_medidas "
+           "WHERE paciente_id = ?")
+    args: list = [int(paciente_id)]
+    if params:
+        sql += f" AND param IN ({', '.join('?' for _ in params)})"
+        args.extend(params)
+    sql += " ORDER BY param, data_exame, exame_id"
+    conn = sqlite3.connect(str(db_path or DB_PATH))
+    try:
+        cur = conn.cursor()
+        return _linhas_dict(cur, cur.execute(sql, args).fetchall())
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+def buscar_coorte(
+    param: str,
+    valor_min: Optional[float] = None,
+    valor_max: Optional[float] = None,
+    especie: Optional[str] = None,
+    data_inicio: Optional[str] = None,
+    data_fim: Optional[str] = None,
+    status: Optional[str] = None,
+    limite: int = 500,
+    db_path: Optional[str] = None,
+) -> List[dict]:
+    """
+    Exames com param na faixa [valor_min, valor_max] (ex.: LA_Ao >= 1.6 em caninos no ano).
+    especie: 'Canina' / 'Felina' (como em normalizar_especie_label). Datas em AAAA-MM-DD.
+    """
+    where = ["m.param = ?"]
+    args: list = [param]
+    if especie:
+        where.append("m.especie = ?")
+        args.append(normalizar_especie_label(especie))
+    if valor_min is not None:
+        where.append("m.valor >= ?")
+        args.append(float(valor_min))
+    if valor_max is not None:
+        where.append("m.valor <= ?")
+        args.append(float(valor_max))
+    if data_inicio:
+        where.append("m.data_exame >= ?")
+        args.append(str(data_inicio)[:10])
+    if data_fim:
+        where.append("m.data_exame <= ?")
+        args.append(str(data_fim)[:10])
+    if status:
+        where.append("m.status = ?")
+        args.append(status)
+    sql = f"""
+        SELECT m.exame_id, m.data_exame, m.especie, m.valor, m.ref_min, m.ref_max, m.status, m.paciente_id,
+               a.nome_animal AS animal, a.nome_tutor AS tutor, a.nome_clinica AS clinica
+        FROM laudos_medidas m
+        JOIN laudos_arquivos a ON a.id = m.exame_id
+        WHERE {' AND '.join(where)}
+        ORDER BY m.valor DESC, m.data_exame DESC
+        LIMIT ?
+    """
+    args.append(int(limite))
+    conn = sqlite3.connect(str(db_path or DB_PATH))
+    try:
+        cur = conn.cursor()
+        return _linhas_dict(cur, cur.execute(sql, args).fetchall())
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # Backfill manual: python -m app.laudos_medidas
+    logging.basicConfig(level=logging.INFO)
+
+    def _mostrar(feitos, total):
+        print(f"  {feitos}/{total} exames", flush=True)
+
+    print(backfill_medidas(progresso=_mostrar))
@@ -10,6 +10,9 @@ from pathlib import Path
 import streamlit as st
 from PIL import Image
 
+from app.armazem_sessao import bytes_imagem
+from app.laudos_imagens import processar_imagens
+
 # Marca d'água em pasta gravável (Streamlit Cloud pode ter app dir read-only)
 MARCA_DAGUA_TEMP = str(Path(tempfile.gettempdir()) / "fortcordis_watermark_faded.png")
 
@@ -57,36 +60,26 @@ def _img_ext_from_name(nome: str) -> str:
 
 
 def obter_imagens_para_pdf():
-    """Retorna lista de imagens do exame (bytes) para preview e PDF."""
+    """
+    Retorna lista de imagens do exame (bytes) para o PDF, já normalizadas pelo
+    pipeline de app.laudos_imagens (orientação, resolução de impressão, recompressão, sem repetidas).
+    O relatório de bytes economizados fica em st.session_state["imagens_relatorio"].
+    """
     imgs = []
 
+    # Itens leves do armazém da sessão (app.armazem_sessao): os bytes são lidos do disco só aqui
     carregadas = st.session_state.get("imagens_carregadas", []) or []
     for it in carregadas:
-        if isinstance(it, dict) and it.get("bytes"):
+        b = bytes_imagem(it)
+        if b:
             imgs.append({
                 "name": str(it.get("name") or "imagem"),
-                "bytes": bytes(it.get("bytes")),
-                "ext": _img_ext_from_name(it.get("name") or "")
-            })
-
-    novas = st.session_state.get("imagens_upload_novas", None)
-    if novas:
-        for f in novas:
-            try:
-                b = bytes(f.getbuffer())
-            except Exception:
-                try:
-                    b = f.getvalue()
-                except Exception:
-                    b = None
-            if not b:
-                continue
-            imgs.append({
-                "name": getattr(f, "name", "imagem"),
                 "bytes": b,
-                "ext": _img_ext_from_name(getattr(f, "name", "") or "")
+                "ext": _img_ext_from_name(it.get("name") or "")
             })
 
+    imgs, relatorio = processar_imagens(imgs)
+    st.session_state["imagens_relatorio"] = relatorio
     return imgs
 
 
@@ -0,0 +1,209 @@
+# Cache de renderização do PDF de laudo e arquivamento incremental: o PDF fica em PASTA_CACHE_PDF/ab/<chave>.pdf,
+# onde a chave é o sha256 das entradas normalizadas (dados e textos do exame, hash de cada imagem, tabela de
+# referência, logo/assinatura e PDF_LAUDO_VERSAO). "Gerar PDF" sem nada alterado devolve os bytes do cache, e o
+# arquivamento em PASTA_LAUDOS grava só os arquivos cujo conteúdo mudou
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import os
+import tempfile
+from datetime import date, datetime
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from app.config import PASTA_CACHE_PDF, PDF_CACHE_MAX_MB, PDF_LAUDO_VERSAO
+
+logger = logging.getLogger(__name__)
+
+
+def _gravar_atomico(destino: Path, dados: bytes) -> None:
+    """Grava em arquivo temporário na mesma pasta e renomeia (nunca deixa arquivo pela metade)."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(destino.parent), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, destino)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# ----------------------------------------------------------------------------
+# Chave de renderização
+# ----------------------------------------------------------------------------
+
+def _normalizar(valor):
+    """Forma estável para o JSON da chave: dicts por chave, números sem tipo numpy, bytes pelo sha256."""
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in sorted(valor.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, (set, frozenset)):
+        return sorted(_normalizar(v) for v in valor)
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(bytes(valor)).hexdigest()
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if valor is None or isinstance(valor, (bool, str, int)):
+        return valor
+    try:
+        f = float(valor)
+    except (TypeError, ValueError):
+        return str(valor)
+    if not math.isfinite(f):
+        return str(f)
+    return int(f) if f.is_integer() else f
+
+
+def hash_tabela(df) -> Optional[str]:
+    """sha256 de uma tabela de referência (colunas + valores); None sem tabela."""
+    if df is None:
+        return None
+    try:
+        import pandas as pd
+        h = hashlib.sha256(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        return h.hexdigest()
+    except Exception:
+        return hashlib.sha256(str(df).encode("utf-8")).hexdigest()
+
+
+def _assinatura_arquivo(caminho) -> Optional[list]:
+    """[nome, tamanho, mtime] de um arquivo usado no layout (logo, marca d'água, assinatura); None se não existe."""
+    if not caminho:
+        return None
+    try:
+        st_ = os.stat(caminho)
+    except OSError:
+        return None
+    return [os.path.basename(str(caminho)), st_.st_size, st_.st_mtime_ns]
+
+
+def chave_render(entradas: dict, imagens: Iterable = (), tabela_ref=None, arquivos: Iterable = ()) -> str:
+    """
+    Chave do PDF: sha256 das entradas normalizadas (dict com tudo o que criar_pdf lê), do conteúdo de cada
+    imagem na ordem, da tabela de referência, de tamanho/mtime dos arquivos do layout e de PDF_LAUDO_VERSAO.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        "versao": PDF_LAUDO_VERSAO,
+        "entradas": _normalizar(entradas),
+        "imagens": [hashlib.sha256(bytes(b)).hexdigest() if b else None for b in imagens],
+        "tabela_ref": hash_tabela(tabela_ref),
+        "arquivos": [_assinatura_arquivo(a) for a in arquivos],
+    }, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+# ----------------------------------------------------------------------------
+# Cache em disco (LRU por mtime)
+# ----------------------------------------------------------------------------
+
+def _caminho_cache(chave: str, pasta: Optional[Path] = None) -> Path:
+    return Path(pasta or PASTA_CACHE_PDF) / chave[:2] / f"{chave}.pdf"
+
+
+def obter_pdf_cache(chave: str, pasta: Optional[Path] = None) -> Optional[bytes]:
+    """Bytes do PDF renderizado com essa chave, ou None. Um acerto renova o arquivo na ordem de remoção."""
+    caminho = _caminho_cache(chave, pasta)
+    try:
+        dados = caminho.read_bytes()
+    except OSError:
+        return None
+    if not dados.startswith(b"%PDF"):
+        return None
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+    return dados
+
+
+def guardar_pdf_cache(chave: str, pdf_bytes: bytes, pasta: Optional[Path] = None,
+                      max_mb: Optional[float] = None) -> None:
+    """Guarda o PDF no cache e remove os menos usados acima do limite. Sem disco gravável, só registra no log."""
+    try:
+        _gravar_atomico(_caminho_cache(chave, pasta), bytes(pdf_bytes))
+        podar_cache(pasta, max_mb)
+    except OSError as e:
+        logger.warning("Cache de PDF indisponível (%s): %s", pasta or PASTA_CACHE_PDF, e)
+
+
+def podar_cache(pasta: Optional[Path] = None, max_mb: Optional[float] = None) -> dict:
+    """Remove os PDFs menos usados (mtime mais antigo) até o cache caber em max_mb. Retorna {"arquivos", "bytes", "removidos"}."""
+    pasta = Path(pasta or PASTA_CACHE_PDF)
+    limite = (PDF_CACHE_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    itens, total = [], 0
+    for p in pasta.glob("*/*.pdf"):
+        try:
+            st_ = p.stat()
+        except OSError:
+            continue
+        itens.append((st_.st_mtime_ns, st_.st_size, p))
+        total += st_.st_size
+    removidos = 0
+    if total > limite:
+        for _mtime, tamanho, p in sorted(itens):
+            if total <= limite:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= tamanho
+            removidos += 1
+    return {"arquivos": len(itens) - removidos, "bytes": total, "removidos": removidos}
+
+
+# ----------------------------------------------------------------------------
+# Arquivamento incremental na pasta
+# ----------------------------------------------------------------------------
+
+def gravar_se_mudou(caminho: Path, dados: bytes) -> bool:
+    """Grava o arquivo só se o conteúdo for diferente do atual. True se gravou."""
+    caminho = Path(caminho)
+    dados = bytes(dados)
+    try:
+        if caminho.stat().st_size == len(dados) and caminho.read_bytes() == dados:
+            return False
+    except OSError:
+        pass
+    _gravar_atomico(caminho, dados)
+    return True
+
+
+def sincronizar_arquivos(pasta: Path, desejados: Dict[str, bytes], remover: Iterable[str] = ()) -> dict:
+    """
+    Deixa a pasta com os arquivos desejados (nome -> bytes), regravando só os que mudaram, e apaga os que casam
+    com os padrões de remover (ex.: imagens antigas do mesmo exame) e não estão entre os desejados.
+    Retorna {"gravados", "iguais", "removidos"}.
+    """
+    pasta = Path(pasta)
+    gravados = iguais = removidos = 0
+    for nome, dados in desejados.items():
+        if gravar_se_mudou(pasta / nome, dados):
+            gravados += 1
+        else:
+            iguais += 1
+    padroes = list(remover)
+    if padroes:
+        try:
+            nomes = [p.name for p in pasta.iterdir()]
+        except OSError:
+            nomes = []
+        for nome in nomes:
+            if nome not in desejados and any(fnmatch(nome, padrao) for padrao in padroes):
+                try:
+                    (pasta / nome).unlink()
+                    removidos += 1
+                except OSError:
+                    pass
+    return {"gravados": gravados, "iguais": iguais, "removidos": removidos}
@@ -1,12 +1,14 @@
 # Referências e tabelas para laudos ecocardiográficos (caninos/felinos)
 # Fase B: extraído do fortcordis_app.py
-import json
 import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import streamlit as st
 
 from app.config import PASTA_DB, ARQUIVO_REF, ARQUIVO_REF_FELINOS
+from app.desempenho import cache_data_medido
+from app.laudos_manifesto import listar_manifesto, sincronizar_manifesto
 from app.utils import nome_proprio_ptbr
 
 _PATH_REF_CANINOS = PASTA_DB / ARQUIVO_REF if hasattr(PASTA_DB, "__truediv__") else Path(str(PASTA_DB)) / ARQUIVO_REF
@@ -634,7 +636,7 @@ def limpar_e_converter_tabela_felinos(df: pd.DataFrame) -> pd.DataFrame:
     df = df.dropna(subset=["Peso"]).sort_values("Peso").reset_index(drop=True)
     return df[colunas_esperadas]
 
-@st.cache_data(show_spinner=False, max_entries=3, ttl=3600)
+@cache_data_medido(show_spinner=False, max_entries=3, ttl=3600)
 def carregar_tabela_referencia_felinos_cached() -> pd.DataFrame:
     path = _PATH_REF_FELINOS
     if path.exists():
@@ -684,32 +686,33 @@ def carregar_tabela_referencia():
         pass
     return df
 
-@st.cache_data(show_spinner=False, max_entries=3, ttl=3600)
+@cache_data_medido(show_spinner=False, max_entries=3, ttl=3600)
 def carregar_tabela_referencia_cached():
     return carregar_tabela_referencia()
 
 
-@st.cache_data(show_spinner=False, ttl=10, max_entries=10)
 def listar_registros_arquivados_cached(pasta_str: str):
-    """Lê metadados dos laudos arquivados (JSON) com TTL."""
-    pasta = Path(pasta_str)
-    arquivos = sorted(pasta.glob("*.json"), reverse=True)
-    registros = []
-    for p in arquivos:
-        try:
-            obj = json.loads(p.read_text(encoding="utf-8"))
-            pac = obj.get("paciente", {}) if isinstance(obj, dict) else {}
-            registros.append({
-                "data": pac.get("data_exame", ""),
-                "clinica": pac.get("clinica", ""),
-                "animal": pac.get("nome", ""),
-                "tutor": pac.get("tutor", ""),
-                "arquivo_json": str(p),
-                "arquivo_pdf": str(pasta / (p.stem + ".pdf"))
-            })
-        except Exception:
-            pass
-    return registros
+    """
+    Metadados dos laudos arquivados (JSON) da pasta, pelo manifesto persistente (app.laudos_manifesto):
+    só arquivos novos ou alterados são lidos. Para filtrar, prefira laudos_manifesto.buscar_manifesto.
+    """
+    sincronizar_manifesto(pasta_str)
+    return listar_manifesto(pasta_str)
+
+
+# Parâmetro -> (coluna do mínimo, coluna do máximo) nas tabelas de referência por peso
+COLUNAS_REFERENCIA = {
+    "LVIDd": ("LVIDd_Min", "LVIDd_Max"), "Ao": ("Ao_Min", "Ao_Max"), "LA": ("LA_Min", "LA_Max"),
+    "IVSd": ("IVSd_Min", "IVSd_Max"), "LVPWd": ("LVPWd_Min", "LVPWd_Max"), "LVIDs": ("LVIDs_Min", "LVIDs_Max"),
+    "IVSs": ("IVSs_Min", "IVSs_Max"), "LVPWs": ("LVPWs_Min", "LVPWs_Max"),
+    "EDV": ("EDV_Min", "EDV_Max"), "ESV": ("ESV_Min", "ESV_Max"), "SV": ("SV_Min", "SV_Max"),
+    "Vmax_Ao": ("Vmax_Ao_Min", "Vmax_Ao_Max"), "Vmax_Pulm": ("Vmax_Pulm_Min", "Vmax_Pulm_Max"),
+    "LA_Ao": ("LA_Ao_Min", "LA_Ao_Max"), "EF": ("EF_Min", "EF_Max"), "FS": ("FS_Min", "FS_Max"),
+    "MV_E": ("MV_E_Min", "MV_E_Max"), "MV_A": ("MV_A_Min", "MV_A_Max"),
+    "MV_E_A": ("MV_EA_Min", "MV_EA_Max"), "MV_DT": ("MV_DT_Min", "MV_DT_Max"), "MV_Slope": ("MV_Slope_Min", "MV_Slope_Max"),
+    "IVRT": ("IVRT_Min", "IVRT_Max"), "E_IVRT": ("E_IVRT_Min", "E_IVRT_Max"),
+    "TR_Vmax": ("TR_Vmax_Min", "TR_Vmax_Max"), "MR_Vmax": ("MR_Vmax_Min", "MR_Vmax_Max")
+}
 
 
 def calcular_referencia_tabela(parametro, peso_kg, df=None):
@@ -730,21 +733,9 @@ def calcular_referencia_tabela(parametro, peso_kg, df=None):
             df = df.rename(columns={"Peso": "Peso (kg)"})
         else:
             return None, ""
-    mapa = {
-        "LVIDd": ("LVIDd_Min", "LVIDd_Max"), "Ao": ("Ao_Min", "Ao_Max"), "LA": ("LA_Min", "LA_Max"),
-        "IVSd": ("IVSd_Min", "IVSd_Max"), "LVPWd": ("LVPWd_Min", "LVPWd_Max"), "LVIDs": ("LVIDs_Min", "LVIDs_Max"),
-        "IVSs": ("IVSs_Min", "IVSs_Max"), "LVPWs": ("LVPWs_Min", "LVPWs_Max"),
-        "EDV": ("EDV_Min", "EDV_Max"), "ESV": ("ESV_Min", "ESV_Max"), "SV": ("SV_Min", "SV_Max"),
-        "Vmax_Ao": ("Vmax_Ao_Min", "Vmax_Ao_Max"), "Vmax_Pulm": ("Vmax_Pulm_Min", "Vmax_Pulm_Max"),
-        "LA_Ao": ("LA_Ao_Min", "LA_Ao_Max"), "EF": ("EF_Min", "EF_Max"), "FS": ("FS_Min", "FS_Max"),
-        "MV_E": ("MV_E_Min", "MV_E_Max"), "MV_A": ("MV_A_Min", "MV_A_Max"),
-        "MV_E_A": ("MV_EA_Min", "MV_EA_Max"), "MV_DT": ("MV_DT_Min", "MV_DT_Max"), "MV_Slope": ("MV_Slope_Min", "MV_Slope_Max"),
-        "IVRT": ("IVRT_Min", "IVRT_Max"), "E_IVRT": ("E_IVRT_Min", "E_IVRT_Max"),
-        "TR_Vmax": ("TR_Vmax_Min", "TR_Vmax_Max"), "MR_Vmax": ("MR_Vmax_Min", "MR_Vmax_Max")
-    }
-    if parametro not in mapa:
+    if parametro not in COLUNAS_REFERENCIA:
         return None, ""
-    col_min, col_max = mapa[parametro]
+    col_min, col_max = COLUNAS_REFERENCIA[parametro]
     if col_min not in df.columns or col_max not in df.columns:
         return (0.0, 0.0), "--"
     df = df.sort_values("Peso (kg)").reset_index(drop=True)
@@ -771,6 +762,67 @@ def calcular_referencia_tabela(parametro, peso_kg, df=None):
         return None, "--"
     return (float(min_val), float(max_val)), f"{float(min_val):.2f} - {float(max_val):.2f}"
 
+
+class TabelaReferenciaIndexada:
+    """
+    calcular_referencia_tabela sobre uma tabela fixa, com o mesmo resultado: a tabela é ordenada e convertida
+    uma vez, e o peso fora da tabela é interpolado pela posição da linha (como o interpolate do pandas faz com a
+    linha inserida), sem copiar o DataFrame a cada consulta. Para processos de lote e caches por peso.
+    """
+
+    def __init__(self, df):
+        self.pesos = None
+        self._colunas = {}
+        if df is None:
+            return
+        df = df.copy()
+        if "Peso (kg)" not in df.columns:
+            if "Peso" not in df.columns:
+                return
+            df = df.rename(columns={"Peso": "Peso (kg)"})
+        df = df.sort_values("Peso (kg)").reset_index(drop=True)
+        self.pesos = pd.to_numeric(df["Peso (kg)"], errors="coerce").to_numpy(dtype=float)
+        self._df = df
+
+    def _coluna(self, col):
+        if col not in self._colunas:
+            self._colunas[col] = pd.to_numeric(self._df[col], errors="coerce").to_numpy(dtype=float)
+        return self._colunas[col]
+
+    def _valor(self, col, peso_kg):
+        v = self._coluna(col)
+        exatos = np.flatnonzero(self.pesos == peso_kg)
+        if exatos.size:
+            return v[exatos[0]]
+        # A linha nova entra depois dos pesos menores; as linhas seguintes andam uma posição
+        k = int(np.count_nonzero(self.pesos < peso_kg))
+        posicoes = np.arange(v.size, dtype=float)
+        posicoes[k:] += 1
+        validos = ~np.isnan(v)
+        if not validos.any():
+            return np.nan
+        return float(np.interp(k, posicoes[validos], v[validos]))
+
+    def referencia(self, parametro, peso_kg):
+        if self.pesos is None:
+            return None, ""
+        try:
+            peso_kg = float(str(peso_kg).replace(",", "."))
+        except Exception:
+            return None, ""
+        if parametro not in COLUNAS_REFERENCIA:
+            return None, ""
+        col_min, col_max = COLUNAS_REFERENCIA[parametro]
+        if col_min not in self._df.columns or col_max not in self._df.columns:
+            return (0.0, 0.0), "--"
+        min_val, max_val = self._valor(col_min, peso_kg), self._valor(col_max, peso_kg)
+        if pd.isna(min_val) or pd.isna(max_val):
+            return None, "--"
+        if float(min_val) == 0.0 and float(max_val) == 0.0:
+            return None, "--"
+        return (float(min_val), float(max_val)), f"{float(min_val):.2f} - {float(max_val):.2f}"
+
+
 def interpretar(valor, ref_tuple):
     if not ref_tuple or (ref_tuple[0] == 0 and ref_tuple[1] == 0):
         return ""
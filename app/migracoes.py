@@ -0,0 +1,455 @@
+# Migrações de esquema do banco: passos ordenados e idempotentes, registrados em migracoes_banco.
+# Reconstruções de tabela copiam em lotes paginados pela chave (INTEGER PRIMARY KEY), cada lote na mesma
+# transação do checkpoint: interrompida (queda, Ctrl+C), a migração continua do último lote confirmado.
+# Substitui os scripts avulsos corrigir_*/recriar_*/adicionar_* (que agora só chamam migrar_banco.py)
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from app.config import DB_PATH, MIGRACAO_LOTE
+from app.sql_safe import validar_coluna, validar_tabela
+from fortcordis_modules.escritor import escrever
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo de uma transação do escritor: a troca final da reconstrução relê a tabela inteira
+TIMEOUT_TRANSACAO_S = 600
+# Tabela de cópia durante a reconstrução: <tabela>__nova
+SUFIXO_NOVA = "__nova"
+
+
+class _Interrompida(Exception):
+    """cancelar sinalizado entre dois lotes: o checkpoint fica para a próxima execução."""
+
+
+def garantir_tabela_migracoes(conn) -> None:
+    """migracoes_banco: uma linha por migração já iniciada (status em_andamento, concluida ou erro)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS migracoes_banco (
+            nome TEXT PRIMARY KEY,
+            descricao TEXT,
+            status TEXT NOT NULL,
+            checkpoint INTEGER NOT NULL DEFAULT 0,
+            linhas INTEGER NOT NULL DEFAULT 0,
+            segundos REAL NOT NULL DEFAULT 0,
+            resultado TEXT,
+            erro TEXT,
+            iniciada_em TEXT,
+            concluida_em TEXT
+        )
+    """)
+
+
+def _ident(nome: str) -> str:
+    """Identificador entre aspas (nomes de colunas lidos do próprio esquema, não de entrada do usuário)."""
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def _colunas(conn, tabela: str) -> List[tuple]:
+    """[(nome, tipo declarado, pk)] na ordem da tabela."""
+    return [(r[0], r[1], r[2]) for r in conn.execute("SELECT name, type, pk FROM pragma_table_info(?)", (tabela,))]
+
+
+def _orfas_por_tabela(conn, tabela: str) -> dict:
+    """{tabela referenciada: linhas de `tabela` sem correspondente} (PRAGMA foreign_key_check). Tabelas
+    referenciadas pelo esquema mas sem órfãs aparecem com 0, para distinguir chaves novas das antigas."""
+    orfas = {r[2]: 0 for r in conn.execute("SELECT * FROM pragma_foreign_key_list(?)", (tabela,))}
+    for _, _, pai, _ in conn.execute(f"PRAGMA foreign_key_check({tabela})").fetchall():
+        orfas[pai] = orfas.get(pai, 0) + 1
+    return orfas
+
+
+def _normalizar_sql(sql: str) -> str:
+    sem_if = re.sub(r"\bIF\s+NOT\s+EXISTS\s+", "", sql or "", flags=re.IGNORECASE)
+    return " ".join(sem_if.split())
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class _Passo:
+    """Contexto entregue a cada migração: leitura, gravação pelo escritor e as operações em lote com checkpoint."""
+
+    def __init__(self, nome: str, checkpoint: int, lote: int, progresso, cancelar):
+        self.nome = nome
+        self.checkpoint = checkpoint
+        self.lote = max(1, int(lote))
+        self.progresso = progresso
+        self.cancelar = cancelar
+        self.linhas = 0
+
+    def ler(self, sql: str, params: tuple = ()) -> list:
+        conn = sqlite3.connect(str(DB_PATH), timeout=30)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def gravar(self, fn, *args):
+        # Chaves estrangeiras desligadas: DROP/RENAME da reconstrução não podem disparar ações em cascata
+        return escrever(fn, *args, db_path=DB_PATH, chaves_estrangeiras=False, timeout=TIMEOUT_TRANSACAO_S)
+
+    def adicionar_colunas(self, tabela: str, colunas: dict) -> List[str]:
+        """ALTER TABLE ADD COLUMN das colunas {nome: tipo} que ainda não existem. Retorna as adicionadas."""
+        validar_tabela(tabela)
+
+        def _alterar(conn):
+            existentes = {c[0] for c in _colunas(conn, tabela)}
+            if not existentes:
+                raise sqlite3.OperationalError(f"tabela {tabela} não existe")
+            novas = [c for c in colunas if c not in existentes]
+            for c in novas:
+                conn.execute(f"ALTER TABLE {tabela} ADD COLUMN {validar_coluna(c)} {colunas[c]}")
+            return novas
+
+        return self.gravar(_alterar)
+
+    def reconstruir_tabela(self, tabela: str, create_sql: str) -> int:
+        """
+        Troca `tabela` por outra criada com create_sql (CREATE TABLE <tabela> ...) sem perder linhas:
+        cria <tabela>__nova, copia em lotes de self.lote pela chave (checkpoint gravado na transação de cada
+        lote) e, numa última transação, reconcilia o que o app mudou durante a cópia, apaga a antiga, renomeia
+        a nova, recria índices/gatilhos e confere as chaves estrangeiras. Colunas da antiga que não estão em
+        create_sql são mantidas (ADD COLUMN). Retorna o número de linhas copiadas nesta execução.
+        """
+        validar_tabela(tabela)
+        nova = tabela + SUFIXO_NOVA
+        sql_nova, n = re.subn(
+            rf"^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?[\"`\[]?{tabela}[\"`\]]?(?=\s*\()",
+            f"CREATE TABLE IF NOT EXISTS {nova}", create_sql, count=1, flags=re.IGNORECASE,
+        )
+        if not n:
+            raise ValueError(f"create_sql não é um CREATE TABLE {tabela}")
+
+        def _preparar(conn):
+            existia = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (nova,)).fetchone()
+            if not existia:
+                # Cópia do zero: um checkpoint antigo (reconstrução anterior já trocada) não vale mais
+                conn.execute(sql_nova)
+                conn.execute("UPDATE migracoes_banco SET checkpoint = 0 WHERE nome = ?", (self.nome,))
+            cols_nova = {c[0] for c in _colunas(conn, nova)}
+            for nome, tipo, _ in _colunas(conn, tabela):
+                if nome not in cols_nova:
+                    conn.execute(f"ALTER TABLE {nova} ADD COLUMN {_ident(nome)} {tipo}")
+            return bool(existia)
+
+        retomada = self.gravar(_preparar)
+        if not retomada:
+            self.checkpoint = 0
+        colunas = self.ler("SELECT name, type, pk FROM pragma_table_info(?)", (tabela,))
+        pks = [c for c in colunas if c[2]]
+        if len(pks) != 1 or str(pks[0][1]).upper() != "INTEGER":
+            raise ValueError(f"{tabela}: a reconstrução em lotes exige uma chave INTEGER PRIMARY KEY")
+        chave = _ident(pks[0][0])
+        lista = ", ".join(_ident(c[0]) for c in colunas)
+        total = self.ler(f"SELECT COUNT(*) FROM {tabela}")[0][0]
+        feitas = self.ler(f"SELECT COUNT(*) FROM {nova}")[0][0] if retomada else 0
+        if retomada:
+            logger.info("Migração %s: retomando %s a partir da chave %d (%d de %d linha(s) já copiadas)",
+                        self.nome, tabela, self.checkpoint, feitas, total)
+
+        def _copiar_lote(conn, ultimo):
+            fim = conn.execute(
+                f"SELECT MAX({chave}) FROM (SELECT {chave} FROM {tabela} WHERE {chave} > ? ORDER BY {chave} LIMIT ?)",
+                (ultimo, self.lote),
+            ).fetchone()[0]
+            if fim is None:
+                return ultimo, 0
+            cur = conn.execute(
+                f"INSERT INTO {nova} ({lista}) SELECT {lista} FROM {tabela} WHERE {chave} > ? AND {chave} <= ?",
+                (ultimo, fim),
+            )
+            conn.execute("UPDATE migracoes_banco SET checkpoint = ?, linhas = linhas + ? WHERE nome = ?",
+                         (fim, cur.rowcount, self.nome))
+            return fim, cur.rowcount
+
+        t0 = time.perf_counter()
+        copiadas = 0
+        while True:
+            if self.cancelar is not None and self.cancelar.is_set():
+                raise _Interrompida()
+            self.checkpoint, n = self.gravar(_copiar_lote, self.checkpoint)
+            if not n:
+                break
+            copiadas += n
+            feitas += n
+            self.linhas += n
+            if self.progresso:
+                self.progresso(self.nome, feitas, total)
+        segundos = time.perf_counter() - t0
+        logger.info("Migração %s: %d linha(s) de %s copiadas em %.1fs (%.0f linhas/s)",
+                    self.nome, copiadas, tabela, segundos, copiadas / segundos if segundos else 0.0)
+
+        def _trocar(conn):
+            # Linhas inseridas/alteradas/apagadas na antiga entre os lotes (o app pode estar aberto)
+            reconciliadas = conn.execute(
+                f"INSERT OR REPLACE INTO {nova} ({lista}) SELECT {lista} FROM {tabela} EXCEPT SELECT {lista} FROM {nova}"
+            ).rowcount
+            reconciliadas += conn.execute(
+                f"DELETE FROM {nova} WHERE {chave} NOT IN (SELECT {chave} FROM {tabela})"
+            ).rowcount
+            orfas_antes = _orfas_por_tabela(conn, tabela)
+            extras = [sql for (sql,) in conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? AND sql IS NOT NULL "
+                "ORDER BY type", (tabela,)
+            )]
+            try:
+                seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabela,)).fetchone()
+            except sqlite3.OperationalError:
+                seq = None  # banco sem nenhuma tabela AUTOINCREMENT
+            conn.execute(f"DROP TABLE {tabela}")
+            # legacy_alter_table: o RENAME não revalida gatilhos/visões de outras tabelas que citam `tabela`
+            conn.execute("PRAGMA legacy_alter_table = ON")
+            try:
+                conn.execute(f"ALTER TABLE {nova} RENAME TO {tabela}")
+            finally:
+                conn.execute("PRAGMA legacy_alter_table = OFF")
+            for sql in extras:
+                try:
+                    conn.execute(sql)
+                except sqlite3.OperationalError as e:
+                    logger.warning("Migração %s: índice/gatilho de %s não recriado (%s): %s", self.nome, tabela, e, sql)
+            if seq:
+                # AUTOINCREMENT não reaproveita ids de linhas apagadas antes da reconstrução
+                conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq[0], tabela))
+            for pai, n in _orfas_por_tabela(conn, tabela).items():
+                if pai not in orfas_antes:
+                    # Chave estrangeira nova no esquema alvo: não desfaz a migração por dados que já eram assim
+                    logger.warning("Migração %s: %d linha(s) de %s sem %s correspondente", self.nome, n, tabela, pai)
+                elif n > orfas_antes[pai]:
+                    raise sqlite3.IntegrityError(
+                        f"{tabela}: {n - orfas_antes[pai]} referência(s) órfã(s) para {pai} após a reconstrução"
+                    )
+            conn.execute("UPDATE migracoes_banco SET checkpoint = 0 WHERE nome = ?", (self.nome,))
+            return reconciliadas
+
+        reconciliadas = self.gravar(_trocar)
+        self.checkpoint = 0
+        if reconciliadas:
+            logger.info("Migração %s: %d linha(s) de %s reconciliadas na troca", self.nome, reconciliadas, tabela)
+        return copiadas
+
+
+# ---------------------------------------------------------------------------------------------------------
+# Migrações (ordem de execução). Cada uma confere o estado do banco antes de mexer: rodar de novo não faz nada.
+# ---------------------------------------------------------------------------------------------------------
+
+def _resumo_colunas(tabela: str, novas: List[str]) -> str:
+    return f"{tabela}: adicionada(s) {', '.join(novas)}" if novas else f"{tabela}: nenhuma coluna faltando"
+
+
+def _tutores_contato(passo: _Passo) -> str:
+    # adicionar_colunas_tutores.py
+    novas = passo.adicionar_colunas("tutores", {"numero": "TEXT", "complemento": "TEXT", "whatsapp": "TEXT"})
+    return _resumo_colunas("tutores", novas)
+
+
+# corrigir_tabela_pacientes_completo.py. data_cadastro sem DEFAULT CURRENT_TIMESTAMP: o SQLite não aceita
+# default não constante em ADD COLUMN (o script antigo falhava nessa coluna)
+COLUNAS_PRONTUARIO_PACIENTES = {
+    "raca": "TEXT",
+    "sexo": "TEXT",
+    "castrado": "INTEGER DEFAULT 0",
+    "data_nascimento": "DATE",
+    "idade_anos": "INTEGER",
+    "idade_meses": "INTEGER",
+    "peso_kg": "REAL",
+    "cor_pelagem": "TEXT",
+    "microchip": "TEXT",
+    "numero_registro": "TEXT",
+    "foto_url": "TEXT",
+    "alergias": "TEXT",
+    "medicamentos_uso": "TEXT",
+    "doencas_previas": "TEXT",
+    "cirurgias_previas": "TEXT",
+    "vacinacao_em_dia": "INTEGER DEFAULT 1",
+    "vermifugacao_em_dia": "INTEGER DEFAULT 1",
+    "observacoes": "TEXT",
+    "ativo": "INTEGER DEFAULT 1",
+    "data_cadastro": "TIMESTAMP",
+    "data_obito": "DATE",
+    "criado_por": "INTEGER",
+}
+
+
+def _pacientes_prontuario(passo: _Passo) -> str:
+    novas = passo.adicionar_colunas("pacientes", COLUNAS_PRONTUARIO_PACIENTES)
+    return _resumo_colunas("pacientes", novas)
+
+
+def _sem_unique_microchip(sql: str) -> str:
+    """CREATE TABLE de pacientes sem UNIQUE em microchip (restrição da coluna ou da tabela)."""
+    sql = re.sub(r"(\bmicrochip\b[^,()]*?)\s+UNIQUE\b", r"\1", sql, flags=re.IGNORECASE)
+    return re.sub(r",\s*(CONSTRAINT\s+\S+\s+)?UNIQUE\s*\(\s*[\"`\[]?microchip[\"`\]]?\s*\)", "", sql,
+                  flags=re.IGNORECASE)
+
+
+def _indices_unicos_microchip(passo: _Passo) -> List[tuple]:
+    """[(índice, origem)] dos índices UNIQUE só em microchip; origem 'u' = restrição no CREATE TABLE, 'c' = CREATE INDEX."""
+    unicos = []
+    for nome, unico, origem in passo.ler("SELECT name, \"unique\", origin FROM pragma_index_list('pacientes')"):
+        if unico and [r[0] for r in passo.ler("SELECT name FROM pragma_index_info(?)", (nome,))] == ["microchip"]:
+            unicos.append((nome, origem))
+    return unicos
+
+
+def _pacientes_microchip_sem_unique(passo: _Passo) -> str:
+    # corrigir_microchip_pacientes.py: nem todo animal tem microchip, então não pode ser UNIQUE. O script antigo
+    # recriava pacientes com um esquema fixo (perdia nome_key); aqui o próprio CREATE TABLE atual é mantido
+    unicos = _indices_unicos_microchip(passo)
+    if not unicos:
+        return "pacientes: microchip sem UNIQUE"
+    criados = [nome for nome, origem in unicos if origem == "c"]
+    if criados:
+        def _apagar_indices(conn):
+            for nome in criados:
+                conn.execute(f"DROP INDEX IF EXISTS {_ident(nome)}")
+        passo.gravar(_apagar_indices)
+    copiadas = 0
+    if any(origem != "c" for _, origem in unicos):
+        sql = passo.ler("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'pacientes'")[0][0]
+        novo = _sem_unique_microchip(sql)
+        if novo == sql:
+            raise ValueError("pacientes: UNIQUE de microchip não encontrado no CREATE TABLE")
+        copiadas = passo.reconstruir_tabela("pacientes", novo)
+    if _indices_unicos_microchip(passo):
+        raise ValueError("pacientes: microchip continua UNIQUE após a migração")
+    return f"pacientes: UNIQUE de microchip removido ({copiadas} linha(s) copiadas)"
+
+
+def _consultas_esquema_atual(passo: _Passo) -> str:
+    # recriar_tabela_consultas.py apagava a tabela (e as consultas); aqui as linhas são copiadas para o esquema atual
+    from app.db import SQL_TABELA_CONSULTAS
+
+    atual = passo.ler("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'consultas'")[0][0]
+    if _normalizar_sql(atual) == _normalizar_sql(SQL_TABELA_CONSULTAS):
+        return "consultas: já no esquema atual"
+    copiadas = passo.reconstruir_tabela("consultas", SQL_TABELA_CONSULTAS)
+    return f"consultas: reconstruída no esquema atual ({copiadas} linha(s) copiadas)"
+
+
+# (nome, descrição, função): a ordem da lista é a ordem de execução; nomes nunca mudam depois de publicados
+MIGRACOES = [
+    ("0001_tutores_contato", "Tutores: colunas numero, complemento e whatsapp", _tutores_contato),
+    ("0002_pacientes_prontuario", "Pacientes: colunas do prontuário (castrado, alergias, microchip...)",
+     _pacientes_prontuario),
+    ("0003_pacientes_microchip_sem_unique", "Pacientes: microchip sem UNIQUE (vários animais sem chip)",
+     _pacientes_microchip_sem_unique),
+    ("0004_consultas_esquema_atual", "Consultas: tabela no esquema atual, sem as restrições antigas",
+     _consultas_esquema_atual),
+]
+
+
+# ---------------------------------------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------------------------------------
+
+def _registros() -> dict:
+    conn = sqlite3.connect(str(DB_PATH), timeout=10)
+    conn.row_factory = sqlite3.Row
+    try:
+        return {r["nome"]: dict(r) for r in conn.execute("SELECT * FROM migracoes_banco")}
+    except sqlite3.OperationalError:
+        return {}  # registro ainda não criado: tudo pendente
+    finally:
+        conn.close()
+
+
+def listar_migracoes() -> List[dict]:
+    """Migrações na ordem de execução: [{nome, descricao, status, linhas, segundos, resultado, erro, concluida_em}]."""
+    registros = _registros()
+    lista = []
+    for nome, descricao, _ in MIGRACOES:
+        reg = registros.get(nome, {})
+        lista.append({
+            "nome": nome,
+            "descricao": descricao,
+            "status": reg.get("status", "pendente"),
+            "linhas": reg.get("linhas", 0),
+            "segundos": reg.get("segundos", 0.0),
+            "resultado": reg.get("resultado"),
+            "erro": reg.get("erro"),
+            "concluida_em": reg.get("concluida_em"),
+        })
+    return lista
+
+
+def _iniciar(conn, nome, descricao, agora):
+    garantir_tabela_migracoes(conn)
+    conn.execute(
+        "INSERT INTO migracoes_banco (nome, descricao, status, iniciada_em) VALUES (?, ?, 'em_andamento', ?) "
+        "ON CONFLICT(nome) DO UPDATE SET status = 'em_andamento', erro = NULL",
+        (nome, descricao, agora),
+    )
+    return conn.execute("SELECT checkpoint FROM migracoes_banco WHERE nome = ?", (nome,)).fetchone()[0]
+
+
+def _finalizar(conn, nome, status, segundos, resultado=None, erro=None, concluida_em=None):
+    conn.execute(
+        "UPDATE migracoes_banco SET status = ?, segundos = segundos + ?, resultado = COALESCE(?, resultado), "
+        "erro = ?, concluida_em = ? WHERE nome = ?",
+        (status, round(segundos, 3), resultado, erro, concluida_em, nome),
+    )
+
+
+def executar_migracoes(
+    ate: Optional[str] = None,
+    lote: int = MIGRACAO_LOTE,
+    progresso: Optional[Callable[[str, int, int], None]] = None,
+    cancelar: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Roda, em ordem, as migrações ainda não concluídas (até `ate`, inclusive). Garante antes o esquema base do
+    app (mesmo _db_init da inicialização). Para na primeira que falhar (o erro fica no registro; a próxima
+    execução tenta de novo do checkpoint) ou quando `cancelar` é sinalizado entre lotes.
+    progresso(nome, linhas_copiadas, total) é chamado a cada lote das reconstruções.
+    Retorna {"executadas": [{nome, resultado, linhas, segundos, linhas_s}], "ja_concluidas", "erro", "cancelado", "segundos"}.
+    """
+    if ate is not None and ate not in {m[0] for m in MIGRACOES}:
+        raise ValueError(f"Migração desconhecida: {ate}")
+    from app.db import _db_init  # app.db importa streamlit: só quando for migrar
+
+    _db_init()
+    t_total = time.perf_counter()
+    registros = _registros()
+    rel = {"executadas": [], "ja_concluidas": 0, "erro": None, "cancelado": False, "segundos": 0.0}
+    for nome, descricao, fn in MIGRACOES:
+        if registros.get(nome, {}).get("status") == "concluida":
+            rel["ja_concluidas"] += 1
+        else:
+            t0 = time.perf_counter()
+            checkpoint = escrever(_iniciar, nome, descricao, _agora(), db_path=DB_PATH, chaves_estrangeiras=False)
+            passo = _Passo(nome, checkpoint, lote, progresso, cancelar)
+            try:
+                resultado = fn(passo)
+            except _Interrompida:
+                escrever(_finalizar, nome, "em_andamento", time.perf_counter() - t0, db_path=DB_PATH,
+                         chaves_estrangeiras=False)
+                logger.info("Migração %s interrompida no checkpoint %d", nome, passo.checkpoint)
+                rel["cancelado"] = True
+                break
+            except Exception as e:
+                logger.exception("Migração %s falhou", nome)
+                escrever(_finalizar, nome, "erro", time.perf_counter() - t0, erro=f"{type(e).__name__}: {e}",
+                         db_path=DB_PATH, chaves_estrangeiras=False)
+                rel["erro"] = {"nome": nome, "mensagem": f"{type(e).__name__}: {e}"}
+                break
+            segundos = time.perf_counter() - t0
+            escrever(_finalizar, nome, "concluida", segundos, resultado=resultado, concluida_em=_agora(),
+                     db_path=DB_PATH, chaves_estrangeiras=False)
+            linhas_s = round(passo.linhas / segundos) if segundos and passo.linhas else 0
+            logger.info("Migração %s concluída em %.1fs (%d linha(s), %d linhas/s): %s",
+                        nome, segundos, passo.linhas, linhas_s, resultado)
+            rel["executadas"].append({"nome": nome, "resultado": resultado, "linhas": passo.linhas,
+                                      "segundos": round(segundos, 3), "linhas_s": linhas_s})
+        if nome == ate:
+            break
+    rel["segundos"] = round(time.perf_counter() - t_total, 3)
+    return rel
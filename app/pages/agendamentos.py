@@ -6,9 +6,11 @@ from datetime import date, datetime, timedelta
 import streamlit as st
 
 from app.config import DB_PATH, formatar_data_br
+from app.services.busca_pacientes import sugerir_pacientes
 from app.services.pacientes import buscar_pacientes_por_termo_livre
+from app.services.referencias import invalidar_referencias, obter_referencias
+from app.services.documentos import descartar_lote, montar_lote_agenda, status_lote, submeter_lote, zip_lote
 from app.db import db_upsert_tutor, db_upsert_paciente
-from app.laudos_banco import listar_animais_tutores_de_laudos
 from fortcordis_modules.database import (
     criar_agendamento,
     listar_agendamentos,
@@ -36,6 +38,7 @@ def _cadastrar_clinica_rapido_agendamentos(nome, endereco=None, telefone=None, t
         clinica_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        invalidar_referencias()
         return clinica_id, None
     except sqlite3.IntegrityError:
         return None, "Clínica com este nome já existe."
@@ -43,17 +46,24 @@ def _cadastrar_clinica_rapido_agendamentos(nome, endereco=None, telefone=None, t
         return None, str(e)
 
 
-def _buscar_servicos_disponiveis_agend(conn):
-    """Busca todos os serviços ativos disponíveis."""
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT id, nome, valor_base
-        FROM servicos
-        WHERE ativo = 1 OR ativo IS NULL
-        ORDER BY nome
-    """)
-    cols = [desc[0] for desc in cursor.description]
-    return [dict(zip(cols, row)) for row in cursor.fetchall()]
+def _buscar_servicos_disponiveis_agend(ref):
+    """Lista todos os serviços ativos disponíveis (snapshot de referências, sem abrir conexão)."""
+    return [{"id": s.id, "nome": s.nome, "valor_base": s.valor_base} for s in ref.servicos_ativos]
+
+
+def _resolver_clinica_id(cursor, ref, clinica_nome):
+    """
+    Retorna o id da clínica pelo nome (snapshot em memória). Se não existir, cadastra em
+    clinicas_parceiras com a tabela de preço padrão. Retorna (clinica_id, criada: bool).
+    """
+    cli = ref.clinica_por_nome(clinica_nome)
+    if cli is not None:
+        return cli.id, False
+    cursor.execute(
+        "INSERT INTO clinicas_parceiras (nome, cidade, tabela_preco_id) VALUES (?, 'Fortaleza', 1)",
+        (clinica_nome,)
+    )
+    return cursor.lastrowid, True
 
 
 def _criar_os_servico_extra(agendamento_id, servico_nome, valor_final):
@@ -71,29 +81,13 @@ def _criar_os_servico_extra(agendamento_id, servico_nome, valor_final):
     if not clinica_nome:
         return None, "Agendamento sem clínica informada."
 
+    ref = obter_referencias()
     conn = sqlite3.connect(str(DB_PATH))
     cursor = conn.cursor()
+    clinica_criada = False
     try:
-        # Garantir que a coluna exista
-        cursor.execute("PRAGMA table_info(clinicas_parceiras)")
-        cols = [r[1] for r in cursor.fetchall()]
-        if "tabela_preco_id" not in cols:
-            cursor.execute("ALTER TABLE clinicas_parceiras ADD COLUMN tabela_preco_id INTEGER")
-
-        # Verificar ou cadastrar clínica
-        cursor.execute(
-            "SELECT id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL) LIMIT 1",
-            (clinica_nome,),
-        )
-        row_cli = cursor.fetchone()
-        if not row_cli:
-            cursor.execute(
-                "INSERT INTO clinicas_parceiras (nome, cidade, tabela_preco_id) VALUES (?, 'Fortaleza', 1)",
-                (clinica_nome,)
-            )
-            clinica_id = cursor.lastrowid
-        else:
-            clinica_id = row_cli[0]
+        # Verificar ou cadastrar clínica (coluna tabela_preco_id garantida por garantir_colunas_financeiro)
+        clinica_id, clinica_criada = _resolver_clinica_id(cursor, ref, clinica_nome)
 
         data_atend = agend.get("data") or agend.get("data_agendamento")
         data_comp = str(data_atend)[:10] if data_atend else datetime.now().strftime("%Y-%m-%d")
@@ -123,6 +117,8 @@ def _criar_os_servico_extra(agendamento_id, servico_nome, valor_final):
         )
         conn.commit()
         conn.close()
+        if clinica_criada:
+            invalidar_referencias()
         return numero_os, None
     except Exception as e:
         conn.rollback()
@@ -145,29 +141,13 @@ def _criar_os_unica_com_servicos(agendamento_id, servicos_selecionados, servicos
     if not clinica_nome:
         return None, "Clínica não informada."
 
+    ref = obter_referencias()
     conn = sqlite3.connect(str(DB_PATH))
     cursor = conn.cursor()
+    clinica_criada = False
     try:
-        # Garantir que a coluna exista
-        cursor.execute("PRAGMA table_info(clinicas_parceiras)")
-        cols = [r[1] for r in cursor.fetchall()]
-        if "tabela_preco_id" not in cols:
-            cursor.execute("ALTER TABLE clinicas_parceiras ADD COLUMN tabela_preco_id INTEGER")
-
-        # Verificar ou cadastrar clínica
-        cursor.execute(
-            "SELECT id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL) LIMIT 1",
-            (clinica_nome,),
-        )
-        row_cli = cursor.fetchone()
-        if not row_cli:
-            cursor.execute(
-                "INSERT INTO clinicas_parceiras (nome, cidade, tabela_preco_id) VALUES (?, 'Fortaleza', 1)",
-                (clinica_nome,)
-            )
-            clinica_id = cursor.lastrowid
-        else:
-            clinica_id = row_cli[0]
+        # Verificar ou cadastrar clínica (coluna tabela_preco_id garantida por garantir_colunas_financeiro)
+        clinica_id, clinica_criada = _resolver_clinica_id(cursor, ref, clinica_nome)
 
         data_atend = agend.get("data") or agend.get("data_agendamento")
         data_comp = str(data_atend)[:10] if data_atend else datetime.now().strftime("%Y-%m-%d")
@@ -180,26 +160,18 @@ def _criar_os_unica_com_servicos(agendamento_id, servicos_selecionados, servicos
         # 1. Adicionar serviço original do agendamento
         servico_original = (agend.get("servico") or "").strip()
         if servico_original:
-            # Buscar o serviço no banco
-            cursor.execute("SELECT id, valor_base FROM servicos WHERE (ativo = 1 OR ativo IS NULL) AND (nome = ? OR nome LIKE ?) LIMIT 1", (servico_original, f"%{servico_original}%"))
-            row_serv = cursor.fetchone()
-            if row_serv:
-                servico_id, valor_base = row_serv[0], float(row_serv[1] or 0)
-                # Buscar valor da tabela de preços
-                cursor.execute("SELECT valor FROM servico_preco WHERE servico_id = ? AND tabela_preco_id = ?", (servico_id, tabela_preco_id))
-                row_preco = cursor.fetchone()
-                valor = float(row_preco[0]) if row_preco else valor_base
-                todos_servicos.append((servico_original, valor))
+            servico = ref.buscar_servico(servico_original)
+            if servico:
+                # Valor da tabela de preços (fallback valor_base)
+                todos_servicos.append((servico_original, ref.valor_servico(servico.id, tabela_preco_id)))
 
         # 2. Adicionar serviços extras selecionados
         for opt in servicos_selecionados:
             nome_servico = opt.split(" (R$")[0]
             if nome_servico in servicos_db:
                 servico_info = servicos_db[nome_servico]
-                # Buscar valor da tabela de preços
-                cursor.execute("SELECT valor FROM servico_preco WHERE servico_id = ? AND tabela_preco_id = ?", (servico_info["id"], tabela_preco_id))
-                row_preco = cursor.fetchone()
-                valor = float(row_preco[0]) if row_preco else servico_info["valor_base"]
+                preco = ref.preco_servico(servico_info["id"], tabela_preco_id)
+                valor = float(preco) if preco is not None else servico_info["valor_base"]
                 todos_servicos.append((nome_servico, valor))
 
         # Formatar para descrição
@@ -237,6 +209,8 @@ def _criar_os_unica_com_servicos(agendamento_id, servicos_selecionados, servicos
         )
         conn.commit()
         conn.close()
+        if clinica_criada:
+            invalidar_referencias()
         return numero_os, None
     except Exception as e:
         conn.rollback()
@@ -244,6 +218,62 @@ def _criar_os_unica_com_servicos(agendamento_id, servicos_selecionados, servicos
         return None, str(e)
 
 
+def _render_documentos_do_dia():
+    """Expander para gerar em lote (pool de processos) os termos e receituários de um dia, em .zip."""
+    with st.expander("📄 Documentos do dia (termos de consentimento e receituários em lote)"):
+        col_d1, col_d2, col_d3 = st.columns(3)
+        with col_d1:
+            dia_docs = st.date_input("Dia", value=date.today(), key="lote_docs_dia")
+        with col_d2:
+            incluir_termos = st.checkbox("Termos de consentimento", value=True, key="lote_docs_termos")
+        with col_d3:
+            incluir_receitas = st.checkbox("Receituários do dia", value=True, key="lote_docs_receitas")
+        col_m1, col_m2 = st.columns(2)
+        with col_m1:
+            medico_docs = st.text_input("Médico(a) veterinário(a)", value=st.session_state.get("usuario_nome", ""), key="lote_docs_medico")
+        with col_m2:
+            crmv_docs = st.text_input("CRMV", key="lote_docs_crmv")
+
+        lote_id = st.session_state.get("lote_docs_id")
+        if st.button("⚙️ Gerar documentos", key="btn_lote_docs_gerar", disabled=bool(lote_id)):
+            itens = montar_lote_agenda(
+                str(dia_docs),
+                incluir_termos=incluir_termos,
+                incluir_receitas=incluir_receitas,
+                medico=medico_docs or "Dr. [Nome]",
+                crmv=crmv_docs or "CRMV-CE XXXXX",
+            )
+            if not itens:
+                st.info("Nenhum agendamento ou prescrição nesse dia.")
+            else:
+                st.session_state["lote_docs_id"] = submeter_lote(itens)
+                st.rerun()
+
+        if lote_id:
+            status = status_lote(lote_id)
+            if not status["existe"]:
+                st.session_state.pop("lote_docs_id", None)
+                st.rerun()
+            st.progress(status["concluidos"] / max(status["total"], 1),
+                        text=f"{status['concluidos']}/{status['total']} documento(s) gerado(s)")
+            if status["pronto"]:
+                if status["erros"]:
+                    st.warning(f"⚠️ {status['erros']} documento(s) com erro ficaram fora do .zip")
+                st.download_button(
+                    "⬇️ Baixar documentos (.zip)",
+                    data=zip_lote(lote_id),
+                    file_name=f"Documentos_{dia_docs.strftime('%Y%m%d')}.zip",
+                    mime="application/zip",
+                    key="btn_lote_docs_zip",
+                )
+            else:
+                st.button("🔄 Atualizar progresso", key="btn_lote_docs_atualizar")
+            if st.button("🗑️ Limpar lote", key="btn_lote_docs_limpar"):
+                descartar_lote(lote_id)
+                st.session_state.pop("lote_docs_id", None)
+                st.rerun()
+
+
 def render_agendamentos():
     st.title("📅 Gestão de Agendamentos")
 
@@ -276,17 +306,11 @@ def render_agendamentos():
 
             if clinica_nome:
                 try:
-                    conn = sqlite3.connect(str(DB_PATH))
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "SELECT id, tabela_preco_id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL) LIMIT 1",
-                        (clinica_nome,)
-                    )
-                    row_cli = cursor.fetchone()
-                    if row_cli:
-                        clinica_id, tabela_preco_id = row_cli[0], row_cli[1] or 1
-                    servicos_disponiveis = _buscar_servicos_disponiveis_agend(conn)
-                    conn.close()
+                    ref = obter_referencias()
+                    cli = ref.clinica_por_nome(clinica_nome)
+                    if cli:
+                        clinica_id, tabela_preco_id = cli.id, cli.tabela_preco_id or 1
+                    servicos_disponiveis = _buscar_servicos_disponiveis_agend(ref)
                 except Exception as e:
                     st.error(f"Erro ao carregar serviços: {e}")
 
@@ -350,20 +374,18 @@ def render_agendamentos():
             busca_vinculo = st.text_input("Buscar (animal ou tutor)", key="agend_vinculo_busca", placeholder="Ex.: Bolota ou Francisco")
             lista_vinculo = []
             if busca_vinculo and str(busca_vinculo).strip():
-                cadastro = buscar_pacientes_por_termo_livre(termo=busca_vinculo.strip(), limite=15)
-                laudos = listar_animais_tutores_de_laudos(termo=busca_vinculo.strip(), limite=15)
-                cadastro_keys = {(c["paciente"].strip().lower(), c["tutor"].strip().lower()) for c in cadastro}
-                for c in cadastro:
-                    lista_vinculo.append({
-                        "id": c.get("id"),
-                        "paciente": c["paciente"],
-                        "tutor": c["tutor"],
-                        "telefone": c.get("telefone") or "",
-                        "rotulo": f"{c['paciente']} — {c['tutor']} (cadastro)",
-                    })
-                for L in laudos:
-                    pa, tu = (L.get("paciente") or "").strip(), (L.get("tutor") or "").strip()
-                    if (pa.lower(), tu.lower()) not in cadastro_keys:
+                # Cadastros e animais que só têm laudo num resultado só, do índice em memória (sem LIKE por rerun)
+                for c in sugerir_pacientes(busca_vinculo.strip(), limite=30):
+                    if c["fonte"] == "cadastro":
+                        lista_vinculo.append({
+                            "id": c.get("id"),
+                            "paciente": c["paciente"],
+                            "tutor": c["tutor"],
+                            "telefone": c.get("telefone") or "",
+                            "rotulo": f"{c['paciente']} — {c['tutor']} (cadastro)",
+                        })
+                    else:
+                        pa, tu = c["paciente"], c["tutor"]
                         lista_vinculo.append({
                             "paciente": pa,
                             "tutor": tu,
@@ -410,15 +432,8 @@ def render_agendamentos():
                 key="novo_agend_servico"
             )
             try:
-                conn_temp = sqlite3.connect(str(DB_PATH))
-                cursor_temp = conn_temp.cursor()
-                try:
-                    cursor_temp.execute(
-                        "SELECT nome FROM clinicas_parceiras WHERE (ativo = 1 OR ativo IS NULL) ORDER BY nome"
-                    )
-                except sqlite3.OperationalError:
-                    cursor_temp.execute("SELECT nome FROM clinicas_parceiras ORDER BY nome")
-                lista_clinicas = [row[0] for row in cursor_temp.fetchall()]
+                ref = obter_referencias()
+                lista_clinicas = [c.nome for c in ref.clinicas_ativas()]
                 # Botão "Cadastrar nova clínica" sempre visível no topo (fora do dropdown)
                 with st.expander("➕ Cadastrar Nova Clínica", expanded=False):
                     st.caption("Não encontrou a clínica na lista? Cadastre aqui.")
@@ -427,9 +442,7 @@ def render_agendamentos():
                     nova_clinica_tel = st.text_input("Telefone", key="nova_clinica_tel_agend")
                     # Seleção de tabela de preços
                     try:
-                        cursor_temp.execute("SELECT id, nome FROM tabelas_preco ORDER BY id")
-                        tabelas_list = cursor_temp.fetchall()
-                        tabelas_opcoes = {f"ID {t[0]}: {t[1]}": t[0] for t in tabelas_list}
+                        tabelas_opcoes = {f"ID {tid}: {tnome}": tid for tid, tnome in ref.tabelas_preco.items()}
                         tabela_selecionada = st.selectbox(
                             "Tabela de Preços",
                             options=list(tabelas_opcoes.keys()),
@@ -452,7 +465,6 @@ def render_agendamentos():
                                 st.error(f"❌ {msg}")
                         else:
                             st.error("Nome da clínica é obrigatório.")
-                conn_temp.close()
                 # Dropdown: só clínicas cadastradas + digitar manualmente
                 opcoes_clinica = (lista_clinicas or []) + ["📝 Digitar manualmente"]
                 clinica_agend_sel = st.selectbox(
@@ -521,6 +533,7 @@ def render_agendamentos():
 
     with tab_lista:
         st.subheader("Lista de Agendamentos")
+        _render_documentos_do_dia()
         col_f1, col_f2, col_f3, col_f4 = st.columns(4)
         with col_f1:
             _ini_default = date.today().strftime("%d/%m/%Y")
@@ -633,7 +646,11 @@ def render_agendamentos():
                                         st.rerun()
                                     else:
                                         # Criar OS normalmente (comportamento original)
-                                        numero_os, erro_os = criar_os_ao_marcar_realizado(agend['id'])
+                                        ref = obter_referencias()
+                                        numero_os, erro_os = criar_os_ao_marcar_realizado(agend['id'], referencias=ref)
+                                        if ref.clinica_por_nome(agend.get("clinica") or "") is None:
+                                            # A clínica pode ter sido cadastrada automaticamente
+                                            invalidar_referencias()
                                         if erro_os == "already_exists" and numero_os:
                                             st.info(f"Agendamento marcado como realizado. OS {numero_os} já existia (laudo ou anterior); não foi criada duplicata.")
                                         elif erro_os:
@@ -649,15 +666,11 @@ def render_agendamentos():
                             if st.session_state.get("agendamento_id_pendente_realizado") == agend['id']:
                                 servicos_extras = st.session_state.get("servicos_extras_selecionados", [])
                                 if servicos_extras:
-                                    # Buscar dados dos serviços
-                                    conn = sqlite3.connect(str(DB_PATH))
-                                    cursor = conn.cursor()
-                                    cursor.execute("SELECT id, nome, valor_base FROM servicos WHERE ativo = 1 OR ativo IS NULL")
-                                    servicos_db = {row[1]: {"id": row[0], "valor_base": row[2]} for row in cursor.fetchall()}
-                                    cursor.execute("SELECT id, tabela_preco_id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL)", (agend.get("clinica"),))
-                                    row_cli = cursor.fetchone()
-                                    tabela_preco_id = row_cli[1] if row_cli else 1
-                                    conn.close()
+                                    # Dados dos serviços e tabela de preço da clínica (snapshot em memória)
+                                    ref = obter_referencias()
+                                    servicos_db = ref.servicos_por_nome()
+                                    cli = ref.clinica_por_nome(agend.get("clinica") or "")
+                                    tabela_preco_id = cli.tabela_preco_id if cli else 1
 
                                     # Criar uma única OS com todos os serviços
                                     numero_os, erro = _criar_os_unica_com_servicos(
@@ -967,11 +980,9 @@ def render_agendamentos():
         if not agends_amanha:
             st.info("📭 Nenhum agendamento para amanhã que precise de confirmação.")
         else:
-            conn_cli = sqlite3.connect(str(DB_PATH))
-            cur_cli = conn_cli.cursor()
-            cur_cli.execute("SELECT nome, whatsapp, telefone FROM clinicas_parceiras WHERE (ativo = 1 OR ativo IS NULL)")
-            clinicas_whatsapp = {row[0]: (row[1] or row[2] or "") for row in cur_cli.fetchall()}
-            conn_cli.close()
+            clinicas_whatsapp = {
+                c.nome: (c.whatsapp or c.telefone or "") for c in obter_referencias().clinicas_ativas()
+            }
             for agend in agends_amanha:
                 clinica_nome = (agend.get("clinica") or "").strip()
                 whatsapp_clinica = (clinicas_whatsapp.get(clinica_nome) or "").strip() if clinica_nome else ""
@@ -8,6 +8,7 @@ import streamlit as st
 
 from app.components import tabela_tabular
 from app.config import DB_PATH
+from app.services.referencias import invalidar_referencias
 from fortcordis_modules.database import garantir_tabelas_financeiro_extras
 from modules.rbac import verificar_permissao
 
@@ -61,6 +62,7 @@ def render_cadastros():
                             """, (novo_nome, novo_end, novo_cidade, novo_tel, 
                                 novo_whats, novo_cnpj, novo_resp, novo_crmv))
                             conn.commit()
+                            invalidar_referencias()
                             st.success(f"✅ Clínica '{novo_nome}' cadastrada com sucesso!")
                             st.balloons()
                         except sqlite3.IntegrityError:
@@ -210,6 +212,7 @@ def render_cadastros():
                                             """, (edit_nome, edit_end, edit_cidade, edit_tel, edit_whats,
                                                 edit_cnpj, edit_resp, edit_crmv, edit_limite_desc, edit_saldo_credito, clinica_id))
                                         conn.commit()
+                                        invalidar_referencias()
                                         st.success(f"✅ Clínica '{edit_nome}' atualizada com sucesso!")
                                         st.rerun()
                                     except Exception as e:
@@ -221,6 +224,7 @@ def render_cadastros():
                                 try:
                                     cursor.execute("UPDATE clinicas_parceiras SET ativo = 0 WHERE id = ?", (clinica_id,))
                                     conn.commit()
+                                    invalidar_referencias()
                                     st.success(f"✅ Clínica '{clinica_sel}' removida!")
                                     st.rerun()
                                 except Exception as e:
@@ -281,6 +285,7 @@ def render_cadastros():
                                     VALUES (?, ?, ?, 1, datetime('now'), datetime('now'))
                                 """, (novo_serv_nome.strip(), novo_serv_desc.strip(), novo_serv_valor))
                                 conn.commit()
+                                invalidar_referencias()
                                 st.success(f"✅ Serviço '{novo_serv_nome}' cadastrado!")
                                 st.rerun()
                             except sqlite3.IntegrityError:
@@ -344,6 +349,7 @@ def render_cadastros():
                                             (servico_add_id, tb_id, valor_add)
                                         )
                                         conn.commit()
+                                        invalidar_referencias()
                                         st.success(f"Serviço incluído na tabela.")
                                         st.rerun()
                                     except Exception as e:
@@ -373,6 +379,7 @@ def render_cadastros():
                                             (servico_del_id, tb_id)
                                         )
                                         conn.commit()
+                                        invalidar_referencias()
                                         st.success("Serviço removido desta tabela.")
                                         st.rerun()
                                     except Exception as e:
@@ -408,6 +415,7 @@ def render_cadastros():
                                         if cursor_preco.rowcount:
                                             atualizados += 1
                                     conn.commit()
+                                    invalidar_referencias()
                                     st.success(f"✅ {atualizados} valor(es) atualizado(s).")
                                     st.rerun()
                             resumo = df_preco[['Serviço', 'valor']].copy()
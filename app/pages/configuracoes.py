@@ -14,17 +14,26 @@ import pandas as pd
 import streamlit as st
 from PIL import Image
 
-from app.config import DB_PATH
+from app.armazem_sessao import estatisticas_sessoes
+from app.config import DB_PATH, JOBS_ATUALIZAR_S, PASTA_SESSOES
+from app import desempenho
 from app.db import _db_conn, _db_init
-from app.laudos_banco import _criar_tabelas_laudos_se_nao_existirem
+from app.laudos_medidas import contar_medidas_pendentes
+from app.services.compressao import (
+    cancelar_recompressao,
+    estado_recompressao,
+    iniciar_recompressao,
+    relatorio_compressao,
+)
+from app.services.ingestao import estado_ingestao
+from app.services.jobs import cancelar_job, estado_job, job_ativo, listar_jobs, resultado_job, submeter_job
+from app.services.manutencao import estado_manutencao, executar_manutencao
+from app.services.referencias import invalidar_referencias
 from app.services.restore_point import (
-    criar_restore_point,
     listar_restore_points,
-    restaurar_restore_point,
     excluir_restore_point,
 )
-from app.sql_safe import validar_tabela, validar_coluna
-from app.utils import _norm_key
+from fortcordis_modules import escritor
 from modules.rbac import verificar_permissao, obter_permissoes_usuario
 
 # Assinatura (mesmo caminho do app principal)
@@ -32,6 +41,143 @@ _PASTA_FORTCORDIS = Path.home() / "FortCordis"
 ASSINATURA_PATH = str(_PASTA_FORTCORDIS / "assinatura.png")
 
 
+# ----------------------------------------------------------------------------
+# Jobs em segundo plano (app.services.jobs): a página só submete e acompanha
+# ----------------------------------------------------------------------------
+
+@st.fragment(run_every=JOBS_ATUALIZAR_S)
+def _progresso_job(job_id: str) -> None:
+    """Barra de progresso do job, relida a cada JOBS_ATUALIZAR_S sem rerun da página; ao terminar, rerun completo."""
+    est = estado_job(job_id)
+    if est is None or not est["ativo"]:
+        st.rerun()
+    if est["status"] == "pendente":
+        st.progress(0.0, text=f"⏳ {est['descricao']}: na fila...")
+    else:
+        feitos, total = est["feitos"], est["total"]
+        texto = f"{est['descricao']}: {feitos}/{total}" if total else f"{est['descricao']}: em andamento..."
+        if est["mensagem"]:
+            texto += f" — {est['mensagem']}"
+        st.progress(min(feitos / total, 1.0) if total else 0.0, text=texto)
+    if est["cancelamento_pedido"]:
+        st.caption("Cancelamento pedido; termina a etapa atual (o que já foi gravado fica).")
+    elif st.button("⏹️ Cancelar", key=f"job_cancelar_{job_id}"):
+        cancelar_job(job_id)
+        st.rerun(scope="fragment")
+
+
+def _painel_job(chave: str, tipo: str, mostrar_resultado, ao_terminar=None) -> bool:
+    """
+    Acompanha o job guardado em st.session_state[chave] (ou o job ativo do tipo, depois de um F5): progresso e
+    cancelar enquanto roda; depois, mostrar_resultado(resultado) ou o erro e um botão para fechar.
+    ao_terminar() roda uma vez, no primeiro rerun após o fim. Retorna True enquanto o job está ativo.
+    """
+    job_id = st.session_state.get(chave) or job_ativo(tipo)
+    if not job_id:
+        return False
+    est = estado_job(job_id)
+    if est is None:
+        st.session_state.pop(chave, None)
+        return False
+    st.session_state[chave] = job_id
+    if est["ativo"]:
+        _progresso_job(job_id)
+        return True
+    if ao_terminar is not None and st.session_state.get(f"{chave}__tratado") != job_id:
+        st.session_state[f"{chave}__tratado"] = job_id
+        ao_terminar()
+    resultado = resultado_job(job_id)
+    if est["status"] == "concluido":
+        mostrar_resultado(resultado)
+    elif est["status"] == "cancelado":
+        st.warning(f"⏹️ {est['descricao']}: cancelado.")
+        if resultado:
+            mostrar_resultado(resultado)
+    elif est["status"] == "interrompido":
+        st.warning(f"⚠️ {est['descricao']}: interrompido (o servidor reiniciou durante a execução).")
+    else:
+        st.error(f"❌ {est['descricao']}: {est['erro']}")
+    if st.button("✖️ Fechar", key=f"{chave}__fechar"):
+        st.session_state.pop(chave, None)
+        st.rerun()
+    return False
+
+
+def _limpar_caches() -> None:
+    """Depois de importar, restaurar ou compactar: conexão e cadastros em cache podem apontar para dados antigos."""
+    try:
+        _db_conn.clear()
+    except Exception:
+        pass
+    invalidar_referencias()
+
+
+def _mostrar_importacao(rel: dict) -> None:
+    b, novos, exist = rel["backup"], rel["novos"], rel["existentes"]
+    st.info(
+        f"📂 Conteúdo do backup: {b['clinicas']} clínicas, {b['tutores']} tutores, {b['pacientes']} pacientes, "
+        f"{b['laudos']} laudos, {b['clinicas_parceiras']} clínicas parceiras"
+        + (f", **{b['laudos_arquivos']} exames da pasta** (JSON/PDF)." if b["laudos_arquivos"] else ".")
+    )
+    msg_c = (f"{novos['clinicas'] + exist['clinicas']} clínicas ({novos['clinicas']} novas, {exist['clinicas']} já existentes)"
+             if (novos["clinicas"] or exist["clinicas"]) else "0 clínicas")
+    msg_t = (f"{novos['tutores'] + exist['tutores']} tutores ({novos['tutores']} novos, {exist['tutores']} já existentes)"
+             if (novos["tutores"] or exist["tutores"]) else "0 tutores")
+    msg_l = (f"{novos['laudos'] + exist['laudos']} laudos ({novos['laudos']} novos, {exist['laudos']} já existentes)"
+             if exist["laudos"] else f"{novos['laudos']} laudos")
+    msg_arq = ""
+    if novos["laudos_arquivos"] or exist["laudos_arquivos"]:
+        msg_arq = f", {novos['laudos_arquivos']} exames da pasta (JSON/PDF)"
+        if exist["laudos_arquivos"]:
+            msg_arq += f" + {exist['laudos_arquivos']} já existentes atualizados"
+    (st.warning if rel["cancelado"] else st.success)(
+        ("⏹️ Importação cancelada; gravado até aqui: " if rel["cancelado"] else "✅ Importação concluída: ")
+        + f"{msg_c}, {msg_t}, {novos['pacientes']} pacientes, {msg_l}, {novos['clinicas_parceiras']} clínicas parceiras"
+        f"{msg_arq} ({rel['segundos']:.0f} s)."
+    )
+    if rel["erros"]:
+        st.error("Alguns passos falharam: " + " | ".join(f"{k}: {v}" for k, v in rel["erros"]))
+    if rel["cancelado"]:
+        return
+    if (b["pacientes"] > 0 and novos["pacientes"] == 0) or (b["clinicas_parceiras"] > 0 and novos["clinicas_parceiras"] == 0):
+        st.warning(
+            "Pacientes ou clínicas parceiras: nenhum *novo* inserido (podem já existir no banco). "
+            "Os **nomes** (clínica, animal, tutor) nos laudos são preenchidos a partir do backup durante a importação. "
+            "Se na aba «Buscar exames» continuarem vazios, confira se há erros acima e tente gerar um novo backup com exportar_backup.py e reimportar."
+        )
+    if b["laudos"] > 0 and novos["laudos"] == 0:
+        st.warning(
+            "O backup tinha laudos mas nenhum foi inserido. "
+            "Possível causa: nomes de colunas diferentes. Gere o backup com exportar_backup.py na pasta do projeto FortCordis_Novo."
+        )
+    if (any(b[k] for k in ("clinicas", "tutores", "pacientes", "laudos", "clinicas_parceiras"))
+            and sum(exist[k] for k in ("clinicas", "tutores")) + sum(novos[k] for k in ("clinicas", "tutores", "pacientes", "laudos")) == 0):
+        st.warning(
+            "O backup tinha dados mas nada foi inserido. Verifique se o arquivo .db foi gerado pelo exportar_backup.py e se as tabelas existem no backup."
+        )
+
+
+def _mostrar_restauracao(rel: dict) -> None:
+    st.success(f"✅ {rel['mensagem']}")
+    st.info("Recarregue a página (F5) para garantir que os dados atualizados apareçam.")
+
+
+def _mostrar_compactacao(rel: dict) -> None:
+    total_rem = sum(rel["removidos"].values())
+    liberado_mb = max(rel["bytes_antes"] - rel["bytes_depois"], 0) / (1024 * 1024)
+    st.success(f"✅ {total_rem} exame(s) repetido(s) removido(s); {liberado_mb:.1f} MB liberados.")
+    st.json(rel)
+
+
+def _mostrar_timeline(rel: dict) -> None:
+    rel = dict(rel)
+    res_tl = rel.pop("resolucao")
+    st.success(
+        f"✅ {sum(rel.values())} evento(s) atualizados; vinculados por nome: {res_tl['exato']} exato(s), "
+        f"{res_tl['aproximado']} aproximado(s); sem paciente: {res_tl['nenhum']}."
+    )
+
+
 def render_configuracoes():
     
     # Verifica se pode acessar configurações
@@ -950,15 +1096,10 @@ def render_configuracoes():
             key="import_limpar_laudos",
             help="Apaga todos os laudos do banco antes de importar. Use isso para começar do zero e preencher clínica/animal/tutor corretamente."
         )
-        if arquivo_backup is not None:
+        importando = _painel_job("__job_importar_backup", "importar_backup", _mostrar_importacao,
+                                 ao_terminar=_limpar_caches)
+        if arquivo_backup is not None and not importando:
             if st.button("🔄 Importar agora", key="btn_importar_backup", type="primary"):
-                import tempfile
-                import io
-                import traceback
-                erros_import = []
-                tmp_path = None
-                conn_backup = None
-                conn_local = None
                 try:
                     bytes_backup = arquivo_backup.read()
                     if not bytes_backup:
@@ -966,500 +1107,16 @@ def render_configuracoes():
                     else:
                         with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as tmp:
                             tmp.write(bytes_backup)
-                            tmp_path = tmp.name
                         del bytes_backup  # Libera memória antes de processar (importante em Cloud)
-                    try:
-                        conn_backup = sqlite3.connect(tmp_path)
-                        conn_backup.row_factory = sqlite3.Row
-                        cur_b = conn_backup.cursor()
-                        # Tabelas presentes no backup (backup em partes pode ter só algumas)
-                        cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
-                        tabelas_no_backup = {r[0] for r in cur_b.fetchall()}
-                        def _count_backup(tabela):
-                            try:
-                                tab = validar_tabela(tabela)
-                                cur_b.execute(f"SELECT COUNT(*) FROM {tab}")
-                                return cur_b.fetchone()[0]
-                            except (sqlite3.OperationalError, ValueError):
-                                return 0
-                        n_c_b, n_t_b = _count_backup("clinicas"), _count_backup("tutores")
-                        n_p_b = _count_backup("pacientes")
-                        n_l_b = _count_backup("laudos_ecocardiograma") + _count_backup("laudos_eletrocardiograma") + _count_backup("laudos_pressao_arterial")
-                        n_cp_b = _count_backup("clinicas_parceiras")
-                        n_laudos_arq_b = _count_backup("laudos_arquivos")
-                        st.info(
-                            f"📂 Conteúdo do backup: {n_c_b} clínicas, {n_t_b} tutores, {n_p_b} pacientes, {n_l_b} laudos, "
-                            f"{n_cp_b} clínicas parceiras" + (f", **{n_laudos_arq_b} exames da pasta** (JSON/PDF)." if n_laudos_arq_b else ".")
-                        )
-                        # Usar apenas conexão nova (não _db_conn em cache) para evitar "Cannot operate on a closed database"
-                        conn_local = sqlite3.connect(str(DB_PATH))
-                        cur_l = conn_local.cursor()
-                        # Inicializar tabelas com conn_local (sem chamar _db_init que usa cache)
-                        cur_l.execute("""CREATE TABLE IF NOT EXISTS clinicas (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            nome TEXT NOT NULL,
-                            nome_key TEXT NOT NULL UNIQUE,
-                            created_at TEXT NOT NULL
-                        )""")
-                        cur_l.execute("""CREATE TABLE IF NOT EXISTS tutores (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            nome TEXT NOT NULL,
-                            nome_key TEXT NOT NULL UNIQUE,
-                            telefone TEXT,
-                            created_at TEXT NOT NULL
-                        )""")
-                        cur_l.execute("""CREATE TABLE IF NOT EXISTS pacientes (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            tutor_id INTEGER NOT NULL,
-                            nome TEXT NOT NULL,
-                            nome_key TEXT NOT NULL,
-                            especie TEXT NOT NULL DEFAULT '',
-                            raca TEXT,
-                            sexo TEXT,
-                            nascimento TEXT,
-                            created_at TEXT NOT NULL,
-                            UNIQUE(tutor_id, nome_key, especie),
-                            FOREIGN KEY(tutor_id) REFERENCES tutores(id)
-                        )""")
-                        for col, tipo in [("ativo", "INTEGER DEFAULT 1"), ("peso_kg", "REAL"), ("microchip", "TEXT"), ("observacoes", "TEXT")]:
-                            try:
-                                c = validar_coluna(col)
-                                cur_l.execute(f"ALTER TABLE pacientes ADD COLUMN {c} {tipo}")
-                            except (sqlite3.OperationalError, ValueError):
-                                pass
-                        for col, tipo in [("whatsapp", "TEXT"), ("ativo", "INTEGER DEFAULT 1")]:
-                            try:
-                                c = validar_coluna(col)
-                                cur_l.execute(f"ALTER TABLE tutores ADD COLUMN {c} {tipo}")
-                            except (sqlite3.OperationalError, ValueError):
-                                pass
-                        _criar_tabelas_laudos_se_nao_existirem(cur_l)
-                        # Garantir colunas nome_clinica e nome_tutor ANTES de importar laudos
-                        for _tab in ("laudos_ecocardiograma", "laudos_eletrocardiograma", "laudos_pressao_arterial"):
-                            for _col, _tipo in [("nome_clinica", "TEXT"), ("nome_tutor", "TEXT")]:
-                                try:
-                                    t = validar_tabela(_tab)
-                                    c = validar_coluna(_col)
-                                    cur_l.execute(f"ALTER TABLE {t} ADD COLUMN {c} {_tipo}")
-                                except (sqlite3.OperationalError, ValueError):
-                                    pass
-                        # Garantir que clinicas_parceiras existe (pode não existir em deploy novo)
-                        cur_l.execute("""
-                            CREATE TABLE IF NOT EXISTS clinicas_parceiras (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                nome TEXT NOT NULL UNIQUE,
-                                endereco TEXT,
-                                bairro TEXT,
-                                cidade TEXT,
-                                telefone TEXT,
-                                whatsapp TEXT,
-                                email TEXT,
-                                cnpj TEXT,
-                                inscricao_estadual TEXT,
-                                responsavel_veterinario TEXT,
-                                crmv_responsavel TEXT,
-                                observacoes TEXT,
-                                ativo INTEGER DEFAULT 1,
-                                data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
-                            )
-                        """)
-                        cur_l.execute("""
-                            CREATE TABLE IF NOT EXISTS laudos_arquivos (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                data_exame TEXT NOT NULL,
-                                nome_animal TEXT,
-                                nome_tutor TEXT,
-                                nome_clinica TEXT,
-                                tipo_exame TEXT DEFAULT 'ecocardiograma',
-                                nome_base TEXT UNIQUE,
-                                conteudo_json BLOB,
-                                conteudo_pdf BLOB,
-                                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-                            )
-                        """)
-                        cur_l.execute("""
-                            CREATE TABLE IF NOT EXISTS laudos_arquivos_imagens (
-                                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                laudo_arquivo_id INTEGER NOT NULL,
-                                ordem INTEGER DEFAULT 0,
-                                nome_arquivo TEXT,
-                                conteudo BLOB,
-                                FOREIGN KEY(laudo_arquivo_id) REFERENCES laudos_arquivos(id)
-                            )
-                        """)
-                        conn_local.commit()
-                        if limpar_laudos_antes:
-                            for _t in ("laudos_ecocardiograma", "laudos_eletrocardiograma", "laudos_pressao_arterial"):
-                                try:
-                                    t = validar_tabela(_t)
-                                    cur_l.execute(f"DELETE FROM {t}")
-                                except (sqlite3.OperationalError, ValueError):
-                                    pass
-                            conn_local.commit()
-                        map_clinica = {}
-                        map_clinica_parceiras = {}
-                        map_tutor = {}
-                        map_paciente = {}
-                        total_c, total_t, total_p, total_l, total_cp, total_laudos_arq = 0, 0, 0, 0, 0, 0
-                        reused_c, reused_t = 0, 0
-                        # 1) Clinicas (tabela simples) — evita duplicata por nome_key; SELECT só colunas que existem no backup
-                        try:
-                            if "clinicas" not in tabelas_no_backup:
-                                pass  # backup em partes: este arquivo pode não ter base
-                            else:
-                                cur_b.execute("PRAGMA table_info(clinicas)")
-                                cols_c = [c[1] for c in cur_b.fetchall()]
-                                if not cols_c:
-                                    erros_import.append(("clinicas", "Tabela clinicas vazia ou sem colunas no backup"))
-                                else:
-                                    tem_nome_key = "nome_key" in cols_c
-                                    tem_created = "created_at" in cols_c
-                                    sel_c = "SELECT " + ", ".join(cols_c) + " FROM clinicas"
-                                    cur_b.execute(sel_c)
-                                    for row in cur_b.fetchall():
-                                        row = dict(row)
-                                        nome_key = (row.get("nome_key") or "").strip() if tem_nome_key else _norm_key(row.get("nome") or "")
-                                        if not nome_key:
-                                            nome_key = _norm_key(row.get("nome") or "") or "sem_nome"
-                                        r = cur_l.execute("SELECT id FROM clinicas WHERE nome_key=?", (nome_key,)).fetchone()
-                                        if r:
-                                            novo_id = r[0] if isinstance(r, (list, tuple)) else r["id"]
-                                            reused_c += 1
-                                        else:
-                                            cur_l.execute(
-                                                "INSERT INTO clinicas (nome, nome_key, created_at) VALUES (?,?,?)",
-                                                (row.get("nome") or "", nome_key, row.get("created_at") if tem_created else datetime.now().isoformat()),
-                                            )
-                                            novo_id = cur_l.lastrowid
-                                            total_c += 1
-                                        map_clinica[int(row["id"])] = novo_id
-                        except sqlite3.OperationalError as e:
-                            erros_import.append(("clinicas", str(e)))
-                        except Exception as e:
-                            erros_import.append(("clinicas", f"{type(e).__name__}: {e}"))
-                        # 2) Tutores — evita duplicata por nome_key; SELECT só colunas que existem no backup
-                        try:
-                            if "tutores" not in tabelas_no_backup:
-                                pass
-                            else:
-                                cur_b.execute("PRAGMA table_info(tutores)")
-                                cols_t = [c[1] for c in cur_b.fetchall()]
-                                if not cols_t:
-                                    erros_import.append(("tutores", "Tabela tutores vazia ou sem colunas no backup"))
-                                else:
-                                    tem_nome_key_t = "nome_key" in cols_t
-                                    tem_created_t = "created_at" in cols_t
-                                    sel_t = "SELECT " + ", ".join(cols_t) + " FROM tutores"
-                                    cur_b.execute(sel_t)
-                                    for row in cur_b.fetchall():
-                                        row = dict(row)
-                                        nome_key_t = (row.get("nome_key") or "").strip() if tem_nome_key_t else _norm_key(row.get("nome") or "")
-                                        if not nome_key_t:
-                                            nome_key_t = _norm_key(row.get("nome") or "") or "sem_nome"
-                                        r = cur_l.execute("SELECT id FROM tutores WHERE nome_key=?", (nome_key_t,)).fetchone()
-                                        if r:
-                                            novo_id = r[0] if isinstance(r, (list, tuple)) else r["id"]
-                                            reused_t += 1
-                                        else:
-                                            cur_l.execute(
-                                                "INSERT INTO tutores (nome, nome_key, telefone, created_at) VALUES (?,?,?,?)",
-                                                (row.get("nome") or "", nome_key_t, row.get("telefone") or None, row.get("created_at") if tem_created_t else datetime.now().isoformat()),
-                                            )
-                                            novo_id = cur_l.lastrowid
-                                            total_t += 1
-                                        map_tutor[int(row["id"])] = novo_id
-                        except sqlite3.OperationalError as e:
-                            erros_import.append(("tutores", str(e)))
-                        except Exception as e:
-                            erros_import.append(("tutores", f"{type(e).__name__}: {e}"))
-                        # 3) Pacientes (usar map_tutor; evita duplicata por tutor_id + nome_key + especie; SELECT só colunas que existem no backup)
-                        try:
-                            if "pacientes" not in tabelas_no_backup:
-                                pass
-                            else:
-                                cur_b.execute("PRAGMA table_info(pacientes)")
-                                cols_p = [c[1] for c in cur_b.fetchall()]
-                                tem_nome_key_p = "nome_key" in cols_p
-                                tem_created_p = "created_at" in cols_p
-                                sel_p = "SELECT " + ", ".join(cols_p) + " FROM pacientes"
-                                cur_b.execute(sel_p)
-                                for row in cur_b.fetchall():
-                                    row = dict(row)
-                                    novo_tutor_id = map_tutor.get(int(row["tutor_id"])) if row.get("tutor_id") is not None else None
-                                    if novo_tutor_id is None:
-                                        continue
-                                    especie_val = row.get("especie") or ""
-                                    nome_key_p = (row.get("nome_key") or "").strip() if tem_nome_key_p else _norm_key(row.get("nome") or "")
-                                    if not nome_key_p:
-                                        nome_key_p = _norm_key(row.get("nome") or "") or "sem_nome"
-                                    r = cur_l.execute(
-                                        "SELECT id FROM pacientes WHERE tutor_id=? AND nome_key=? AND especie=?",
-                                        (novo_tutor_id, nome_key_p, especie_val),
-                                    ).fetchone()
-                                    if r:
-                                        novo_id = r[0] if isinstance(r, (list, tuple)) else r["id"]
-                                    else:
-                                        cur_l.execute(
-                                            """INSERT INTO pacientes (tutor_id, nome, nome_key, especie, raca, sexo, nascimento, created_at)
-                                               VALUES (?,?,?,?,?,?,?,?)""",
-                                            (
-                                                novo_tutor_id,
-                                                row.get("nome") or "",
-                                                nome_key_p,
-                                                especie_val,
-                                                row.get("raca"),
-                                                row.get("sexo"),
-                                                row.get("nascimento"),
-                                                row.get("created_at") if tem_created_p else datetime.now().isoformat(),
-                                            ),
-                                        )
-                                        novo_id = cur_l.lastrowid
-                                        total_p += 1
-                                    map_paciente[int(row["id"])] = novo_id
-                        except sqlite3.OperationalError as e:
-                            erros_import.append(("pacientes", str(e)))
-                        except Exception as e:
-                            erros_import.append(("pacientes", f"{type(e).__name__}: {e}"))
-                        # 4) Clinicas parceiras (INSERT OR IGNORE por nome; só colunas que existem no destino)
-                        try:
-                            cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='clinicas_parceiras'")
-                            if cur_b.fetchone():
-                                cur_l.execute("PRAGMA table_info(clinicas_parceiras)")
-                                dest_cp = [c[1] for c in cur_l.fetchall()]
-                                cur_b.execute("PRAGMA table_info(clinicas_parceiras)")
-                                cols_cp = [c[1] for c in cur_b.fetchall()]
-                                cols_cp_insert = [c for c in dest_cp if c != "id" and c in cols_cp]
-                                if not cols_cp_insert:
-                                    cols_cp_insert = [c for c in dest_cp if c != "id"]
-                                cur_b.execute("SELECT * FROM clinicas_parceiras")
-                                erro_cp_msg = None
-                                for row in cur_b.fetchall():
-                                    row_dict = dict(zip(cols_cp, row))
-                                    old_id = row_dict.get("id")
-                                    nome_cp = (row_dict.get("nome") or "").strip() if row_dict.get("nome") is not None else ""
-                                    vals_cp = [row_dict.get(c) for c in cols_cp_insert]
-                                    placeholders_cp = ", ".join(["?" for _ in cols_cp_insert])
-                                    try:
-                                        cur_l.execute(
-                                            f"INSERT OR IGNORE INTO clinicas_parceiras ({', '.join(cols_cp_insert)}) VALUES ({placeholders_cp})",
-                                            vals_cp,
-                                        )
-                                        # sqlite3 rowcount pode ser -1; lastrowid > 0 indica inserção nova
-                                        if getattr(cur_l, "lastrowid", 0) and cur_l.lastrowid > 0:
-                                            total_cp += 1
-                                            if old_id is not None:
-                                                map_clinica_parceiras[int(old_id)] = cur_l.lastrowid
-                                    except sqlite3.OperationalError as e:
-                                        if erro_cp_msg is None:
-                                            erro_cp_msg = str(e)
-                                    if nome_cp and old_id is not None and int(old_id) not in map_clinica_parceiras:
-                                        r = cur_l.execute("SELECT id FROM clinicas_parceiras WHERE nome=?", (nome_cp,)).fetchone()
-                                        novo_id = (r[0] if isinstance(r, (list, tuple)) else r["id"]) if r else None
-                                        if novo_id is not None:
-                                            map_clinica_parceiras[int(old_id)] = novo_id
-                                if erro_cp_msg:
-                                    erros_import.append(("clinicas_parceiras", erro_cp_msg))
-                        except sqlite3.OperationalError as e:
-                            erros_import.append(("clinicas_parceiras", str(e)))
-                        except Exception as e:
-                            erros_import.append(("clinicas_parceiras", f"{type(e).__name__}: {e}"))
-                        # 5) Laudos (mapear paciente_id e clinica_id; só inserir colunas que existem no destino)
-                        # Só processar tabelas de laudos que existem no backup (evitar "no such table")
-                        cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('laudos_ecocardiograma','laudos_eletrocardiograma','laudos_pressao_arterial')")
-                        tabelas_laudos_no_backup = [r[0] for r in cur_b.fetchall()]
-                        BATCH_LAUDOS_TABELAS = 30  # Processar laudos em lotes para reduzir pico de memória
-                        for tabela in tabelas_laudos_no_backup:
-                            try:
-                                cur_l.execute(f"PRAGMA table_info({tabela})")
-                                colunas_destino = [c[1] for c in cur_l.fetchall()]
-                                cur_b.execute(f"SELECT * FROM {tabela}")
-                                cur_b.execute(f"PRAGMA table_info({tabela})")
-                                colunas_laudo = [c[1] for c in cur_b.fetchall()]
-                                colunas_sem_id = [c for c in colunas_laudo if c != "id" and c in colunas_destino]
-                                for col_extra in ("nome_paciente", "nome_clinica", "nome_tutor"):
-                                    if col_extra in colunas_destino and col_extra not in colunas_sem_id:
-                                        colunas_sem_id.append(col_extra)
-                                if not colunas_sem_id:
-                                    continue
-                                cur_b.execute(f"SELECT * FROM {tabela}")
-                                while True:
-                                    rows_laudo = cur_b.fetchmany(BATCH_LAUDOS_TABELAS)
-                                    if not rows_laudo:
-                                        break
-                                    for row in rows_laudo:
-                                        row_d = dict(zip(colunas_laudo, row))
-                                        old_paciente_id = int(row_d["paciente_id"]) if row_d.get("paciente_id") else None
-                                        novo_paciente_id = map_paciente.get(old_paciente_id) if old_paciente_id is not None else None
-                                        old_clinica_id = int(row_d["clinica_id"]) if row_d.get("clinica_id") else None
-                                        novo_clinica_id = (map_clinica_parceiras.get(old_clinica_id) or map_clinica.get(old_clinica_id)) if old_clinica_id is not None else None
-                                        row_d["paciente_id"] = novo_paciente_id
-                                        row_d["clinica_id"] = novo_clinica_id
-                                        if old_paciente_id is not None:
-                                            try:
-                                                r_bp = cur_b.execute("SELECT nome FROM pacientes WHERE id=?", (old_paciente_id,)).fetchone()
-                                                if r_bp:
-                                                    row_d["nome_paciente"] = (r_bp[0] if isinstance(r_bp, (list, tuple)) else r_bp["nome"]) or ""
-                                            except Exception:
-                                                pass
-                                        if old_clinica_id is not None:
-                                            try:
-                                                r_bc = cur_b.execute("SELECT nome FROM clinicas WHERE id=?", (old_clinica_id,)).fetchone()
-                                                if not r_bc:
-                                                    r_bc = cur_b.execute("SELECT nome FROM clinicas_parceiras WHERE id=?", (old_clinica_id,)).fetchone()
-                                                if r_bc:
-                                                    row_d["nome_clinica"] = (r_bc[0] if isinstance(r_bc, (list, tuple)) else r_bc["nome"]) or ""
-                                            except Exception:
-                                                pass
-                                        if old_paciente_id is not None:
-                                            try:
-                                                r_bt = cur_b.execute(
-                                                    "SELECT t.nome FROM pacientes p JOIN tutores t ON t.id = p.tutor_id WHERE p.id=?",
-                                                    (old_paciente_id,),
-                                                ).fetchone()
-                                                if r_bt:
-                                                    row_d["nome_tutor"] = (r_bt[0] if isinstance(r_bt, (list, tuple)) else r_bt["nome"]) or ""
-                                            except Exception:
-                                                pass
-                                        vals = []
-                                        for c in colunas_sem_id:
-                                            if c == "arquivo_xml":
-                                                vals.append(row_d.get("arquivo_xml") or row_d.get("arquivo_json"))
-                                            elif c in ("nome_paciente", "nome_clinica", "nome_tutor"):
-                                                vals.append(row_d.get(c) or "")
-                                            else:
-                                                vals.append(row_d.get(c))
-                                        placeholders = ", ".join(["?" for _ in colunas_sem_id])
-                                        try:
-                                            cur_l.execute(
-                                                f"INSERT INTO {tabela} ({', '.join(colunas_sem_id)}) VALUES ({placeholders})",
-                                                vals,
-                                            )
-                                            total_l += 1
-                                        except sqlite3.OperationalError as e:
-                                            erros_import.append((f"laudos_{tabela}", str(e)))
-                                    conn_local.commit()
-                            except sqlite3.OperationalError as e:
-                                erros_import.append((tabela, str(e)))
-                        # Preencher nome_paciente, nome_clinica e nome_tutor quando vazios (a partir das tabelas vinculadas no destino)
-                        for tabela in ("laudos_ecocardiograma", "laudos_eletrocardiograma", "laudos_pressao_arterial"):
-                            try:
-                                cur_l.execute(f"""UPDATE {tabela} SET nome_paciente = (SELECT nome FROM pacientes WHERE pacientes.id = {tabela}.paciente_id)
-                                    WHERE (nome_paciente IS NULL OR TRIM(COALESCE(nome_paciente, '')) = '') AND paciente_id IS NOT NULL""")
-                                cur_l.execute(f"""UPDATE {tabela} SET nome_clinica = COALESCE(
-                                    (SELECT nome FROM clinicas WHERE clinicas.id = {tabela}.clinica_id),
-                                    (SELECT nome FROM clinicas_parceiras WHERE clinicas_parceiras.id = {tabela}.clinica_id)
-                                    ) WHERE clinica_id IS NOT NULL AND (nome_clinica IS NULL OR TRIM(COALESCE(nome_clinica, '')) = '')""")
-                                cur_l.execute(f"""UPDATE {tabela} SET nome_tutor = (SELECT t.nome FROM pacientes p JOIN tutores t ON t.id = p.tutor_id WHERE p.id = {tabela}.paciente_id)
-                                    WHERE paciente_id IS NOT NULL AND (nome_tutor IS NULL OR TRIM(COALESCE(nome_tutor, '')) = '')""")
-                            except sqlite3.OperationalError:
-                                pass
-                        # 6) Laudos da pasta (laudos_arquivos + laudos_arquivos_imagens) — copiar do backup com commit em lotes
-                        cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='laudos_arquivos'")
-                        if cur_b.fetchone():
-                            try:
-                                cur_b.execute("PRAGMA table_info(laudos_arquivos)")
-                                cols_arq = [c[1] for c in cur_b.fetchall()]
-                                cols_sem_id = [c for c in cols_arq if c != "id"]
-                                cur_b.execute("SELECT * FROM laudos_arquivos")
-                                map_laudo_arq = {}
-                                BATCH_LAUDOS = 50
-                                i = 0
-                                while True:
-                                    rows_batch = cur_b.fetchmany(BATCH_LAUDOS)
-                                    if not rows_batch:
-                                        break
-                                    for row in rows_batch:
-                                        row_d = dict(zip(cols_arq, row))
-                                        old_id = row_d.get("id")
-                                        vals = [row_d.get(c) for c in cols_sem_id]
-                                        cur_l.execute(
-                                            f"INSERT INTO laudos_arquivos ({', '.join(cols_sem_id)}) VALUES ({', '.join(['?'] * len(cols_sem_id))})",
-                                            vals,
-                                        )
-                                        new_id = cur_l.lastrowid
-                                        if old_id is not None:
-                                            map_laudo_arq[int(old_id)] = new_id
-                                        total_laudos_arq += 1
-                                        i += 1
-                                    conn_local.commit()
-                                cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='laudos_arquivos_imagens'")
-                                if cur_b.fetchone():
-                                    cur_b.execute("PRAGMA table_info(laudos_arquivos_imagens)")
-                                    cols_img = [c[1] for c in cur_b.fetchall()]
-                                    cols_img_sem_id = [c for c in cols_img if c != "id"]
-                                    cur_b.execute("SELECT * FROM laudos_arquivos_imagens")
-                                    i2 = 0
-                                    while True:
-                                        rows_img_batch = cur_b.fetchmany(BATCH_LAUDOS)
-                                        if not rows_img_batch:
-                                            break
-                                        for row in rows_img_batch:
-                                            row_d = dict(zip(cols_img, row))
-                                            old_laudo_id = row_d.get("laudo_arquivo_id")
-                                            new_laudo_id = map_laudo_arq.get(int(old_laudo_id)) if old_laudo_id is not None else None
-                                            if new_laudo_id is not None:
-                                                vals_img = [new_laudo_id if c == "laudo_arquivo_id" else row_d.get(c) for c in cols_img_sem_id]
-                                                cur_l.execute(
-                                                    f"INSERT INTO laudos_arquivos_imagens ({', '.join(cols_img_sem_id)}) VALUES ({', '.join(['?'] * len(cols_img_sem_id))})",
-                                                    vals_img,
-                                                )
-                                            i2 += 1
-                                        conn_local.commit()
-                            except sqlite3.OperationalError as e:
-                                erros_import.append(("laudos_arquivos", str(e)))
-                        conn_local.commit()
-                        msg_c = f"{total_c + reused_c} clínicas ({total_c} novas, {reused_c} já existentes)" if (total_c or reused_c) else "0 clínicas"
-                        msg_t = f"{total_t + reused_t} tutores ({total_t} novos, {reused_t} já existentes)" if (total_t or reused_t) else "0 tutores"
-                        msg_arq = f", {total_laudos_arq} exames da pasta (JSON/PDF)" if total_laudos_arq else ""
-                        st.success(
-                            f"✅ Importação concluída: {msg_c}, {msg_t}, {total_p} pacientes, "
-                            f"{total_l} laudos, {total_cp} clínicas parceiras{msg_arq}."
+                        # O job apaga o arquivo temporário ao terminar
+                        st.session_state["__job_importar_backup"] = submeter_job(
+                            "importar_backup",
+                            descricao=f"Importar {arquivo_backup.name}",
+                            usuario_id=st.session_state.get("usuario_id"),
+                            caminho_backup=tmp.name,
+                            limpar_laudos=limpar_laudos_antes,
                         )
-                        try:
-                            _db_conn.clear()
-                        except Exception:
-                            pass
-                        st.info(
-                            "Se a página travar ou aparecer erro após a importação, **recarregue (F5)** e faça login de novo. "
-                            "Os dados já foram salvos no banco."
-                        )
-                        if erros_import:
-                            st.error("Alguns passos falharam: " + " | ".join(f"{k}: {v}" for k, v in erros_import))
-                        if (n_p_b > 0 and total_p == 0) or (n_cp_b > 0 and total_cp == 0):
-                            st.warning(
-                                "Pacientes ou clínicas parceiras: nenhum *novo* inserido (podem já existir no banco). "
-                                "Os **nomes** (clínica, animal, tutor) nos laudos são preenchidos a partir do backup durante a importação. "
-                                "Se na aba «Buscar exames» continuarem vazios, confira se há erros acima e tente gerar um novo backup com exportar_backup.py e reimportar."
-                            )
-                        if n_l_b > 0 and total_l == 0:
-                            st.warning(
-                                "O backup tinha laudos mas nenhum foi inserido. "
-                                "Possível causa: nomes de colunas diferentes. Gere o backup com exportar_backup.py na pasta do projeto FortCordis_Novo."
-                            )
-                        if (n_c_b or n_t_b or n_p_b or n_l_b or n_cp_b) and (total_c + reused_c + total_t + reused_t + total_p + total_l) == 0:
-                            st.warning(
-                                "O backup tinha dados mas nada foi inserido. Verifique se o arquivo .db foi gerado pelo exportar_backup.py e se as tabelas existem no backup."
-                            )
-                    except Exception as e:
-                        st.error(f"Erro ao importar: {e}")
-                        with st.expander("Detalhes técnicos do erro (para diagnóstico)"):
-                            st.code(traceback.format_exc(), language="text")
-                    finally:
-                        try:
-                            if conn_backup is not None:
-                                conn_backup.close()
-                        except Exception:
-                            pass
-                        try:
-                            if conn_local is not None:
-                                conn_local.close()
-                        except Exception:
-                            pass
-                        try:
-                            if tmp_path and os.path.exists(tmp_path):
-                                os.remove(tmp_path)
-                        except Exception:
-                            pass
+                        st.rerun()
                 except Exception as e:
                     st.error(f"Erro ao processar arquivo: {e}")
                     with st.expander("Detalhes técnicos do erro (para diagnóstico)"):
@@ -1490,19 +1147,17 @@ def render_configuracoes():
             btn_criar_rp = st.button("💾 Criar Restore Point", key="btn_criar_rp", type="primary", use_container_width=True)
 
         if btn_criar_rp:
-            with st.spinner("Criando restore point..."):
-                ok, msg, nome = criar_restore_point(rp_descricao)
-            if ok:
-                st.success(f"✅ {msg}")
-                time.sleep(1)
-                st.rerun()
-            else:
-                st.error(f"❌ {msg}")
+            st.session_state["__job_criar_rp"] = submeter_job(
+                "criar_restore_point", usuario_id=st.session_state.get("usuario_id"), descricao=rp_descricao
+            )
+            st.rerun()
+        _painel_job("__job_criar_rp", "criar_restore_point", lambda r: st.success(f"✅ {r['mensagem']}"))
 
         st.markdown("---")
 
         # --- Listar restore points ---
         st.markdown("#### Restore Points Disponíveis")
+        _painel_job("__job_restaurar_rp", "restaurar_restore_point", _mostrar_restauracao, ao_terminar=_limpar_caches)
         pontos = listar_restore_points()
 
         if not pontos:
@@ -1544,18 +1199,14 @@ def render_configuracoes():
                         col_conf1, col_conf2 = st.columns(2)
                         with col_conf1:
                             if st.button("✅ Confirmar Restauração", key=f"rp_conf_rest_{rp_id}", type="primary", use_container_width=True):
-                                with st.spinner("Restaurando..."):
-                                    ok, msg = restaurar_restore_point(rp_id)
-                                if ok:
-                                    st.success(f"✅ {msg}")
-                                    try:
-                                        _db_conn.clear()
-                                    except Exception:
-                                        pass
-                                    st.info("Recarregue a página (F5) para garantir que os dados atualizados apareçam.")
-                                    st.session_state.pop(f"rp_confirmar_restaurar_{rp_id}", None)
-                                else:
-                                    st.error(f"❌ {msg}")
+                                st.session_state["__job_restaurar_rp"] = submeter_job(
+                                    "restaurar_restore_point",
+                                    descricao=f"Restaurar {ponto['nome']}",
+                                    usuario_id=st.session_state.get("usuario_id"),
+                                    rp_id=rp_id,
+                                )
+                                st.session_state.pop(f"rp_confirmar_restaurar_{rp_id}", None)
+                                st.rerun()
                         with col_conf2:
                             if st.button("❌ Cancelar", key=f"rp_cancel_rest_{rp_id}", use_container_width=True):
                                 st.session_state.pop(f"rp_confirmar_restaurar_{rp_id}", None)
@@ -1675,3 +1326,294 @@ def render_configuracoes():
                 "Se os valores de RAM (RSS) subirem muito ao usar o app, pode indicar vazamento ou cache. "
                 "No Community Cloud, use esta aba para acompanhar o uso antes de atingir o limite."
             )
+            est_sessoes = estatisticas_sessoes()
+            st.caption(
+                f"Imagens e PDFs de laudos em edição: {est_sessoes['sessoes']} sessão(ões), {est_sessoes['itens']} arquivo(s); "
+                f"{est_sessoes['bytes_disco'] / (1024 * 1024):.1f} MB em disco ({PASTA_SESSOES}), "
+                f"{est_sessoes['bytes_memoria'] / (1024 * 1024):.1f} MB em memória."
+            )
+
+        st.markdown("---")
+        st.markdown("#### ⏱️ Desempenho (páginas, SQL e cache)")
+        if not desempenho.ativo():
+            st.info("Instrumentação desligada (FORTCORDIS_PERF=0).")
+        else:
+            st.caption(
+                f"Últimos {len(desempenho.eventos())} eventos deste processo (buffer circular). Tempos em ms; "
+                "a página atual só entra no resumo depois de terminar o render."
+            )
+            col_top, col_ord = st.columns(2)
+            with col_top:
+                top_perf = st.number_input("Top N", min_value=3, max_value=50, value=10, step=1, key="perf_top")
+            with col_ord:
+                ordem_perf = st.selectbox(
+                    "Ordenar por", ["p95", "total_ms", "n"], key="perf_ordem",
+                    format_func=lambda o: {"p95": "p95 (mais lentos)", "total_ms": "tempo total", "n": "chamadas"}[o],
+                )
+            secoes_perf = [
+                ("Páginas", "pagina", ordem_perf),
+                ("Consultas SQL", "sql", ordem_perf),
+                ("st.cache_data (taxa de acerto)", "cache", "n"),
+            ]
+            for titulo_perf, tipo_perf, ordem_tipo in secoes_perf:
+                st.markdown(f"**{titulo_perf}**")
+                tabela_perf = desempenho.resumo(tipo_perf, int(top_perf), ordem_tipo)
+                if tabela_perf:
+                    st.dataframe(pd.DataFrame(tabela_perf), use_container_width=True, hide_index=True)
+                else:
+                    st.caption("Sem dados.")
+            col_exp, col_limpar = st.columns(2)
+            with col_exp:
+                st.download_button(
+                    "📥 Exportar eventos (JSONL)",
+                    data=desempenho.exportar_jsonl(),
+                    file_name=f"desempenho_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl",
+                    mime="application/x-ndjson",
+                    key="perf_exportar",
+                )
+            with col_limpar:
+                if st.button("🗑️ Limpar eventos", key="perf_limpar"):
+                    desempenho.limpar()
+                    st.rerun()
+
+        st.markdown("---")
+        st.markdown("#### ✍️ Gravações no banco (escritor único)")
+        if not escritor.ATIVO:
+            st.info("Escritor único desligado (FORTCORDIS_ESCRITOR=0): cada gravação usa a própria conexão.")
+        else:
+            st.caption(
+                "Agendamentos, baixas de OS, laudos e logins gravam por uma fila única deste processo; gravações que "
+                "chegam juntas são confirmadas no mesmo COMMIT. Espera alta indica gravações lentas na frente da fila."
+            )
+            stats_escrita = escritor.estatisticas_escritores()
+            if not stats_escrita:
+                st.caption("Nenhuma gravação desde que o servidor iniciou.")
+            for arquivo_db, se in stats_escrita.items():
+                c1, c2, c3, c4 = st.columns(4)
+                with c1:
+                    st.metric("Gravações", se["tarefas"], help=f"{arquivo_db}; {se['falhas']} com erro")
+                with c2:
+                    st.metric("Por COMMIT", f"{se['media_por_lote']:.2f}", help=f"Maior lote: {se['maior_lote']}")
+                with c3:
+                    st.metric("Espera média na fila", f"{se['espera_media_ms']:.1f} ms",
+                              help=f"Máxima: {se['espera_max_ms']:.1f} ms")
+                with c4:
+                    st.metric("Na fila agora", se["pendentes"])
+
+        st.markdown("---")
+        st.markdown("#### 🔧 Manutenção do banco")
+        try:
+            est_man = estado_manutencao()
+        except Exception as e:
+            st.error(f"Erro ao ler o estado do banco: {e}")
+        else:
+            mb = 1024 * 1024
+            st.caption(
+                "Checkpoint do WAL quando ele cresce, estatísticas do planejador (PRAGMA optimize) a cada poucas horas "
+                "e devolução do espaço livre ao disco (vacuum incremental). "
+                + ("Roda sozinha em segundo plano" + (f"; última rodada: {est_man['ultima_rodada']}." if est_man["ultima_rodada"] else ".")
+                   if est_man["agendador_ativo"] else "Agendador desligado (FORTCORDIS_MANUTENCAO=0).")
+            )
+            c1, c2, c3, c4 = st.columns(4)
+            with c1:
+                st.metric("Arquivo do banco", f"{est_man['arquivo_bytes'] / mb:.1f} MB")
+            with c2:
+                st.metric("WAL", f"{est_man['wal_bytes'] / mb:.1f} MB", help=f"journal_mode={est_man['journal_mode']}")
+            with c3:
+                st.metric("Páginas livres", est_man["paginas_livres"], help=f"{est_man['livres_bytes'] / mb:.1f} MB sem uso dentro do arquivo")
+            with c4:
+                st.metric("auto_vacuum", est_man["auto_vacuum"])
+            if est_man["erro"]:
+                st.warning(f"Última rodada com erro: {est_man['erro']}")
+            if est_man["ultimas"]:
+                st.dataframe(
+                    pd.DataFrame([
+                        {"tarefa": t, "executado_em": u["executado_em"], "duracao_ms": u["duracao_ms"],
+                         "resultado": ", ".join(f"{k}={v}" for k, v in (u["resultado"] or {}).items())}
+                        for t, u in sorted(est_man["ultimas"].items())
+                    ]),
+                    use_container_width=True, hide_index=True,
+                )
+            col_man, col_inc = st.columns(2)
+            with col_man:
+                if st.button("🔧 Rodar manutenção agora", key="diagnostico_manutencao_rodar"):
+                    with st.spinner("Manutenção em andamento..."):
+                        res_man = executar_manutencao(forcar=True)
+                    erros_man = {t: r["erro"] for t, r in res_man.items() if isinstance(r, dict) and r.get("erro")}
+                    if erros_man:
+                        st.warning(f"Concluída com erro em: {erros_man}")
+                    else:
+                        st.success(f"✅ Manutenção concluída: {', '.join(res_man)}.")
+            with col_inc:
+                vacuum_ativo = _painel_job(
+                    "__job_vacuum_incremental", "vacuum_incremental",
+                    lambda r: st.success(
+                        f"✅ auto_vacuum=INCREMENTAL em {r['segundos']:.1f} s; arquivo "
+                        f"{r['arquivo_antes'] / mb:.1f} → {r['arquivo_depois'] / mb:.1f} MB."
+                    ),
+                )
+                if est_man["auto_vacuum"] != "INCREMENTAL" and not vacuum_ativo:
+                    if st.button("🗜️ Ativar vacuum incremental", key="diagnostico_manutencao_incremental",
+                                 help="Reescreve o banco uma vez (VACUUM); as gravações esperam até terminar"):
+                        st.session_state["__job_vacuum_incremental"] = submeter_job(
+                            "vacuum_incremental", usuario_id=st.session_state.get("usuario_id")
+                        )
+                        st.rerun()
+
+        st.markdown("---")
+        st.markdown("#### 📂 Ingestão automática da pasta de laudos")
+        try:
+            est_ing = estado_ingestao()
+        except Exception as e:
+            st.error(f"Erro ao ler o estado da ingestão: {e}")
+        else:
+            modo_ing = {"watchdog": "eventos do sistema de arquivos (watchdog)", "varredura": "varredura periódica"}
+            st.caption(
+                f"Exames novos ou alterados em {est_ing['pasta']} entram sozinhos em Buscar exames. "
+                + (f"Observando por {modo_ing.get(est_ing['modo'], 'varredura periódica')}"
+                   + (f"; última passada: {est_ing['ultima_passada']}." if est_ing["ultima_passada"] else ".")
+                   if est_ing["ativo"] else "Thread parada (sem a pasta neste servidor ou FORTCORDIS_INGESTAO=0).")
+            )
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                st.metric("Exames no cursor", est_ing["no_cursor"], help="Já ingeridos; só são relidos se mudarem")
+            with c2:
+                st.metric("Ingeridos nesta sessão do servidor", est_ing["ingeridos"])
+            with c3:
+                st.metric("Com erro", est_ing["com_erro"], help="JSON ilegível ou falha ao gravar; tenta de novo quando o arquivo mudar")
+            if est_ing["erro"]:
+                st.warning(f"Última passada com erro: {est_ing['erro']}")
+            verificando = _painel_job(
+                "__job_ingerir_pasta", "ingerir_pasta",
+                lambda r: st.success(
+                    f"✅ {r['exames']} exame(s) na pasta; {r['ingeridos']} importado(s), "
+                    f"{r['erros']} com erro, {r['aguardando']} ainda sendo gravado(s)."
+                ),
+            )
+            if not verificando and st.button("📂 Verificar a pasta agora", key="diagnostico_ingestao_passada"):
+                st.session_state["__job_ingerir_pasta"] = submeter_job(
+                    "ingerir_pasta", usuario_id=st.session_state.get("usuario_id")
+                )
+                st.rerun()
+
+        st.markdown("---")
+        st.markdown("#### 🧹 Compactar exames repetidos")
+        st.caption(
+            "Une laudos repetidos (mesmo paciente, tutor, clínica, data, tipo e medidas) deixados por importações "
+            "antigas, cria o índice único de fingerprint e devolve o espaço ao disco (VACUUM). Pode levar alguns minutos."
+        )
+        compactando = _painel_job("__job_compactar_exames", "compactar_exames", _mostrar_compactacao,
+                                  ao_terminar=_limpar_caches)
+        if not compactando and st.button("🧹 Compactar exames repetidos", key="diagnostico_compactar_exames"):
+            st.session_state["__job_compactar_exames"] = submeter_job(
+                "compactar_exames", usuario_id=st.session_state.get("usuario_id")
+            )
+            st.rerun()
+
+        st.markdown("---")
+        st.markdown("#### 📐 Medidas dos exames arquivados")
+        pendentes_medidas = contar_medidas_pendentes()
+        st.caption(
+            "As medidas de cada ecocardiograma (LVIDd, AE/Ao, Onda E...) ficam em uma tabela indexada para "
+            "tendências e buscas por coorte. Exames salvos pelo app já entram nela; os antigos precisam da extração. "
+            f"Pendentes: **{pendentes_medidas}**."
+        )
+        extraindo = _painel_job(
+            "__job_backfill_medidas", "backfill_medidas",
+            lambda r: st.success(f"✅ {r['exames']} exame(s), {r['medidas']} medida(s) em {r['segundos']:.1f} s."),
+        )
+        if not extraindo and st.button("📐 Extrair medidas pendentes", key="diagnostico_extrair_medidas",
+                                       disabled=pendentes_medidas == 0):
+            st.session_state["__job_backfill_medidas"] = submeter_job(
+                "backfill_medidas", usuario_id=st.session_state.get("usuario_id")
+            )
+            st.rerun()
+
+        st.markdown("---")
+        st.markdown("#### 🕒 Histórico dos pacientes")
+        st.caption(
+            "Recria a linha do tempo (consultas, exames, prescrições e agendamentos) a partir das tabelas e vincula "
+            "ao paciente os registros que só têm nome de animal/tutor, inclusive com pequenas diferenças de grafia."
+        )
+        reconstruindo = _painel_job("__job_backfill_timeline", "backfill_timeline", _mostrar_timeline)
+        if not reconstruindo and st.button("🕒 Reconstruir histórico", key="diagnostico_reconstruir_timeline"):
+            st.session_state["__job_backfill_timeline"] = submeter_job(
+                "backfill_timeline", usuario_id=st.session_state.get("usuario_id")
+            )
+            st.rerun()
+
+        st.markdown("---")
+        st.markdown("#### 🗜️ Compressão dos arquivos no banco")
+        st.caption(
+            "JSON e PDF dos laudos, NFS-e e PDFs de prescrição novos já são gravados comprimidos. A recompressão "
+            "regrava em segundo plano os gravados antes disso; o app continua utilizável enquanto ela roda."
+        )
+        if st.button("📊 Calcular espaço ocupado", key="diagnostico_relatorio_compressao"):
+            with st.spinner("Lendo cabeçalhos dos arquivos..."):
+                try:
+                    st.session_state["__relatorio_compressao"] = relatorio_compressao()
+                except Exception as e:
+                    st.error(f"Erro ao calcular espaço: {e}")
+        rel_comp = st.session_state.get("__relatorio_compressao")
+        if rel_comp:
+            mb = 1024 * 1024
+            c1, c2, c3 = st.columns(3)
+            with c1:
+                st.metric("Conteúdo original", f"{rel_comp['bytes_originais'] / mb:.1f} MB")
+            with c2:
+                st.metric("Ocupado no banco", f"{rel_comp['bytes_armazenados'] / mb:.1f} MB",
+                          delta=f"-{rel_comp['economia'] / mb:.1f} MB", delta_color="inverse")
+            with c3:
+                st.metric("Livre dentro do arquivo", f"{rel_comp['paginas_livres_bytes'] / mb:.1f} MB",
+                          help="Espaço já liberado, devolvido ao disco com VACUUM")
+            st.dataframe(pd.DataFrame(rel_comp["colunas"]), use_container_width=True, hide_index=True)
+
+        estado_comp = estado_recompressao()
+        if estado_comp["em_andamento"]:
+            feitos_comp, total_comp = estado_comp["feitos"], estado_comp["total"]
+            st.progress(feitos_comp / max(total_comp, 1), text=f"Recomprimindo: {feitos_comp}/{total_comp} arquivo(s)")
+            col_atu, col_canc = st.columns(2)
+            with col_atu:
+                if st.button("🔄 Atualizar", key="diagnostico_recompressao_atualizar"):
+                    st.rerun()
+            with col_canc:
+                if st.button("⏹️ Cancelar", key="diagnostico_recompressao_cancelar"):
+                    cancelar_recompressao()
+                    st.rerun()
+        else:
+            vacuum_comp = st.checkbox("Devolver o espaço ao disco ao final (VACUUM)", value=True, key="diagnostico_recompressao_vacuum")
+            if st.button("🗜️ Comprimir arquivos existentes", key="diagnostico_recompressao_iniciar"):
+                iniciar_recompressao(vacuum=vacuum_comp)
+                st.session_state.pop("__relatorio_compressao", None)
+                st.rerun()
+            if estado_comp["erro"]:
+                st.error(f"Erro na recompressão: {estado_comp['erro']}")
+            elif estado_comp["resultado"]:
+                res_comp = estado_comp["resultado"]
+                alteradas_comp = sum(c["alteradas"] for c in res_comp["colunas"].values())
+                st.success(
+                    f"✅ {alteradas_comp} arquivo(s) regravado(s) em {res_comp['segundos']:.1f} s; "
+                    f"{res_comp['bytes_liberados'] / (1024 * 1024):.1f} MB a menos nos BLOBs, arquivo do banco "
+                    f"{res_comp['arquivo_antes'] / (1024 * 1024):.1f} → {res_comp['arquivo_depois'] / (1024 * 1024):.1f} MB"
+                    + (" (cancelada)" if res_comp["cancelado"] else "") + "."
+                )
+
+        st.markdown("---")
+        st.markdown("#### ⏳ Jobs em segundo plano")
+        st.caption(
+            "Importações, restore points, compactação, histórico e medidas rodam no servidor enquanto a página "
+            "continua utilizável; o andamento aparece junto de cada botão. Últimos jobs:"
+        )
+        jobs_recentes = listar_jobs(limite=20)
+        if jobs_recentes:
+            st.dataframe(
+                pd.DataFrame([
+                    {"descricao": j["descricao"], "status": j["status"],
+                     "progresso": f"{j['feitos']}/{j['total']}" if j["total"] else "", "criado_em": j["criado_em"],
+                     "concluido_em": j["concluido_em"], "erro": j["erro"]}
+                    for j in jobs_recentes
+                ]),
+                use_container_width=True, hide_index=True,
+            )
+        else:
+            st.info("Nenhum job executado ainda.")
@@ -8,6 +8,7 @@ import streamlit as st
 
 from app.config import DB_PATH, formatar_data_br
 from app.services.financeiro import (
+    FAIXAS_AGING,
     clientes_em_debito,
     consumo_clinicas,
     creditos_clientes,
@@ -16,6 +17,7 @@ from app.services.financeiro import (
     fluxo_caixa_periodo,
     lucro_realizado,
 )
+from app.services.manutencao import solicitar_manutencao
 from fortcordis_modules.database import (
     dar_baixa_conta_pagar,
     dar_baixa_os,
@@ -111,6 +113,7 @@ def render_financeiro():
             if os_lote and st.button("🗑️ Excluir selecionadas", key="btn_excluir_lote", type="secondary"):
                 n = excluir_os_em_lote(os_lote)
                 if n > 0:
+                    solicitar_manutencao()
                     st.success(f"✅ {n} OS excluída(s).")
                     st.rerun()
             os_para_excluir = st.selectbox("Ou selecione uma OS", options=ids_os, format_func=lambda x: labels_os.get(x, str(x)), key="excluir_os_sel")
@@ -239,15 +242,31 @@ def render_financeiro():
     # ---- Clientes em Débito ----
     with tab_debito:
         st.markdown("### Controle de Clientes em Débito")
-        debitos = clientes_em_debito()
-        if not debitos:
+        erro_debito = None
+        try:
+            debitos = clientes_em_debito()
+        except sqlite3.Error as e:
+            debitos, erro_debito = [], e
+        if erro_debito is not None:
+            st.error(f"Erro ao consultar clientes em débito: {erro_debito}")
+        elif not debitos:
             st.success("Nenhuma clínica em débito.")
         else:
+            df_aging = pd.DataFrame([
+                {"Clínica": d["clinica_nome"], "OS": d["qtd_os"], "Total (R$)": d["total_pendente"], **d["aging"]}
+                for d in debitos
+            ])
+            st.dataframe(
+                df_aging.style.format({c: "R$ {:,.2f}" for c in ["Total (R$)", *FAIXAS_AGING]}),
+                use_container_width=True,
+                hide_index=True,
+            )
+            st.caption("Aging em dias desde o vencimento (ou data de competência, quando não há vencimento).")
             for d in debitos:
                 st.metric(f"{d['clinica_nome']}", f"R$ {d['total_pendente']:,.2f} ({d['qtd_os']} OS)")
-                for os_item in d.get("os_list", [])[:5]:
+                for os_item in d.get("os_list", []):
                     st.caption(f"  {os_item.get('numero_os')} – R$ {os_item.get('valor', 0):,.2f} – {formatar_data_br(os_item.get('data_competencia'))}")
-                if len(d.get("os_list", [])) > 5:
+                if d["qtd_os"] > len(d.get("os_list", [])):
                     st.caption("  ...")
 
     # ---- Créditos de Clientes ----
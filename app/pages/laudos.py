@@ -1,10 +1,10 @@
 # app/pages/laudos.py
 """Página Laudos e Exames: cadastro, medidas, qualitativa, imagens, frases, referências, buscar, pressão arterial."""
+import io
 import json
 import os
 import re
 import sqlite3
-import tempfile
 from datetime import date, datetime
 from pathlib import Path
 
@@ -13,9 +13,14 @@ import streamlit as st
 from fpdf import FPDF
 from PIL import Image
 
+from app.armazem_sessao import LimiteSessaoExcedido, armazem_da_sessao, guardar_imagem
 from app.config import DB_PATH, PASTA_DB, formatar_data_br
 from app.db import _db_init
 from app.laudos_banco import excluir_laudo_arquivo_do_banco, excluir_laudo_do_banco
+from app.laudos_pdf import _img_ext_from_name
+from app.laudos_pdf_cache import chave_render, guardar_pdf_cache, obter_pdf_cache, sincronizar_arquivos
+from app.laudos_miniaturas import obter_miniatura
+from app.services.referencias import invalidar_referencias, obter_referencias
 from app.laudos_helpers import (
     ARQUIVO_FRASES,
     ARQUIVO_FRASES_REPO,
@@ -28,10 +33,12 @@ from app.laudos_helpers import (
     listar_laudos_arquivos_do_banco,
     listar_laudos_do_banco,
     migrar_txt_para_det,
-    obter_imagens_laudo_arquivo,
-    obter_laudo_arquivo_por_id,
     restaurar_laudo_para_pasta,
 )
+from app.laudos_blobs import handles_imagens_laudo_arquivo, handles_laudo_arquivo
+from app.laudos_dedup import ha_exames_repetidos
+from app.laudos_manifesto import buscar_manifesto, clinicas_manifesto, contar_manifesto, sincronizar_manifesto
+from app.laudos_medidas import buscar_coorte, contar_medidas_pendentes, tendencia_paciente
 from fortcordis_modules.database import garantir_colunas_financeiro, inserir_financeiro
 from modules.rbac import verificar_permissao
 
@@ -47,31 +54,91 @@ def _salvar_frases_json(db: dict) -> None:
             pass
 
 
-def _buscar_servicos_disponiveis(conn, clinica_id):
-    """Busca todos os serviços ativos com preços da tabela de preço da clínica."""
-    cursor = conn.cursor()
-    # Buscar tabela de preço da clínica
-    cursor.execute("SELECT tabela_preco_id FROM clinicas_parceiras WHERE id = ?", (clinica_id,))
-    row = cursor.fetchone()
-    tabela_preco_id = row[0] if row and row[0] else 1
-    # Buscar serviços com preço da tabela da clínica (fallback para valor_base)
-    cursor.execute("""
-        SELECT s.id, s.nome, COALESCE(sp.valor, s.valor_base, 0) as valor_base
-        FROM servicos s
-        LEFT JOIN servico_preco sp ON s.id = sp.servico_id AND sp.tabela_preco_id = ?
-        WHERE s.ativo = 1 OR s.ativo IS NULL
-        ORDER BY s.nome
-    """, (tabela_preco_id,))
-    cols = [desc[0] for desc in cursor.description]
-    return [dict(zip(cols, row)) for row in cursor.fetchall()]
-
-
-def _get_tabela_preco_id(conn, clinica_id):
-    """Busca o ID da tabela de preço da clínica."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT tabela_preco_id FROM clinicas_parceiras WHERE id = ?", (clinica_id,))
-    result = cursor.fetchone()
-    return result[0] if result else None
+def _buscar_servicos_disponiveis(ref, clinica_id):
+    """Lista todos os serviços ativos com preços da tabela de preço da clínica (snapshot em memória)."""
+    return ref.servicos_com_preco(clinica_id)
+
+
+def _get_tabela_preco_id(ref, clinica_id):
+    """ID da tabela de preço da clínica (None se a clínica não existir)."""
+    cli = ref.clinicas.get(clinica_id)
+    return cli.tabela_preco_id if cli else None
+
+
+def _formatar_tamanho(n: int) -> str:
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.1f} MB"
+    return f"{max(n, 1) / 1024:.0f} KB"
+
+
+def _liberar_imagens_nao_usadas(itens: list) -> None:
+    """Apaga do armazém da sessão as imagens que saíram do exame (o último PDF gerado fica)."""
+    chaves = {it.get("chave") for it in itens if isinstance(it, dict)}
+    chaves.add(st.session_state.get("pdf_laudo_chave"))
+    armazem_da_sessao().manter(c for c in chaves if c)
+
+
+def _botao_download_blob(handle, rotulo: str, key: str) -> None:
+    """
+    Download em dois passos: o botão mostra só o tamanho; ao clicar, os bytes são lidos
+    (em blocos, via handle) e o download fica disponível. Mantém um único BLOB em memória.
+    """
+    if handle is None:
+        st.caption(f"{rotulo} não armazenado.")
+        return
+    ident = (handle.tabela, handle.coluna, handle.rowid)
+    pronto = st.session_state.get("__blob_download")
+    if pronto and pronto[0] == ident:
+        st.download_button(f"⬇️ {rotulo}", data=pronto[1], file_name=handle.nome, mime=handle.mime, key=key)
+    elif st.button(f"📦 {rotulo} ({_formatar_tamanho(handle.tamanho)})", key=f"{key}_preparar"):
+        st.session_state["__blob_download"] = (ident, handle.ler())
+        st.rerun()
+
+
+def _render_busca_medidas(params: dict) -> None:
+    """Coorte por parâmetro (tabela laudos_medidas) e tendência do paciente escolhido."""
+    chaves = list(params.keys())
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        param = st.selectbox(
+            "Parâmetro", chaves, index=chaves.index("LA_Ao") if "LA_Ao" in chaves else 0,
+            format_func=lambda k: params[k][0], key="medidas_param",
+        )
+    with c2:
+        valor_min = st.number_input("Valor mínimo", value=0.0, step=0.1, key="medidas_min")
+    with c3:
+        especie = st.selectbox("Espécie", ["Todas", "Canina", "Felina"], key="medidas_especie")
+    with c4:
+        ano = st.number_input("Ano (0 = todos)", value=date.today().year, min_value=0, step=1, key="medidas_ano")
+    resultado = buscar_coorte(
+        param,
+        valor_min=valor_min if valor_min > 0 else None,
+        especie=None if especie == "Todas" else especie,
+        data_inicio=f"{int(ano)}-01-01" if ano else None,
+        data_fim=f"{int(ano)}-12-31" if ano else None,
+    )
+    if not resultado:
+        pendentes = contar_medidas_pendentes()
+        st.info("Nenhum exame encontrado." + (
+            f" {pendentes} exame(s) ainda sem medidas extraídas: Configurações > Diagnóstico > Extrair medidas."
+            if pendentes else ""
+        ))
+        return
+    df_coorte = pd.DataFrame(resultado)
+    df_coorte["data_exame"] = df_coorte["data_exame"].astype(str).apply(formatar_data_br)
+    st.dataframe(
+        df_coorte[["data_exame", "animal", "tutor", "clinica", "especie", "valor", "ref_min", "ref_max", "status"]],
+        use_container_width=True, hide_index=True,
+    )
+    st.caption(f"{len(df_coorte)} exame(s) (máx. 500, maiores valores primeiro).")
+
+    pacientes = {r["paciente_id"]: f'{r["animal"]} ({r["tutor"]})' for r in resultado if r.get("paciente_id")}
+    if pacientes:
+        pid = st.selectbox("Tendência do paciente", list(pacientes), format_func=pacientes.get, key="medidas_paciente")
+        serie = tendencia_paciente(pid, [param])
+        if serie:
+            df_serie = pd.DataFrame(serie).set_index("data_exame")[["valor", "ref_min", "ref_max"]]
+            st.line_chart(df_serie)
 
 
 def render_laudos(deps=None):
@@ -205,26 +272,10 @@ def render_laudos(deps=None):
     def buscar_clinicas_cadastradas_laudos():
         """Busca clínicas do MESMO banco de Cadastros (clinicas_parceiras) para integração Laudos ↔ Cadastros."""
         try:
-            conn = sqlite3.connect(str(DB_PATH))
-            cursor = conn.cursor()
-            try:
-                cursor.execute("""
-                    SELECT id, nome, COALESCE(endereco, '') as endereco,
-                           COALESCE(telefone, whatsapp, '') as telefone
-                    FROM clinicas_parceiras
-                    WHERE (ativo = 1 OR ativo IS NULL)
-                    ORDER BY nome
-                """)
-            except sqlite3.OperationalError:
-                cursor.execute("""
-                    SELECT id, nome, COALESCE(endereco, '') as endereco,
-                           COALESCE(telefone, whatsapp, '') as telefone
-                    FROM clinicas_parceiras
-                    ORDER BY nome
-                """)
-            clinicas = cursor.fetchall()
-            conn.close()
-            return clinicas
+            return [
+                (c.id, c.nome, c.endereco, c.telefone or c.whatsapp)
+                for c in obter_referencias().clinicas_ativas()
+            ]
         except Exception:
             return []
 
@@ -240,6 +291,7 @@ def render_laudos(deps=None):
             clinica_id = cursor.lastrowid
             conn.commit()
             conn.close()
+            invalidar_referencias()
             return clinica_id, "success"
         except sqlite3.IntegrityError:
             return None, "Clínica com este nome já existe."
@@ -828,43 +880,56 @@ def render_laudos(deps=None):
     with tab4:
         st.subheader("📷 Imagens do exame")
 
-        # Imagens carregadas do exame arquivado (quando existirem)
+        # Imagens do exame (arquivado e enviadas): no session_state só miniatura + chave do armazém da sessão;
+        # a grade envia ao navegador só as miniaturas, os bytes completos ficam em disco até a geração do PDF
         imgs_carregadas = st.session_state.get("imagens_carregadas", []) or []
         if imgs_carregadas:
-            st.caption(f"Imagens carregadas do exame arquivado ({len(imgs_carregadas)}):")
+            st.caption(f"Imagens do exame ({len(imgs_carregadas)}):")
             cols = st.columns(4)
             for idx, it in enumerate(imgs_carregadas):
-                b = it.get("bytes") if isinstance(it, dict) else None
+                b = it.get("miniatura") if isinstance(it, dict) else None
+                if b is None and isinstance(it, dict) and it.get("bytes"):
+                    # Item antigo com os bytes completos: miniatura do cache, lembrada no item
+                    b = it["miniatura"] = obter_miniatura(bytes(it["bytes"]))
                 nome = it.get("name", f"imagem_{idx}") if isinstance(it, dict) else f"imagem_{idx}"
                 with cols[idx % 4]:
                     if b:
                         st.image(b, use_container_width=True)
                     st.caption(nome)
                     if st.button("🗑️", key=f"btn_rm_img_{idx}", help=f"Remover {nome}"):
-                        st.session_state["imagens_carregadas"] = [
-                            im for j, im in enumerate(imgs_carregadas) if j != idx
-                        ]
+                        restantes = [im for j, im in enumerate(imgs_carregadas) if j != idx]
+                        st.session_state["imagens_carregadas"] = restantes
+                        _liberar_imagens_nao_usadas(restantes)
                         st.rerun()
 
             cL, cR = st.columns([1, 3])
             with cL:
                 if st.button("🧹 Remover todas", key="btn_limpar_imagens_carregadas"):
                     st.session_state["imagens_carregadas"] = []
+                    _liberar_imagens_nao_usadas([])
                     st.rerun()
 
         st.divider()
 
         st.caption("Adicionar novas imagens (essas também entram no PDF):")
+        # Os enviados vão para o armazém da sessão e o uploader é recriado vazio (chave nova), para o
+        # Streamlit não manter outra cópia de cada arquivo
+        versao_upload = st.session_state.get("__imagens_upload_versao", 0)
         novas = st.file_uploader(
             "Adicionar imagens",
             type=["jpg", "jpeg", "png"],
             accept_multiple_files=True,
-            key="imagens_upload_novas"
+            key=f"imagens_upload_novas_{versao_upload}"
         )
         if novas:
-            cols = st.columns(4)
-            for idx, img in enumerate(novas):
-                cols[idx % 4].image(img, use_container_width=True)
+            try:
+                adicionadas = [guardar_imagem(getattr(f, "name", "imagem"), f.getvalue()) for f in novas]
+            except LimiteSessaoExcedido as e:
+                st.error(str(e))
+            else:
+                st.session_state["imagens_carregadas"] = imgs_carregadas + adicionadas
+                st.session_state["__imagens_upload_versao"] = versao_upload + 1
+                st.rerun()
 
     with tab5:
         st.header("⚙️ Editor de Frases")
@@ -1196,21 +1261,21 @@ def render_laudos(deps=None):
         if laudos_banco:
             df_banco = pd.DataFrame(laudos_banco)
             df_banco["data"] = df_banco["data"].astype(str)
-            # Deduplicar por data + clinica + animal + tutor + tipo (evita dezenas de repetidos quando backup foi importado várias vezes)
+            # Exames repetidos são unidos pelo fingerprint na importação (e pela compactação em Configurações)
             colunas_exib = ["data", "clinica", "animal", "tutor", "tipo_exame"]
-            df_uniq = df_banco[colunas_exib].drop_duplicates(keep="first")
-            n_uniq, n_total = len(df_uniq), len(df_banco)
-            df_exib = df_uniq.copy()
+            df_exib = df_banco[colunas_exib].copy()
             df_exib["data"] = df_exib["data"].apply(formatar_data_br)
             st.dataframe(df_exib, use_container_width=True, hide_index=True)
-            texto_total = f"**{n_uniq}** exame(s) únicos" + (f" (de **{n_total}** no banco — repetidos por importações anteriores; importe o backup **apenas uma vez**)." if n_uniq < n_total else ".")
+            texto_total = f"**{len(df_banco)}** exame(s)."
+            if ha_exames_repetidos():
+                texto_total += " Há exames repetidos de importações antigas: use **Configurações > Diagnóstico > Compactar exames repetidos**."
             st.caption(
                 f"{texto_total} "
                 "O banco guarda o caminho do seu PC (ex.: C:\\...\\Laudos\\arquivo.pdf); no sistema online os arquivos não existem — aqui você vê só os dados (data, clínica, animal, tutor, tipo)."
             )
-            if df_uniq["clinica"].fillna("").str.strip().eq("").all() and df_uniq["animal"].fillna("").str.strip().eq("").all():
+            if df_exib["clinica"].fillna("").str.strip().eq("").all() and df_exib["animal"].fillna("").str.strip().eq("").all():
                 st.info(
-                    "**Clínica, animal e tutor vazios?** Em Configurações > Importar dados: marque **«Limpar laudos antes de importar»** e importe o backup **uma vez**. "
+                    "**Clínica, animal e tutor vazios?** Em Configurações > Importar dados: marque **«Limpar laudos antes de importar»** e importe o backup de novo. "
                     "Isso apaga os laudos repetidos e reimporta com os vínculos corretos — os nomes passam a aparecer aqui."
                 )
             # seleção individual para exclusão
@@ -1270,45 +1335,38 @@ def render_laudos(deps=None):
             opcoes_arq = [f'{formatar_data_br(r["data"])} | {r["animal"]} | {r["tutor"]} | {r["clinica"]}' for r in laudos_arq]
             idx_arq = st.selectbox("Selecione um exame para baixar (JSON/PDF)", range(len(opcoes_arq)), format_func=lambda i: opcoes_arq[i], key="sel_laudo_arquivo")
             row_arq = laudos_arq[idx_arq]
-            blob_row = obter_laudo_arquivo_por_id(row_arq["id_laudo_arquivo"])
-            if blob_row:
+            # Só metadados (tamanho/tipo); bytes lidos em blocos quando o usuário pede
+            blobs_arq = handles_laudo_arquivo(row_arq["id_laudo_arquivo"])
+            if blobs_arq:
                 cj, cp, cl, cr = st.columns(4)
                 with cj:
-                    if blob_row.get("conteudo_json"):
-                        st.download_button(
-                            "⬇️ JSON",
-                            data=blob_row["conteudo_json"],
-                            file_name=(blob_row.get("nome_base") or "laudo") + ".json",
-                            mime="application/json",
-                            key="dl_json_arquivo",
-                        )
-                    else:
-                        st.caption("JSON não armazenado.")
+                    _botao_download_blob(blobs_arq["json"], "JSON", "dl_json_arquivo")
                 with cp:
-                    if blob_row.get("conteudo_pdf"):
-                        st.download_button(
-                            "⬇️ PDF",
-                            data=blob_row["conteudo_pdf"],
-                            file_name=(blob_row.get("nome_base") or "laudo") + ".pdf",
-                            mime="application/pdf",
-                            key="dl_pdf_arquivo",
-                        )
-                    else:
-                        st.caption("PDF não armazenado.")
+                    _botao_download_blob(blobs_arq["pdf"], "PDF", "dl_pdf_arquivo")
                 with cl:
-                    if blob_row.get("conteudo_json"):
+                    if blobs_arq["json"] is not None:
                         if st.button("📥 Carregar para edição", key="btn_carregar_json_banco", help="Carrega dados e imagens do exame para edição nas abas Cadastro, Medidas, Imagens, etc."):
                             try:
-                                obj = json.loads(blob_row["conteudo_json"].decode("utf-8") if isinstance(blob_row["conteudo_json"], bytes) else blob_row["conteudo_json"])
-                                imagens = obter_imagens_laudo_arquivo(row_arq["id_laudo_arquivo"])
-                                st.session_state["__carregar_exame_json_content"] = obj
-                                st.session_state["__carregar_exame_imagens"] = [
-                                    {"name": (img.get("nome_arquivo") or f"imagem_{i}.jpg"), "bytes": img.get("conteudo") or b""}
-                                    for i, img in enumerate(imagens)
+                                obj = json.loads(blobs_arq["json"].ler().decode("utf-8"))
+                                # Uma imagem por vez do banco para o armazém da sessão; o carregamento só é
+                                # agendado depois de todas gravadas (nada de exame pela metade no próximo rerun)
+                                imagens_exame = [
+                                    guardar_imagem(h.nome, h.ler())
+                                    for h in handles_imagens_laudo_arquivo(row_arq["id_laudo_arquivo"])
                                 ]
-                                st.rerun()
                             except Exception as e:
-                                st.error(f"Erro ao carregar exame: {e}")
+                                # Sai do armazém o que foi gravado até o erro (o exame em edição continua)
+                                st.session_state.pop("__carregar_exame_json_content", None)
+                                st.session_state.pop("__carregar_exame_imagens", None)
+                                _liberar_imagens_nao_usadas(st.session_state.get("imagens_carregadas") or [])
+                                if isinstance(e, LimiteSessaoExcedido):
+                                    st.error(f"Exame não carregado: {e}")
+                                else:
+                                    st.error(f"Erro ao carregar exame: {e}")
+                            else:
+                                st.session_state["__carregar_exame_json_content"] = obj
+                                st.session_state["__carregar_exame_imagens"] = imagens_exame
+                                st.rerun()
                     else:
                         st.caption("—")
                 with cr:
@@ -1333,18 +1391,22 @@ def render_laudos(deps=None):
             else:
                 st.info("Nenhum exame da pasta no banco. Execute o script **importar_pasta_laudos_para_banco.py** na pasta do projeto (apontando para a pasta Laudos) e depois importe o backup no sistema online.")
 
+        st.markdown("---")
+        st.subheader("📈 Medidas dos exames (coorte e tendência)")
+        with st.expander("Buscar exames por valor de medida", expanded=False):
+            _render_busca_medidas(PARAMS)
+
         st.markdown("---")
         st.subheader("📁 Exames na pasta (arquivos JSON/PDF)")
         st.caption(f"Pasta: {PASTA_LAUDOS}")
 
-        # varre apenas JSON (JavaScript Object Notation) e usa cache com TTL (Time To Live)
-        registros = listar_registros_arquivados_cached(str(PASTA_LAUDOS))
+        # manifesto persistente da pasta: só JSON novos/alterados são lidos; filtros rodam no SQLite
+        sincronizar_manifesto(PASTA_LAUDOS)
+        total_pasta = contar_manifesto(PASTA_LAUDOS)
 
-        if not registros:
+        if not total_pasta:
             st.warning("Nenhum exame na pasta. No sistema online essa pasta não existe; use a seção «Exames no banco» acima para ver os importados.")
         else:
-            df_busca = pd.DataFrame(registros)
-
             # --- filtros ---
             st.markdown("### Filtros")
 
@@ -1358,7 +1420,7 @@ def render_laudos(deps=None):
             # linha 2: clínica + animal + tutor
             c3, c4, c5 = st.columns(3)
             with c3:
-                clinicas = ["(todas)"] + sorted([c for c in df_busca["clinica"].dropna().unique().tolist() if str(c).strip()])
+                clinicas = ["(todas)"] + clinicas_manifesto(PASTA_LAUDOS)
                 clin_sel = st.selectbox("Clínica", options=clinicas)
 
             with c4:
@@ -1367,49 +1429,21 @@ def render_laudos(deps=None):
             with c5:
                 tutor_txt = st.text_input("Tutor (contém)", value="")
 
-            # linha 3: busca livre (animal+tutor+clínica)
+            # linha 3: busca livre (animal+tutor+clínica); todos os termos precisam aparecer
             busca_livre = st.text_input("Busca livre (animal / tutor / clínica)", value="")
 
-
-            # normaliza datas do DF para filtrar
-            def _to_date_safe(s):
-                try:
-                    return datetime.strptime(str(s)[:10], "%Y-%m-%d").date()
-                except (ValueError, TypeError):
-                    return None
-
-            df_busca["data_dt"] = df_busca["data"].apply(_to_date_safe)
-
-            # aplica filtros
-            m = df_busca["data_dt"].notna()
-            m &= (df_busca["data_dt"] >= dt_ini) & (df_busca["data_dt"] <= dt_fim)
-
-            if clin_sel != "(todas)":
-                m &= (df_busca["clinica"].astype(str) == str(clin_sel))
-
-            if animal_txt.strip():
-                m &= df_busca["animal"].astype(str).str.lower().str.contains(animal_txt.strip().lower(), na=False)
-
-            if tutor_txt.strip():
-                m &= df_busca["tutor"].astype(str).str.lower().str.contains(tutor_txt.strip().lower(), na=False)
-
-            # Busca livre (AND): separa em termos e exige que TODOS apareçam
-            if busca_livre.strip():
-                combinado = (
-                    df_busca["animal"].astype(str).str.lower() + " " +
-                    df_busca["tutor"].astype(str).str.lower() + " " +
-                    df_busca["clinica"].astype(str).str.lower()
-                )
-
-                # termos = palavras digitadas (ignora múltiplos espaços)
-                termos = [t for t in busca_livre.strip().lower().split() if t]
-
-                # AND: todos os termos precisam aparecer no combinado
-                for termo in termos:
-                    m &= combinado.str.contains(re.escape(termo), na=False)
-
-
-            df_f = df_busca[m].sort_values(["data_dt", "clinica", "animal"], ascending=[False, True, True])
+            df_f = pd.DataFrame(
+                buscar_manifesto(
+                    PASTA_LAUDOS,
+                    data_inicio=dt_ini,
+                    data_fim=dt_fim,
+                    clinica=None if clin_sel == "(todas)" else clin_sel,
+                    animal=animal_txt,
+                    tutor=tutor_txt,
+                    busca_livre=busca_livre,
+                ),
+                columns=["data", "data_exame", "clinica", "animal", "tutor", "arquivo_json", "arquivo_pdf"],
+            )
 
             st.write(f"**Resultados:** {len(df_f)}")
             df_f_exib = df_f[["data", "clinica", "animal", "tutor"]].copy()
@@ -1883,6 +1917,7 @@ def render_laudos(deps=None):
                     }
                 }
 
+                # Cópia legível na pasta (origem da ingestão); o conteúdo no banco passa pelo blob_store
                 (PASTA_LAUDOS / f"{nome_base_pa}.pdf").write_bytes(pdf_pa_bytes)
                 json_pa_str = json.dumps(dados_pa, indent=4, ensure_ascii=False)
                 (PASTA_LAUDOS / f"{nome_base_pa}.json").write_text(json_pa_str, encoding="utf-8")
@@ -1964,7 +1999,8 @@ def render_laudos(deps=None):
                 self.set_y(-15); self.set_font("Arial", 'I', 9); self.set_text_color(100,100,100)
                 self.cell(0, 10, "Fort Cordis Cardiologia Veterinária | Fortaleza-CE", align='C')
 
-        def criar_pdf():
+        def criar_pdf(imgs_pdf=None):
+            """PDF do eco; imgs_pdf: imagens já processadas por obter_imagens_para_pdf (evita processar de novo)."""
             pdf = PDF_Export()
             pdf.add_page()
             def pdf_safe(txt):
@@ -2213,7 +2249,8 @@ def render_laudos(deps=None):
 
 
             
-            imgs_pdf = obter_imagens_para_pdf()
+            if imgs_pdf is None:
+                imgs_pdf = obter_imagens_para_pdf()
             if imgs_pdf:
                 pdf.add_page()
                 pdf.set_font("Arial", 'B', 14)
@@ -2224,27 +2261,15 @@ def render_laudos(deps=None):
                 x, y = x_s, y_s
 
                 for i, it in enumerate(imgs_pdf):
-                    ext = (it.get("ext") or ".jpg").lower()
-                    if ext not in [".jpg", ".png"]:
-                        ext = ".jpg"
-
-                    t = os.path.join(tempfile.gettempdir(), f"fc_img_{i}{ext}")
-                    try:
-                        with open(t, "wb") as fi:
-                            fi.write(it.get("bytes", b"") or b"")
-                    except Exception:
+                    if not it.get("bytes"):
                         continue
 
                     if y + 65 > 270:
                         pdf.add_page()
                         y, x = 50, x_s
 
-                    pdf.image(t, x=x, y=y, w=90, h=65)
-
-                    try:
-                        os.remove(t)
-                    except Exception:
-                        pass
+                    # Bytes já reduzidos/recomprimidos pelo pipeline de imagens (sem arquivo temporário)
+                    pdf.image(io.BytesIO(it["bytes"]), x=x, y=y, w=90, h=65)
 
                     if x == x_s:
                         x += 95
@@ -2282,24 +2307,11 @@ def render_laudos(deps=None):
 
                     if clinica_nome:
                         try:
-                            conn_fin = sqlite3.connect(str(DB_PATH))
-                            cursor_fin = conn_fin.cursor()
-                            cursor_fin.execute(
-                                "SELECT id, tabela_preco_id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL)",
-                                (clinica_nome,)
-                            )
-                            res_clinica = cursor_fin.fetchone()
-                            if res_clinica:
-                                clinica_id = res_clinica[0]
-                                tabela_id = res_clinica[1]
-                                # Buscar nome da tabela
-                                cursor_fin.execute("SELECT nome FROM tabelas_preco WHERE id = ?", (tabela_id,))
-                                tab_row = cursor_fin.fetchone()
-                                tabela_nome = tab_row[0] if tab_row else "Padrão"
-
-                                # Buscar serviços disponíveis
-                                servicos_disponiveis = _buscar_servicos_disponiveis(conn_fin, clinica_id)
-                            conn_fin.close()
+                            ref = obter_referencias()
+                            cli_ref = ref.clinica_por_nome(clinica_nome)
+                            if cli_ref:
+                                tabela_nome = ref.nome_tabela_preco(cli_ref.tabela_preco_id)
+                                servicos_disponiveis = _buscar_servicos_disponiveis(ref, cli_ref.id)
                         except Exception as e:
                             st.error(f"Erro ao carregar serviços: {e}")
 
@@ -2411,9 +2423,37 @@ def render_laudos(deps=None):
                     if st.session_state.get("df_ref") is None:
                         st.session_state["df_ref"] = carregar_tabela_referencia_cached()
 
-                with st.spinner("Gerando PDF..."):
-                    pdf_bytes = criar_pdf()
-                st.session_state["pdf_bytes"] = pdf_bytes
+                # Chave do PDF: tudo o que criar_pdf lê (dados/textos do exame, imagens, tabela, logo/assinatura).
+                # Sem nada alterado desde a última geração, reaproveita os bytes do cache
+                imgs = obter_imagens_para_pdf()
+                entry_layout = (st.session_state.get("db_frases", {}).get(
+                    montar_chave_frase(sb_patologia, sb_grau_refluxo, sb_grau_geral), {}) or {}).get("layout")
+                chave_pdf = chave_render(
+                    {
+                        "dados": dados_save,
+                        "data_exame": str(data_exame),
+                        "ritmo": ritmo, "fc": fc, "estado": estado,
+                        "cad_especie": st.session_state.get("cad_especie", ""),
+                        "patologia": sb_patologia, "layout_frase": entry_layout,
+                    },
+                    imagens=[it.get("bytes") for it in imgs],
+                    tabela_ref=st.session_state.get("df_ref_felinos") if especie_is_felina(esp_pdf) else st.session_state.get("df_ref"),
+                    arquivos=["logo.png", _caminho_marca_dagua(), st.session_state.get("assinatura_path")],
+                )
+                pdf_bytes = obter_pdf_cache(chave_pdf)
+                if pdf_bytes is None:
+                    with st.spinner("Gerando PDF..."):
+                        pdf_bytes = criar_pdf(imgs)
+                    guardar_pdf_cache(chave_pdf, pdf_bytes)
+                else:
+                    st.caption("⚡ Laudo sem alterações desde a última geração: PDF reaproveitado do cache.")
+                # Só a chave no session_state; os bytes ficam no armazém da sessão até o download
+                try:
+                    st.session_state["pdf_laudo_chave"] = armazem_da_sessao().guardar(pdf_bytes)
+                except LimiteSessaoExcedido as e:
+                    # Sem botão de download nesta sessão (nem o do PDF anterior); o arquivamento abaixo segue
+                    st.session_state.pop("pdf_laudo_chave", None)
+                    st.error(str(e))
 
                 # ============================================================
                 # ✅ ARQUIVA PDF, JSON, IMAGENS E SALVA NO BANCO
@@ -2428,21 +2468,12 @@ def render_laudos(deps=None):
                             clinica=clinica
                         )
 
-                    # 1) salva PDF
-                    (PASTA_LAUDOS / f"{nome_base}.pdf").write_bytes(pdf_bytes)
-
-                    # 2) salva imagens (quando existirem) e registra no JSON
-                    imgs = obter_imagens_para_pdf()
+                    # 1) PDF, imagens (quando existirem) e JSON com as imagens referenciadas; na pasta só é
+                    # regravado o que mudou, e imagens antigas do mesmo exame (re-geração) são removidas
+                    arquivos_pasta = {f"{nome_base}.pdf": pdf_bytes}
                     imgs_saved = []
                     imgs_para_banco = []  # (nome_arquivo, bytes) para laudos_arquivos_imagens
 
-                    # remove imagens antigas do mesmo exame (caso esteja re-gerando)
-                    try:
-                        for p in PASTA_LAUDOS.glob(f"{nome_base}__IMG_*.*"):
-                            p.unlink(missing_ok=True)
-                    except Exception:
-                        pass
-
                     for i, it in enumerate(imgs, start=1):
                         b = it.get("bytes")
                         if not b:
@@ -2451,17 +2482,36 @@ def render_laudos(deps=None):
                         if ext not in [".jpg", ".png"]:
                             ext = ".jpg"
                         fname = f"{nome_base}__IMG_{i:02d}{ext}"
-                        (PASTA_LAUDOS / fname).write_bytes(b)
+                        arquivos_pasta[fname] = b
                         imgs_saved.append(fname)
                         imgs_para_banco.append((fname, b))
+                        # original enviado (só em disco, quando LAUDOS_IMAGENS_MANTER_ORIGINAL)
+                        if it.get("original") is not None:
+                            ext_orig = _img_ext_from_name(it.get("name") or "")
+                            arquivos_pasta[f"{nome_base}__ORIG_{i:02d}{ext_orig}"] = it["original"]
+
+                    rel_imgs = st.session_state.get("imagens_relatorio") or {}
+                    if rel_imgs.get("qtd_entrada"):
+                        st.caption(
+                            f"📷 {rel_imgs['qtd_saida']} imagem(ns) arquivada(s)"
+                            + (f", {rel_imgs['duplicadas']} repetida(s) ignorada(s)" if rel_imgs.get("duplicadas") else "")
+                            + f" — {rel_imgs['bytes_antes'] / 1024:,.0f} KB → {rel_imgs['bytes_depois'] / 1024:,.0f} KB"
+                            + f" ({rel_imgs['bytes_economizados'] / 1024:,.0f} KB economizados)"
+                        )
 
-                    # 3) salva JSON já com as imagens referenciadas
                     dados_save_arch = dict(dados_save)
                     dados_save_arch["imagens"] = imgs_saved
                     json_str_arch = json.dumps(dados_save_arch, indent=4, ensure_ascii=False)
-                    (PASTA_LAUDOS / f"{nome_base}.json").write_text(json_str_arch, encoding="utf-8")
+                    arquivos_pasta[f"{nome_base}.json"] = json_str_arch.encode("utf-8")
+                    # Cópia legível na pasta (origem da ingestão); o conteúdo no banco passa pelo blob_store
+                    sinc_pasta = sincronizar_arquivos(
+                        PASTA_LAUDOS, arquivos_pasta, remover=(f"{nome_base}__IMG_*.*", f"{nome_base}__ORIG_*.*")
+                    )
 
                     _ = st.success(f"PDF gerado e arquivado em: {PASTA_LAUDOS}")
+                    if sinc_pasta["iguais"]:
+                        st.caption(f"📁 {sinc_pasta['gravados']} arquivo(s) gravado(s), "
+                                   f"{sinc_pasta['iguais']} sem alteração mantido(s)")
 
                     # 3b) ✅ SALVA NO BANCO (laudos_arquivos + imagens)
                     try:
@@ -2504,29 +2554,20 @@ def render_laudos(deps=None):
                         garantir_colunas_financeiro()
                         clinica_nome = (clinica or "").strip()
                         if clinica_nome:
+                            ref = obter_referencias()
                             conn_fin = sqlite3.connect(str(DB_PATH))
                             try:
                                 cursor_fin = conn_fin.cursor()
-                                cursor_fin.execute(
-                                    "SELECT id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL)",
-                                    (clinica_nome,)
-                                )
-                                res_clinica = cursor_fin.fetchone()
-                                if res_clinica:
-                                    clinica_id_os = res_clinica[0]
+                                cli_ref = ref.clinica_por_nome(clinica_nome)
+                                if cli_ref:
+                                    clinica_id_os = cli_ref.id
                                     data_comp = _normalizar_data_str(data_exame)
 
                                     # Obter serviços selecionados do session_state
                                     servicos_selecionados = st.session_state.get("servicos_selecionados", [])
 
                                     # Parse das opções selecionadas para obter IDs e valores
-                                    opcoes_servicos = {}
-                                    if servicos_selecionados:
-                                        cursor_fin.execute(
-                                            "SELECT id, nome, valor_base FROM servicos WHERE ativo = 1 OR ativo IS NULL"
-                                        )
-                                        for row in cursor_fin.fetchall():
-                                            opcoes_servicos[row[1]] = {"id": row[0], "valor_base": row[2]}
+                                    opcoes_servicos = ref.servicos_por_nome() if servicos_selecionados else {}
 
                                     # Agregar todos os serviços em uma única OS
                                     servicos_validos = []
@@ -2539,7 +2580,7 @@ def render_laudos(deps=None):
                                         if nome_servico in opcoes_servicos:
                                             servico_info = opcoes_servicos[nome_servico]
                                             servico_id_os = servico_info["id"]
-                                            vb, vd, vf = calcular_valor_final(servico_id_os, clinica_id_os)
+                                            vb, vd, vf = calcular_valor_final(servico_id_os, clinica_id_os, referencias=ref)
                                             servicos_validos.append((nome_servico, vb, vd, vf))
                                             total_bruto += vb
                                             total_desconto += vd
@@ -2594,10 +2635,11 @@ def render_laudos(deps=None):
             _ = st.info("💡 Apenas cardiologistas podem gerar laudos.")
 
         # Download button
-        if "pdf_bytes" in st.session_state:
+        pdf_laudo = armazem_da_sessao().ler(st.session_state["pdf_laudo_chave"]) if st.session_state.get("pdf_laudo_chave") else None
+        if pdf_laudo:
             _ = st.download_button(
                 "⬇️ Baixar PDF",
-                data=st.session_state["pdf_bytes"],
+                data=pdf_laudo,
                 file_name=f"{nome_base}.pdf",
                 mime="application/pdf",
                 key="download_pdf_laudo_eco"
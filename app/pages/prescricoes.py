@@ -7,8 +7,15 @@ from pathlib import Path
 import pandas as pd
 import streamlit as st
 
-from app.config import DB_PATH, formatar_data_br
-from app.services import buscar_pacientes
+from app.config import DB_PATH, PRESCRICOES_POR_PAGINA, formatar_data_br
+from app.services import (
+    buscar_pacientes,
+    carregar_pdf_prescricao,
+    contar_historico_prescricoes,
+    listar_historico_prescricoes,
+    registrar_prescricao,
+)
+from fortcordis_modules.documentos import gerar_receituario_pdf
 from modules.rbac import verificar_permissao
 
 
@@ -333,39 +340,17 @@ def render_prescricoes():
 
                     st.session_state.presc_pdf_bytes = pdf_bytes
 
-                    # Salva no banco de dados
-                    conn_salvar = sqlite3.connect(str(DB_PATH))
-                    cursor_salvar = conn_salvar.cursor()
-
-                    # Cria pasta para prescrições se não existir
-                    PASTA_PRESCRICOES = Path.home() / "FortCordis" / "Prescricoes"
-                    PASTA_PRESCRICOES.mkdir(parents=True, exist_ok=True)
-
-                    # Nome do arquivo
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    nome_arquivo = f"Receita_{presc_paciente.replace(' ', '_')}_{timestamp}.pdf"
-                    caminho_pdf = PASTA_PRESCRICOES / nome_arquivo
-
-                    # Salva o PDF
-                    with open(caminho_pdf, 'wb') as f:
-                        f.write(pdf_bytes)
-
-                    # Registra no banco
-                    now = datetime.now().isoformat()
-                    cursor_salvar.execute("""
-                        INSERT INTO prescricoes (
-                            paciente_nome, tutor_nome, especie, peso_kg,
-                            data_prescricao, texto_prescricao, medico_veterinario,
-                            crmv, caminho_pdf, created_at, updated_at
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        presc_paciente, presc_tutor, presc_especie, presc_peso,
-                        datetime.now().strftime("%Y-%m-%d"), presc_texto,
-                        presc_medico, presc_crmv, str(caminho_pdf), now, now
-                    ))
-
-                    conn_salvar.commit()
-                    conn_salvar.close()
+                    # Arquiva o PDF (por conteúdo) e registra no banco
+                    _, caminho_pdf = registrar_prescricao(
+                        paciente_nome=presc_paciente,
+                        tutor_nome=presc_tutor,
+                        especie=presc_especie,
+                        peso_kg=presc_peso,
+                        texto_prescricao=presc_texto,
+                        medico_veterinario=presc_medico,
+                        crmv=presc_crmv,
+                        pdf_bytes=pdf_bytes,
+                    )
 
                     st.success(f"✅ Receituário gerado e salvo!")
                     st.info(f"📁 Arquivo: {caminho_pdf}")
@@ -891,37 +876,31 @@ def render_prescricoes():
             filtro_data = st.date_input("📅 A partir de", value=datetime.now() - timedelta(days=30),
                                         key="hist_filtro_data")
 
-        # Buscar prescrições
-        conn_hist = sqlite3.connect(str(DB_PATH))
-        try:
-            query_hist = """
-                SELECT id, paciente_nome, tutor_nome, especie, peso_kg,
-                       data_prescricao, medico_veterinario, crmv, caminho_pdf
-                FROM prescricoes
-                WHERE data_prescricao >= ?
-            """
-            params_hist = [filtro_data.strftime("%Y-%m-%d")]
-
-            if filtro_paciente:
-                query_hist += " AND UPPER(paciente_nome) LIKE UPPER(?)"
-                params_hist.append(f"%{filtro_paciente}%")
-
-            if filtro_tutor:
-                query_hist += " AND UPPER(tutor_nome) LIKE UPPER(?)"
-                params_hist.append(f"%{filtro_tutor}%")
-
-            query_hist += " ORDER BY data_prescricao DESC, id DESC LIMIT 50"
-
-            historico_df = pd.read_sql_query(query_hist, conn_hist, params=params_hist)
-        except Exception as e:
-            historico_df = pd.DataFrame()
-            st.warning(f"Erro ao buscar histórico: {e}")
-        conn_hist.close()
+        # Buscar prescrições (paginado; só metadados — PDFs são lidos sob demanda)
+        filtros_hist = {
+            "data_inicio": filtro_data.strftime("%Y-%m-%d"),
+            "paciente": filtro_paciente,
+            "tutor": filtro_tutor,
+        }
+        total_hist = contar_historico_prescricoes(**filtros_hist)
+        total_paginas = max(1, -(-total_hist // PRESCRICOES_POR_PAGINA))
+        pagina_hist = 1
+        if total_paginas > 1:
+            pagina_hist = st.number_input(
+                f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1, step=1,
+                key="hist_pagina"
+            )
+        historico = listar_historico_prescricoes(
+            **filtros_hist,
+            limite=PRESCRICOES_POR_PAGINA,
+            offset=(int(pagina_hist) - 1) * PRESCRICOES_POR_PAGINA,
+        )
 
-        if not historico_df.empty:
-            st.markdown(f"**{len(historico_df)} prescrições encontradas**")
+        if historico:
+            st.markdown(f"**{total_hist} prescrições encontradas**")
 
-            for idx, presc in historico_df.iterrows():
+            pdf_carregado = st.session_state.get("hist_pdf_carregado")  # (id, bytes) do último PDF pedido
+            for presc in historico:
                 with st.expander(f"📄 {presc['paciente_nome']} - {formatar_data_br(presc['data_prescricao'])}", expanded=False):
                     col_h1, col_h2 = st.columns(2)
 
@@ -936,19 +915,24 @@ def render_prescricoes():
                         st.markdown(f"**Veterinário:** {presc['medico_veterinario']}")
                         st.markdown(f"**CRMV:** {presc['crmv']}")
 
-                    # Botão para baixar PDF se existir
-                    if presc['caminho_pdf'] and Path(presc['caminho_pdf']).exists():
-                        with open(presc['caminho_pdf'], 'rb') as f:
-                            pdf_data = f.read()
+                    # PDF: carrega os bytes só quando pedido
+                    if not presc["pdf_disponivel"]:
+                        st.warning("📁 Arquivo PDF não encontrado")
+                    elif pdf_carregado and pdf_carregado[0] == presc["id"]:
                         st.download_button(
                             "⬇️ Baixar PDF",
-                            data=pdf_data,
+                            data=pdf_carregado[1],
                             file_name=f"Receita_{presc['paciente_nome']}_{presc['data_prescricao']}.pdf",
                             mime="application/pdf",
                             key=f"btn_download_hist_{presc['id']}"
                         )
-                    else:
-                        st.warning("📁 Arquivo PDF não encontrado")
+                    elif st.button("📄 Preparar PDF", key=f"btn_preparar_hist_{presc['id']}"):
+                        dados_pdf = carregar_pdf_prescricao(presc["id"])
+                        if dados_pdf:
+                            st.session_state["hist_pdf_carregado"] = (presc["id"], dados_pdf)
+                            st.rerun()
+                        else:
+                            st.warning("📁 Arquivo PDF não encontrado")
         else:
             st.info("Nenhuma prescrição encontrada para os filtros selecionados.")
 
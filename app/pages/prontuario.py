@@ -16,6 +16,9 @@ from app.services import (
     criar_consulta,
     listar_pacientes_com_tutor,
     listar_pacientes_tabela,
+    listar_timeline,
+    contar_timeline,
+    registrar_paciente_busca,
 )
 from modules.rbac import verificar_permissao
 
@@ -34,12 +37,13 @@ def render_prontuario():
     _db_init()  # Garante tabelas e colunas (ativo em tutores, etc.) antes das queries
 
     # Abas do prontuário
-    tab_busca, tab_tutores, tab_pacientes, tab_laudos, tab_consultas = st.tabs([
+    tab_busca, tab_tutores, tab_pacientes, tab_laudos, tab_consultas, tab_historico = st.tabs([
         "🔍 Busca Rápida",
         "👨‍👩‍👧 Tutores",
         "🐕 Pacientes",
         "📊 Laudos",
-        "🩺 Consultas"
+        "🩺 Consultas",
+        "🕒 Histórico",
     ])
 
     # ========================================================================
@@ -415,6 +419,52 @@ def render_prontuario():
         finally:
             conn_list.close()
     
+    # ========================================================================
+    # ABA: HISTÓRICO DO PACIENTE (linha do tempo em paciente_eventos)
+    # ========================================================================
+
+    with tab_historico:
+        st.subheader("🕒 Histórico do Paciente")
+        st.caption("Consultas, exames, prescrições e agendamentos do paciente, do mais recente para o mais antigo.")
+        try:
+            pac_hist_df = listar_pacientes_com_tutor()
+        except Exception:
+            pac_hist_df = pd.DataFrame()
+        if pac_hist_df.empty:
+            st.info("Nenhum paciente cadastrado.")
+        else:
+            opcoes_hist = {
+                f"{str(r['paciente']).title()} — Tutor: {str(r['tutor']).title()} (#{r['id']})": int(r["id"])
+                for _, r in pac_hist_df.iterrows()
+            }
+            col_h1, col_h2 = st.columns([3, 2])
+            with col_h1:
+                pac_hist = st.selectbox("Paciente", list(opcoes_hist.keys()), key="hist_paciente")
+            with col_h2:
+                tipos_hist = st.multiselect(
+                    "Tipos",
+                    ["consulta", "exame", "prescricao", "agendamento"],
+                    format_func=lambda t: {"consulta": "Consultas", "exame": "Exames", "prescricao": "Prescrições", "agendamento": "Agendamentos"}[t],
+                    key="hist_tipos",
+                )
+            pac_hist_id = opcoes_hist[pac_hist]
+            por_pagina_hist = 20
+            total_hist = contar_timeline(pac_hist_id, tipos_hist)
+            if total_hist == 0:
+                st.info("Nenhum evento para este paciente. Se houver registros antigos, use Configurações > Diagnóstico > Reconstruir histórico.")
+            else:
+                paginas_hist = (total_hist + por_pagina_hist - 1) // por_pagina_hist
+                pagina_hist = st.number_input(
+                    f"Página (de {paginas_hist})", min_value=1, max_value=paginas_hist, value=1, step=1, key="hist_pagina"
+                )
+                icones_hist = {"consulta": "🩺", "exame": "🫀", "prescricao": "💊", "agendamento": "📅"}
+                for ev in listar_timeline(pac_hist_id, limite=por_pagina_hist, offset=(int(pagina_hist) - 1) * por_pagina_hist, tipos=tipos_hist):
+                    data_ev = (ev.get("data_evento") or "").replace("T", " ")
+                    st.markdown(f"{icones_hist.get(ev['tipo'], '•')} **{data_ev}** — {ev['titulo']}")
+                    if ev.get("resumo"):
+                        st.caption(str(ev["resumo"])[:300])
+                st.caption(f"Total: {total_hist} evento(s)")
+
     # ========================================================================
     # ABA 3: PACIENTES
     # ========================================================================
@@ -574,6 +624,7 @@ def render_prontuario():
                                         ))
                                     
                                     conn_pac.commit()
+                                    registrar_paciente_busca(cursor_pac.lastrowid)
                                     st.success(f"✅ Paciente '{pac_nome}' cadastrado com sucesso!")
                                     st.balloons()
                                     
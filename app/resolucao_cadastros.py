@@ -0,0 +1,619 @@
+# Resolução de cadastros repetidos (clínicas, tutores, pacientes): blocagem por chaves normalizadas/fonéticas,
+# similaridade só entre registros do mesmo bloco e plano de união aplicado numa transação, reescrevendo as referências
+from __future__ import annotations
+
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import re
+import sqlite3
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from app.config import DB_PATH
+from app.laudos_dedup import TABELAS_EXAMES, fingerprint_linha_exame
+from app.services.busca_pacientes import invalidar_busca_pacientes
+from app.sql_safe import validar_coluna, validar_tabela
+from app.utils import _norm_key
+from fortcordis_modules.escritor import escrever
+
+logger = logging.getLogger(__name__)
+
+# Blocos maiores que isto (token muito comum: "maria", "silva") não geram pares; os registros ainda se
+# encontram pelas outras chaves (nome inteiro, primeiro+último token)
+BLOCO_MAXIMO = 50
+# Chaves de nome inteiro (mesmos tokens / mesma fonética) só são descartadas acima disto
+BLOCO_MAXIMO_EXATO = 500
+# Nomes com a mesma fonética token a token ("Sousa"/"Souza", "Thiago"/"Tiago") valem pelo menos isto,
+# mesmo com Dice dos trigramas menor
+SCORE_FONETICO = 0.92
+
+_CONECTIVOS = frozenset({"de", "da", "do", "das", "dos", "e"})
+_GENERICOS_CLINICA = _CONECTIVOS | frozenset({
+    "clinica", "clin", "veterinaria", "veterinario", "vet", "hospital", "hosp", "ltda", "me", "eireli",
+})
+
+# Tabelas de exame: clinica_id aponta para clinicas quando o id existe lá, senão para clinicas_parceiras
+# (mesma regra de laudos_dedup._nomes_vinculados)
+ENTIDADES = {
+    "clinicas_parceiras": {
+        "genericos": _GENERICOS_CLINICA,
+        "limiar": 0.85,
+        "documento": "cnpj",
+        "somar": ("saldo_credito",),
+        "referencias": (
+            ("financeiro", "clinica_id"),
+            ("movimentos_caixa", "clinica_id"),
+            ("creditos_movimentos", "clinica_id"),
+            ("nfse_arquivos", "clinica_id"),
+            ("parcerias_descontos", "clinica_id"),
+        ),
+        "referencias_exames": "clinica_id",
+        "textos": (("agendamentos", "clinica", None),),
+    },
+    "clinicas": {
+        "genericos": _GENERICOS_CLINICA,
+        "limiar": 0.85,
+        "documento": None,
+        "somar": (),
+        "referencias": (),
+        "referencias_exames": "clinica_id",
+        "textos": (("agendamentos", "clinica", None),),
+    },
+    "tutores": {
+        "genericos": _CONECTIVOS,
+        "limiar": 0.9,
+        "documento": "telefone",
+        "somar": (),
+        "referencias": (("consultas", "tutor_id"),),
+        "referencias_exames": None,
+        "textos": (("agendamentos", "tutor", None), ("prescricoes", "tutor_nome", None)),
+    },
+    "pacientes": {
+        "genericos": _CONECTIVOS,
+        "limiar": 0.9,
+        "documento": None,
+        "somar": (),
+        "referencias": (
+            ("consultas", "paciente_id"),
+            ("laudos_medidas", "paciente_id"),
+            ("paciente_eventos", "paciente_id"),
+            ("agendamentos", "paciente_id"),
+        ),
+        "referencias_exames": "paciente_id",
+        # Nome de paciente só é trocado quando o tutor do texto é o do paciente mantido
+        "textos": (("agendamentos", "paciente", "tutor"), ("prescricoes", "paciente_nome", "tutor_nome")),
+    },
+}
+
+# Ordem recomendada: tutores antes de pacientes (pacientes só são comparados dentro do mesmo tutor)
+ORDEM_ENTIDADES = ("clinicas_parceiras", "clinicas", "tutores", "pacientes")
+
+_NAO_ALFANUM = re.compile(r"[^a-z0-9]+")
+_FONETICA = (
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"[cs]h"), "x"),
+    (re.compile(r"lh"), "l"),
+    (re.compile(r"nh"), "n"),
+    (re.compile(r"qu|q"), "k"),
+    (re.compile(r"gu(?=[ei])"), "g"),
+    (re.compile(r"g(?=[ei])"), "j"),
+    (re.compile(r"c(?=[eiy])"), "s"),
+    (re.compile(r"c"), "k"),
+    (re.compile(r"z"), "s"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"y"), "i"),
+    (re.compile(r"h"), ""),
+)
+_REPETIDAS = re.compile(r"(.)\1+")
+_VOGAIS = re.compile(r"[aeiou]")
+
+
+# ----------------------------------------------------------------------------
+# Normalização, chaves de bloco e similaridade (funções puras)
+# ----------------------------------------------------------------------------
+
+def tokens_nome(nome: str, genericos: Iterable[str] = _CONECTIVOS) -> List[str]:
+    """Tokens do nome sobre _norm_key (sem acentos, minúsculo), sem pontuação e sem as palavras genéricas."""
+    return [t for t in _NAO_ALFANUM.sub(" ", _norm_key(nome)).split() if t not in genericos]
+
+
+@functools.lru_cache(maxsize=100_000)
+def fonetica(token: str) -> str:
+    """
+    Código fonético simples para português: grafias equivalentes (ph/f, ch/x, ç/c/s/z, qu/k, th/t...) e letras
+    dobradas viram uma; das vogais ficam só a primeira letra e a final (Maria/Mario continuam diferentes).
+    """
+    if token.isdigit():
+        return token
+    s = token
+    for padrao, troca in _FONETICA:
+        s = padrao.sub(troca, s)
+    s = _REPETIDAS.sub(r"\1", s)
+    if len(s) < 3:
+        return s
+    return s[0] + _VOGAIS.sub("", s[1:-1]) + s[-1]
+
+
+def chaves_bloco(tokens: List[str], escopo=None) -> List[tuple]:
+    """
+    Chaves de blocagem: (tipo, chave). "t" tokens ordenados, "f" fonética do nome inteiro, "p" fonética do
+    primeiro+último token e "r" fonética de cada token com 4+ letras. O escopo (ex.: tutor_id) prefixa todas.
+    """
+    if not tokens:
+        return []
+    fon = [fonetica(t) for t in tokens]
+    chaves = [("t", " ".join(sorted(tokens))), ("f", " ".join(fon))]
+    if len(tokens) > 1:
+        chaves.append(("p", f"{fon[0]}|{fon[-1]}"))
+    chaves.extend(("r", f) for t, f in zip(tokens, fon) if len(t) >= 4)
+    return [(tipo, f"{escopo}\x1f{chave}") for tipo, chave in chaves]
+
+
+def _trigramas(tokens: List[str]) -> frozenset:
+    s = f"  {' '.join(tokens)} "
+    return frozenset(s[i:i + 3] for i in range(len(s) - 2))
+
+
+def _digitos(valor) -> str:
+    return re.sub(r"\D", "", str(valor or ""))
+
+
+def _documentos_conflitam(doc_a: str, doc_b: str) -> bool:
+    """Telefone/CNPJ preenchidos nos dois e diferentes (últimos 8 dígitos): não são a mesma pessoa/empresa."""
+    return len(doc_a) >= 8 and len(doc_b) >= 8 and doc_a[-8:] != doc_b[-8:]
+
+
+def _numeros(tokens: List[str]) -> frozenset:
+    return frozenset(t for t in tokens if t.isdigit())
+
+
+def encontrar_duplicados(
+    registros: List[dict],
+    limiar: float = 0.9,
+    genericos: Iterable[str] = _CONECTIVOS,
+    bloco_maximo: int = BLOCO_MAXIMO,
+) -> dict:
+    """
+    registros: [{"id", "nome", "escopo" (opcional: só compara dentro do mesmo), "documento" (opcional),
+    "compativel" (opcional: ex. espécie; vazio combina com qualquer)}]. Documentos (telefone/CNPJ) ou números
+    no nome diferentes impedem a união.
+    Compara só pares que dividem alguma chave de bloco. Similaridade: 1.0 para os mesmos tokens em qualquer
+    ordem, senão Dice dos trigramas de caracteres (no mínimo SCORE_FONETICO com a mesma fonética); pares com
+    similaridade >= limiar são unidos transitivamente. Retorna {"grupos": [[(id, score)]], "blocos", "pares_comparados", "segundos"}.
+    """
+    t0 = time.perf_counter()
+    genericos = frozenset(genericos)
+    toks, ordenados, fons, docs, compat, nums = {}, {}, {}, {}, {}, {}
+    blocos = {}
+    for r in registros:
+        rid = r["id"]
+        toks[rid] = tokens_nome(r.get("nome") or "", genericos)
+        ordenados[rid] = sorted(toks[rid])
+        nums[rid] = _numeros(toks[rid])
+        docs[rid] = _digitos(r.get("documento"))
+        compat[rid] = _norm_key(r["compativel"]) if r.get("compativel") else ""
+        chaves = chaves_bloco(toks[rid], r.get("escopo"))
+        fons[rid] = chaves[1][1] if chaves else None
+        for chave in chaves:
+            blocos.setdefault(chave, []).append(rid)
+
+    pai = {}
+
+    def _raiz(x):
+        while pai.get(x, x) != x:
+            pai[x] = pai.get(pai[x], pai[x])
+            x = pai[x]
+        return x
+
+    vistos = set()
+    melhor = {}
+    usados = 0
+    trigramas = {}
+    for (tipo, _chave), ids in blocos.items():
+        if len(ids) < 2 or len(ids) > (BLOCO_MAXIMO_EXATO if tipo in ("t", "f") else bloco_maximo):
+            continue
+        usados += 1
+        for a, b in itertools.combinations(ids, 2):
+            par = (a, b) if a < b else (b, a)
+            if par in vistos:
+                continue
+            vistos.add(par)
+            if compat[a] and compat[b] and compat[a] != compat[b]:
+                continue
+            if _documentos_conflitam(docs[a], docs[b]):
+                continue
+            if nums[a] and nums[b] and nums[a] != nums[b]:
+                continue  # "Unidade 1" x "Unidade 2": números diferentes nunca são o mesmo cadastro
+            if ordenados[a] == ordenados[b]:
+                score = 1.0
+            else:
+                ta = trigramas.get(a) or trigramas.setdefault(a, _trigramas(toks[a]))
+                tb = trigramas.get(b) or trigramas.setdefault(b, _trigramas(toks[b]))
+                score = 2 * len(ta & tb) / (len(ta) + len(tb))
+                if score < SCORE_FONETICO and fons[a] == fons[b]:
+                    score = SCORE_FONETICO
+            if score >= limiar:
+                ra, rb = _raiz(a), _raiz(b)
+                if ra != rb:
+                    pai[max(ra, rb)] = min(ra, rb)
+                melhor[a] = max(melhor.get(a, 0.0), score)
+                melhor[b] = max(melhor.get(b, 0.0), score)
+
+    grupos = {}
+    for rid in melhor:
+        grupos.setdefault(_raiz(rid), []).append((rid, round(melhor[rid], 3)))
+    return {
+        "grupos": [sorted(g) for g in grupos.values() if len(g) > 1],
+        "blocos": usados,
+        "pares_comparados": len(vistos),
+        "segundos": round(time.perf_counter() - t0, 3),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Plano (somente leitura)
+# ----------------------------------------------------------------------------
+
+def _tabelas(conn: sqlite3.Connection) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _colunas(conn: sqlite3.Connection, tabela: str) -> list:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({validar_tabela(tabela)})")]
+
+
+def _contar_referencias(conn: sqlite3.Connection, entidade: str) -> dict:
+    """{id: linhas que apontam para ele} somando todas as referências por id da entidade."""
+    cfg = ENTIDADES[entidade]
+    existentes = _tabelas(conn)
+    refs = list(cfg["referencias"])
+    if cfg["referencias_exames"]:
+        refs += [(t, cfg["referencias_exames"]) for t in TABELAS_EXAMES]
+    if entidade == "tutores":
+        refs.append(("pacientes", "tutor_id"))
+    contagem = {}
+    for tabela, coluna in refs:
+        if tabela not in existentes or coluna not in _colunas(conn, tabela):
+            continue
+        tab, col = validar_tabela(tabela), validar_coluna(coluna)
+        try:
+            for rid, n in conn.execute(f"SELECT {col}, COUNT(*) FROM {tab} WHERE {col} IS NOT NULL GROUP BY {col}"):
+                contagem[rid] = contagem.get(rid, 0) + n
+        except sqlite3.OperationalError as e:
+            logger.warning("Referências de %s em %s.%s indisponíveis: %s", entidade, tabela, coluna, e)
+    return contagem
+
+
+def _carregar_registros(conn: sqlite3.Connection, entidade: str) -> List[dict]:
+    tab = validar_tabela(entidade)
+    cols = set(_colunas(conn, entidade))
+    doc = ENTIDADES[entidade]["documento"]
+    campos = ["id", "nome"]
+    if doc and doc in cols:
+        campos.append(validar_coluna(doc))
+    if entidade == "pacientes":
+        campos += ["tutor_id", "especie"]
+    registros = []
+    for row in conn.execute(f"SELECT {', '.join(campos)} FROM {tab}"):
+        r = dict(zip(campos, row))
+        registros.append({
+            "id": r["id"],
+            "nome": r["nome"],
+            "documento": r.get(doc) if doc else None,
+            "escopo": r.get("tutor_id"),
+            "compativel": r.get("especie"),
+        })
+    return registros
+
+
+def _assinaturas(conn: sqlite3.Connection, entidade: str, ids: list) -> dict:
+    """{id: sha256 (16 hex) da linha inteira}: o plano guarda a de cada membro e só é aplicado se nada mudou."""
+    tab = validar_tabela(entidade)
+    out = {}
+    for i in range(0, len(ids), 500):
+        parte = ids[i:i + 500]
+        for row in conn.execute(f"SELECT * FROM {tab} WHERE id IN ({', '.join('?' for _ in parte)})", parte):
+            texto = json.dumps(list(row), ensure_ascii=False, default=str)
+            out[row[0]] = hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+    return out
+
+
+def planejar_uniao(entidade: str, limiar: Optional[float] = None, db_path: Optional[str] = None) -> dict:
+    """
+    Plano de união dos repetidos de uma entidade (clinicas_parceiras, clinicas, tutores, pacientes), sem gravar nada.
+    Em cada grupo fica o registro com mais referências (empate: menor id). O plano é JSON puro: pode ser salvo,
+    revisado e aplicado depois com aplicar_plano. Pacientes só são comparados dentro do mesmo tutor.
+    Retorna {"entidade", "limiar", "gerado_em", "registros", "blocos", "pares_comparados", "segundos",
+    "grupos": [{"manter": {id, nome, referencias, assinatura}, "unir": [{id, nome, score, referencias, assinatura}]}]}.
+    A assinatura é o hash da linha do cadastro: se ela mudar até a aplicação, o plano é recusado.
+    """
+    if entidade not in ENTIDADES:
+        raise ValueError(f"Entidade desconhecida: {entidade!r}")
+    cfg = ENTIDADES[entidade]
+    limiar = cfg["limiar"] if limiar is None else limiar
+    t0 = time.perf_counter()
+    conn = sqlite3.connect(str(db_path or DB_PATH), timeout=30)
+    try:
+        if entidade not in _tabelas(conn):
+            registros, refs = [], {}
+        else:
+            registros = _carregar_registros(conn, entidade)
+            refs = _contar_referencias(conn, entidade)
+        achados = encontrar_duplicados(registros, limiar=limiar, genericos=cfg["genericos"])
+        assinaturas = _assinaturas(conn, entidade, [rid for membros in achados["grupos"] for rid, _s in membros])
+    finally:
+        conn.close()
+
+    nomes = {r["id"]: r["nome"] for r in registros}
+    grupos = []
+    for membros in achados["grupos"]:
+        ordenados = sorted(membros, key=lambda m: (-refs.get(m[0], 0), m[0]))
+        manter = ordenados[0][0]
+        grupos.append({
+            "manter": {"id": manter, "nome": nomes[manter], "referencias": refs.get(manter, 0),
+                       "assinatura": assinaturas.get(manter)},
+            "unir": [{"id": rid, "nome": nomes[rid], "score": score, "referencias": refs.get(rid, 0),
+                      "assinatura": assinaturas.get(rid)}
+                     for rid, score in ordenados[1:]],
+        })
+    grupos.sort(key=lambda g: _norm_key(g["manter"]["nome"]))
+    return {
+        "entidade": entidade,
+        "limiar": limiar,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "registros": len(registros),
+        "blocos": achados["blocos"],
+        "pares_comparados": achados["pares_comparados"],
+        "segundos": round(time.perf_counter() - t0, 3),
+        "grupos": grupos,
+    }
+
+
+# ----------------------------------------------------------------------------
+# Aplicação (uma transação no escritor único)
+# ----------------------------------------------------------------------------
+
+def _garantir_tabela_log(conn) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resolucao_cadastros_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entidade TEXT NOT NULL,
+            id_mantido INTEGER NOT NULL,
+            id_unido INTEGER NOT NULL,
+            nome_unido TEXT,
+            score REAL,
+            aplicado_em TEXT NOT NULL
+        )
+    """)
+
+
+def _completar_mantido(conn, entidade: str, manter: int, unidos: list) -> None:
+    """Preenche só as colunas vazias do mantido com as dos unidos (mais recentes primeiro); soma saldos; ativo se algum for."""
+    tab = validar_tabela(entidade)
+    cfg = ENTIDADES[entidade]
+    marcas = ", ".join("?" for _ in unidos)
+    cols = [c for c in _colunas(conn, entidade) if c not in ("id", "nome", "nome_key", "tutor_id", "created_at",
+                                                          "data_cadastro", "ativo") and c not in cfg["somar"]]
+    for c in cols:
+        conn.execute(
+            f"""UPDATE {tab} SET "{c}" = (
+                    SELECT "{c}" FROM {tab} WHERE id IN ({marcas})
+                      AND "{c}" IS NOT NULL AND TRIM(CAST("{c}" AS TEXT)) <> ''
+                    ORDER BY id DESC LIMIT 1)
+                WHERE id = ? AND ("{c}" IS NULL OR TRIM(CAST("{c}" AS TEXT)) = '')
+                  AND EXISTS (SELECT 1 FROM {tab} WHERE id IN ({marcas})
+                              AND "{c}" IS NOT NULL AND TRIM(CAST("{c}" AS TEXT)) <> '')""",
+            unidos + [manter] + unidos,
+        )
+    existentes = set(_colunas(conn, entidade))
+    for c in cfg["somar"]:
+        if c in existentes:
+            col = validar_coluna(c)
+            conn.execute(
+                f"UPDATE {tab} SET {col} = COALESCE({col}, 0) + "
+                f"(SELECT COALESCE(SUM({col}), 0) FROM {tab} WHERE id IN ({marcas})) WHERE id = ?",
+                unidos + [manter],
+            )
+    if "ativo" in existentes:
+        conn.execute(
+            f"UPDATE {tab} SET ativo = 1 WHERE id = ? AND EXISTS (SELECT 1 FROM {tab} WHERE id IN ({marcas}) AND ativo = 1)",
+            [manter] + unidos,
+        )
+
+
+def _reescrever(conn, tabela: str, coluna: str, manter: int, unidos: list, extra: str = "") -> int:
+    tab, col = validar_tabela(tabela), validar_coluna(coluna)
+    marcas = ", ".join("?" for _ in unidos)
+    return conn.execute(f"UPDATE {tab} SET {col} = ? WHERE {col} IN ({marcas}){extra}", [manter] + unidos).rowcount
+
+
+def _mover_pacientes(conn, tutor_manter: int, tutores_unidos: list, contagem: dict) -> None:
+    """
+    Pacientes dos tutores unidos passam para o mantido. Se o mantido já tem o mesmo paciente (nome_key + espécie,
+    a chave única da tabela), o repetido é unido a ele em vez de movido.
+    """
+    marcas = ", ".join("?" for _ in tutores_unidos)
+    rows = conn.execute(
+        f"SELECT id, nome_key, especie FROM pacientes WHERE tutor_id IN ({marcas}) ORDER BY id", tutores_unidos
+    ).fetchall()
+    for pid, nome_key, especie in rows:
+        existente = conn.execute(
+            "SELECT id FROM pacientes WHERE tutor_id = ? AND nome_key = ? AND especie = ? AND id <> ?",
+            (tutor_manter, nome_key, especie, pid),
+        ).fetchone()
+        if existente:
+            _unir_grupo(conn, "pacientes", existente[0], [pid], contagem)
+            contagem["pacientes_unidos"] = contagem.get("pacientes_unidos", 0) + 1
+        else:
+            conn.execute("UPDATE pacientes SET tutor_id = ? WHERE id = ?", (tutor_manter, pid))
+            contagem["pacientes.tutor_id"] = contagem.get("pacientes.tutor_id", 0) + 1
+
+
+def _unir_grupo(conn, entidade: str, manter: int, unidos: list, contagem: dict) -> None:
+    """Reescreve todas as referências por id de `unidos` para `manter`, completa o mantido e apaga os unidos."""
+    cfg = ENTIDADES[entidade]
+    existentes = _tabelas(conn)
+    _completar_mantido(conn, entidade, manter, unidos)
+    if entidade == "tutores":
+        _mover_pacientes(conn, manter, unidos, contagem)
+    for tabela, coluna in cfg["referencias"]:
+        if tabela in existentes and coluna in _colunas(conn, tabela):
+            n = _reescrever(conn, tabela, coluna, manter, unidos)
+            contagem[f"{tabela}.{coluna}"] = contagem.get(f"{tabela}.{coluna}", 0) + n
+    col_exames = cfg["referencias_exames"]
+    if col_exames:
+        extra = ""
+        if entidade == "clinicas_parceiras" and "clinicas" in existentes:
+            # Ids que também existem em clinicas apontam para lá (não são desta entidade)
+            extra = f" AND {validar_coluna(col_exames)} NOT IN (SELECT id FROM clinicas)"
+        for tabela in TABELAS_EXAMES:
+            if tabela not in existentes or col_exames not in _colunas(conn, tabela):
+                continue
+            tab, col = validar_tabela(tabela), validar_coluna(col_exames)
+            marcas = ", ".join("?" for _ in unidos)
+            ids = [r[0] for r in conn.execute(f"SELECT id FROM {tab} WHERE {col} IN ({marcas}){extra}", unidos)]
+            if ids:
+                _reescrever(conn, tabela, col_exames, manter, unidos, extra)
+                contagem[f"{tabela}.{col_exames}"] = contagem.get(f"{tabela}.{col_exames}", 0) + len(ids)
+                contagem.setdefault("_exames", {}).setdefault(tabela, set()).update(ids)
+    tab = validar_tabela(entidade)
+    conn.execute(f"DELETE FROM {tab} WHERE id IN ({', '.join('?' for _ in unidos)})", unidos)
+
+
+def _reescrever_textos(conn, entidade: str, mapa: dict, contagem: dict) -> None:
+    """
+    Colunas de texto (agendamentos.clinica, prescricoes.tutor_nome...): nomes que normalizam (_norm_key) para
+    um nome unido passam a ter o nome do mantido. mapa: {chave: nome_mantido}; para pacientes a chave é
+    (nome_key do paciente, nome_key do tutor).
+    """
+    existentes = _tabelas(conn)
+
+    def _canonico(*valores):
+        chave = tuple(_norm_key(v) for v in valores) if len(valores) > 1 else _norm_key(valores[0])
+        return mapa.get(chave)
+
+    conn.create_function("fc_nome_canonico", -1, _canonico, deterministic=True)
+    for tabela, coluna, escopo in ENTIDADES[entidade]["textos"]:
+        if tabela not in existentes:
+            continue
+        cols = _colunas(conn, tabela)
+        if coluna not in cols or (escopo and escopo not in cols):
+            continue
+        tab, col = validar_tabela(tabela), validar_coluna(coluna)
+        args = f"{col}, {validar_coluna(escopo)}" if escopo else col
+        n = conn.execute(
+            f"UPDATE {tab} SET {col} = fc_nome_canonico({args}) "
+            f"WHERE fc_nome_canonico({args}) IS NOT NULL AND fc_nome_canonico({args}) <> {col}"
+        ).rowcount
+        contagem[f"{tabela}.{coluna}"] = contagem.get(f"{tabela}.{coluna}", 0) + n
+
+
+def _recalcular_fingerprints(conn, exames: dict) -> int:
+    """Exames sem nome na linha usam o nome vinculado no fingerprint: recalcula os que mudaram de vínculo."""
+    n = 0
+    for tabela, ids in exames.items():
+        tab = validar_tabela(tabela)
+        cols = _colunas(conn, tabela)
+        if "fingerprint" not in cols:
+            continue
+        cur = conn.cursor()
+        lista = sorted(ids)
+        for i in range(0, len(lista), 500):
+            parte = lista[i:i + 500]
+            rows = cur.execute(f"SELECT * FROM {tab} WHERE id IN ({', '.join('?' for _ in parte)})", parte).fetchall()
+            for row in rows:
+                linha = dict(zip(cols, row))
+                novo = fingerprint_linha_exame(cur, tabela, linha)
+                if novo == linha["fingerprint"]:
+                    continue
+                try:
+                    cur.execute(f"UPDATE {tab} SET fingerprint = ? WHERE id = ?", (novo, linha["id"]))
+                    n += 1
+                except sqlite3.IntegrityError:
+                    # Virou o mesmo exame de outra linha (índice único): fica para compactar_exames_duplicados
+                    logger.info("Exame %s.%s repetido após a união de cadastros", tabela, linha["id"])
+    return n
+
+
+def _aplicar(conn, plano: dict) -> dict:
+    entidade = plano["entidade"]
+    _garantir_tabela_log(conn)
+    # Plano velho (cadastro apagado, unido ou editado desde a revisão) não é aplicado
+    membros = [g["manter"] for g in plano["grupos"]] + [u for g in plano["grupos"] for u in g["unir"]]
+    atuais = _assinaturas(conn, entidade, [m["id"] for m in membros])
+    faltando = sorted({m["id"] for m in membros if m["id"] not in atuais})
+    if faltando:
+        raise ValueError(f"Plano desatualizado: {entidade} {faltando[:10]} não existe(m) mais; gere o plano de novo")
+    alterados = sorted({m["id"] for m in membros if m.get("assinatura") != atuais[m["id"]]})
+    if alterados:
+        raise ValueError(f"Plano desatualizado: {entidade} {alterados[:10]} mudou(aram) desde o plano; gere o plano de novo")
+
+    nomes_tutor = {}
+    if entidade == "pacientes":
+        nomes_tutor = dict(conn.execute(
+            "SELECT p.id, t.nome FROM pacientes p JOIN tutores t ON t.id = p.tutor_id"
+        ).fetchall())
+    mapa = {}
+    for g in plano["grupos"]:
+        nome_manter = g["manter"]["nome"]
+        for membro in [g["manter"]] + g["unir"]:
+            if entidade == "pacientes":
+                tutor = nomes_tutor.get(g["manter"]["id"]) or ""
+                mapa[(_norm_key(membro["nome"]), _norm_key(tutor))] = nome_manter
+            else:
+                mapa[_norm_key(membro["nome"])] = nome_manter
+
+    contagem = {}
+    agora = datetime.now().isoformat(timespec="seconds")
+    for g in plano["grupos"]:
+        manter = g["manter"]["id"]
+        unidos = [u["id"] for u in g["unir"]]
+        if not unidos:
+            continue
+        _unir_grupo(conn, entidade, manter, unidos, contagem)
+        conn.executemany(
+            "INSERT INTO resolucao_cadastros_log (entidade, id_mantido, id_unido, nome_unido, score, aplicado_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(entidade, manter, u["id"], u["nome"], u.get("score"), agora) for u in g["unir"]],
+        )
+    _reescrever_textos(conn, entidade, mapa, contagem)
+    exames = contagem.pop("_exames", {})
+    fingerprints = _recalcular_fingerprints(conn, exames)
+    return {
+        "entidade": entidade,
+        "grupos": len(plano["grupos"]),
+        "removidos": sum(len(g["unir"]) for g in plano["grupos"]),
+        "atualizados": contagem,
+        "fingerprints_recalculados": fingerprints,
+    }
+
+
+def aplicar_plano(plano: dict, db_path: Optional[str] = None) -> dict:
+    """
+    Aplica o plano de planejar_uniao numa única transação (escritor único, com chaves estrangeiras ligadas):
+    referências por id (financeiro, consultas, laudos, pacientes...) e nomes em texto (agendamentos,
+    prescrições) passam para o mantido; os unidos são apagados e registrados em resolucao_cadastros_log.
+    Qualquer erro desfaz tudo. Retorna {"entidade", "grupos", "removidos", "atualizados": {"tabela.coluna": n},
+    "fingerprints_recalculados"}.
+    """
+    if plano.get("entidade") not in ENTIDADES:
+        raise ValueError(f"Entidade desconhecida no plano: {plano.get('entidade')!r}")
+    if not plano.get("grupos"):
+        return {"entidade": plano["entidade"], "grupos": 0, "removidos": 0, "atualizados": {}, "fingerprints_recalculados": 0}
+    resultado = escrever(_aplicar, plano, db_path=db_path or DB_PATH, chaves_estrangeiras=True, timeout=600)
+    invalidar_busca_pacientes()
+    return resultado
+
+
+def salvar_plano(plano: dict, caminho) -> None:
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(plano, f, ensure_ascii=False, indent=2)
+
+
+def carregar_plano(caminho) -> dict:
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
@@ -15,6 +15,63 @@ from app.services.financeiro import (
     consumo_clinicas,
     desempenho_colaboradores,
 )
+from app.services.referencias import obter_referencias, invalidar_referencias
+from app.services.prescricoes import (
+    registrar_prescricao,
+    listar_historico_prescricoes,
+    contar_historico_prescricoes,
+    carregar_pdf_prescricao,
+)
+from app.services.documentos import (
+    submeter_lote,
+    status_lote,
+    resultado_lote,
+    zip_lote,
+    descartar_lote,
+    montar_lote_agenda,
+)
+from app.services.timeline import (
+    backfill_timeline,
+    resolver_eventos_pendentes,
+    listar_timeline,
+    contar_timeline,
+)
+from app.services.compressao import (
+    relatorio_compressao,
+    recomprimir_blobs,
+    iniciar_recompressao,
+    cancelar_recompressao,
+    estado_recompressao,
+)
+from app.services.ingestao import (
+    estado_ingestao,
+    ingerir_pasta,
+    iniciar_ingestao,
+    solicitar_ingestao,
+)
+from app.services.manutencao import (
+    estado_manutencao,
+    executar_manutencao,
+    iniciar_manutencao,
+    solicitar_manutencao,
+    ativar_vacuum_incremental,
+)
+from app.services.jobs import (
+    submeter_job,
+    estado_job,
+    cancelar_job,
+    resultado_job,
+    listar_jobs,
+    registrar_tipo,
+)
+from app.services.importacao_backup import importar_backup
+from app.services.busca_pacientes import (
+    sugerir_pacientes,
+    invalidar_busca_pacientes,
+    registrar_paciente_busca,
+    registrar_tutor_busca,
+    registrar_laudo_busca,
+)
 
 __all__ = [
     "listar_consultas_recentes",
@@ -30,4 +87,46 @@ __all__ = [
     "creditos_clientes",
     "consumo_clinicas",
     "desempenho_colaboradores",
+    "obter_referencias",
+    "invalidar_referencias",
+    "registrar_prescricao",
+    "listar_historico_prescricoes",
+    "contar_historico_prescricoes",
+    "carregar_pdf_prescricao",
+    "submeter_lote",
+    "status_lote",
+    "resultado_lote",
+    "zip_lote",
+    "descartar_lote",
+    "montar_lote_agenda",
+    "backfill_timeline",
+    "resolver_eventos_pendentes",
+    "listar_timeline",
+    "contar_timeline",
+    "relatorio_compressao",
+    "recomprimir_blobs",
+    "iniciar_recompressao",
+    "cancelar_recompressao",
+    "estado_recompressao",
+    "estado_manutencao",
+    "executar_manutencao",
+    "iniciar_manutencao",
+    "solicitar_manutencao",
+    "ativar_vacuum_incremental",
+    "estado_ingestao",
+    "ingerir_pasta",
+    "iniciar_ingestao",
+    "solicitar_ingestao",
+    "submeter_job",
+    "estado_job",
+    "cancelar_job",
+    "resultado_job",
+    "listar_jobs",
+    "registrar_tipo",
+    "importar_backup",
+    "sugerir_pacientes",
+    "invalidar_busca_pacientes",
+    "registrar_paciente_busca",
+    "registrar_tutor_busca",
+    "registrar_laudo_busca",
 ]
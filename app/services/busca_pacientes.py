@@ -0,0 +1,435 @@
+# Serviço de busca de pacientes para vínculo (XML importado, novo agendamento): índice em memória dos nomes
+# normalizados (_norm_key) de pacientes cadastrados e de pares animal/tutor que só aparecem em laudos
+"""
+Em vez de um `LIKE '%termo%'` em pacientes, tutores, laudos_arquivos e laudos_ecocardiograma a cada rerun,
+o índice é montado uma vez por processo e responde em memória, na ordem de relevância e parando nas
+`limite` primeiras sugestões:
+1. nome que começa com o termo (o nome igual ao termo vem primeiro): lista ordenada dos nomes + bisect;
+2. alguma palavra do nome começa com o termo: lista ordenada dos finais de nome a partir de cada palavra;
+3. o termo aparece no meio do nome: str.find num texto único com todos os nomes, na ordem tutor/animal.
+Mesma semântica do LIKE, mas sem acento e sem diferença de maiúsculas.
+
+O índice é atualizado na hora pelas gravações do app (registrar_paciente_busca, registrar_tutor_busca,
+registrar_laudo_busca); importações e uniões em lote chamam invalidar_busca_pacientes(). Mesmo sem
+invalidação ele é relido a cada BUSCA_PACIENTES_TTL_SEGUNDOS (escritas feitas fora do app).
+"""
+import logging
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from typing import Iterable, Optional
+
+from app.config import BUSCA_PACIENTES_TTL_SEGUNDOS, DB_PATH
+from app.utils import _norm_key
+
+logger = logging.getLogger(__name__)
+
+FONTES = ("cadastro", "laudo")
+
+# Campos normalizados de uma entrada: 0 = animal, 1 = tutor
+ANIMAL, TUTOR = 0, 1
+
+_SQL_PACIENTES = """
+    SELECT p.id, p.tutor_id, COALESCE(p.nome, ''), COALESCE(t.nome, ''), COALESCE(t.telefone, ''), t.id
+    FROM pacientes p
+    LEFT JOIN tutores t ON p.tutor_id = t.id
+    WHERE (p.ativo = 1 OR p.ativo IS NULL)
+"""
+
+
+def _itens(eid: int, fonte: int, campos: tuple) -> tuple:
+    """Itens das listas ordenadas: ([(nome, fonte, eid, campo)], [(final a partir da 2ª palavra em diante, ...)])."""
+    nomes, finais = [], []
+    for campo, texto in enumerate(campos):
+        if not texto:
+            continue
+        nomes.append((texto, fonte, eid, campo))
+        i = texto.find(" ")
+        while i >= 0:
+            finais.append((texto[i + 1:], fonte, eid, campo))
+            i = texto.find(" ", i + 1)
+    return nomes, finais
+
+
+def _remover_ordenado(lista: list, item: tuple) -> None:
+    i = bisect_left(lista, item)
+    if i < len(lista) and lista[i] == item:
+        del lista[i]
+
+
+class IndiceBusca:
+    """
+    Índice de nomes (animal, tutor). Cada entrada é um paciente cadastrado (fonte "cadastro") ou um par
+    animal/tutor de laudo (fonte "laudo"), guardada como (fonte, animal normalizado, tutor normalizado,
+    tem_tutor, campos públicos do resultado).
+    """
+
+    def __init__(self, versao: int = 0):
+        self.versao = versao
+        self.carregado_em = time.monotonic()
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._por_chave = {}
+        self._nomes = []
+        self._finais = []
+        self._pares_cadastro = Counter()
+        self._prox = 0
+        # Texto único para "contém": um trecho "animal\x01tutor" por entrada, na ordem dos resultados
+        self._texto = None
+        self._inicios = []
+        self._eids_texto = []
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    # --- escrita ---
+
+    def _remover(self, eid: int) -> None:
+        fonte, p_, t_, _tem, _pub, chave = self._entradas.pop(eid)
+        self._por_chave.pop(chave, None)
+        nomes, finais = _itens(eid, fonte, (p_, t_))
+        for item in nomes:
+            _remover_ordenado(self._nomes, item)
+        for item in finais:
+            _remover_ordenado(self._finais, item)
+        if fonte == 0:
+            self._pares_cadastro[(p_, t_)] -= 1
+            if self._pares_cadastro[(p_, t_)] <= 0:
+                del self._pares_cadastro[(p_, t_)]
+        self._texto = None
+
+    def _adicionar(self, fonte: int, animal: str, tutor: str, tem_tutor: bool, publico: tuple, chave: tuple,
+                   ordenar: bool) -> None:
+        eid = self._por_chave.get(chave)
+        if eid is not None:
+            self._remover(eid)
+        eid = self._prox
+        self._prox += 1
+        p_, t_ = _norm_key(animal), _norm_key(tutor)
+        self._entradas[eid] = (fonte, p_, t_, tem_tutor, publico, chave)
+        self._por_chave[chave] = eid
+        nomes, finais = _itens(eid, fonte, (p_, t_))
+        if ordenar:
+            for item in nomes:
+                insort(self._nomes, item)
+            for item in finais:
+                insort(self._finais, item)
+        else:
+            self._nomes.extend(nomes)
+            self._finais.extend(finais)
+        if fonte == 0:
+            self._pares_cadastro[(p_, t_)] += 1
+        self._texto = None
+
+    def adicionar_paciente(self, paciente_id: int, tutor_id: Optional[int], paciente: str, tutor: str,
+                           telefone: str = "", tem_tutor: bool = True, ordenar: bool = True) -> None:
+        paciente, tutor = (paciente or "").strip(), (tutor or "").strip()
+        publico = (paciente_id, tutor_id, paciente, tutor, (telefone or "").strip())
+        with self._lock:
+            self._adicionar(0, paciente, tutor, tem_tutor, publico, ("cadastro", paciente_id), ordenar)
+
+    def remover_paciente(self, paciente_id: int) -> None:
+        with self._lock:
+            eid = self._por_chave.get(("cadastro", paciente_id))
+            if eid is not None:
+                self._remover(eid)
+
+    def adicionar_laudo(self, animal: str, tutor: str = "", ordenar: bool = True) -> None:
+        animal, tutor = (animal or "").strip(), (tutor or "").strip()
+        chave = ("laudo", _norm_key(animal), _norm_key(tutor))
+        if not chave[1] and not chave[2]:
+            return
+        with self._lock:
+            if chave not in self._por_chave:
+                self._adicionar(1, animal, tutor, True, (animal, tutor), chave, ordenar)
+
+    def ordenar(self) -> None:
+        """Ordena as listas depois de uma carga com ordenar=False."""
+        with self._lock:
+            self._nomes.sort()
+            self._finais.sort()
+
+    def ids_paciente_do_tutor(self, tutor_id: int) -> list:
+        with self._lock:
+            return [e[4][0] for e in self._entradas.values() if e[0] == 0 and e[4][1] == tutor_id]
+
+    # --- consulta ---
+
+    def _montar_texto(self) -> None:
+        """Texto único na ordem dos resultados (cadastro antes de laudo, depois tutor e animal); refeito após gravações."""
+        ordem = sorted(self._entradas.items(), key=lambda kv: (kv[1][0], kv[1][2], kv[1][1], kv[0]))
+        partes, inicios, pos = [], [], 0
+        for _eid, e in ordem:
+            parte = f"{e[1]}\x01{e[2]}"
+            inicios.append(pos)
+            partes.append(parte)
+            pos += len(parte) + 1
+        self._texto = "\x00".join(partes)
+        self._inicios = inicios
+        self._eids_texto = [eid for eid, _e in ordem]
+
+    def _contem(self, termo: str):
+        """eids cujo animal ou tutor contém termo, na ordem do texto único."""
+        if self._texto is None:
+            self._montar_texto()
+        texto, inicios, eids = self._texto, self._inicios, self._eids_texto
+        pos = texto.find(termo)
+        while pos >= 0:
+            i = bisect_right(inicios, pos) - 1
+            yield eids[i]
+            proximo = inicios[i + 1] if i + 1 < len(inicios) else len(texto)
+            pos = texto.find(termo, proximo)
+
+    @staticmethod
+    def _faixa(lista: list, termo: str, campo: Optional[int]):
+        """eids dos itens de lista (ordenada) que começam com termo, na ordem da lista."""
+        i = bisect_left(lista, (termo,))
+        n = len(lista)
+        while i < n:
+            item = lista[i]
+            if not item[0].startswith(termo):
+                return
+            if campo is None or item[3] == campo:
+                yield item[2]
+            i += 1
+
+    def buscar(self, termo: Optional[str] = None, animal: Optional[str] = None, tutor: Optional[str] = None,
+               fontes: Iterable[str] = FONTES, limite: int = 15, exigir_tutor: bool = False) -> list:
+        """
+        Sugestões por relevância (nome começa com o termo, palavra começa com o termo, contém). termo: cada
+        palavra precisa aparecer no animal ou no tutor; animal/tutor: precisam aparecer no campo
+        correspondente. Com as duas fontes, pares de laudo que já são um cadastro não se repetem.
+        """
+        palavras = _norm_key(termo or "").split()
+        a, t = _norm_key(animal or ""), _norm_key(tutor or "")
+        limite = max(int(limite), 0)
+        # O termo mais longo conduz a busca (menos itens na faixa); os outros só conferem
+        guia, campo = max(((w, None) for w in palavras), key=lambda x: len(x[0]), default=("", None))
+        if len(a) > len(guia):
+            guia, campo = a, ANIMAL
+        if len(t) > len(guia):
+            guia, campo = t, TUTOR
+        if not guia or not limite:
+            return []
+        aceitas = {FONTES.index(f) for f in fontes if f in FONTES}
+        mesclar = aceitas == {0, 1}
+        saida, vistos = [], set()
+        with self._lock:
+            entradas = self._entradas
+            for eids in (self._faixa(self._nomes, guia, campo), self._faixa(self._finais, guia, campo),
+                         self._contem(guia)):
+                for eid in eids:
+                    if eid in vistos:
+                        continue
+                    vistos.add(eid)
+                    fonte, p_, t_, tem_tutor, publico, _chave = entradas[eid]
+                    if fonte not in aceitas or (exigir_tutor and not tem_tutor):
+                        continue
+                    if (a and a not in p_) or (t and t not in t_):
+                        continue
+                    if any(w not in p_ and w not in t_ for w in palavras):
+                        continue
+                    if mesclar and fonte == 1 and (p_, t_) in self._pares_cadastro:
+                        continue
+                    if fonte == 0:
+                        saida.append({"id": publico[0], "tutor_id": publico[1], "paciente": publico[2],
+                                      "tutor": publico[3], "telefone": publico[4], "fonte": "cadastro"})
+                    else:
+                        saida.append({"paciente": publico[0], "tutor": publico[1], "fonte": "laudo"})
+                    if len(saida) >= limite:
+                        return saida
+        return saida
+
+
+# ----------------------------------------------------------------------------
+# Carga e atualização
+# ----------------------------------------------------------------------------
+
+def _carregar_indice(versao: int, db_path: Optional[str] = None) -> IndiceBusca:
+    """Lê pacientes ativos (com tutor) e os pares animal/tutor distintos de laudos_arquivos e laudos_ecocardiograma."""
+    indice = IndiceBusca(versao)
+    conn = sqlite3.connect(str(db_path or DB_PATH))
+    try:
+        for pid, tid, pac, tut, tel, tid_existente in conn.execute(_SQL_PACIENTES):
+            indice.adicionar_paciente(pid, tid, pac, tut, tel, tem_tutor=tid_existente is not None, ordenar=False)
+        consultas = (
+            "SELECT DISTINCT TRIM(COALESCE(nome_animal, '')), TRIM(COALESCE(nome_tutor, '')) FROM laudos_arquivos",
+            "SELECT DISTINCT TRIM(COALESCE(nome_paciente, '')), '' FROM laudos_ecocardiograma",
+        )
+        for sql in consultas:
+            try:
+                for animal, tut in conn.execute(sql):
+                    indice.adicionar_laudo(animal, tut, ordenar=False)
+            except sqlite3.OperationalError:
+                pass  # tabela ainda não criada
+    finally:
+        conn.close()
+    indice.ordenar()
+    return indice
+
+
+_lock = threading.Lock()
+_versao = 0
+_indice: Optional[IndiceBusca] = None
+# Gravações registradas enquanto um índice novo é montado são reaplicadas nele antes da troca
+_pendentes_lock = threading.Lock()
+_recarga = {"pendentes": None, "em_segundo_plano": False}
+
+
+def invalidar_busca_pacientes() -> None:
+    """Bump de versão: a próxima busca relê o banco. Chamar após gravações em lote (importação, união de cadastros)."""
+    global _versao
+    with _lock:
+        _versao += 1
+
+
+def _aplicar(indice: IndiceBusca, op: tuple) -> None:
+    """Aplica uma gravação registrada: ("paciente", id) relê o paciente no banco, ("laudo", animal, tutor)."""
+    if op[0] == "laudo":
+        indice.adicionar_laudo(op[1], op[2])
+        return
+    paciente_id = op[1]
+    try:
+        conn = sqlite3.connect(str(DB_PATH))
+        try:
+            row = conn.execute(_SQL_PACIENTES + " AND p.id = ?", (paciente_id,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning("Falha ao atualizar o índice de busca (paciente %s): %s", paciente_id, e)
+        invalidar_busca_pacientes()
+        return
+    if row is None:
+        indice.remover_paciente(paciente_id)
+    else:
+        indice.adicionar_paciente(row[0], row[1], row[2], row[3], row[4], tem_tutor=row[5] is not None)
+
+
+def _registrar(op: tuple) -> None:
+    """Aplica a gravação no índice atual e, se um novo estiver sendo montado, guarda para reaplicar nele."""
+    with _pendentes_lock:
+        indice = _indice
+        if _recarga["pendentes"] is not None:
+            _recarga["pendentes"].append(op)
+    if indice is not None:
+        _aplicar(indice, op)
+
+
+def _recarregar(versao: int) -> IndiceBusca:
+    """Monta o índice (com _lock) e troca o atual, reaplicando as gravações feitas durante a montagem."""
+    global _indice
+    with _pendentes_lock:
+        if _recarga["pendentes"] is None:
+            _recarga["pendentes"] = []
+    try:
+        novo = _carregar_indice(versao)
+    except BaseException:
+        with _pendentes_lock:
+            _recarga["pendentes"] = None
+        raise
+    while True:
+        with _pendentes_lock:
+            pendentes = _recarga["pendentes"]
+            if not pendentes:
+                _recarga["pendentes"] = None
+                _indice = novo
+                return novo
+            _recarga["pendentes"] = []
+        for op in pendentes:
+            _aplicar(novo, op)
+
+
+def _recarregar_em_segundo_plano() -> None:
+    try:
+        with _lock:
+            remontou = False
+            try:
+                indice = _indice
+                if indice is not None and indice.versao == _versao and \
+                        time.monotonic() - indice.carregado_em >= BUSCA_PACIENTES_TTL_SEGUNDOS:
+                    _recarregar(_versao)
+                    remontou = True
+            finally:
+                with _pendentes_lock:
+                    _recarga["em_segundo_plano"] = False
+                    if not remontou:
+                        _recarga["pendentes"] = None  # outra chamada já remontou; as gravações já estão no atual
+    except Exception as e:
+        logger.warning("Falha ao recarregar o índice de busca de pacientes: %s", e)
+
+
+def obter_indice_busca() -> IndiceBusca:
+    """
+    Índice atual: montado na primeira busca e remontado quando a versão muda. Com o TTL vencido a busca
+    continua no índice atual enquanto uma thread monta o novo.
+    """
+    indice = _indice
+    if indice is not None and indice.versao == _versao:
+        if time.monotonic() - indice.carregado_em >= BUSCA_PACIENTES_TTL_SEGUNDOS:
+            with _pendentes_lock:
+                iniciar = not _recarga["em_segundo_plano"]
+                if iniciar:
+                    _recarga["em_segundo_plano"] = True
+                    if _recarga["pendentes"] is None:
+                        _recarga["pendentes"] = []  # gravações a partir daqui vão também para o índice novo
+            if iniciar:
+                threading.Thread(target=_recarregar_em_segundo_plano, name="fortcordis-busca-pacientes",
+                                 daemon=True).start()
+        return indice
+    with _lock:
+        indice = _indice
+        if indice is None or indice.versao != _versao:
+            try:
+                indice = _recarregar(_versao)
+            except sqlite3.Error as e:
+                logger.warning("Falha ao montar o índice de busca de pacientes: %s", e)
+                if indice is None:
+                    raise
+    return indice
+
+
+def registrar_paciente_busca(paciente_id: int) -> None:
+    """Relê um paciente (e o tutor) no índice; inativo ou apagado sai dele. Sem índice montado, não faz nada."""
+    if paciente_id:
+        _registrar(("paciente", paciente_id))
+
+
+def registrar_tutor_busca(tutor_id: int) -> None:
+    """Nome/telefone do tutor mudou: relê os pacientes dele no índice."""
+    indice = _indice
+    if indice is None or not tutor_id:
+        return
+    for pid in indice.ids_paciente_do_tutor(tutor_id):
+        registrar_paciente_busca(pid)
+
+
+def registrar_laudo_busca(nome_animal: Optional[str], nome_tutor: Optional[str] = "") -> None:
+    """Par animal/tutor de um laudo gravado entra no índice (só memória; pode ser chamado dentro da transação)."""
+    _registrar(("laudo", nome_animal or "", nome_tutor or ""))
+
+
+def sugerir_pacientes(termo: Optional[str], limite: int = 15) -> list:
+    """
+    Sugestões para um termo (animal ou tutor) com cadastros e nomes que só aparecem em laudos num único
+    resultado. Retorna [{"id", "tutor_id", "paciente", "tutor", "telefone", "fonte": "cadastro"} |
+    {"paciente", "tutor", "fonte": "laudo"}, ...] (cadastros com tutor).
+    """
+    if not termo or not str(termo).strip():
+        return []
+    try:
+        return obter_indice_busca().buscar(termo=str(termo), limite=limite, exigir_tutor=True)
+    except sqlite3.Error as e:
+        logger.warning("Sugestões sem índice (busca direta no banco): %s", e)
+    # Sem índice: as duas buscas por LIKE, pares de laudo que já são cadastro saem
+    from app.laudos_banco import listar_animais_tutores_de_laudos
+    from app.services.pacientes import buscar_pacientes_por_termo_livre
+
+    cadastro = buscar_pacientes_por_termo_livre(termo=termo, limite=limite)
+    chaves = {(_norm_key(c["paciente"]), _norm_key(c["tutor"])) for c in cadastro}
+    laudos = [
+        r for r in listar_animais_tutores_de_laudos(termo=termo, limite=limite)
+        if (_norm_key(r["paciente"]), _norm_key(r["tutor"])) not in chaves
+    ]
+    return (cadastro + laudos)[:limite]
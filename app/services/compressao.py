@@ -0,0 +1,253 @@
+# Serviço de compressão de BLOBs: recompressão em segundo plano das linhas gravadas antes do codec
+# (fortcordis_modules.blob_codec) e relatório do espaço ocupado/economizado por coluna
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.blob_store import TAMANHO_REFERENCIA, ler_referencia
+from app.config import BLOB_RECOMPRESSAO_LOTE, DB_PATH
+from app.sql_safe import validar_coluna, validar_tabela
+from fortcordis_modules.blob_codec import (
+    ALGORITMO_PADRAO,
+    TAMANHO_CABECALHO,
+    codificar,
+    decodificar,
+    ler_cabecalho,
+)
+
+logger = logging.getLogger(__name__)
+
+# Colunas gravadas pelo codec (tabela, coluna)
+ALVOS = (
+    ("laudos_arquivos", "conteudo_json"),
+    ("laudos_arquivos", "conteudo_pdf"),
+    ("nfse_arquivos", "arquivo_blob"),
+    ("prescricoes_pdfs", "conteudo"),
+)
+
+# Bytes ocupados sem ler o valor; TEXT (JSON de scripts antigos) conta bytes, não caracteres
+_TAMANHO_SQL = "CASE WHEN typeof({col}) = 'text' THEN length(CAST({col} AS BLOB)) ELSE length({col}) END"
+
+_TAMANHO_PREFIXO = max(TAMANHO_CABECALHO, TAMANHO_REFERENCIA)
+
+_lock = threading.Lock()
+_job = {"thread": None, "cancelar": None, "progresso": (0, 0), "resultado": None, "erro": None, "inicio": None}
+
+
+def _tamanho_arquivo(caminho: str) -> int:
+    return sum(os.path.getsize(caminho + suf) for suf in ("", "-wal") if os.path.exists(caminho + suf))
+
+
+def _prefixo(conn: sqlite3.Connection, tabela: str, coluna: str, rowid: int) -> bytes:
+    """Primeiros bytes do valor (cabeçalho do codec ou referência ao object store) sem carregar o BLOB inteiro."""
+    if hasattr(conn, "blobopen"):
+        try:
+            with conn.blobopen(tabela, coluna, rowid, readonly=True) as blob:
+                return blob.read(_TAMANHO_PREFIXO)
+        except sqlite3.OperationalError:
+            pass  # valor TEXT/NULL no meio do caminho: cai para o substr
+    row = conn.execute(
+        f"SELECT substr(CAST({coluna} AS BLOB), 1, ?) FROM {tabela} WHERE rowid = ?", (_TAMANHO_PREFIXO, rowid)
+    ).fetchone()
+    return bytes(row[0]) if row and row[0] is not None else b""
+
+
+def relatorio_compressao(db_path: Optional[str] = None) -> dict:
+    """
+    Espaço ocupado pelos BLOBs de cada coluna do codec, lendo só o cabeçalho de cada valor.
+    Conteúdo movido para o object store (app.blob_store) entra só em externas/bytes_externos.
+    Retorna {"colunas": [{tabela, coluna, linhas, comprimidas, externas, bytes_armazenados, bytes_originais,
+    bytes_externos, economia}], "bytes_armazenados", "bytes_originais", "economia", "paginas_livres_bytes",
+    "arquivo_bytes"}.
+    paginas_livres_bytes: espaço já liberado dentro do arquivo, devolvido ao disco só com VACUUM.
+    """
+    caminho = str(db_path or DB_PATH)
+    conn = sqlite3.connect(caminho, timeout=30)
+    colunas = []
+    try:
+        for tabela, coluna in ALVOS:
+            tab, col = validar_tabela(tabela), validar_coluna(coluna)
+            try:
+                rows = conn.execute(
+                    f"SELECT rowid, {_TAMANHO_SQL.format(col=col)} FROM {tab} WHERE {col} IS NOT NULL"
+                ).fetchall()
+            except sqlite3.OperationalError:
+                continue  # tabela ainda não criada neste banco
+            item = {"tabela": tabela, "coluna": coluna, "linhas": len(rows), "comprimidas": 0, "externas": 0,
+                    "bytes_armazenados": 0, "bytes_originais": 0, "bytes_externos": 0}
+            for rowid, tamanho in rows:
+                tamanho = tamanho or 0
+                inicio = _prefixo(conn, tab, col, rowid) if tamanho >= TAMANHO_CABECALHO else b""
+                ref = ler_referencia(inicio) if tamanho == TAMANHO_REFERENCIA else None
+                if ref:
+                    item["externas"] += 1
+                    item["bytes_externos"] += ref["tamanho"]
+                    continue
+                cab = ler_cabecalho(inicio)
+                item["bytes_armazenados"] += tamanho
+                item["bytes_originais"] += cab["tamanho"] if cab else tamanho
+                item["comprimidas"] += cab is not None
+            item["economia"] = item["bytes_originais"] - item["bytes_armazenados"]
+            colunas.append(item)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    armazenados = sum(c["bytes_armazenados"] for c in colunas)
+    originais = sum(c["bytes_originais"] for c in colunas)
+    return {
+        "colunas": colunas,
+        "bytes_armazenados": armazenados,
+        "bytes_originais": originais,
+        "economia": originais - armazenados,
+        "paginas_livres_bytes": page_size * livres,
+        "arquivo_bytes": _tamanho_arquivo(caminho),
+    }
+
+
+def recomprimir_blobs(
+    db_path: Optional[str] = None,
+    algoritmo: Optional[str] = None,
+    limiar: Optional[int] = None,
+    lote: int = BLOB_RECOMPRESSAO_LOTE,
+    vacuum: bool = False,
+    progresso: Optional[Callable[[int, int], None]] = None,
+    cancelar: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Regrava pelo codec as linhas de ALVOS: comprime as antigas (sem cabeçalho) e recomprime as que
+    estão em outro algoritmo ("nenhum" descomprime tudo). Referências ao object store não mudam. Uma transação curta por lote (keyset por
+    rowid), para não segurar o banco enquanto o app grava. progresso(feitos, total) a cada lote.
+    Retorna {"colunas": {"tabela.coluna": {linhas, alteradas, bytes_antes, bytes_depois}},
+    "bytes_liberados", "arquivo_antes", "arquivo_depois", "cancelado", "segundos"}.
+    """
+    algoritmo = algoritmo or ALGORITMO_PADRAO
+    caminho = str(db_path or DB_PATH)
+    t0 = time.perf_counter()
+    arquivo_antes = _tamanho_arquivo(caminho)
+    conn = sqlite3.connect(caminho, timeout=60)
+    colunas = {}
+    cancelado = False
+    try:
+        existentes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        alvos = [(t, c) for t, c in ALVOS if t in existentes]
+        total = sum(
+            conn.execute(
+                f"SELECT COUNT(*) FROM {validar_tabela(t)} WHERE {validar_coluna(c)} IS NOT NULL"
+            ).fetchone()[0]
+            for t, c in alvos
+        )
+        feitos = 0
+        for tabela, coluna in alvos:
+            tab, col = validar_tabela(tabela), validar_coluna(coluna)
+            stats = {"linhas": 0, "alteradas": 0, "bytes_antes": 0, "bytes_depois": 0}
+            ultimo = 0
+            while not cancelado:
+                if cancelar is not None and cancelar.is_set():
+                    cancelado = True
+                    break
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    f"SELECT rowid, {col} FROM {tab} WHERE rowid > ? AND {col} IS NOT NULL ORDER BY rowid LIMIT ?",
+                    (ultimo, int(lote)),
+                ).fetchall()
+                for rowid, valor in rows:
+                    atual = valor.encode("utf-8") if isinstance(valor, str) else bytes(valor)
+                    cab = ler_cabecalho(atual)
+                    if ler_referencia(atual) or (cab and cab["algoritmo"] == algoritmo):
+                        novo = atual
+                    else:
+                        original = decodificar(atual)
+                        novo = original if algoritmo == "nenhum" else codificar(original, limiar, algoritmo)
+                    if novo != atual or isinstance(valor, str):
+                        conn.execute(f"UPDATE {tab} SET {col} = ? WHERE rowid = ?", (sqlite3.Binary(novo), rowid))
+                        stats["alteradas"] += 1
+                    stats["linhas"] += 1
+                    stats["bytes_antes"] += len(atual)
+                    stats["bytes_depois"] += len(novo)
+                conn.commit()
+                if not rows:
+                    break
+                ultimo = rows[-1][0]
+                feitos += len(rows)
+                if progresso:
+                    progresso(feitos, total)
+            if stats["linhas"]:
+                colunas[f"{tabela}.{coluna}"] = stats
+        if vacuum and not cancelado and any(s["alteradas"] for s in colunas.values()):
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # em WAL, o VACUUM passa pelo -wal
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return {
+        "colunas": colunas,
+        "bytes_liberados": sum(s["bytes_antes"] - s["bytes_depois"] for s in colunas.values()),
+        "arquivo_antes": arquivo_antes,
+        "arquivo_depois": _tamanho_arquivo(caminho),
+        "cancelado": cancelado,
+        "segundos": round(time.perf_counter() - t0, 1),
+    }
+
+
+# ----------------------------------------------------------------------------
+# Job em segundo plano (uma execução por processo do servidor)
+# ----------------------------------------------------------------------------
+
+def _executar_job(kwargs: dict, cancelar: threading.Event) -> None:
+    def _progresso(feitos, total):
+        with _lock:
+            _job["progresso"] = (feitos, total)
+
+    try:
+        resultado = recomprimir_blobs(progresso=_progresso, cancelar=cancelar, **kwargs)
+    except Exception as e:
+        logger.exception("Recompressão de BLOBs falhou")
+        with _lock:
+            _job["erro"] = str(e)
+    else:
+        with _lock:
+            _job["resultado"] = resultado
+
+
+def iniciar_recompressao(**kwargs) -> bool:
+    """
+    Inicia recomprimir_blobs(**kwargs) numa thread do servidor e retorna imediatamente.
+    False se já houver uma recompressão em andamento. Acompanhe com estado_recompressao().
+    """
+    with _lock:
+        if _job["thread"] is not None and _job["thread"].is_alive():
+            return False
+        cancelar = threading.Event()
+        thread = threading.Thread(target=_executar_job, args=(kwargs, cancelar), name="recompressao_blobs", daemon=True)
+        _job.update(thread=thread, cancelar=cancelar, progresso=(0, 0), resultado=None, erro=None,
+                    inicio=datetime.now().isoformat(timespec="seconds"))
+    thread.start()
+    return True
+
+
+def cancelar_recompressao() -> None:
+    """Pede a parada da recompressão em andamento (termina o lote atual, já gravado)."""
+    with _lock:
+        if _job["cancelar"] is not None:
+            _job["cancelar"].set()
+
+
+def estado_recompressao() -> dict:
+    """{"em_andamento", "inicio", "feitos", "total", "resultado" (dict ou None), "erro"}."""
+    with _lock:
+        feitos, total = _job["progresso"]
+        return {
+            "em_andamento": _job["thread"] is not None and _job["thread"].is_alive(),
+            "inicio": _job["inicio"],
+            "feitos": feitos,
+            "total": total,
+            "resultado": _job["resultado"],
+            "erro": _job["erro"],
+        }
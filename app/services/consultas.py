@@ -6,6 +6,7 @@ from typing import Optional, Tuple
 import pandas as pd
 
 from app.config import DB_PATH
+from app.services.timeline import registrar_evento_consulta
 
 logger = logging.getLogger(__name__)
 
@@ -111,6 +112,7 @@ def criar_consulta(
                 cursor.execute("UPDATE pacientes SET peso_kg = ? WHERE id = ?", (peso_kg, paciente_id))
             except Exception:
                 pass
+        registrar_evento_consulta(cursor, consulta_id)
         conn.commit()
         return (consulta_id, None)
     except Exception as e:
@@ -0,0 +1,208 @@
+# Serviço de documentos: geração em lote (receituário, atestado, GTA, termo) em processos paralelos
+import io
+import logging
+import multiprocessing
+import sqlite3
+import threading
+import uuid
+import zipfile
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from app.config import DB_PATH, DOCUMENTOS_WORKERS
+from fortcordis_modules.documentos import RENDERIZADORES, renderizar_documento
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor: Optional[Executor] = None
+# lote_id -> {"itens": [...], "futures": [...]} (vive no processo do servidor, não na sessão)
+_lotes = {}
+
+
+def _obter_executor() -> Executor:
+    """Pool de processos compartilhado (criado na primeira chamada). Usa 'spawn' para não herdar
+    as threads do Streamlit; se o ambiente não permitir processos, cai para um pool de threads."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            try:
+                _executor = ProcessPoolExecutor(
+                    max_workers=DOCUMENTOS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, NotImplementedError, ValueError) as e:
+                logger.warning("Pool de processos indisponível (%s); usando threads", e)
+                _executor = ThreadPoolExecutor(max_workers=DOCUMENTOS_WORKERS, thread_name_prefix="documentos")
+        return _executor
+
+
+def _descartar_executor() -> None:
+    global _executor
+    with _lock:
+        antigo, _executor = _executor, None
+    if antigo is not None:
+        antigo.shutdown(wait=False, cancel_futures=True)
+
+
+def _submeter_itens(executor: Executor, itens: List[dict]) -> list:
+    return [executor.submit(renderizar_documento, item["tipo"], item.get("parametros") or {}) for item in itens]
+
+
+def submeter_lote(itens: List[dict]) -> str:
+    """
+    Enfileira um lote de documentos e retorna imediatamente o id do lote.
+    Cada item: {"tipo": 'receituario'|'atestado'|'gta'|'termo', "parametros": {...}, "nome_arquivo": "x.pdf"}.
+    Acompanhe com status_lote(lote_id) e obtenha os PDFs com resultado_lote / zip_lote.
+    """
+    for item in itens:
+        if item.get("tipo") not in RENDERIZADORES:
+            raise ValueError(f"Tipo de documento desconhecido: {item.get('tipo')}")
+    try:
+        futures = _submeter_itens(_obter_executor(), itens)
+    except BrokenExecutor:
+        # Um processo de trabalho morreu (ex.: falta de memória): recria o pool e tenta de novo
+        logger.warning("Pool de documentos quebrado; recriando")
+        _descartar_executor()
+        futures = _submeter_itens(_obter_executor(), itens)
+    lote_id = uuid.uuid4().hex[:12]
+    with _lock:
+        _lotes[lote_id] = {"itens": list(itens), "futures": futures}
+    return lote_id
+
+
+def _obter_lote(lote_id: str) -> Optional[dict]:
+    with _lock:
+        return _lotes.get(lote_id)
+
+
+def status_lote(lote_id: str) -> dict:
+    """Progresso do lote: total, concluidos, erros, pronto (todos terminaram)."""
+    lote = _obter_lote(lote_id)
+    if not lote:
+        return {"total": 0, "concluidos": 0, "erros": 0, "pronto": False, "existe": False}
+    feitos = [f for f in lote["futures"] if f.done()]
+    erros = sum(1 for f in feitos if f.exception() is not None)
+    total = len(lote["futures"])
+    return {"total": total, "concluidos": len(feitos), "erros": erros, "pronto": len(feitos) == total, "existe": True}
+
+
+def resultado_lote(lote_id: str, timeout: Optional[float] = None) -> list:
+    """
+    Aguarda (até timeout) e retorna uma lista na ordem dos itens:
+    {"nome_arquivo", "tipo", "pdf": bytes | None, "erro": str | None}.
+    """
+    lote = _obter_lote(lote_id)
+    if not lote:
+        return []
+    out = []
+    for item, fut in zip(lote["itens"], lote["futures"]):
+        pdf, erro = None, None
+        try:
+            pdf = fut.result(timeout=timeout)
+        except Exception as e:
+            erro = str(e) or type(e).__name__
+            logger.warning("Falha ao gerar %s (%s): %s", item.get("nome_arquivo"), item.get("tipo"), erro)
+        out.append({"nome_arquivo": item.get("nome_arquivo") or f"{item['tipo']}.pdf", "tipo": item["tipo"],
+                    "pdf": pdf, "erro": erro})
+    return out
+
+
+def zip_lote(lote_id: str, timeout: Optional[float] = None) -> bytes:
+    """Empacota os PDFs gerados do lote em um .zip (itens com erro ficam de fora)."""
+    buf = io.BytesIO()
+    usados = set()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for r in resultado_lote(lote_id, timeout=timeout):
+            if r["pdf"] is None:
+                continue
+            nome = r["nome_arquivo"]
+            if nome in usados:
+                base, ext = (nome.rsplit(".", 1) + ["pdf"])[:2]
+                i = 2
+                while f"{base}_{i}.{ext}" in usados:
+                    i += 1
+                nome = f"{base}_{i}.{ext}"
+            usados.add(nome)
+            zf.writestr(nome, r["pdf"])
+    return buf.getvalue()
+
+
+def descartar_lote(lote_id: str) -> None:
+    """Remove o lote da memória (cancela o que ainda não começou)."""
+    with _lock:
+        lote = _lotes.pop(lote_id, None)
+    if lote:
+        for fut in lote["futures"]:
+            fut.cancel()
+
+
+def _nome_seguro(texto: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in (texto or "").strip()).strip("_") or "sem_nome"
+
+
+def montar_lote_agenda(
+    data_iso: str,
+    incluir_termos: bool = True,
+    incluir_receitas: bool = True,
+    medico: str = "Dr. [Nome]",
+    crmv: str = "CRMV-CE XXXXX",
+    logo_path: Optional[str] = None,
+) -> List[dict]:
+    """
+    Monta os itens de lote para o dia: um termo de consentimento por agendamento (não cancelado)
+    e os receituários das prescrições registradas na data.
+    """
+    itens = []
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        if incluir_termos:
+            try:
+                rows = conn.execute("""
+                    SELECT id, hora, paciente, tutor, servico FROM agendamentos
+                    WHERE data = ? AND COALESCE(status, '') <> 'Cancelado'
+                    ORDER BY hora, id
+                """, (data_iso,)).fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            for ag_id, hora, paciente, tutor, servico in rows:
+                itens.append({
+                    "tipo": "termo",
+                    "nome_arquivo": f"Termo_{(hora or '').replace(':', '')}_{_nome_seguro(paciente)}_{ag_id}.pdf",
+                    "parametros": {
+                        "procedimento": servico or "",
+                        "paciente_nome": paciente or "",
+                        "tutor_nome": tutor or "",
+                        "tutor_cpf": "____________________",
+                        "medico": medico,
+                        "crmv": crmv,
+                        "logo_path": logo_path,
+                    },
+                })
+        if incluir_receitas:
+            try:
+                rows = conn.execute("""
+                    SELECT id, paciente_nome, tutor_nome, especie, peso_kg, texto_prescricao,
+                           medico_veterinario, crmv
+                    FROM prescricoes WHERE data_prescricao = ? ORDER BY id
+                """, (data_iso,)).fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            for p_id, paciente, tutor, especie, peso, texto, med, p_crmv in rows:
+                itens.append({
+                    "tipo": "receituario",
+                    "nome_arquivo": f"Receita_{_nome_seguro(paciente)}_{p_id}.pdf",
+                    "parametros": {
+                        "paciente_nome": paciente or "",
+                        "tutor_nome": tutor or "",
+                        "especie": especie or "",
+                        "peso_kg": peso,
+                        "prescricao_texto": texto or "",
+                        "medico": med or medico,
+                        "crmv": p_crmv or crmv,
+                        "logo_path": logo_path,
+                    },
+                })
+    finally:
+        conn.close()
+    return itens
@@ -1,19 +1,25 @@
 # app/services/financeiro.py
 """Serviços de relatórios e análises financeiras: fluxo de caixa, demonstrativo, lucro realizado, etc."""
 import calendar
+import logging
 import sqlite3
 from datetime import datetime
 from typing import Optional
 
 from app.config import DB_PATH
 from fortcordis_modules.database import (
+    garantir_colunas_financeiro,
     garantir_tabelas_financeiro_extras,
     get_conn,
     listar_contas_a_pagar,
-    listar_financeiro_pendentes,
     listar_movimentos_caixa,
 )
 
+logger = logging.getLogger(__name__)
+
+# Colunas de financeiro conferidas uma vez por processo (o relatório de débito não roda DDL a cada render)
+_colunas_conferidas = {"feito": False}
+
 
 def fluxo_caixa_periodo(data_inicio: str, data_fim: str) -> dict:
     """
@@ -108,49 +114,122 @@ def lucro_realizado(mes: Optional[int] = None, ano: Optional[int] = None) -> flo
     return d["lucro_realizado"]
 
 
-def clientes_em_debito() -> list:
+# Faixas de aging (dias desde o vencimento; sem vencimento, desde a data de competência)
+FAIXAS_AGING = ("0-30", "31-60", "61-90", "90+")
+
+_SQL_DEBITO_POR_CLINICA = """
+    WITH pend AS (
+        SELECT f.clinica_id,
+               COALESCE(f.valor_final, 0) AS valor,
+               CAST(julianday(:data_ref)
+                    - julianday(COALESCE(NULLIF(f.data_vencimento, ''), f.data_competencia)) AS INTEGER) AS dias
+        FROM financeiro f
+        WHERE f.status_pagamento = 'pendente' OR f.status_pagamento IS NULL
+    )
+    SELECT p.clinica_id,
+           COALESCE(c.nome, 'Clínica') AS clinica_nome,
+           SUM(p.valor) AS total_pendente,
+           COUNT(*) AS qtd_os,
+           SUM(CASE WHEN COALESCE(p.dias, 0) <= 30 THEN p.valor ELSE 0 END) AS faixa_0_30,
+           SUM(CASE WHEN p.dias BETWEEN 31 AND 60 THEN p.valor ELSE 0 END) AS faixa_31_60,
+           SUM(CASE WHEN p.dias BETWEEN 61 AND 90 THEN p.valor ELSE 0 END) AS faixa_61_90,
+           SUM(CASE WHEN p.dias > 90 THEN p.valor ELSE 0 END) AS faixa_90_mais,
+           MAX(p.dias) AS dias_atraso_max
+    FROM pend p
+    LEFT JOIN clinicas_parceiras c ON c.id = p.clinica_id
+    GROUP BY p.clinica_id
+    ORDER BY total_pendente DESC
+"""
+
+_SQL_ULTIMAS_OS_POR_CLINICA = """
+    SELECT clinica_id, id, numero_os, valor, data_competencia
+    FROM (
+        SELECT f.clinica_id, f.id, COALESCE(f.numero_os, 'OS-' || f.id) AS numero_os,
+               COALESCE(f.valor_final, 0) AS valor, f.data_competencia,
+               ROW_NUMBER() OVER (
+                   PARTITION BY f.clinica_id ORDER BY f.data_competencia DESC, f.id DESC
+               ) AS rn
+        FROM financeiro f
+        WHERE f.status_pagamento = 'pendente' OR f.status_pagamento IS NULL
+    )
+    WHERE rn <= :limite
+    ORDER BY clinica_id, rn
+"""
+
+
+def clientes_em_debito(data_ref: Optional[str] = None, os_por_clinica: int = 5) -> list:
     """
-    Retorna lista de clínicas (clientes) em débito: OS pendentes com valor e data.
-    Cada item: clinica_id, clinica_nome, total_pendente, qtd_os, lista de OS.
+    Retorna lista de clínicas (clientes) em débito, agregada em SQL (GROUP BY clínica).
+    Cada item: clinica_id, clinica_nome, total_pendente, qtd_os, aging (valor por faixa
+    0-30/31-60/61-90/90+ dias), dias_atraso_max e os_list com as `os_por_clinica` OS mais
+    recentes (qtd_os traz o total). Ordenada pelo maior total pendente.
+    data_ref: data de referência do aging (YYYY-MM-DD); padrão hoje.
+    Erro do banco é registrado e repassado (não vira "nenhuma clínica em débito").
     """
-    pendentes = listar_financeiro_pendentes()
-    by_clinica = {}
-    for p in pendentes:
-        cid = p.get("clinica_id")
-        cnome = p.get("clinica_nome") or "Clínica"
-        if cid not in by_clinica:
-            by_clinica[cid] = {"clinica_id": cid, "clinica_nome": cnome, "total_pendente": 0, "qtd_os": 0, "os_list": []}
-        v = float(p.get("valor_final") or 0)
-        by_clinica[cid]["total_pendente"] += v
-        by_clinica[cid]["qtd_os"] += 1
-        by_clinica[cid]["os_list"].append({"id": p.get("id"), "numero_os": p.get("numero_os"), "valor": v, "data_competencia": p.get("data_competencia")})
-    return list(by_clinica.values())
+    data_ref = data_ref or datetime.now().strftime("%Y-%m-%d")
+    # Bancos antigos: numero_os / data_vencimento podem não existir ainda
+    if not _colunas_conferidas["feito"]:
+        garantir_colunas_financeiro()
+        _colunas_conferidas["feito"] = True
+    conn = get_conn()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(_SQL_DEBITO_POR_CLINICA, {"data_ref": data_ref})
+        grupos = cursor.fetchall()
+        os_por_cid = {}
+        if grupos and os_por_clinica > 0:
+            cursor.execute(_SQL_ULTIMAS_OS_POR_CLINICA, {"limite": int(os_por_clinica)})
+            for cid, fid, numero_os, valor, data_comp in cursor.fetchall():
+                os_por_cid.setdefault(cid, []).append(
+                    {"id": fid, "numero_os": numero_os, "valor": float(valor), "data_competencia": data_comp}
+                )
+    except sqlite3.OperationalError:
+        logger.exception("Falha ao consultar clientes em débito")
+        raise
+    finally:
+        conn.close()
+    out = []
+    for cid, cnome, total, qtd, f0, f1, f2, f3, dias_max in grupos:
+        out.append({
+            "clinica_id": cid,
+            "clinica_nome": cnome,
+            "total_pendente": float(total or 0),
+            "qtd_os": qtd,
+            "aging": dict(zip(FAIXAS_AGING, (float(f0 or 0), float(f1 or 0), float(f2 or 0), float(f3 or 0)))),
+            "dias_atraso_max": max(int(dias_max or 0), 0),
+            "os_list": os_por_cid.get(cid, []),
+        })
+    return out
 
 
 def creditos_clientes() -> list:
     """
-    Retorna lista de clínicas com saldo de crédito > 0 (controle de créditos de clientes).
+    Retorna lista de clínicas com saldo de crédito > 0 (controle de créditos de clientes),
+    com o total pendente em OS e o saldo líquido (crédito - pendente), numa única consulta.
     """
-    garantir_tabelas_financeiro_extras()
     conn = get_conn()
     conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
     try:
-        cursor.execute("PRAGMA table_info(clinicas_parceiras)")
-        cols = [r[1].lower() for r in cursor.fetchall()]
-        if "saldo_credito" not in cols:
-            conn.close()
-            return []
-        cursor.execute("""
-            SELECT id, nome, COALESCE(saldo_credito, 0) as saldo_credito
-            FROM clinicas_parceiras WHERE (ativo = 1 OR ativo IS NULL) AND COALESCE(saldo_credito, 0) > 0
+        rows = conn.execute("""
+            SELECT c.id, c.nome, COALESCE(c.saldo_credito, 0) AS saldo_credito,
+                   COALESCE(p.total_pendente, 0) AS total_pendente,
+                   COALESCE(c.saldo_credito, 0) - COALESCE(p.total_pendente, 0) AS saldo_liquido
+            FROM clinicas_parceiras c
+            LEFT JOIN (
+                SELECT clinica_id, SUM(COALESCE(valor_final, 0)) AS total_pendente
+                FROM financeiro
+                WHERE status_pagamento = 'pendente' OR status_pagamento IS NULL
+                GROUP BY clinica_id
+            ) p ON p.clinica_id = c.id
+            WHERE (c.ativo = 1 OR c.ativo IS NULL) AND COALESCE(c.saldo_credito, 0) > 0
             ORDER BY saldo_credito DESC
-        """)
-        rows = cursor.fetchall()
+        """).fetchall()
         out = [dict(r) for r in rows]
-    except Exception:
+    except sqlite3.OperationalError:
+        # Banco sem saldo_credito (tabelas estendidas ainda não criadas)
         out = []
-    conn.close()
+    finally:
+        conn.close()
     return out
 
 
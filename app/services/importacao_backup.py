@@ -0,0 +1,544 @@
+# Importação de um backup .db (exportar_backup.py / exportar_backup_partes.py) para o banco do app: clínicas,
+# tutores, pacientes, clínicas parceiras, laudos e exames da pasta (laudos_arquivos + imagens), remapeando os ids
+# e reaproveitando o que já existe. Sem Streamlit: a página de Configurações roda como job em segundo plano
+# (app.services.jobs) e mostra o relatório
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.blob_store import gravar_blob
+from app.config import DB_PATH
+from app.laudos_dedup import garantir_fingerprints, upsert_exame, upsert_laudo_arquivo
+from app.laudos_medidas import backfill_medidas
+from app.services.busca_pacientes import invalidar_busca_pacientes
+from app.sql_safe import validar_coluna, validar_tabela
+from app.utils import _norm_key
+
+# Etapas relatadas em progresso(feitos, ETAPAS)
+ETAPAS = 8
+
+
+def importar_backup(
+    caminho_backup: str,
+    limpar_laudos: bool = False,
+    db_path: Optional[str] = None,
+    progresso: Optional[Callable[[int, int], None]] = None,
+    cancelar: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Importa o backup em caminho_backup para o banco (commit por etapa e por lote; um erro numa etapa fica em
+    "erros" e as seguintes continuam). limpar_laudos apaga os laudos do banco antes. progresso(etapa, ETAPAS) ao
+    fim de cada etapa; com cancelar setado para entre etapas/lotes, mantendo o que já foi gravado.
+    Retorna {"backup": {clinicas, tutores, pacientes, laudos, clinicas_parceiras, laudos_arquivos},
+    "novos": {...mesmas chaves}, "existentes": {clinicas, tutores, laudos, laudos_arquivos},
+    "erros": [(etapa, mensagem)], "cancelado", "segundos"}.
+    """
+    from app.laudos_banco import _criar_tabelas_laudos_se_nao_existirem  # laudos_banco importa app.services
+
+    t0 = time.perf_counter()
+    erros_import = []
+    conn_backup = None
+    conn_local = None
+
+    def _parar() -> bool:
+        return cancelar is not None and cancelar.is_set()
+
+    def _etapa(n: int) -> None:
+        if progresso:
+            progresso(n, ETAPAS)
+
+    try:
+        conn_backup = sqlite3.connect(str(caminho_backup))
+        conn_backup.row_factory = sqlite3.Row
+        cur_b = conn_backup.cursor()
+        # Tabelas presentes no backup (backup em partes pode ter só algumas)
+        cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+        tabelas_no_backup = {r[0] for r in cur_b.fetchall()}
+        def _count_backup(tabela):
+            try:
+                tab = validar_tabela(tabela)
+                cur_b.execute(f"SELECT COUNT(*) FROM {tab}")
+                return cur_b.fetchone()[0]
+            except (sqlite3.OperationalError, ValueError):
+                return 0
+        n_c_b, n_t_b = _count_backup("clinicas"), _count_backup("tutores")
+        n_p_b = _count_backup("pacientes")
+        n_l_b = _count_backup("laudos_ecocardiograma") + _count_backup("laudos_eletrocardiograma") + _count_backup("laudos_pressao_arterial")
+        n_cp_b = _count_backup("clinicas_parceiras")
+        n_laudos_arq_b = _count_backup("laudos_arquivos")
+        rel_backup = {"clinicas": n_c_b, "tutores": n_t_b, "pacientes": n_p_b, "laudos": n_l_b,
+                      "clinicas_parceiras": n_cp_b, "laudos_arquivos": n_laudos_arq_b}
+        # Usar apenas conexão nova (não _db_conn em cache) para evitar "Cannot operate on a closed database"
+        conn_local = sqlite3.connect(str(db_path or DB_PATH), timeout=60)
+        cur_l = conn_local.cursor()
+        # Inicializar tabelas com conn_local (sem chamar _db_init que usa cache)
+        cur_l.execute("""CREATE TABLE IF NOT EXISTS clinicas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            nome_key TEXT NOT NULL UNIQUE,
+            created_at TEXT NOT NULL
+        )""")
+        cur_l.execute("""CREATE TABLE IF NOT EXISTS tutores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            nome_key TEXT NOT NULL UNIQUE,
+            telefone TEXT,
+            created_at TEXT NOT NULL
+        )""")
+        cur_l.execute("""CREATE TABLE IF NOT EXISTS pacientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tutor_id INTEGER NOT NULL,
+            nome TEXT NOT NULL,
+            nome_key TEXT NOT NULL,
+            especie TEXT NOT NULL DEFAULT '',
+            raca TEXT,
+            sexo TEXT,
+            nascimento TEXT,
+            created_at TEXT NOT NULL,
+            UNIQUE(tutor_id, nome_key, especie),
+            FOREIGN KEY(tutor_id) REFERENCES tutores(id)
+        )""")
+        for col, tipo in [("ativo", "INTEGER DEFAULT 1"), ("peso_kg", "REAL"), ("microchip", "TEXT"), ("observacoes", "TEXT")]:
+            try:
+                c = validar_coluna(col)
+                cur_l.execute(f"ALTER TABLE pacientes ADD COLUMN {c} {tipo}")
+            except (sqlite3.OperationalError, ValueError):
+                pass
+        for col, tipo in [("whatsapp", "TEXT"), ("ativo", "INTEGER DEFAULT 1")]:
+            try:
+                c = validar_coluna(col)
+                cur_l.execute(f"ALTER TABLE tutores ADD COLUMN {c} {tipo}")
+            except (sqlite3.OperationalError, ValueError):
+                pass
+        _criar_tabelas_laudos_se_nao_existirem(cur_l)
+        # Garantir colunas nome_clinica e nome_tutor ANTES de importar laudos
+        for _tab in ("laudos_ecocardiograma", "laudos_eletrocardiograma", "laudos_pressao_arterial"):
+            for _col, _tipo in [("nome_clinica", "TEXT"), ("nome_tutor", "TEXT")]:
+                try:
+                    t = validar_tabela(_tab)
+                    c = validar_coluna(_col)
+                    cur_l.execute(f"ALTER TABLE {t} ADD COLUMN {c} {_tipo}")
+                except (sqlite3.OperationalError, ValueError):
+                    pass
+        # Garantir que clinicas_parceiras existe (pode não existir em deploy novo)
+        cur_l.execute("""
+            CREATE TABLE IF NOT EXISTS clinicas_parceiras (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL UNIQUE,
+                endereco TEXT,
+                bairro TEXT,
+                cidade TEXT,
+                telefone TEXT,
+                whatsapp TEXT,
+                email TEXT,
+                cnpj TEXT,
+                inscricao_estadual TEXT,
+                responsavel_veterinario TEXT,
+                crmv_responsavel TEXT,
+                observacoes TEXT,
+                ativo INTEGER DEFAULT 1,
+                data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur_l.execute("""
+            CREATE TABLE IF NOT EXISTS laudos_arquivos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                data_exame TEXT NOT NULL,
+                nome_animal TEXT,
+                nome_tutor TEXT,
+                nome_clinica TEXT,
+                tipo_exame TEXT DEFAULT 'ecocardiograma',
+                nome_base TEXT UNIQUE,
+                conteudo_json BLOB,
+                conteudo_pdf BLOB,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur_l.execute("""
+            CREATE TABLE IF NOT EXISTS laudos_arquivos_imagens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                laudo_arquivo_id INTEGER NOT NULL,
+                ordem INTEGER DEFAULT 0,
+                nome_arquivo TEXT,
+                conteudo BLOB,
+                FOREIGN KEY(laudo_arquivo_id) REFERENCES laudos_arquivos(id)
+            )
+        """)
+        conn_local.commit()
+        # Fingerprint (chave natural) nos exames: reimportar o mesmo backup atualiza em vez de duplicar
+        garantir_fingerprints(conn_local)
+        if limpar_laudos:
+            for _t in ("laudos_ecocardiograma", "laudos_eletrocardiograma", "laudos_pressao_arterial"):
+                try:
+                    t = validar_tabela(_t)
+                    cur_l.execute(f"DELETE FROM {t}")
+                except (sqlite3.OperationalError, ValueError):
+                    pass
+            conn_local.commit()
+        _etapa(1)
+        map_clinica = {}
+        map_clinica_parceiras = {}
+        map_tutor = {}
+        map_paciente = {}
+        total_c, total_t, total_p, total_l, total_cp, total_laudos_arq = 0, 0, 0, 0, 0, 0
+        reused_l, reused_laudos_arq = 0, 0
+        reused_c, reused_t = 0, 0
+        # 1) Clinicas (tabela simples) — evita duplicata por nome_key; SELECT só colunas que existem no backup
+        try:
+            if _parar() or "clinicas" not in tabelas_no_backup:
+                pass  # backup em partes: este arquivo pode não ter base
+            else:
+                cur_b.execute("PRAGMA table_info(clinicas)")
+                cols_c = [c[1] for c in cur_b.fetchall()]
+                if not cols_c:
+                    erros_import.append(("clinicas", "Tabela clinicas vazia ou sem colunas no backup"))
+                else:
+                    tem_nome_key = "nome_key" in cols_c
+                    tem_created = "created_at" in cols_c
+                    sel_c = "SELECT " + ", ".join(cols_c) + " FROM clinicas"
+                    cur_b.execute(sel_c)
+                    for row in cur_b.fetchall():
+                        row = dict(row)
+                        nome_key = (row.get("nome_key") or "").strip() if tem_nome_key else _norm_key(row.get("nome") or "")
+                        if not nome_key:
+                            nome_key = _norm_key(row.get("nome") or "") or "sem_nome"
+                        r = cur_l.execute("SELECT id FROM clinicas WHERE nome_key=?", (nome_key,)).fetchone()
+                        if r:
+                            novo_id = r[0] if isinstance(r, (list, tuple)) else r["id"]
+                            reused_c += 1
+                        else:
+                            cur_l.execute(
+                                "INSERT INTO clinicas (nome, nome_key, created_at) VALUES (?,?,?)",
+                                (row.get("nome") or "", nome_key, row.get("created_at") if tem_created else datetime.now().isoformat()),
+                            )
+                            novo_id = cur_l.lastrowid
+                            total_c += 1
+                        map_clinica[int(row["id"])] = novo_id
+        except sqlite3.OperationalError as e:
+            erros_import.append(("clinicas", str(e)))
+        except Exception as e:
+            erros_import.append(("clinicas", f"{type(e).__name__}: {e}"))
+        conn_local.commit()
+        _etapa(2)
+        # 2) Tutores — evita duplicata por nome_key; SELECT só colunas que existem no backup
+        try:
+            if _parar() or "tutores" not in tabelas_no_backup:
+                pass
+            else:
+                cur_b.execute("PRAGMA table_info(tutores)")
+                cols_t = [c[1] for c in cur_b.fetchall()]
+                if not cols_t:
+                    erros_import.append(("tutores", "Tabela tutores vazia ou sem colunas no backup"))
+                else:
+                    tem_nome_key_t = "nome_key" in cols_t
+                    tem_created_t = "created_at" in cols_t
+                    sel_t = "SELECT " + ", ".join(cols_t) + " FROM tutores"
+                    cur_b.execute(sel_t)
+                    for row in cur_b.fetchall():
+                        row = dict(row)
+                        nome_key_t = (row.get("nome_key") or "").strip() if tem_nome_key_t else _norm_key(row.get("nome") or "")
+                        if not nome_key_t:
+                            nome_key_t = _norm_key(row.get("nome") or "") or "sem_nome"
+                        r = cur_l.execute("SELECT id FROM tutores WHERE nome_key=?", (nome_key_t,)).fetchone()
+                        if r:
+                            novo_id = r[0] if isinstance(r, (list, tuple)) else r["id"]
+                            reused_t += 1
+                        else:
+                            cur_l.execute(
+                                "INSERT INTO tutores (nome, nome_key, telefone, created_at) VALUES (?,?,?,?)",
+                                (row.get("nome") or "", nome_key_t, row.get("telefone") or None, row.get("created_at") if tem_created_t else datetime.now().isoformat()),
+                            )
+                            novo_id = cur_l.lastrowid
+                            total_t += 1
+                        map_tutor[int(row["id"])] = novo_id
+        except sqlite3.OperationalError as e:
+            erros_import.append(("tutores", str(e)))
+        except Exception as e:
+            erros_import.append(("tutores", f"{type(e).__name__}: {e}"))
+        conn_local.commit()
+        _etapa(3)
+        # 3) Pacientes (usar map_tutor; evita duplicata por tutor_id + nome_key + especie; SELECT só colunas que existem no backup)
+        try:
+            if _parar() or "pacientes" not in tabelas_no_backup:
+                pass
+            else:
+                cur_b.execute("PRAGMA table_info(pacientes)")
+                cols_p = [c[1] for c in cur_b.fetchall()]
+                tem_nome_key_p = "nome_key" in cols_p
+                tem_created_p = "created_at" in cols_p
+                sel_p = "SELECT " + ", ".join(cols_p) + " FROM pacientes"
+                cur_b.execute(sel_p)
+                for row in cur_b.fetchall():
+                    row = dict(row)
+                    novo_tutor_id = map_tutor.get(int(row["tutor_id"])) if row.get("tutor_id") is not None else None
+                    if novo_tutor_id is None:
+                        continue
+                    especie_val = row.get("especie") or ""
+                    nome_key_p = (row.get("nome_key") or "").strip() if tem_nome_key_p else _norm_key(row.get("nome") or "")
+                    if not nome_key_p:
+                        nome_key_p = _norm_key(row.get("nome") or "") or "sem_nome"
+                    r = cur_l.execute(
+                        "SELECT id FROM pacientes WHERE tutor_id=? AND nome_key=? AND especie=?",
+                        (novo_tutor_id, nome_key_p, especie_val),
+                    ).fetchone()
+                    if r:
+                        novo_id = r[0] if isinstance(r, (list, tuple)) else r["id"]
+                    else:
+                        cur_l.execute(
+                            """INSERT INTO pacientes (tutor_id, nome, nome_key, especie, raca, sexo, nascimento, created_at)
+                               VALUES (?,?,?,?,?,?,?,?)""",
+                            (
+                                novo_tutor_id,
+                                row.get("nome") or "",
+                                nome_key_p,
+                                especie_val,
+                                row.get("raca"),
+                                row.get("sexo"),
+                                row.get("nascimento"),
+                                row.get("created_at") if tem_created_p else datetime.now().isoformat(),
+                            ),
+                        )
+                        novo_id = cur_l.lastrowid
+                        total_p += 1
+                    map_paciente[int(row["id"])] = novo_id
+        except sqlite3.OperationalError as e:
+            erros_import.append(("pacientes", str(e)))
+        except Exception as e:
+            erros_import.append(("pacientes", f"{type(e).__name__}: {e}"))
+        conn_local.commit()
+        _etapa(4)
+        # 4) Clinicas parceiras (INSERT OR IGNORE por nome; só colunas que existem no destino)
+        try:
+            cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='clinicas_parceiras'")
+            if cur_b.fetchone() and not _parar():
+                cur_l.execute("PRAGMA table_info(clinicas_parceiras)")
+                dest_cp = [c[1] for c in cur_l.fetchall()]
+                cur_b.execute("PRAGMA table_info(clinicas_parceiras)")
+                cols_cp = [c[1] for c in cur_b.fetchall()]
+                cols_cp_insert = [c for c in dest_cp if c != "id" and c in cols_cp]
+                if not cols_cp_insert:
+                    cols_cp_insert = [c for c in dest_cp if c != "id"]
+                cur_b.execute("SELECT * FROM clinicas_parceiras")
+                erro_cp_msg = None
+                for row in cur_b.fetchall():
+                    row_dict = dict(zip(cols_cp, row))
+                    old_id = row_dict.get("id")
+                    nome_cp = (row_dict.get("nome") or "").strip() if row_dict.get("nome") is not None else ""
+                    vals_cp = [row_dict.get(c) for c in cols_cp_insert]
+                    placeholders_cp = ", ".join(["?" for _ in cols_cp_insert])
+                    try:
+                        cur_l.execute(
+                            f"INSERT OR IGNORE INTO clinicas_parceiras ({', '.join(cols_cp_insert)}) VALUES ({placeholders_cp})",
+                            vals_cp,
+                        )
+                        # sqlite3 rowcount pode ser -1; lastrowid > 0 indica inserção nova
+                        if getattr(cur_l, "lastrowid", 0) and cur_l.lastrowid > 0:
+                            total_cp += 1
+                            if old_id is not None:
+                                map_clinica_parceiras[int(old_id)] = cur_l.lastrowid
+                    except sqlite3.OperationalError as e:
+                        if erro_cp_msg is None:
+                            erro_cp_msg = str(e)
+                    if nome_cp and old_id is not None and int(old_id) not in map_clinica_parceiras:
+                        r = cur_l.execute("SELECT id FROM clinicas_parceiras WHERE nome=?", (nome_cp,)).fetchone()
+                        novo_id = (r[0] if isinstance(r, (list, tuple)) else r["id"]) if r else None
+                        if novo_id is not None:
+                            map_clinica_parceiras[int(old_id)] = novo_id
+                if erro_cp_msg:
+                    erros_import.append(("clinicas_parceiras", erro_cp_msg))
+        except sqlite3.OperationalError as e:
+            erros_import.append(("clinicas_parceiras", str(e)))
+        except Exception as e:
+            erros_import.append(("clinicas_parceiras", f"{type(e).__name__}: {e}"))
+        conn_local.commit()
+        _etapa(5)
+        # 5) Laudos (mapear paciente_id e clinica_id; só inserir colunas que existem no destino)
+        # Só processar tabelas de laudos que existem no backup (evitar "no such table")
+        cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN ('laudos_ecocardiograma','laudos_eletrocardiograma','laudos_pressao_arterial')")
+        tabelas_laudos_no_backup = [] if _parar() else [r[0] for r in cur_b.fetchall()]
+        BATCH_LAUDOS_TABELAS = 30  # Processar laudos em lotes para reduzir pico de memória
+        for tabela in tabelas_laudos_no_backup:
+            try:
+                cur_l.execute(f"PRAGMA table_info({tabela})")
+                colunas_destino = [c[1] for c in cur_l.fetchall()]
+                cur_b.execute(f"SELECT * FROM {tabela}")
+                cur_b.execute(f"PRAGMA table_info({tabela})")
+                colunas_laudo = [c[1] for c in cur_b.fetchall()]
+                colunas_sem_id = [c for c in colunas_laudo if c not in ("id", "fingerprint") and c in colunas_destino]
+                for col_extra in ("nome_paciente", "nome_clinica", "nome_tutor"):
+                    if col_extra in colunas_destino and col_extra not in colunas_sem_id:
+                        colunas_sem_id.append(col_extra)
+                if not colunas_sem_id:
+                    continue
+                cur_b.execute(f"SELECT * FROM {tabela}")
+                # Nomes do backup por outro cursor: um execute em cur_b reiniciaria o fetchmany
+                while True:
+                    rows_laudo = cur_b.fetchmany(BATCH_LAUDOS_TABELAS)
+                    if not rows_laudo or _parar():
+                        break
+                    for row in rows_laudo:
+                        row_d = dict(zip(colunas_laudo, row))
+                        old_paciente_id = int(row_d["paciente_id"]) if row_d.get("paciente_id") else None
+                        novo_paciente_id = map_paciente.get(old_paciente_id) if old_paciente_id is not None else None
+                        old_clinica_id = int(row_d["clinica_id"]) if row_d.get("clinica_id") else None
+                        novo_clinica_id = (map_clinica_parceiras.get(old_clinica_id) or map_clinica.get(old_clinica_id)) if old_clinica_id is not None else None
+                        row_d["paciente_id"] = novo_paciente_id
+                        row_d["clinica_id"] = novo_clinica_id
+                        if old_paciente_id is not None:
+                            try:
+                                r_bp = conn_backup.execute("SELECT nome FROM pacientes WHERE id=?", (old_paciente_id,)).fetchone()
+                                if r_bp:
+                                    row_d["nome_paciente"] = (r_bp[0] if isinstance(r_bp, (list, tuple)) else r_bp["nome"]) or ""
+                            except Exception:
+                                pass
+                        if old_clinica_id is not None:
+                            try:
+                                r_bc = conn_backup.execute("SELECT nome FROM clinicas WHERE id=?", (old_clinica_id,)).fetchone()
+                                if not r_bc:
+                                    r_bc = conn_backup.execute("SELECT nome FROM clinicas_parceiras WHERE id=?", (old_clinica_id,)).fetchone()
+                                if r_bc:
+                                    row_d["nome_clinica"] = (r_bc[0] if isinstance(r_bc, (list, tuple)) else r_bc["nome"]) or ""
+                            except Exception:
+                                pass
+                        if old_paciente_id is not None:
+                            try:
+                                r_bt = conn_backup.execute(
+                                    "SELECT t.nome FROM pacientes p JOIN tutores t ON t.id = p.tutor_id WHERE p.id=?",
+                                    (old_paciente_id,),
+                                ).fetchone()
+                                if r_bt:
+                                    row_d["nome_tutor"] = (r_bt[0] if isinstance(r_bt, (list, tuple)) else r_bt["nome"]) or ""
+                            except Exception:
+                                pass
+                        vals = []
+                        for c in colunas_sem_id:
+                            if c == "arquivo_xml":
+                                vals.append(row_d.get("arquivo_xml") or row_d.get("arquivo_json"))
+                            elif c in ("nome_paciente", "nome_clinica", "nome_tutor"):
+                                vals.append(row_d.get(c) or "")
+                            else:
+                                vals.append(row_d.get(c))
+                        try:
+                            _lid, _criado = upsert_exame(cur_l, tabela, colunas_sem_id, vals)
+                            if _criado:
+                                total_l += 1
+                            else:
+                                reused_l += 1
+                        except sqlite3.OperationalError as e:
+                            erros_import.append((f"laudos_{tabela}", str(e)))
+                    conn_local.commit()
+            except sqlite3.OperationalError as e:
+                erros_import.append((tabela, str(e)))
+        # Preencher nome_paciente, nome_clinica e nome_tutor quando vazios (a partir das tabelas vinculadas no destino)
+        for tabela in ("laudos_ecocardiograma", "laudos_eletrocardiograma", "laudos_pressao_arterial"):
+            try:
+                cur_l.execute(f"""UPDATE {tabela} SET nome_paciente = (SELECT nome FROM pacientes WHERE pacientes.id = {tabela}.paciente_id)
+                    WHERE (nome_paciente IS NULL OR TRIM(COALESCE(nome_paciente, '')) = '') AND paciente_id IS NOT NULL""")
+                cur_l.execute(f"""UPDATE {tabela} SET nome_clinica = COALESCE(
+                    (SELECT nome FROM clinicas WHERE clinicas.id = {tabela}.clinica_id),
+                    (SELECT nome FROM clinicas_parceiras WHERE clinicas_parceiras.id = {tabela}.clinica_id)
+                    ) WHERE clinica_id IS NOT NULL AND (nome_clinica IS NULL OR TRIM(COALESCE(nome_clinica, '')) = '')""")
+                cur_l.execute(f"""UPDATE {tabela} SET nome_tutor = (SELECT t.nome FROM pacientes p JOIN tutores t ON t.id = p.tutor_id WHERE p.id = {tabela}.paciente_id)
+                    WHERE paciente_id IS NOT NULL AND (nome_tutor IS NULL OR TRIM(COALESCE(nome_tutor, '')) = '')""")
+            except sqlite3.OperationalError:
+                pass
+        conn_local.commit()
+        _etapa(6)
+        # 6) Laudos da pasta (laudos_arquivos + laudos_arquivos_imagens) — copiar do backup com commit em lotes
+        cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='laudos_arquivos'")
+        if cur_b.fetchone() and not _parar():
+            try:
+                cur_b.execute("PRAGMA table_info(laudos_arquivos)")
+                cols_arq = [c[1] for c in cur_b.fetchall()]
+                cur_b.execute("SELECT * FROM laudos_arquivos")
+                map_laudo_arq = {}
+                laudos_arq_existentes = set()  # já estavam no destino: imagens do backup substituem as atuais
+                BATCH_LAUDOS = 50
+                i = 0
+                while True:
+                    rows_batch = cur_b.fetchmany(BATCH_LAUDOS)
+                    if not rows_batch or _parar():
+                        break
+                    for row in rows_batch:
+                        row_d = dict(zip(cols_arq, row))
+                        old_id = row_d.get("id")
+                        new_id, _criado = upsert_laudo_arquivo(
+                            cur_l,
+                            row_d.get("nome_base"),
+                            row_d.get("data_exame") or "",
+                            row_d.get("nome_animal"),
+                            row_d.get("nome_tutor"),
+                            row_d.get("nome_clinica"),
+                            row_d.get("tipo_exame"),
+                            row_d.get("conteudo_json"),
+                            row_d.get("conteudo_pdf"),
+                            created_at=row_d.get("created_at"),
+                        )
+                        if old_id is not None:
+                            map_laudo_arq[int(old_id)] = new_id
+                        if _criado:
+                            total_laudos_arq += 1
+                        else:
+                            laudos_arq_existentes.add(new_id)
+                            reused_laudos_arq += 1
+                        i += 1
+                    conn_local.commit()
+                cur_b.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='laudos_arquivos_imagens'")
+                if cur_b.fetchone():
+                    cur_b.execute("PRAGMA table_info(laudos_arquivos_imagens)")
+                    cols_img = [c[1] for c in cur_b.fetchall()]
+                    cols_img_sem_id = [c for c in cols_img if c != "id"]
+                    cur_b.execute("SELECT * FROM laudos_arquivos_imagens")
+                    i2 = 0
+                    while True:
+                        rows_img_batch = cur_b.fetchmany(BATCH_LAUDOS)
+                        if not rows_img_batch or _parar():
+                            break
+                        for row in rows_img_batch:
+                            row_d = dict(zip(cols_img, row))
+                            old_laudo_id = row_d.get("laudo_arquivo_id")
+                            new_laudo_id = map_laudo_arq.get(int(old_laudo_id)) if old_laudo_id is not None else None
+                            if new_laudo_id is not None:
+                                if new_laudo_id in laudos_arq_existentes:
+                                    cur_l.execute("DELETE FROM laudos_arquivos_imagens WHERE laudo_arquivo_id = ?", (new_laudo_id,))
+                                    laudos_arq_existentes.discard(new_laudo_id)
+                                row_d["laudo_arquivo_id"] = new_laudo_id
+                                row_d["conteudo"] = gravar_blob(row_d.get("conteudo"))
+                                vals_img = [row_d.get(c) for c in cols_img_sem_id]
+                                cur_l.execute(
+                                    f"INSERT INTO laudos_arquivos_imagens ({', '.join(cols_img_sem_id)}) VALUES ({', '.join(['?'] * len(cols_img_sem_id))})",
+                                    vals_img,
+                                )
+                            i2 += 1
+                        conn_local.commit()
+            except sqlite3.OperationalError as e:
+                erros_import.append(("laudos_arquivos", str(e)))
+        conn_local.commit()
+        _etapa(7)
+        # 7) Medidas dos exames importados/atualizados para laudos_medidas (pool de processos)
+        if (total_laudos_arq or reused_laudos_arq) and not _parar():
+            try:
+                backfill_medidas(db_path=db_path)
+            except Exception as e:
+                erros_import.append(("laudos_medidas", str(e)))
+        _etapa(8)
+    finally:
+        for conn in (conn_backup, conn_local):
+            try:
+                if conn is not None:
+                    conn.close()
+            except Exception:
+                pass
+        invalidar_busca_pacientes()
+    return {
+        "backup": rel_backup,
+        "novos": {"clinicas": total_c, "tutores": total_t, "pacientes": total_p, "laudos": total_l,
+                  "clinicas_parceiras": total_cp, "laudos_arquivos": total_laudos_arq},
+        "existentes": {"clinicas": reused_c, "tutores": reused_t, "laudos": reused_l,
+                       "laudos_arquivos": reused_laudos_arq},
+        "erros": erros_import,
+        "cancelado": _parar(),
+        "segundos": round(time.perf_counter() - t0, 1),
+    }
@@ -0,0 +1,362 @@
+# Serviço de ingestão automática da pasta de laudos: uma thread do servidor observa PASTA_LAUDOS e grava em
+# laudos_arquivos os exames (<nome_base>.json + .pdf + __IMG_*) novos ou alterados, em lotes pelo escritor único;
+# o cursor persistido (ingestao_pasta_laudos) guarda a assinatura de cada exame e evita reler o que não mudou
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.config import (
+    DB_PATH,
+    INGESTAO_ATIVA,
+    INGESTAO_DEBOUNCE_S,
+    INGESTAO_LOTE,
+    INGESTAO_POLL_S,
+    INGESTAO_REVARRER_S,
+    PASTA_LAUDOS,
+)
+from fortcordis_modules.escritor import escrever
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # dependência opcional: sem ela a pasta é varrida a cada INGESTAO_POLL_S
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# Mesmo padrão de importar_pasta_laudos_para_banco.py: <nome_base>__IMG_NN.<ext>
+_MARCA_IMAGEM = "__IMG_"
+
+_lock = threading.Lock()
+_lock_passada = threading.Lock()
+# pasta -> {nome_base: assinatura} já ingerida (carregado do banco na primeira passada)
+_cursores = {}
+_estado = {"thread": None, "observador": None, "modo": None, "acordar": threading.Event(), "pasta": None,
+           "ultima_passada": None, "ultimo_resultado": None, "ingeridos": 0, "erros": 0, "erro": None}
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def garantir_tabela_cursor(conn: sqlite3.Connection) -> None:
+    """ingestao_pasta_laudos: uma linha por exame da pasta com a assinatura (nome/mtime/tamanho) dos arquivos ingeridos."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingestao_pasta_laudos (
+            pasta TEXT NOT NULL,
+            nome_base TEXT NOT NULL,
+            assinatura TEXT NOT NULL,
+            laudo_arquivo_id INTEGER,
+            erro TEXT,
+            ingerido_em TEXT,
+            PRIMARY KEY (pasta, nome_base)
+        )
+    """)
+
+
+def _papel_arquivo(nome: str) -> Optional[tuple]:
+    """(nome_base, "json" | "pdf" | "imagem") do arquivo da pasta; None para o que não faz parte de um exame."""
+    i = nome.find(_MARCA_IMAGEM)
+    if i > 0:
+        return (nome[:i], "imagem") if "." in nome[i:] else None
+    if nome.endswith(".json"):
+        return nome[:-5], "json"
+    if nome.endswith(".pdf"):
+        return nome[:-4], "pdf"
+    return None
+
+
+def varrer_pasta(pasta) -> dict:
+    """
+    Agrupa os arquivos da pasta por exame, só com os stat() do scandir (nenhum conteúdo é lido).
+    Retorna {nome_base: {"json", "pdf", "imagens", "arquivos", "assinatura", "mtime_ns"}} dos exames com JSON.
+    """
+    grupos = {}
+    with os.scandir(str(pasta)) as it:
+        for entrada in it:
+            papel = _papel_arquivo(entrada.name)
+            if papel is None or not entrada.is_file():
+                continue
+            st_ = entrada.stat()
+            g = grupos.setdefault(papel[0], {"json": None, "pdf": None, "imagens": [], "arquivos": []})
+            if papel[1] == "imagem":
+                g["imagens"].append(entrada.name)
+            else:
+                g[papel[1]] = entrada.name
+            g["arquivos"].append((entrada.name, st_.st_mtime_ns, st_.st_size))
+    exames = {}
+    for nome_base, g in grupos.items():
+        if not g["json"]:
+            continue  # PDF/imagens sem JSON: ainda sendo gravados ou avulsos
+        g["imagens"].sort()
+        g["arquivos"].sort()
+        g["assinatura"] = hashlib.sha1(repr(g["arquivos"]).encode("utf-8")).hexdigest()
+        g["mtime_ns"] = max(m for _, m, _ in g["arquivos"])
+        exames[nome_base] = g
+    return exames
+
+
+def _inalterado(pasta: str, g: dict) -> bool:
+    """Os arquivos do exame continuam com o mesmo mtime/tamanho da varredura (nada foi escrito durante a leitura)."""
+    for nome, mtime_ns, tamanho in g["arquivos"]:
+        try:
+            st_ = os.stat(os.path.join(pasta, nome))
+        except OSError:
+            return False
+        if (st_.st_mtime_ns, st_.st_size) != (mtime_ns, tamanho):
+            return False
+    return True
+
+
+def _tipo_exame(obj: dict) -> str:
+    """Tipo pelas medidas presentes no JSON (mesma regra do importar_pasta_laudos_para_banco.py)."""
+    medidas = obj.get("medidas") or {}
+    if isinstance(medidas, dict):
+        if "pressao_sistolica" in medidas or "pressao_diastolica" in medidas:
+            return "pressao_arterial"
+        if "ritmo" in medidas or "frequencia_cardiaca" in medidas:
+            return "eletrocardiograma"
+    return "ecocardiograma"
+
+
+def _ler_bytes(pasta: str, nome: str) -> bytes:
+    with open(os.path.join(pasta, nome), "rb") as f:
+        return f.read()
+
+
+def _ler_exame(pasta: str, nome_base: str, g: dict) -> dict:
+    """Argumentos de gravar_laudo_arquivo para o exame; levanta OSError/ValueError se o JSON não puder ser lido."""
+    conteudo_json = _ler_bytes(pasta, g["json"])
+    obj = json.loads(conteudo_json.decode("utf-8"))
+    if not isinstance(obj, dict):
+        raise ValueError("JSON do laudo não é um objeto")
+    pac = obj.get("paciente") or {}
+    if not isinstance(pac, dict):
+        pac = {}
+    data_exame = str(pac.get("data_exame") or "")[:10]
+    if not data_exame:
+        data_exame = nome_base[:10] if len(nome_base) >= 10 else datetime.now().strftime("%Y-%m-%d")
+    conteudo_pdf = _ler_bytes(pasta, g["pdf"]) if g["pdf"] else None
+    imagens = [(nome, _ler_bytes(pasta, nome)) for nome in g["imagens"]]
+    return {
+        "nome_base": nome_base,
+        "data_exame": data_exame,
+        "nome_animal": str(pac.get("nome") or "").strip(),
+        "nome_tutor": str(pac.get("tutor") or "").strip(),
+        "nome_clinica": str(pac.get("clinica") or "").strip(),
+        "tipo_exame": _tipo_exame(obj),
+        "conteudo_json": conteudo_json,
+        "conteudo_pdf": conteudo_pdf,
+        "imagens": imagens,
+    }
+
+
+def _gravar_lote(conn, pasta: str, itens: list) -> list:
+    """Grava os exames do lote e o cursor de cada um na mesma transação; um exame com erro não derruba o lote."""
+    # Import tardio: app.laudos_banco importa app.services (manutencao)
+    from app.laudos_banco import gravar_laudo_arquivo
+    from app.laudos_dedup import garantir_fingerprints
+
+    garantir_tabela_cursor(conn)
+    garantir_fingerprints(conn)
+    agora = _agora()
+    resultados = []
+    for nome_base, assinatura, dados, erro in itens:
+        laudo_arquivo_id = None
+        if dados is not None:
+            conn.execute("SAVEPOINT ingestao_exame")
+            try:
+                laudo_arquivo_id = gravar_laudo_arquivo(conn, **dados)
+            except Exception as e:
+                logger.exception("Ingestão da pasta de laudos: falha ao gravar %s", nome_base)
+                conn.execute("ROLLBACK TO ingestao_exame")
+                erro = str(e)
+            conn.execute("RELEASE ingestao_exame")
+        conn.execute(
+            "INSERT OR REPLACE INTO ingestao_pasta_laudos (pasta, nome_base, assinatura, laudo_arquivo_id, erro, ingerido_em) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (pasta, nome_base, assinatura, laudo_arquivo_id, erro, agora),
+        )
+        resultados.append((nome_base, assinatura, erro))
+    return resultados
+
+
+def _apagar_cursor(conn, pasta: str, nomes: list) -> None:
+    garantir_tabela_cursor(conn)
+    conn.executemany("DELETE FROM ingestao_pasta_laudos WHERE pasta = ? AND nome_base = ?", [(pasta, n) for n in nomes])
+
+
+def _carregar_cursor(pasta: str) -> dict:
+    conn = sqlite3.connect(str(DB_PATH), timeout=10)
+    try:
+        return dict(conn.execute("SELECT nome_base, assinatura FROM ingestao_pasta_laudos WHERE pasta = ?", (pasta,)))
+    except sqlite3.OperationalError:
+        return {}  # tabela criada no primeiro lote
+    finally:
+        conn.close()
+
+
+def ingerir_pasta(pasta=None, debounce_s: float = INGESTAO_DEBOUNCE_S, lote: int = INGESTAO_LOTE) -> dict:
+    """
+    Uma passada de ingestão: varre a pasta, compara a assinatura de cada exame com o cursor e grava os novos ou
+    alterados cujo arquivo mais novo está parado há debounce_s (os mais recentes ficam para a próxima passada).
+    Exames que somem da pasta saem só do cursor (o que já está em laudos_arquivos fica). JSON ilegível fica no
+    cursor com o erro e só é tentado de novo quando mudar.
+    Retorna {"exames", "novos_ou_alterados", "ingeridos", "erros", "aguardando", "removidos", "segundos"}.
+    """
+    pasta_str = str(pasta or PASTA_LAUDOS)
+    t0 = time.perf_counter()
+    rel = {"exames": 0, "novos_ou_alterados": 0, "ingeridos": 0, "erros": 0, "aguardando": 0, "removidos": 0,
+           "segundos": 0.0}
+    if not os.path.isdir(pasta_str):
+        return rel  # pasta não existe (ex.: sistema online)
+
+    with _lock_passada:
+        cursor = _cursores.get(pasta_str)
+        if cursor is None:
+            cursor = _cursores[pasta_str] = _carregar_cursor(pasta_str)
+        exames = varrer_pasta(pasta_str)
+        mudados = [b for b, g in exames.items() if cursor.get(b) != g["assinatura"]]
+        limite_ns = time.time_ns() - int(debounce_s * 1_000_000_000)
+        prontos = sorted(b for b in mudados if exames[b]["mtime_ns"] <= limite_ns)
+        rel.update(exames=len(exames), novos_ou_alterados=len(mudados), aguardando=len(mudados) - len(prontos))
+
+        if prontos:
+            from app.laudos_banco import garantir_tabela_laudos_arquivos
+            garantir_tabela_laudos_arquivos()
+        for i in range(0, len(prontos), max(1, lote)):
+            itens = []
+            for nome_base in prontos[i:i + lote]:
+                g = exames[nome_base]
+                try:
+                    dados, erro = _ler_exame(pasta_str, nome_base, g), None
+                except (OSError, ValueError) as e:
+                    dados, erro = None, str(e)
+                if not _inalterado(pasta_str, g):
+                    rel["aguardando"] += 1  # mudou durante a leitura: entra na próxima passada
+                    continue
+                itens.append((nome_base, g["assinatura"], dados, erro))
+            if not itens:
+                continue
+            for nome_base, assinatura, erro in escrever(_gravar_lote, pasta_str, itens, db_path=DB_PATH,
+                                                        chaves_estrangeiras=False):
+                cursor[nome_base] = assinatura
+                if erro:
+                    rel["erros"] += 1
+                    logger.warning("Ingestão da pasta de laudos: %s não importado: %s", nome_base, erro)
+                else:
+                    rel["ingeridos"] += 1
+
+        removidos = [b for b in cursor if b not in exames]
+        if removidos:
+            escrever(_apagar_cursor, pasta_str, removidos, db_path=DB_PATH, chaves_estrangeiras=False)
+            for nome_base in removidos:
+                cursor.pop(nome_base, None)
+        rel["removidos"] = len(removidos)
+    rel["segundos"] = round(time.perf_counter() - t0, 3)
+    return rel
+
+
+# ----------------------------------------------------------------------------
+# Observador (uma thread por processo do servidor)
+# ----------------------------------------------------------------------------
+
+class _AoMudar(FileSystemEventHandler):
+    """Qualquer evento na pasta só acorda a thread; a varredura decide o que mudou."""
+
+    def on_any_event(self, event):
+        _estado["acordar"].set()
+
+
+def _iniciar_observador(pasta: str) -> str:
+    if Observer is None:
+        return "varredura"
+    try:
+        observador = Observer()
+        observador.schedule(_AoMudar(), pasta, recursive=False)
+        observador.daemon = True
+        observador.start()
+    except Exception:
+        logger.exception("Ingestão da pasta de laudos: watchdog indisponível, usando varredura periódica")
+        return "varredura"
+    _estado["observador"] = observador
+    return "watchdog"
+
+
+def _laco(pasta: str) -> None:
+    modo = _iniciar_observador(pasta)
+    with _lock:
+        _estado["modo"] = modo
+    espera_ociosa = INGESTAO_REVARRER_S if modo == "watchdog" else INGESTAO_POLL_S
+    while True:
+        try:
+            rel = ingerir_pasta(pasta)
+        except Exception as e:
+            logger.exception("Passada de ingestão da pasta de laudos falhou")
+            rel = None
+            with _lock:
+                _estado["erro"] = str(e)
+        else:
+            with _lock:
+                _estado["erro"] = None
+                _estado["ultimo_resultado"] = rel
+                _estado["ingeridos"] += rel["ingeridos"]
+                _estado["erros"] += rel["erros"]
+        with _lock:
+            _estado["ultima_passada"] = _agora()
+        # Exame esperando o debounce: volta logo; senão, até o próximo evento (ou a varredura de segurança)
+        _estado["acordar"].wait(INGESTAO_DEBOUNCE_S if rel and rel["aguardando"] else espera_ociosa)
+        _estado["acordar"].clear()
+
+
+def iniciar_ingestao(pasta=None) -> bool:
+    """Inicia a thread de ingestão (idempotente; chamado a cada rerun do app). False se desligada ou sem a pasta."""
+    pasta_str = str(pasta or PASTA_LAUDOS)
+    if not INGESTAO_ATIVA or not os.path.isdir(pasta_str):
+        return False
+    with _lock:
+        if _estado["thread"] is None or not _estado["thread"].is_alive():
+            thread = threading.Thread(target=_laco, args=(pasta_str,), name="ingestao_laudos", daemon=True)
+            _estado["thread"] = thread
+            _estado["pasta"] = pasta_str
+            thread.start()
+    return True
+
+
+def solicitar_ingestao() -> None:
+    """Antecipa a próxima passada (ex.: botão na aba Diagnóstico)."""
+    _estado["acordar"].set()
+
+
+def estado_ingestao() -> dict:
+    """{"ativo", "modo" ("watchdog"/"varredura"), "pasta", "ultima_passada", "ultimo_resultado", "ingeridos", "erros",
+    "erro", "no_cursor", "com_erro"} da thread deste processo e do cursor persistido."""
+    with _lock:
+        estado = {
+            "ativo": _estado["thread"] is not None and _estado["thread"].is_alive(),
+            "modo": _estado["modo"],
+            "pasta": _estado["pasta"] or str(PASTA_LAUDOS),
+            "ultima_passada": _estado["ultima_passada"],
+            "ultimo_resultado": _estado["ultimo_resultado"],
+            "ingeridos": _estado["ingeridos"],
+            "erros": _estado["erros"],
+            "erro": _estado["erro"],
+        }
+    conn = sqlite3.connect(str(DB_PATH), timeout=5)
+    try:
+        estado["no_cursor"], estado["com_erro"] = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(erro IS NOT NULL), 0) FROM ingestao_pasta_laudos WHERE pasta = ?",
+            (estado["pasta"],),
+        ).fetchone()
+    except sqlite3.OperationalError:
+        estado["no_cursor"], estado["com_erro"] = 0, 0
+    finally:
+        conn.close()
+    return estado
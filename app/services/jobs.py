@@ -0,0 +1,401 @@
+# Jobs em segundo plano: operações longas (restore point, importação de backup, ingestão da pasta, compactação,
+# histórico, medidas) rodam num pool de threads do servidor em vez de dentro do rerun da página. A página
+# submete o job e consulta o estado (estado_job) a cada rerun/fragmento; jobs_background guarda tipo, status,
+# progresso, resultado e erro de cada job (sobrevive a reruns, a outra sessão e mostra o histórico). Progresso
+# fino, cancelamento e resultado ficam em memória; o banco é atualizado nas transições e a cada
+# JOBS_PROGRESSO_INTERVALO_S. Jobs que estavam rodando quando o servidor parou ficam "interrompido"
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from app.config import DB_PATH, JOBS_MEMORIA, JOBS_PROGRESSO_INTERVALO_S, JOBS_RETENCAO_DIAS, JOBS_WORKERS
+from fortcordis_modules.escritor import escrever
+
+logger = logging.getLogger(__name__)
+
+ATIVOS = ("pendente", "executando")
+FINAIS = ("concluido", "erro", "cancelado", "interrompido")
+
+_lock = threading.Lock()
+_tipos = {}
+_jobs = {}
+_pool = {"executor": None, "iniciado": False, "tipos_padrao": False}
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def garantir_tabela_jobs(conn: sqlite3.Connection) -> None:
+    """jobs_background: uma linha por job submetido (status pendente/executando/concluido/erro/cancelado/interrompido)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs_background (
+            id TEXT PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            descricao TEXT,
+            status TEXT NOT NULL,
+            feitos INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            mensagem TEXT,
+            resultado TEXT,
+            erro TEXT,
+            criado_por INTEGER,
+            criado_em TEXT NOT NULL,
+            iniciado_em TEXT,
+            concluido_em TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_background_criado ON jobs_background(criado_em)")
+
+
+_COLUNAS = ("id", "tipo", "descricao", "status", "feitos", "total", "mensagem", "resultado", "erro", "criado_por",
+            "criado_em", "iniciado_em", "concluido_em")
+
+
+def _json(valor) -> Optional[str]:
+    if valor is None:
+        return None
+    try:
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    except (TypeError, ValueError):
+        return json.dumps(str(valor), ensure_ascii=False)
+
+
+def _persistir(job: dict) -> None:
+    """Grava a linha inteira do job (INSERT OR REPLACE: vale também depois de um restore trocar o banco)."""
+    valores = [job["id"], job["tipo"], job["descricao"], job["status"], job["feitos"], job["total"],
+               job["mensagem"], _json(job["resultado"]), job["erro"], job["criado_por"], job["criado_em"],
+               job["iniciado_em"], job["concluido_em"]]
+
+    def _gravar(conn):
+        garantir_tabela_jobs(conn)
+        conn.execute(
+            f"INSERT OR REPLACE INTO jobs_background ({', '.join(_COLUNAS)}) VALUES ({', '.join('?' * len(_COLUNAS))})",
+            valores,
+        )
+
+    try:
+        escrever(_gravar, db_path=job["db_path"], chaves_estrangeiras=False)
+    except Exception as e:
+        # A tabela é só o registro: o job continua e o estado em memória segue valendo
+        logger.warning("Falha ao registrar o job %s (%s): %s", job["id"], job["status"], e)
+
+
+def _marcar_interrompidos(db_path) -> None:
+    """Na primeira chamada do processo: jobs ativos no banco eram de um servidor que parou."""
+    def _gravar(conn):
+        garantir_tabela_jobs(conn)
+        conn.execute(
+            "UPDATE jobs_background SET status = 'interrompido', concluido_em = ? WHERE status IN ('pendente', 'executando')",
+            (_agora(),),
+        )
+        conn.execute(
+            "DELETE FROM jobs_background WHERE status IN ('concluido', 'erro', 'cancelado', 'interrompido') AND criado_em < ?",
+            ((datetime.now() - timedelta(days=JOBS_RETENCAO_DIAS)).isoformat(timespec="seconds"),),
+        )
+
+    try:
+        escrever(_gravar, db_path=db_path, chaves_estrangeiras=False)
+    except Exception as e:
+        logger.warning("Falha ao revisar jobs_background: %s", e)
+
+
+def _iniciar() -> None:
+    with _lock:
+        iniciar = not _pool["iniciado"]
+        _pool["iniciado"] = True
+    if iniciar:
+        _marcar_interrompidos(DB_PATH)
+
+
+def _executor() -> ThreadPoolExecutor:
+    _iniciar()
+    with _lock:
+        if _pool["executor"] is None:
+            _pool["executor"] = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix="job_fortcordis")
+        return _pool["executor"]
+
+
+# ----------------------------------------------------------------------------
+# Tipos de job
+# ----------------------------------------------------------------------------
+
+def registrar_tipo(tipo: str, fn: Callable, rotulo: Optional[str] = None) -> None:
+    """
+    Registra fn como o job "tipo". fn recebe os kwargs do submeter_job e, se declarar, progresso(feitos, total
+    [, mensagem]) e cancelar (threading.Event); deve retornar algo serializável em JSON (dict) ou levantar exceção.
+    """
+    params = inspect.signature(fn).parameters
+    _tipos[tipo] = {"fn": fn, "rotulo": rotulo or tipo, "progresso": "progresso" in params, "cancelar": "cancelar" in params}
+
+
+def _tipos_padrao() -> None:
+    # Import tardio: os serviços de cada tipo importam bastante coisa e só são necessários ao submeter
+    from app.laudos_dedup import compactar_exames_duplicados
+    from app.laudos_medidas import backfill_medidas
+    from app.services.importacao_backup import importar_backup
+    from app.services.ingestao import ingerir_pasta
+    from app.services.manutencao import ativar_vacuum_incremental
+    from app.services.restore_point import criar_restore_point, restaurar_restore_point
+    from app.services.timeline import backfill_timeline
+
+    def _criar_rp(descricao: str = "") -> dict:
+        ok, msg, nome = criar_restore_point(descricao)
+        if not ok:
+            raise RuntimeError(msg)
+        return {"mensagem": msg, "nome": nome}
+
+    def _restaurar_rp(rp_id: int) -> dict:
+        ok, msg = restaurar_restore_point(rp_id)
+        if not ok:
+            raise RuntimeError(msg)
+        return {"mensagem": msg}
+
+    def _importar(caminho_backup: str, limpar_laudos: bool = False, remover_arquivo: bool = True,
+                  progresso=None, cancelar=None) -> dict:
+        try:
+            return importar_backup(caminho_backup, limpar_laudos=limpar_laudos, progresso=progresso, cancelar=cancelar)
+        finally:
+            if remover_arquivo:
+                try:
+                    os.remove(caminho_backup)
+                except OSError:
+                    pass
+
+    for tipo, fn, rotulo in (
+        ("criar_restore_point", _criar_rp, "Criar restore point"),
+        ("restaurar_restore_point", _restaurar_rp, "Restaurar restore point"),
+        ("importar_backup", _importar, "Importar backup"),
+        ("ingerir_pasta", ingerir_pasta, "Verificar a pasta de laudos"),
+        ("compactar_exames", compactar_exames_duplicados, "Compactar exames repetidos"),
+        ("backfill_timeline", backfill_timeline, "Reconstruir histórico"),
+        ("backfill_medidas", backfill_medidas, "Extrair medidas"),
+        ("vacuum_incremental", ativar_vacuum_incremental, "Ativar vacuum incremental"),
+    ):
+        if tipo not in _tipos:  # um registrar_tipo anterior com o mesmo nome prevalece
+            registrar_tipo(tipo, fn, rotulo)
+
+
+def _tipo(tipo: str) -> dict:
+    with _lock:
+        if not _pool["tipos_padrao"]:
+            _pool["tipos_padrao"] = True
+            _tipos_padrao()
+        if tipo not in _tipos:
+            raise ValueError(f"Tipo de job desconhecido: {tipo}")
+        return _tipos[tipo]
+
+
+# ----------------------------------------------------------------------------
+# Execução
+# ----------------------------------------------------------------------------
+
+def _executar(job_id: str, kwargs: dict) -> None:
+    with _lock:
+        job = _jobs[job_id]
+        if job["cancelar"].is_set():
+            job.update(status="cancelado", concluido_em=_agora())
+        else:
+            job.update(status="executando", iniciado_em=_agora())
+        info = dict(job)
+    _persistir(info)
+    if info["status"] == "cancelado":
+        return
+    tipo = _tipo(info["tipo"])
+    ultimo = [time.monotonic()]
+
+    def _progresso(feitos, total, mensagem=None):
+        with _lock:
+            job.update(feitos=int(feitos or 0), total=int(total or 0))
+            if mensagem is not None:
+                job["mensagem"] = str(mensagem)
+            gravar = time.monotonic() - ultimo[0] >= JOBS_PROGRESSO_INTERVALO_S
+            if gravar:
+                ultimo[0] = time.monotonic()
+                info_p = dict(job)
+        if gravar:
+            _persistir(info_p)
+
+    extras = {}
+    if tipo["progresso"]:
+        extras["progresso"] = _progresso
+    if tipo["cancelar"]:
+        extras["cancelar"] = job["cancelar"]
+    try:
+        resultado = tipo["fn"](**kwargs, **extras)
+    except Exception as e:
+        logger.exception("Job %s (%s) falhou", job_id, info["tipo"])
+        with _lock:
+            job.update(status="erro", erro=f"{type(e).__name__}: {e}", concluido_em=_agora())
+    else:
+        # Tipo sem cancelar roda até o fim: conta como concluído mesmo com o pedido de parada
+        cancelado = tipo["cancelar"] and job["cancelar"].is_set() and (
+            not isinstance(resultado, dict) or resultado.get("cancelado", True))
+        with _lock:
+            job.update(status="cancelado" if cancelado else "concluido", resultado=resultado, concluido_em=_agora())
+    with _lock:
+        info = dict(job)
+    _persistir(info)
+    _podar_memoria()
+
+
+def _podar_memoria() -> None:
+    """Mantém em memória só os JOBS_MEMORIA jobs terminados mais recentes (os antigos continuam no banco)."""
+    with _lock:
+        finais = sorted((j["concluido_em"] or "", jid) for jid, j in _jobs.items() if j["status"] in FINAIS)
+        for _, jid in finais[:max(0, len(finais) - JOBS_MEMORIA)]:
+            _jobs.pop(jid, None)
+
+
+def submeter_job(tipo: str, descricao: str = "", usuario_id: Optional[int] = None, unico: bool = True,
+                 **kwargs) -> str:
+    """
+    Enfileira fn(**kwargs) do tipo registrado e retorna o id do job imediatamente. Com unico, se já houver um job
+    ativo do mesmo tipo, retorna o id dele em vez de submeter outro (clique duplo, outra aba).
+    Acompanhe com estado_job(id); cancelar_job(id) pede a parada.
+    """
+    info = _tipo(tipo)
+    executor = _executor()
+    with _lock:
+        if unico:
+            for jid, j in _jobs.items():
+                if j["tipo"] == tipo and j["status"] in ATIVOS:
+                    return jid
+        job_id = uuid.uuid4().hex[:16]
+        job = {
+            "id": job_id, "tipo": tipo, "descricao": descricao or info["rotulo"], "status": "pendente",
+            "feitos": 0, "total": 0, "mensagem": None, "resultado": None, "erro": None, "criado_por": usuario_id,
+            "criado_em": _agora(), "iniciado_em": None, "concluido_em": None,
+            "db_path": str(DB_PATH), "cancelar": threading.Event(), "future": None,
+        }
+        _jobs[job_id] = job
+        snapshot = dict(job)
+    _persistir(snapshot)
+    future = executor.submit(_executar, job_id, kwargs)
+    with _lock:
+        job["future"] = future
+    return job_id
+
+
+def cancelar_job(job_id: str) -> bool:
+    """
+    Pede a parada do job: um pendente nem começa; um em execução para no próximo ponto de verificação (se o tipo
+    aceitar cancelar; senão termina normalmente). False se o job não está ativo neste servidor.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None or job["status"] not in ATIVOS:
+            return False
+        job["cancelar"].set()
+        future = job["future"]
+    if future is not None and future.cancel():
+        # Ainda na fila: _executar não vai rodar
+        with _lock:
+            job.update(status="cancelado", concluido_em=_agora())
+            info = dict(job)
+        _persistir(info)
+    return True
+
+
+def _publico(job: dict) -> dict:
+    return {
+        "id": job["id"], "tipo": job["tipo"], "descricao": job["descricao"], "status": job["status"],
+        "feitos": job["feitos"], "total": job["total"], "mensagem": job["mensagem"], "erro": job["erro"],
+        "criado_por": job["criado_por"], "criado_em": job["criado_em"], "iniciado_em": job["iniciado_em"],
+        "concluido_em": job["concluido_em"], "ativo": job["status"] in ATIVOS,
+        "cancelamento_pedido": bool(job.get("cancelar") is not None and job["cancelar"].is_set()),
+    }
+
+
+def _da_linha(row) -> dict:
+    job = dict(zip(_COLUNAS, row))
+    try:
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+    except ValueError:
+        pass
+    return job
+
+
+def _ler(where: str, params: tuple, limite: int) -> list:
+    try:
+        conn = sqlite3.connect(str(DB_PATH), timeout=5)
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(_COLUNAS)} FROM jobs_background {where} ORDER BY criado_em DESC LIMIT ?",
+                params + (limite,),
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.OperationalError:
+        return []  # tabela criada no primeiro job
+    return [_da_linha(r) for r in rows]
+
+
+def estado_job(job_id: str) -> Optional[dict]:
+    """
+    {"id", "tipo", "descricao", "status", "feitos", "total", "mensagem", "erro", "criado_por", "criado_em",
+    "iniciado_em", "concluido_em", "ativo", "cancelamento_pedido"}; None se o id não existe. Barato: jobs deste
+    servidor vêm da memória, os demais de jobs_background.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            return _publico(job)
+    linhas = _ler("WHERE id = ?", (job_id,), 1)
+    return _publico(linhas[0]) if linhas else None
+
+
+def resultado_job(job_id: str):
+    """Valor retornado pelo job concluído (ou parcial, se cancelado); None enquanto ativo, com erro ou desconhecido."""
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            return job["resultado"]
+    linhas = _ler("WHERE id = ?", (job_id,), 1)
+    return linhas[0]["resultado"] if linhas else None
+
+
+def listar_jobs(tipo: Optional[str] = None, limite: int = 20) -> list:
+    """Jobs mais recentes (do banco, com o progresso ao vivo dos que rodam neste servidor), do mais novo ao mais antigo."""
+    _iniciar()
+    linhas = _ler("WHERE tipo = ?", (tipo,), limite) if tipo else _ler("", (), limite)
+    with _lock:
+        vivos = {jid: _publico(j) for jid, j in _jobs.items() if tipo is None or j["tipo"] == tipo}
+    jobs = {j["id"]: _publico(j) for j in linhas}
+    jobs.update(vivos)
+    return sorted(jobs.values(), key=lambda j: j["criado_em"] or "", reverse=True)[:limite]
+
+
+def job_ativo(tipo: str) -> Optional[str]:
+    """Id do job ativo do tipo neste servidor, ou None (para a página retomar o acompanhamento após um F5)."""
+    with _lock:
+        for jid, j in _jobs.items():
+            if j["tipo"] == tipo and j["status"] in ATIVOS:
+                return jid
+    return None
+
+
+def aguardar_job(job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+    """Espera o job terminar (scripts e benchmarks; a página só consulta estado_job). Retorna estado_job."""
+    with _lock:
+        job = _jobs.get(job_id)
+        future = job["future"] if job else None
+    fim = None if timeout is None else time.monotonic() + timeout
+    while future is None and job is not None and (fim is None or time.monotonic() < fim):
+        time.sleep(0.01)  # submeter_job ainda guardando o future
+        with _lock:
+            future = job["future"]
+    if future is not None:
+        try:
+            future.result(timeout=None if fim is None else max(0.0, fim - time.monotonic()))
+        except Exception:
+            pass  # cancelado na fila ou timeout: o estado diz
+    return estado_job(job_id)
@@ -0,0 +1,278 @@
+# Serviço de manutenção do banco: checkpoint do WAL por tamanho, PRAGMA optimize periódico e vacuum
+# incremental (auto_vacuum=INCREMENTAL), numa thread do servidor; estado na aba Diagnóstico
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.config import (
+    DB_PATH,
+    MANUTENCAO_ATIVA,
+    MANUTENCAO_INTERVALO_S,
+    MANUTENCAO_OTIMIZAR_S,
+    VACUUM_INCREMENTAL_MIN_PAGINAS,
+    VACUUM_INCREMENTAL_PAGINAS,
+    WAL_LIMIAR_CHECKPOINT,
+    WAL_LIMIAR_TRUNCATE,
+)
+from fortcordis_modules.escritor import escrever
+
+logger = logging.getLogger(__name__)
+
+# Espera curta pelo lock no checkpoint: o TRUNCATE segura novos escritores enquanto espera os leitores
+TIMEOUT_CHECKPOINT_S = 1
+
+_MODOS_AUTO_VACUUM = {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}
+
+_lock = threading.Lock()
+_agendador = {"thread": None, "acordar": threading.Event(), "ultima_rodada": None, "erro": None}
+
+
+def _agora() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _tamanho(caminho: str) -> int:
+    return os.path.getsize(caminho) if os.path.exists(caminho) else 0
+
+
+def _registrar(tarefa: str, resultado: dict, duracao_ms: float, db_path: Optional[str] = None) -> None:
+    def _gravar(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS manutencao_banco (
+                tarefa TEXT PRIMARY KEY,
+                executado_em TEXT NOT NULL,
+                duracao_ms REAL,
+                resultado TEXT
+            )
+        """)
+        conn.execute(
+            "INSERT OR REPLACE INTO manutencao_banco (tarefa, executado_em, duracao_ms, resultado) VALUES (?, ?, ?, ?)",
+            (tarefa, _agora(), round(duracao_ms, 1), json.dumps(resultado, ensure_ascii=False)),
+        )
+
+    escrever(_gravar, db_path=db_path or DB_PATH, chaves_estrangeiras=False)
+
+
+def _ultimas_execucoes(conn: sqlite3.Connection) -> dict:
+    try:
+        rows = conn.execute("SELECT tarefa, executado_em, duracao_ms, resultado FROM manutencao_banco").fetchall()
+    except sqlite3.OperationalError:
+        return {}  # tabela criada na primeira manutenção
+    return {
+        tarefa: {"executado_em": em, "duracao_ms": ms, "resultado": json.loads(res) if res else None}
+        for tarefa, em, ms, res in rows
+    }
+
+
+def estado_banco(db_path: Optional[str] = None) -> dict:
+    """
+    {"arquivo_bytes", "wal_bytes", "page_size", "paginas", "paginas_livres", "livres_bytes", "auto_vacuum"
+    ("NONE"/"FULL"/"INCREMENTAL"), "journal_mode", "ultimas": {tarefa: {executado_em, duracao_ms, resultado}}}.
+    """
+    caminho = str(db_path or DB_PATH)
+    conn = sqlite3.connect(caminho, timeout=5)
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        paginas = conn.execute("PRAGMA page_count").fetchone()[0]
+        livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        ultimas = _ultimas_execucoes(conn)
+    finally:
+        conn.close()
+    return {
+        "arquivo_bytes": _tamanho(caminho),
+        "wal_bytes": _tamanho(caminho + "-wal"),
+        "page_size": page_size,
+        "paginas": paginas,
+        "paginas_livres": livres,
+        "livres_bytes": livres * page_size,
+        "auto_vacuum": _MODOS_AUTO_VACUUM.get(auto_vacuum, str(auto_vacuum)),
+        "journal_mode": journal,
+        "ultimas": ultimas,
+    }
+
+
+def checkpoint_wal(db_path: Optional[str] = None, modo: Optional[str] = None) -> dict:
+    """
+    Checkpoint do WAL. Sem modo, decide pelo tamanho do -wal: nada abaixo de WAL_LIMIAR_CHECKPOINT,
+    PASSIVE até WAL_LIMIAR_TRUNCATE e TRUNCATE acima (zera o -wal quando nenhum leitor o está usando).
+    Retorna {"modo", "wal_antes", "wal_depois", "ocupado", "paginas_log", "paginas_copiadas"}; modo None se não rodou.
+    """
+    caminho = str(db_path or DB_PATH)
+    wal_antes = _tamanho(caminho + "-wal")
+    if modo is None:
+        if wal_antes >= WAL_LIMIAR_TRUNCATE:
+            modo = "TRUNCATE"
+        elif wal_antes >= WAL_LIMIAR_CHECKPOINT:
+            modo = "PASSIVE"
+        else:
+            return {"modo": None, "wal_antes": wal_antes, "wal_depois": wal_antes}
+    modo = modo.upper()
+    if modo not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+        raise ValueError(f"Modo de checkpoint inválido: {modo}")
+    conn = sqlite3.connect(caminho, timeout=TIMEOUT_CHECKPOINT_S, isolation_level=None)
+    try:
+        ocupado, paginas_log, copiadas = conn.execute(f"PRAGMA wal_checkpoint({modo})").fetchone()
+        if modo == "PASSIVE" and not ocupado and paginas_log == copiadas:
+            # Tudo já copiado para o banco: o TRUNCATE só zera o -wal (o PASSIVE mantém o arquivo do tamanho máximo)
+            ocupado, paginas_log, copiadas = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            modo = "PASSIVE+TRUNCATE"
+    finally:
+        conn.close()
+    return {"modo": modo, "wal_antes": wal_antes, "wal_depois": _tamanho(caminho + "-wal"),
+            "ocupado": bool(ocupado), "paginas_log": paginas_log, "paginas_copiadas": copiadas}
+
+
+def otimizar(db_path: Optional[str] = None) -> dict:
+    """
+    Atualiza as estatísticas do planejador (limitadas por analysis_limit, rápido mesmo em banco grande).
+    PRAGMA optimize só analisa as tabelas que a própria conexão consultou antes do SQLite 3.46; nas versões
+    anteriores roda ANALYZE. Pelo escritor único. Retorna {"metodo", "sqlite"}.
+    """
+    novo = sqlite3.sqlite_version_info >= (3, 46, 0)
+
+    def _otimizar(conn):
+        conn.execute("PRAGMA analysis_limit = 1000")
+        if novo:
+            conn.execute("PRAGMA optimize = 0x10002").fetchall()  # 0x10000: todas as tabelas, não só as usadas
+        else:
+            conn.execute("ANALYZE")
+
+    escrever(_otimizar, db_path=db_path or DB_PATH, chaves_estrangeiras=False)
+    return {"metodo": "optimize" if novo else "analyze", "sqlite": sqlite3.sqlite_version}
+
+
+def vacuum_incremental(db_path: Optional[str] = None, paginas: int = VACUUM_INCREMENTAL_PAGINAS) -> dict:
+    """
+    Devolve ao sistema até `paginas` páginas livres (só com auto_vacuum=INCREMENTAL; ver ativar_vacuum_incremental).
+    Pelo escritor único, em uma transação curta. Retorna {"paginas_livres_antes", "paginas_livres_depois", "bytes_devolvidos"}.
+    """
+    def _vacuum(conn):
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return None
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        antes = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # O módulo sqlite3 dá um único passo em comandos sem colunas e cada passo do incremental_vacuum
+        # libera uma página: um comando por página
+        for _ in range(min(int(paginas), antes)):
+            conn.execute("PRAGMA incremental_vacuum(1)")
+        depois = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return {"paginas_livres_antes": antes, "paginas_livres_depois": depois,
+                "bytes_devolvidos": (antes - depois) * page_size}
+
+    rel = escrever(_vacuum, db_path=db_path or DB_PATH, chaves_estrangeiras=False)
+    if rel is None:
+        raise ValueError("auto_vacuum não está em INCREMENTAL; use ativar_vacuum_incremental() uma vez.")
+    return rel
+
+
+def ativar_vacuum_incremental(db_path: Optional[str] = None) -> dict:
+    """
+    Passa o banco para auto_vacuum=INCREMENTAL. Exige um VACUUM completo (reescreve o arquivo e bloqueia
+    as gravações enquanto roda); depois disso a manutenção devolve o espaço aos poucos.
+    Retorna {"arquivo_antes", "arquivo_depois", "segundos"}.
+    """
+    caminho = str(db_path or DB_PATH)
+    t0 = time.perf_counter()
+    antes = _tamanho(caminho) + _tamanho(caminho + "-wal")
+    conn = sqlite3.connect(caminho, timeout=60, isolation_level=None)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    rel = {"arquivo_antes": antes, "arquivo_depois": _tamanho(caminho) + _tamanho(caminho + "-wal"),
+           "segundos": round(time.perf_counter() - t0, 1)}
+    _registrar("ativar_vacuum_incremental", rel, (time.perf_counter() - t0) * 1000, caminho)
+    return rel
+
+
+def executar_manutencao(db_path: Optional[str] = None, forcar: bool = False) -> dict:
+    """
+    Uma rodada de manutenção: vacuum incremental (se houver páginas livres acima do mínimo), PRAGMA optimize
+    (se a última execução tiver mais de MANUTENCAO_OTIMIZAR_S) e checkpoint do WAL conforme o tamanho.
+    forcar: roda tudo o que se aplica, com checkpoint TRUNCATE. Retorna {tarefa: resultado} do que rodou;
+    falhas viram {"erro": mensagem} sem interromper as outras tarefas.
+    """
+    caminho = str(db_path or DB_PATH)
+    estado = estado_banco(caminho)
+    tarefas = []
+    if estado["auto_vacuum"] == "INCREMENTAL" and estado["paginas_livres"] >= (1 if forcar else VACUUM_INCREMENTAL_MIN_PAGINAS):
+        tarefas.append(("vacuum_incremental", lambda: vacuum_incremental(caminho)))
+    ultima_otim = (estado["ultimas"].get("otimizar") or {}).get("executado_em")
+    if forcar or not ultima_otim or datetime.fromisoformat(ultima_otim) < datetime.now() - timedelta(seconds=MANUTENCAO_OTIMIZAR_S):
+        tarefas.append(("otimizar", lambda: otimizar(caminho)))
+    # Por último: o vacuum incremental e o ANALYZE também passam pelo -wal
+    tarefas.append(("checkpoint", lambda: checkpoint_wal(caminho, "TRUNCATE" if forcar else None)))
+
+    resultados = {}
+    for nome, fn in tarefas:
+        t0 = time.perf_counter()
+        try:
+            res = fn()
+        except Exception as e:
+            logger.warning("Manutenção do banco: %s falhou: %s", nome, e)
+            res = {"erro": str(e)}
+        resultados[nome] = res
+        if nome == "checkpoint" and res.get("modo") is None:
+            continue  # WAL pequeno: nada feito, não vale registrar
+        try:
+            _registrar(nome, res, (time.perf_counter() - t0) * 1000, caminho)
+        except Exception as e:
+            logger.warning("Manutenção do banco: não foi possível registrar %s: %s", nome, e)
+    return resultados
+
+
+# ----------------------------------------------------------------------------
+# Agendador (uma thread por processo do servidor)
+# ----------------------------------------------------------------------------
+
+def _laco() -> None:
+    while True:
+        _agendador["acordar"].wait(MANUTENCAO_INTERVALO_S)
+        _agendador["acordar"].clear()
+        try:
+            executar_manutencao()
+        except Exception as e:
+            logger.exception("Rodada de manutenção do banco falhou")
+            with _lock:
+                _agendador["erro"] = str(e)
+        else:
+            with _lock:
+                _agendador["erro"] = None
+        with _lock:
+            _agendador["ultima_rodada"] = _agora()
+
+
+def iniciar_manutencao() -> bool:
+    """Inicia a thread de manutenção (idempotente; chamado a cada rerun do app). False se desligada."""
+    if not MANUTENCAO_ATIVA:
+        return False
+    with _lock:
+        if _agendador["thread"] is None or not _agendador["thread"].is_alive():
+            thread = threading.Thread(target=_laco, name="manutencao_banco", daemon=True)
+            _agendador["thread"] = thread
+            thread.start()
+    return True
+
+
+def solicitar_manutencao() -> None:
+    """Antecipa a próxima rodada (ex.: depois de exclusões grandes, para devolver o espaço logo)."""
+    _agendador["acordar"].set()
+
+
+def estado_manutencao(db_path: Optional[str] = None) -> dict:
+    """estado_banco() + {"agendador_ativo", "ultima_rodada", "erro"} da thread deste processo."""
+    estado = estado_banco(db_path)
+    with _lock:
+        estado["agendador_ativo"] = _agendador["thread"] is not None and _agendador["thread"].is_alive()
+        estado["ultima_rodada"] = _agendador["ultima_rodada"]
+        estado["erro"] = _agendador["erro"]
+    return estado
@@ -6,6 +6,7 @@ from typing import Optional
 import pandas as pd
 
 from app.config import DB_PATH
+from app.services.busca_pacientes import obter_indice_busca
 
 logger = logging.getLogger(__name__)
 
@@ -109,6 +110,14 @@ def buscar_pacientes_para_vinculo(
     """
     if not nome_animal and not nome_tutor:
         return []
+    # Índice em memória (app.services.busca_pacientes); o SQL abaixo fica para quando o índice não pode ser montado
+    try:
+        return [
+            {"id": r["id"], "tutor_id": r["tutor_id"], "paciente": r["paciente"], "tutor": r["tutor"]}
+            for r in obter_indice_busca().buscar(animal=nome_animal, tutor=nome_tutor, fontes=("cadastro",), limite=limite)
+        ]
+    except sqlite3.Error as e:
+        logger.warning("Busca para vínculo sem índice: %s", e)
     conn = sqlite3.connect(str(DB_PATH))
     try:
         query = """
@@ -151,6 +160,10 @@ def buscar_pacientes_por_termo_livre(
     """
     if not termo or not str(termo).strip():
         return []
+    try:
+        return obter_indice_busca().buscar(termo=str(termo), fontes=("cadastro",), limite=limite, exigir_tutor=True)
+    except sqlite3.Error as e:
+        logger.warning("Busca por termo sem índice: %s", e)
     conn = sqlite3.connect(str(DB_PATH))
     try:
         t = f"%{str(termo).strip()}%"
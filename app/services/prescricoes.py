@@ -0,0 +1,215 @@
+# Serviço de prescrições: arquivo de PDFs por conteúdo (sha256) e histórico paginado
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+from app.blob_store import armazenamento_externo, gravar_blob, ler_blob
+from app.config import DB_PATH, PASTA_PRESCRICOES, PRESCRICOES_PDF_NO_BANCO
+from app.exceptions import BlobError
+from app.services.timeline import registrar_evento_prescricao
+
+logger = logging.getLogger(__name__)
+
+
+def _caminho_por_hash(pdf_hash: str) -> Path:
+    """Caminho do PDF no arquivo local: PASTA_PRESCRICOES/ab/abcdef....pdf"""
+    return PASTA_PRESCRICOES / pdf_hash[:2] / f"{pdf_hash}.pdf"
+
+
+def _gravar_atomico(destino: Path, dados: bytes) -> None:
+    """Grava em arquivo temporário na mesma pasta e renomeia (nunca deixa PDF pela metade)."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=str(destino.parent), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+        os.replace(tmp, destino)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def arquivar_pdf_prescricao(conn: sqlite3.Connection, pdf_bytes: bytes) -> Tuple[str, int]:
+    """
+    Arquiva o PDF pelo sha256 do conteúdo (PDFs idênticos ocupam um único registro/arquivo).
+    Com o backend "local" (app.blob_store) o PDF vai para o object store e prescricoes_pdfs guarda a
+    referência; no "banco", grava em PASTA_PRESCRICOES e, se PRESCRICOES_PDF_NO_BANCO, também em
+    prescricoes_pdfs (pelo codec de BLOBs). Não faz commit. Retorna (hash, tamanho) do PDF original.
+    """
+    pdf_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    tamanho = len(pdf_bytes)
+    if armazenamento_externo():
+        conteudo = gravar_blob(pdf_bytes)
+    else:
+        destino = _caminho_por_hash(pdf_hash)
+        try:
+            if not destino.exists():
+                _gravar_atomico(destino, pdf_bytes)
+        except OSError as e:
+            # Sem disco gravável (ex.: nuvem): segue só com o banco
+            logger.warning("Não foi possível gravar PDF de prescrição em %s: %s", destino, e)
+            if not PRESCRICOES_PDF_NO_BANCO:
+                raise
+        conteudo = gravar_blob(pdf_bytes) if PRESCRICOES_PDF_NO_BANCO else None
+    conn.execute(
+        "INSERT OR IGNORE INTO prescricoes_pdfs (hash, tamanho, conteudo, created_at) VALUES (?, ?, ?, ?)",
+        (pdf_hash, tamanho, sqlite3.Binary(conteudo) if conteudo is not None else None,
+         datetime.now().isoformat()),
+    )
+    return pdf_hash, tamanho
+
+
+def registrar_prescricao(
+    paciente_nome: str,
+    tutor_nome: str,
+    especie: str,
+    peso_kg: float,
+    texto_prescricao: str,
+    medico_veterinario: str,
+    crmv: str,
+    pdf_bytes: bytes,
+    data_prescricao: Optional[str] = None,
+) -> Tuple[int, str]:
+    """
+    Arquiva o PDF e registra a prescrição numa única transação.
+    Retorna (id_prescricao, caminho_pdf).
+    """
+    data_prescricao = data_prescricao or datetime.now().strftime("%Y-%m-%d")
+    now = datetime.now().isoformat()
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        pdf_hash, tamanho = arquivar_pdf_prescricao(conn, pdf_bytes)
+        caminho_pdf = str(_caminho_por_hash(pdf_hash))
+        cursor = conn.execute("""
+            INSERT INTO prescricoes (
+                paciente_nome, tutor_nome, especie, peso_kg,
+                data_prescricao, texto_prescricao, medico_veterinario,
+                crmv, caminho_pdf, pdf_hash, pdf_tamanho, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            paciente_nome, tutor_nome, especie, peso_kg,
+            data_prescricao, texto_prescricao, medico_veterinario,
+            crmv, caminho_pdf, pdf_hash, tamanho, now, now,
+        ))
+        prescricao_id = cursor.lastrowid
+        registrar_evento_prescricao(cursor, prescricao_id)
+        conn.commit()
+        return prescricao_id, caminho_pdf
+    finally:
+        conn.close()
+
+
+def _filtros_historico(data_inicio: Optional[str], paciente: str, tutor: str) -> Tuple[str, list]:
+    where = ["1=1"]
+    params = []
+    if data_inicio:
+        where.append("p.data_prescricao >= ?")
+        params.append(data_inicio)
+    if paciente:
+        where.append("UPPER(p.paciente_nome) LIKE UPPER(?)")
+        params.append(f"%{paciente}%")
+    if tutor:
+        where.append("UPPER(p.tutor_nome) LIKE UPPER(?)")
+        params.append(f"%{tutor}%")
+    return " AND ".join(where), params
+
+
+def contar_historico_prescricoes(data_inicio: Optional[str] = None, paciente: str = "", tutor: str = "") -> int:
+    """Total de prescrições para os filtros (para paginação)."""
+    where, params = _filtros_historico(data_inicio, paciente, tutor)
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM prescricoes p WHERE {where}", params).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def listar_historico_prescricoes(
+    data_inicio: Optional[str] = None,
+    paciente: str = "",
+    tutor: str = "",
+    limite: int = 25,
+    offset: int = 0,
+) -> list:
+    """
+    Página do histórico (mais recentes primeiro), só metadados: não abre nenhum PDF.
+    Cada item traz pdf_disponivel (há hash arquivado ou caminho legado) e pdf_tamanho;
+    os bytes são obtidos sob demanda com carregar_pdf_prescricao(id).
+    """
+    where, params = _filtros_historico(data_inicio, paciente, tutor)
+    conn = sqlite3.connect(str(DB_PATH))
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(f"""
+            SELECT p.id, p.paciente_nome, p.tutor_nome, p.especie, p.peso_kg,
+                   p.data_prescricao, p.medico_veterinario, p.crmv, p.caminho_pdf,
+                   p.pdf_hash, COALESCE(p.pdf_tamanho, a.tamanho) AS pdf_tamanho
+            FROM prescricoes p
+            LEFT JOIN prescricoes_pdfs a ON a.hash = p.pdf_hash
+            WHERE {where}
+            ORDER BY p.data_prescricao DESC, p.id DESC
+            LIMIT ? OFFSET ?
+        """, params + [int(limite), int(offset)]).fetchall()
+    except sqlite3.OperationalError as e:
+        logger.warning("Histórico de prescrições indisponível: %s", e)
+        return []
+    finally:
+        conn.close()
+    out = []
+    for r in rows:
+        item = dict(r)
+        item["pdf_disponivel"] = bool(item.get("pdf_hash") or item.get("caminho_pdf"))
+        out.append(item)
+    return out
+
+
+def carregar_pdf_prescricao(prescricao_id: int) -> Optional[bytes]:
+    """
+    Lê os bytes do PDF de uma prescrição: banco/object store, arquivo por hash ou caminho legado (nessa ordem).
+    Prescrições antigas (só caminho_pdf) são indexadas por hash na primeira leitura.
+    Retorna None se o PDF não existir mais.
+    """
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        row = conn.execute(
+            "SELECT pdf_hash, caminho_pdf FROM prescricoes WHERE id = ?", (int(prescricao_id),)
+        ).fetchone()
+        if not row:
+            return None
+        pdf_hash, caminho_pdf = row
+        if pdf_hash:
+            blob = conn.execute("SELECT conteudo FROM prescricoes_pdfs WHERE hash = ?", (pdf_hash,)).fetchone()
+            if blob and blob[0] is not None:
+                try:
+                    return ler_blob(blob[0])
+                except BlobError as e:
+                    logger.warning("PDF da prescrição %s indisponível no armazenamento: %s", prescricao_id, e.message)
+            arquivo = _caminho_por_hash(pdf_hash)
+            if arquivo.exists():
+                return arquivo.read_bytes()
+        if caminho_pdf and Path(caminho_pdf).exists():
+            dados = Path(caminho_pdf).read_bytes()
+            if not pdf_hash:
+                novo_hash, tamanho = arquivar_pdf_prescricao(conn, dados)
+                conn.execute(
+                    "UPDATE prescricoes SET pdf_hash = ?, pdf_tamanho = ? WHERE id = ?",
+                    (novo_hash, tamanho, int(prescricao_id)),
+                )
+                conn.commit()
+            return dados
+        return None
+    except sqlite3.OperationalError as e:
+        logger.warning("Falha ao carregar PDF da prescrição %s: %s", prescricao_id, e)
+        return None
+    finally:
+        conn.close()
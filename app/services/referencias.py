@@ -0,0 +1,341 @@
+# Serviço de dados de referência: clínicas, serviços, pacotes, tabelas de preço e descontos
+"""
+Cache read-through dos cadastros de referência usados em quase toda interação
+(Agendamentos, Laudos, criação de OS).
+
+Em vez de abrir uma conexão por consulta (`SELECT ... FROM clinicas_parceiras WHERE nome = ?`,
+`servico_preco`, `parcerias_descontos`...), carregamos tudo numa única leitura e devolvemos
+um snapshot imutável (`ReferenciasSnapshot`). O snapshot é compartilhado entre sessões do
+mesmo processo e só é recarregado quando:
+- algum escritor chama `invalidar_referencias()` (bump de versão), ou
+- o snapshot passa de REFERENCIAS_TTL_SEGUNDOS (rede de segurança para escritas externas,
+  ex.: scripts de migração rodados fora do app).
+"""
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from app.config import REFERENCIAS_TTL_SEGUNDOS
+from fortcordis_modules.database import aplicar_desconto, get_conn
+
+logger = logging.getLogger(__name__)
+
+# Tabela de preço usada quando a clínica não tem tabela_preco_id (mesmo padrão do SQL legado)
+TABELA_PRECO_PADRAO = 1
+
+
+@dataclass(frozen=True)
+class Clinica:
+    id: int
+    nome: str
+    ativo: bool
+    tabela_preco_id: Optional[int]
+    limite_desconto_percentual: Optional[float]
+    endereco: str
+    telefone: str
+    whatsapp: str
+
+
+@dataclass(frozen=True)
+class Servico:
+    id: int
+    nome: str
+    valor_base: float
+    ativo: bool
+
+
+@dataclass(frozen=True)
+class Pacote:
+    id: int
+    nome: str
+    valor_promocional: float
+    servicos_ids: Tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class Desconto:
+    servico_id: Optional[int]
+    tipo_desconto: str
+    valor_desconto: float
+    data_inicio: str
+    data_fim: str
+
+    def vigente_em(self, dia_iso: str) -> bool:
+        """Mesmo filtro do SQL: data_inicio <= hoje <= data_fim (NULL = sem limite)."""
+        if self.data_inicio and self.data_inicio[:10] > dia_iso:
+            return False
+        if self.data_fim and self.data_fim[:10] < dia_iso:
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class ReferenciasSnapshot:
+    """Fotografia imutável dos cadastros de referência. Todas as consultas são em memória."""
+    versao: int
+    carregado_em: float
+    clinicas: Mapping[int, Clinica]
+    clinicas_ativas_por_nome: Mapping[str, Clinica]
+    servicos: Mapping[int, Servico]
+    servicos_ativos: Tuple[Servico, ...]
+    tabelas_preco: Mapping[int, str]
+    precos: Mapping[Tuple[int, int], float]
+    pacotes: Tuple[Pacote, ...]
+    descontos: Mapping[int, Tuple[Desconto, ...]]
+
+    # ----- Clínicas -----
+    def clinica_por_nome(self, nome: str) -> Optional[Clinica]:
+        """Equivale a `SELECT ... FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL)`."""
+        return self.clinicas_ativas_por_nome.get((nome or "").strip())
+
+    def clinicas_ativas(self) -> Tuple[Clinica, ...]:
+        """Clínicas ativas ordenadas por nome (para selectbox)."""
+        return tuple(sorted(self.clinicas_ativas_por_nome.values(), key=lambda c: c.nome))
+
+    def tabela_preco_id(self, clinica_id: Optional[int]) -> int:
+        """Tabela de preço da clínica, com fallback para a tabela padrão (1)."""
+        cli = self.clinicas.get(clinica_id)
+        return (cli.tabela_preco_id if cli and cli.tabela_preco_id else TABELA_PRECO_PADRAO)
+
+    def nome_tabela_preco(self, tabela_preco_id: Optional[int]) -> str:
+        return self.tabelas_preco.get(tabela_preco_id, "Padrão")
+
+    # ----- Serviços e preços -----
+    def buscar_servico(self, nome: str) -> Optional[Servico]:
+        """
+        Equivale a `WHERE (ativo = 1 OR ativo IS NULL) AND (nome = ? OR nome LIKE '%nome%') LIMIT 1`:
+        primeiro serviço ativo (ordem de id) com nome igual ou contendo o termo (sem diferenciar caixa).
+        """
+        termo = (nome or "").strip()
+        if not termo:
+            return None
+        termo_lower = termo.lower()
+        for s in sorted(self.servicos_ativos, key=lambda x: x.id):
+            if s.nome == termo or termo_lower in s.nome.lower():
+                return s
+        return None
+
+    def preco_servico(self, servico_id: int, tabela_preco_id: Optional[int]) -> Optional[float]:
+        """Valor do serviço na tabela de preço (servico_preco) ou None se não houver."""
+        return self.precos.get((servico_id, tabela_preco_id or TABELA_PRECO_PADRAO))
+
+    def valor_servico(self, servico_id: int, tabela_preco_id: Optional[int]) -> float:
+        """Preço da tabela com fallback para valor_base do serviço."""
+        v = self.preco_servico(servico_id, tabela_preco_id)
+        if v is not None:
+            return float(v)
+        s = self.servicos.get(servico_id)
+        return float(s.valor_base) if s else 0.0
+
+    def servicos_com_preco(self, clinica_id: Optional[int]) -> list:
+        """
+        Serviços ativos com o preço da tabela da clínica (fallback valor_base).
+        Mesmo formato de `_buscar_servicos_disponiveis`: [{"id", "nome", "valor_base"}, ...].
+        """
+        tabela_id = self.tabela_preco_id(clinica_id)
+        return [
+            {"id": s.id, "nome": s.nome, "valor_base": self.valor_servico(s.id, tabela_id)}
+            for s in self.servicos_ativos
+        ]
+
+    def servicos_por_nome(self) -> dict:
+        """Mapa nome -> {"id", "valor_base"} dos serviços ativos (valor_base do cadastro)."""
+        return {s.nome: {"id": s.id, "valor_base": s.valor_base} for s in self.servicos_ativos}
+
+    # ----- Descontos -----
+    def desconto_aplicavel(self, clinica_id: int, servico_id: int, dia_iso: Optional[str] = None) -> Optional[Desconto]:
+        """
+        Desconto vigente da clínica para o serviço. Desconto específico do serviço tem prioridade
+        sobre o desconto geral (servico_id NULL), como o `ORDER BY servico_id DESC LIMIT 1` do SQL.
+        """
+        dia_iso = dia_iso or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        geral = None
+        for d in self.descontos.get(clinica_id, ()):
+            if not d.vigente_em(dia_iso):
+                continue
+            if d.servico_id == servico_id:
+                return d
+            if d.servico_id is None and geral is None:
+                geral = d
+        return geral
+
+    def calcular_valor_final(self, servico_id: int, clinica_id: int, dia_iso: Optional[str] = None) -> Tuple[float, float, float]:
+        """
+        Caminho puro (sem banco) de `fortcordis_modules.database.calcular_valor_final`.
+        Retorna (valor_base, valor_desconto, valor_final).
+        """
+        tabela_id = self.tabela_preco_id(clinica_id)
+        valor_base = float(self.preco_servico(servico_id, tabela_id) or 0.0)
+        if valor_base == 0.0:
+            servico = self.servicos.get(servico_id)
+            if servico is None:
+                return (0.0, 0.0, 0.0)
+            valor_base = float(servico.valor_base or 0)
+        desconto = self.desconto_aplicavel(clinica_id, servico_id, dia_iso)
+        if desconto is None:
+            return (valor_base, 0.0, valor_base)
+        cli = self.clinicas.get(clinica_id)
+        limite_pct = cli.limite_desconto_percentual if cli else None
+        return aplicar_desconto(valor_base, desconto.tipo_desconto, desconto.valor_desconto, limite_pct)
+
+
+def _colunas(cursor, tabela: str) -> set:
+    try:
+        cursor.execute(f"PRAGMA table_info({tabela})")
+        return {r[1].lower() for r in cursor.fetchall()}
+    except sqlite3.OperationalError:
+        return set()
+
+
+def _col(cols: set, nome: str, padrao: str = "NULL") -> str:
+    """Expressão SELECT tolerante a bancos antigos sem a coluna."""
+    return nome if nome in cols else f"{padrao} AS {nome}"
+
+
+def _carregar_snapshot(versao: int) -> ReferenciasSnapshot:
+    """Lê todos os cadastros de referência numa única conexão."""
+    conn = get_conn()
+    cursor = conn.cursor()
+    try:
+        cols_cli = _colunas(cursor, "clinicas_parceiras")
+        clinicas = {}
+        ativas_por_nome = {}
+        if cols_cli:
+            cursor.execute(f"""
+                SELECT id, nome, {_col(cols_cli, 'ativo', '1')}, {_col(cols_cli, 'tabela_preco_id')},
+                       {_col(cols_cli, 'limite_desconto_percentual')},
+                       {_col(cols_cli, 'endereco', "''")}, {_col(cols_cli, 'telefone', "''")},
+                       {_col(cols_cli, 'whatsapp', "''")}
+                FROM clinicas_parceiras
+                ORDER BY id
+            """)
+            for r in cursor.fetchall():
+                cli = Clinica(
+                    id=r[0],
+                    nome=r[1] or "",
+                    ativo=(r[2] is None or r[2] == 1),
+                    tabela_preco_id=r[3],
+                    limite_desconto_percentual=float(r[4]) if r[4] is not None else None,
+                    endereco=r[5] or "",
+                    telefone=r[6] or "",
+                    whatsapp=r[7] or "",
+                )
+                clinicas[cli.id] = cli
+                # Mantém a primeira ocorrência (menor id), como o LIMIT 1 do SQL
+                if cli.ativo and cli.nome not in ativas_por_nome:
+                    ativas_por_nome[cli.nome] = cli
+
+        cols_serv = _colunas(cursor, "servicos")
+        servicos = {}
+        if cols_serv:
+            cursor.execute(f"SELECT id, nome, valor_base, {_col(cols_serv, 'ativo', '1')} FROM servicos ORDER BY nome")
+            for r in cursor.fetchall():
+                servicos[r[0]] = Servico(id=r[0], nome=r[1] or "", valor_base=float(r[2] or 0),
+                                         ativo=(r[3] is None or r[3] == 1))
+        servicos_ativos = tuple(s for s in servicos.values() if s.ativo)
+
+        tabelas = {}
+        if _colunas(cursor, "tabelas_preco"):
+            cursor.execute("SELECT id, nome FROM tabelas_preco ORDER BY id")
+            tabelas = {r[0]: r[1] or "" for r in cursor.fetchall()}
+
+        precos = {}
+        if _colunas(cursor, "servico_preco"):
+            cursor.execute("SELECT servico_id, tabela_preco_id, valor FROM servico_preco")
+            for servico_id, tabela_id, valor in cursor.fetchall():
+                if valor is not None:
+                    precos.setdefault((servico_id, tabela_id), float(valor))
+
+        pacotes = []
+        cols_pac = _colunas(cursor, "pacotes")
+        if cols_pac:
+            itens = {}
+            if _colunas(cursor, "pacote_servicos"):
+                cursor.execute("SELECT pacote_id, servico_id FROM pacote_servicos ORDER BY id")
+                for pacote_id, servico_id in cursor.fetchall():
+                    itens.setdefault(pacote_id, []).append(servico_id)
+            filtro = "WHERE (ativo = 1 OR ativo IS NULL)" if "ativo" in cols_pac else ""
+            cursor.execute(f"SELECT id, nome, valor_promocional FROM pacotes {filtro} ORDER BY nome")
+            for r in cursor.fetchall():
+                pacotes.append(Pacote(id=r[0], nome=r[1] or "", valor_promocional=float(r[2] or 0),
+                                      servicos_ids=tuple(itens.get(r[0], ()))))
+
+        descontos = {}
+        cols_pd = _colunas(cursor, "parcerias_descontos")
+        if cols_pd:
+            col_valor = "valor_desconto" if "valor_desconto" in cols_pd else "valor"
+            cursor.execute(f"""
+                SELECT clinica_id, servico_id, tipo_desconto, {col_valor},
+                       {_col(cols_pd, 'data_inicio')}, {_col(cols_pd, 'data_fim')}
+                FROM parcerias_descontos
+                WHERE ativo = 1
+                ORDER BY id
+            """)
+            for r in cursor.fetchall():
+                descontos.setdefault(r[0], []).append(Desconto(
+                    servico_id=r[1],
+                    tipo_desconto=r[2] or "percentual",
+                    valor_desconto=float(r[3] or 0),
+                    data_inicio=str(r[4] or ""),
+                    data_fim=str(r[5] or ""),
+                ))
+    finally:
+        conn.close()
+
+    return ReferenciasSnapshot(
+        versao=versao,
+        carregado_em=time.monotonic(),
+        clinicas=MappingProxyType(clinicas),
+        clinicas_ativas_por_nome=MappingProxyType(ativas_por_nome),
+        servicos=MappingProxyType(servicos),
+        servicos_ativos=servicos_ativos,
+        tabelas_preco=MappingProxyType(tabelas),
+        precos=MappingProxyType(precos),
+        pacotes=tuple(pacotes),
+        descontos=MappingProxyType({k: tuple(v) for k, v in descontos.items()}),
+    )
+
+
+_lock = threading.Lock()
+_versao = 0
+_snapshot: Optional[ReferenciasSnapshot] = None
+
+
+def invalidar_referencias() -> None:
+    """Bump de versão: o próximo `obter_referencias()` relê o banco. Chamar após gravar cadastros."""
+    global _versao
+    with _lock:
+        _versao += 1
+
+
+def obter_referencias() -> ReferenciasSnapshot:
+    """Snapshot atual dos cadastros de referência (recarrega só se a versão mudou ou o TTL expirou)."""
+    global _snapshot
+    snap = _snapshot
+    if (
+        snap is not None
+        and snap.versao == _versao
+        and time.monotonic() - snap.carregado_em < REFERENCIAS_TTL_SEGUNDOS
+    ):
+        return snap
+    with _lock:
+        snap = _snapshot
+        if (
+            snap is None
+            or snap.versao != _versao
+            or time.monotonic() - snap.carregado_em >= REFERENCIAS_TTL_SEGUNDOS
+        ):
+            try:
+                snap = _carregar_snapshot(_versao)
+            except sqlite3.Error as e:
+                logger.warning("Falha ao carregar cadastros de referência: %s", e)
+                if snap is None:
+                    raise
+                return snap
+            _snapshot = snap
+        return snap
@@ -14,6 +14,7 @@ from datetime import datetime
 from pathlib import Path
 
 from app.config import DB_PATH
+from app.services.manutencao import solicitar_manutencao
 
 # Limite de restore points mantidos (os mais antigos são removidos automaticamente)
 MAX_RESTORE_POINTS = 10
@@ -237,5 +238,6 @@ def _limpar_antigos(conn):
                 (excesso,),
             )
             conn.commit()
+            solicitar_manutencao()  # cada snapshot é um BLOB grande: devolve o espaço na próxima rodada
     except Exception:
         pass
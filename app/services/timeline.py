@@ -0,0 +1,316 @@
+# Serviço de linha do tempo do paciente: consultas, exames, prescrições e agendamentos materializados
+# em paciente_eventos (por paciente_id), gravados junto de cada escrita e reconstruídos por backfill
+import logging
+import sqlite3
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+from app.config import DB_PATH
+from app.laudos_dedup import _nomes_vinculados
+from app.sql_safe import validar_tabela
+from app.utils import _norm_key
+from fortcordis_modules.database import (
+    evento_de_agendamento,
+    garantir_tabela_eventos_paciente,
+    registrar_evento_paciente,
+)
+
+logger = logging.getLogger(__name__)
+
+TIPOS_EVENTO = ("consulta", "exame", "prescricao", "agendamento")
+
+_ROTULO_EXAME = {
+    "ecocardiograma": "Ecocardiograma",
+    "eletrocardiograma": "Eletrocardiograma",
+    "pressao_arterial": "Pressão arterial",
+}
+_TABELAS_EXAME = {
+    "laudos_ecocardiograma": "ecocardiograma",
+    "laudos_eletrocardiograma": "eletrocardiograma",
+    "laudos_pressao_arterial": "pressao_arterial",
+}
+
+# Semelhança mínima (0-1) entre nomes normalizados para o vínculo aproximado
+LIMIAR_SEMELHANCA = 0.85
+
+
+def chave_exame(tipo_exame: str, data_exame: str, nome_animal: str, nome_tutor: str) -> str:
+    """Mesma chave para o exame em laudos_<tipo> e em laudos_arquivos (um evento por exame)."""
+    return f"exame:{_norm_key(tipo_exame or 'ecocardiograma')}:{str(data_exame or '')[:10]}:{_norm_key(nome_animal)}:{_norm_key(nome_tutor)}"
+
+
+def resolver_paciente_id(cur: sqlite3.Cursor, nome_paciente: str, nome_tutor: str) -> Optional[int]:
+    """Vínculo exato por nome normalizado do animal + tutor (usado na gravação; o aproximado fica no job)."""
+    kp, kt = _norm_key(nome_paciente), _norm_key(nome_tutor)
+    if not kp or not kt:
+        return None
+    try:
+        rows = cur.execute(
+            "SELECT p.id FROM tutores t JOIN pacientes p ON p.tutor_id = t.id WHERE t.nome_key = ? AND p.nome_key = ? LIMIT 2",
+            (kt, kp),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    return rows[0][0] if len(rows) == 1 else None
+
+
+def _linha(cur: sqlite3.Cursor, tabela: str, rid: int) -> Optional[dict]:
+    cur.execute(f"SELECT * FROM {validar_tabela(tabela)} WHERE id = ?", (rid,))
+    row = cur.fetchone()
+    return dict(zip([d[0] for d in cur.description], row)) if row else None
+
+
+def _registrar(cur: sqlite3.Cursor, ev: dict) -> None:
+    if not ev.get("paciente_id"):
+        ev["paciente_id"] = resolver_paciente_id(cur, ev.get("nome_paciente"), ev.get("nome_tutor"))
+        ev["resolucao"] = "exato" if ev["paciente_id"] else None
+    registrar_evento_paciente(cur, **ev)
+
+
+# ----------------------------------------------------------------------------
+# Eventos por origem (chamados nas gravações e no backfill)
+# ----------------------------------------------------------------------------
+
+def _evento_consulta(cur: sqlite3.Cursor, c: dict) -> dict:
+    nome_pac, nome_tut, _ = _nomes_vinculados(cur, c.get("paciente_id"), None)
+    hora = (c.get("hora_consulta") or "").strip()
+    data = c.get("data_consulta") or ""
+    return {
+        "chave": f"consulta:{c['id']}",
+        "tipo": "consulta",
+        "data_evento": f"{data}T{hora}" if data and hora else data,
+        "titulo": f"Consulta — {c.get('tipo_atendimento') or 'Atendimento'}",
+        "resumo": c.get("diagnostico_presuntivo") or c.get("motivo_consulta") or "",
+        "paciente_id": c.get("paciente_id"),
+        "nome_paciente": nome_pac,
+        "nome_tutor": nome_tut,
+        "origem_tabela": "consultas",
+        "origem_id": c["id"],
+    }
+
+
+def _evento_prescricao(p: dict) -> dict:
+    texto = (p.get("texto_prescricao") or "").strip()
+    return {
+        "chave": f"prescricao:{p['id']}",
+        "tipo": "prescricao",
+        "data_evento": p.get("data_prescricao") or (p.get("created_at") or "")[:10],
+        "titulo": "Prescrição" + (f" — {p['medico_veterinario']}" if p.get("medico_veterinario") else ""),
+        "resumo": texto.splitlines()[0] if texto else "",
+        "nome_paciente": p.get("paciente_nome") or "",
+        "nome_tutor": p.get("tutor_nome") or "",
+        "origem_tabela": "prescricoes",
+        "origem_id": p["id"],
+    }
+
+
+def _evento_exame(cur: sqlite3.Cursor, tabela: str, e: dict) -> dict:
+    if tabela == "laudos_arquivos":
+        tipo = e.get("tipo_exame") or "ecocardiograma"
+        nome_pac, nome_tut, paciente_id, resumo = e.get("nome_animal") or "", e.get("nome_tutor") or "", None, ""
+    else:
+        tipo = _TABELAS_EXAME[tabela]
+        pac_v, tut_v, _ = _nomes_vinculados(cur, e.get("paciente_id"), None)
+        nome_pac = (e.get("nome_paciente") or "").strip() or pac_v
+        nome_tut = (e.get("nome_tutor") or "").strip() or tut_v
+        paciente_id, resumo = e.get("paciente_id"), e.get("conclusao") or ""
+    data = str(e.get("data_exame") or "")[:10]
+    return {
+        "chave": chave_exame(tipo, data, nome_pac, nome_tut),
+        "tipo": "exame",
+        "data_evento": data,
+        "titulo": _ROTULO_EXAME.get(tipo, tipo.replace("_", " ").title()),
+        "resumo": resumo,
+        "paciente_id": paciente_id,
+        "nome_paciente": nome_pac,
+        "nome_tutor": nome_tut,
+        "origem_tabela": tabela,
+        "origem_id": e["id"],
+    }
+
+
+def registrar_evento_consulta(cur: sqlite3.Cursor, consulta_id: int) -> None:
+    c = _linha(cur, "consultas", consulta_id)
+    if c:
+        _registrar(cur, _evento_consulta(cur, c))
+
+
+def registrar_evento_prescricao(cur: sqlite3.Cursor, prescricao_id: int) -> None:
+    p = _linha(cur, "prescricoes", prescricao_id)
+    if p:
+        _registrar(cur, _evento_prescricao(p))
+
+
+def registrar_evento_exame(cur: sqlite3.Cursor, tabela: str, exame_id: int) -> None:
+    """tabela: laudos_ecocardiograma / laudos_eletrocardiograma / laudos_pressao_arterial / laudos_arquivos."""
+    e = _linha(cur, tabela, exame_id)
+    if e:
+        _registrar(cur, _evento_exame(cur, tabela, e))
+
+
+def remover_eventos_da_origem(cur: sqlite3.Cursor, origem_tabela: str, origem_id: int) -> None:
+    try:
+        cur.execute("DELETE FROM paciente_eventos WHERE origem_tabela = ? AND origem_id = ?", (origem_tabela, origem_id))
+    except sqlite3.OperationalError:
+        pass
+
+
+# ----------------------------------------------------------------------------
+# Backfill e resolução nome -> paciente_id
+# ----------------------------------------------------------------------------
+
+def _tabela_existe(cur: sqlite3.Cursor, tabela: str) -> bool:
+    return cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).fetchone() is not None
+
+
+def backfill_timeline(db_path: Optional[str] = None, lote: int = 500) -> dict:
+    """
+    Recria os eventos de todas as origens (idempotente: chave única por registro) e roda a
+    resolução por nome. Retorna {origem: qtd, ..., "resolucao": {...}}.
+    """
+    conn = sqlite3.connect(str(db_path or DB_PATH), timeout=60)
+    contagem = {}
+    try:
+        garantir_tabela_eventos_paciente(conn)
+        cur = conn.cursor()
+        leitor = conn.cursor()
+        origens = ["consultas", "prescricoes", "agendamentos", *_TABELAS_EXAME, "laudos_arquivos"]
+        for tabela in origens:
+            if not _tabela_existe(cur, tabela):
+                continue
+            colunas = "id, tipo_exame, data_exame, nome_animal, nome_tutor" if tabela == "laudos_arquivos" else "*"
+            leitor.execute(f"SELECT {colunas} FROM {validar_tabela(tabela)} ORDER BY id")
+            nomes = [d[0] for d in leitor.description]
+            n = 0
+            while True:
+                rows = leitor.fetchmany(lote)
+                if not rows:
+                    break
+                for row in rows:
+                    r = dict(zip(nomes, row))
+                    if tabela == "consultas":
+                        ev = _evento_consulta(cur, r)
+                    elif tabela == "prescricoes":
+                        ev = _evento_prescricao(r)
+                    elif tabela == "agendamentos":
+                        if "data" not in r and "data_agendamento" in r:
+                            r["data"] = r["data_agendamento"]
+                        ev = evento_de_agendamento(r)
+                    else:
+                        ev = _evento_exame(cur, tabela, r)
+                    registrar_evento_paciente(cur, **ev)
+                    n += 1
+                conn.commit()
+            contagem[tabela] = n
+    finally:
+        conn.close()
+    contagem["resolucao"] = resolver_eventos_pendentes(db_path=db_path)
+    return contagem
+
+
+def _melhor(candidatos: List[Tuple[int, str]], alvo: str, limiar: float) -> Optional[int]:
+    """id do candidato mais parecido com alvo (>= limiar); None se não houver ou se empatar."""
+    pontuados = sorted(((SequenceMatcher(None, alvo, k).ratio(), pid) for pid, k in candidatos), reverse=True)
+    if not pontuados or pontuados[0][0] < limiar:
+        return None
+    if len(pontuados) > 1 and pontuados[1][0] == pontuados[0][0] and pontuados[1][1] != pontuados[0][1]:
+        return None
+    return pontuados[0][1]
+
+
+def resolver_eventos_pendentes(db_path: Optional[str] = None, limiar: float = LIMIAR_SEMELHANCA) -> dict:
+    """
+    Vincula a um paciente os eventos que só têm nomes (resolucao IS NULL): exato por animal+tutor,
+    depois aproximado (tutor parecido com o mesmo animal, ou animal parecido do mesmo tutor).
+    Sem candidato seguro, marca 'nenhum' (não volta a ser tentado até os nomes mudarem).
+    """
+    conn = sqlite3.connect(str(db_path or DB_PATH), timeout=60)
+    out = {"exato": 0, "aproximado": 0, "nenhum": 0}
+    try:
+        garantir_tabela_eventos_paciente(conn)
+        cur = conn.cursor()
+        pendentes = cur.execute(
+            "SELECT id, nome_paciente, nome_tutor FROM paciente_eventos WHERE paciente_id IS NULL AND resolucao IS NULL"
+        ).fetchall()
+        if not pendentes:
+            return out
+        por_animal, por_tutor = {}, {}
+        try:
+            for pid, kp, kt in cur.execute(
+                "SELECT p.id, p.nome_key, t.nome_key FROM pacientes p JOIN tutores t ON t.id = p.tutor_id "
+                "WHERE p.ativo = 1 OR p.ativo IS NULL"
+            ):
+                por_animal.setdefault(kp, []).append((pid, kt))
+                por_tutor.setdefault(kt, []).append((pid, kp))
+        except sqlite3.OperationalError:
+            pass
+        atualizacoes = []
+        for ev_id, nome_pac, nome_tut in pendentes:
+            kp, kt = _norm_key(nome_pac), _norm_key(nome_tut)
+            cands = por_animal.get(kp, []) if kp else []
+            exatos = {pid for pid, t in cands if t == kt}
+            pid, modo = None, "nenhum"
+            if len(exatos) == 1:
+                pid, modo = exatos.pop(), "exato"
+            elif kp and not exatos:
+                if kt and cands:
+                    pid = _melhor(cands, kt, limiar)
+                elif not kt and len({c[0] for c in cands}) == 1:
+                    pid = cands[0][0]
+                if pid is None and kt in por_tutor:
+                    pid = _melhor(por_tutor[kt], kp, limiar)
+                if pid is not None:
+                    modo = "aproximado"
+            out[modo] += 1
+            atualizacoes.append((pid, modo, ev_id))
+        cur.executemany("UPDATE paciente_eventos SET paciente_id = ?, resolucao = ? WHERE id = ?", atualizacoes)
+        conn.commit()
+    finally:
+        conn.close()
+    return out
+
+
+# ----------------------------------------------------------------------------
+# Consulta (índice idx_eventos_paciente_data)
+# ----------------------------------------------------------------------------
+
+def _filtro_tipos(tipos: Optional[List[str]]) -> Tuple[str, list]:
+    tipos = [t for t in (tipos or []) if t in TIPOS_EVENTO]
+    if not tipos:
+        return "", []
+    return f" AND tipo IN ({', '.join('?' for _ in tipos)})", tipos
+
+
+def contar_timeline(paciente_id: int, tipos: Optional[List[str]] = None) -> int:
+    extra, args = _filtro_tipos(tipos)
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        return conn.execute(
+            f"SELECT COUNT(*) FROM paciente_eventos WHERE paciente_id = ?{extra}", [int(paciente_id)] + args
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+    finally:
+        conn.close()
+
+
+def listar_timeline(paciente_id: int, limite: int = 20, offset: int = 0, tipos: Optional[List[str]] = None) -> List[dict]:
+    """
+    Histórico do paciente, do mais recente para o mais antigo, numa única consulta indexada.
+    Cada item: id, tipo, data_evento, titulo, resumo, origem_tabela, origem_id, resolucao.
+    """
+    extra, args = _filtro_tipos(tipos)
+    conn = sqlite3.connect(str(DB_PATH))
+    try:
+        cur = conn.execute(
+            f"""SELECT id, tipo, data_evento, titulo, resumo, origem_tabela, origem_id, resolucao
+                FROM paciente_eventos WHERE paciente_id = ?{extra}
+                ORDER BY data_evento DESC, id DESC LIMIT ? OFFSET ?""",
+            [int(paciente_id)] + args + [int(limite), int(offset)],
+        )
+        nomes = [d[0] for d in cur.description]
+        return [dict(zip(nomes, r)) for r in cur.fetchall()]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
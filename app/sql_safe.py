@@ -40,6 +40,15 @@ TABELAS_PERMITIDAS: frozenset[str] = frozenset({
     "prescricao_itens",
     # Medicamentos
     "medicamentos",
+    # Arquivos guardados como BLOB (codec de compressão)
+    "nfse_arquivos",
+    "prescricoes_pdfs",
+    # Referências a clínicas/tutores/pacientes reescritas pela resolução de cadastros
+    "movimentos_caixa",
+    "creditos_movimentos",
+    "parcerias_descontos",
+    "laudos_medidas",
+    "paciente_eventos",
 })
 
 
@@ -51,12 +60,23 @@ COLUNAS_PERMITIDAS: frozenset[str] = frozenset({
     "whatsapp",
     # Laudos (colunas adicionadas por migração)
     "nome_clinica", "nome_tutor", "nome_paciente",
-    "arquivo_json", "arquivo_pdf",
+    "arquivo_json", "arquivo_pdf", "fingerprint",
+    # BLOBs gravados pelo codec de compressão
+    "conteudo_json", "conteudo_pdf", "arquivo_blob", "conteudo",
     # Genéricas
     "nome", "telefone", "raca", "sexo", "nascimento",
     "email", "endereco", "bairro", "cidade", "cnpj",
     "inscricao_estadual", "responsavel_veterinario", "crmv_responsavel",
     "data_cadastro",
+    # Resolução de cadastros: referências por id, nomes em texto e saldos somados na união
+    "clinica_id", "tutor_id", "paciente_id",
+    "clinica", "tutor", "paciente", "tutor_nome", "paciente_nome",
+    "saldo_credito",
+    # Migrações de esquema (app.migracoes): colunas de contato de tutores e do prontuário de pacientes
+    "numero", "complemento", "castrado", "data_nascimento", "idade_anos", "idade_meses",
+    "cor_pelagem", "numero_registro", "foto_url", "alergias", "medicamentos_uso",
+    "doencas_previas", "cirurgias_previas", "vacinacao_em_dia", "vermifugacao_em_dia",
+    "data_obito", "criado_por",
 })
 
 
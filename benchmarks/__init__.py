@@ -0,0 +1 @@
+# Benchmarks de desempenho (rodar com: python -m benchmarks.<nome>)
@@ -0,0 +1,172 @@
+"""
+Benchmark do armazém de imagens por sessão (app.armazem_sessao) contra o modelo antigo (bytes de cada imagem
+em st.session_state["imagens_carregadas"]).
+
+- memória: N sessões com M imagens JPEG cada; tracemalloc do que fica vivo com os bytes na sessão x com o
+  armazém (miniaturas + LRU limitado por sessão)
+- leitura: bytes_imagem devolve exatamente o enviado; tempo de guardar (com miniatura) e de ler do disco/LRU
+- limites: LRU nunca passa de SESSAO_MEMORIA_MAX_MB; conteúdo repetido grava um arquivo só; acima do teto de
+  disco guardar levanta LimiteSessaoExcedido
+- limpeza: manter/liberar apagam os arquivos; armazém coletado (fim da sessão) apaga a pasta; a varredura
+  remove pastas paradas de sessões mortas e mantém as vivas
+
+Sai com código 1 se alguma conferência falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_armazem_sessao
+  python -m benchmarks.bench_armazem_sessao --sessoes 10 --imagens 20 --memoria-mb 8
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+
+def _jpeg(rnd: random.Random, largura=1600, altura=1200) -> bytes:
+    from PIL import Image
+    img = Image.effect_noise((largura // 4, altura // 4), rnd.randint(20, 80)).convert("RGB").resize((largura, altura))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessoes", type=int, default=6)
+    parser.add_argument("--imagens", type=int, default=12, help="imagens por sessão")
+    parser.add_argument("--memoria-mb", type=float, default=4, help="LRU em memória por sessão")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="fc_bench_armazem_"))
+    # Precisa ser definido antes de importar app/* (as pastas são lidas no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(tmp / "bench.db")
+    os.environ["FORTCORDIS_PASTA_SESSOES"] = str(tmp / "sessoes")
+    os.environ["FORTCORDIS_PASTA_MINIATURAS"] = str(tmp / "miniaturas")
+
+    import app.armazem_sessao as arm_mod
+    from app.armazem_sessao import ArmazemSessao, LimiteSessaoExcedido, bytes_imagem, guardar_imagem
+
+    rnd = random.Random(args.seed)
+    problemas = []
+    relatorio = {"sessoes": args.sessoes, "imagens": args.imagens}
+    # Mesmo conjunto de imagens por sessão (conteúdo distinto entre sessões não muda a conta de memória)
+    originais = [_jpeg(rnd) for _ in range(args.imagens)]
+    mb = 1024 * 1024
+    total_bytes = sum(len(b) for b in originais)
+
+    # 1) Memória: bytes na sessão x armazém
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    # bytes(bytearray(...)): cópia de verdade, como cada upload de cada sessão (bytes(b) devolveria o mesmo objeto)
+    sessoes_antigas = [[{"name": f"IMG_{i:02d}.jpg", "bytes": bytes(bytearray(b))} for i, b in enumerate(originais)]
+                       for _ in range(args.sessoes)]
+    mem_antigo = tracemalloc.get_traced_memory()[0] - base
+    del sessoes_antigas
+    gc.collect()
+
+    base = tracemalloc.get_traced_memory()[0]
+    armazens, sessoes_novas, t_guardar = [], [], []
+    for _ in range(args.sessoes):
+        arm = ArmazemSessao(memoria_max_mb=args.memoria_mb)
+        itens = []
+        for i, b in enumerate(originais):
+            t0 = time.perf_counter()
+            itens.append(guardar_imagem(f"IMG_{i:02d}.jpg", bytes(bytearray(b)), armazem=arm))
+            t_guardar.append(time.perf_counter() - t0)
+        armazens.append(arm)
+        sessoes_novas.append(itens)
+    mem_novo = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    relatorio["memoria"] = {"imagens_mb_por_sessao": round(total_bytes / mb, 1), "antigo_mb": round(mem_antigo / mb, 1),
+                            "armazem_mb": round(mem_novo / mb, 1)}
+    print(f"⏱️  {args.sessoes} sessão(ões) x {args.imagens} imagem(ns) ({total_bytes / mb:.1f} MB cada): "
+          f"bytes na sessão {mem_antigo / mb:.1f} MB, armazém {mem_novo / mb:.1f} MB "
+          f"(LRU {args.memoria_mb:g} MB/sessão); guardar {statistics.median(t_guardar) * 1000:.1f} ms/imagem")
+    limite_novo = args.sessoes * (args.memoria_mb * mb + args.imagens * 64 * 1024)
+    if mem_novo > limite_novo:
+        problemas.append(f"armazém usou {mem_novo / mb:.1f} MB (esperado até {limite_novo / mb:.1f} MB)")
+
+    # 2) Leitura: conteúdo idêntico, LRU dentro do teto
+    arm, itens = armazens[0], sessoes_novas[0]
+    t_disco, t_memoria = [], []
+    for it, b in zip(itens, originais):
+        t0 = time.perf_counter()
+        lido = bytes_imagem(it, armazem=arm)
+        t_disco.append(time.perf_counter() - t0)
+        if lido != b:
+            problemas.append(f"{it['name']}: bytes lidos diferentes dos enviados")
+        t0 = time.perf_counter()
+        bytes_imagem(it, armazem=arm)
+        t_memoria.append(time.perf_counter() - t0)
+        if not it["miniatura"] or len(it["miniatura"]) > 64 * 1024:
+            problemas.append(f"{it['name']}: miniatura ausente ou grande ({len(it['miniatura'] or b'')} bytes)")
+    est = arm.estatisticas()
+    if est["bytes_memoria"] > args.memoria_mb * mb:
+        problemas.append(f"LRU com {est['bytes_memoria']} bytes acima do teto")
+    relatorio["leitura"] = {"ler_ms_mediana": round(statistics.median(t_disco) * 1000, 2),
+                            "ler_lru_us_mediana": round(statistics.median(t_memoria) * 1e6, 1), "estatisticas": est}
+    print(f"⏱️  ler: {statistics.median(t_disco) * 1000:.2f} ms (mediana, disco ou LRU), releitura "
+          f"{statistics.median(t_memoria) * 1e6:.1f} µs; {est['removidos_memoria']} saída(s) do LRU")
+
+    # 3) Repetidos e teto de disco
+    antes = len(list(arm.pasta.iterdir()))
+    guardar_imagem("repetida.jpg", originais[0], armazem=arm)
+    if len(list(arm.pasta.iterdir())) != antes:
+        problemas.append("conteúdo repetido gravou outro arquivo")
+    pequeno = ArmazemSessao(disco_max_mb=len(originais[0]) * 1.5 / mb)
+    pequeno.guardar(originais[0])
+    try:
+        pequeno.guardar(originais[1])
+        problemas.append("teto de disco não levantou LimiteSessaoExcedido")
+    except LimiteSessaoExcedido:
+        pass
+    pequeno.fechar()
+
+    # 4) Limpeza
+    removidos = arm.manter([it["chave"] for it in itens[: args.imagens // 2]])
+    if removidos != args.imagens - args.imagens // 2 or len(list(arm.pasta.iterdir())) != args.imagens // 2:
+        problemas.append(f"manter removeu {removidos}, sobraram {len(list(arm.pasta.iterdir()))} arquivo(s)")
+    pastas = [a.pasta for a in armazens]
+    del arm, armazens, sessoes_novas, itens
+    gc.collect()
+    restantes = [p for p in pastas if p.exists()]
+    if restantes:
+        problemas.append(f"{len(restantes)} pasta(s) de sessão ainda existem depois da coleta")
+
+    viva = ArmazemSessao()
+    viva.guardar(b"viva")
+    orfa = Path(os.environ["FORTCORDIS_PASTA_SESSOES"]) / "sessao_de_outro_processo"
+    orfa.mkdir(parents=True)
+    (orfa / "x").write_bytes(b"x")
+    velho = time.time() - 48 * 3600
+    os.utime(orfa, (velho, velho))
+    os.utime(viva.pasta, (velho, velho))
+    removidas = arm_mod.varrer_sessoes_paradas(ttl_h=24)
+    if removidas != 1 or orfa.exists() or not viva.pasta.exists():
+        problemas.append(f"varredura: {removidas} removida(s), órfã existe={orfa.exists()}, viva existe={viva.pasta.exists()}")
+    viva.fechar()
+
+    relatorio["problemas"] = problemas
+    for p in problemas:
+        print(f"   ⚠️ {p}")
+    if not problemas:
+        print("   ✅ bytes idênticos, LRU no teto, repetidos e teto de disco, pastas apagadas no fim da sessão")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
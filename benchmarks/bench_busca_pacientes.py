@@ -0,0 +1,248 @@
+"""
+Benchmark da busca de pacientes para vínculo (app.services.busca_pacientes) contra os LIKE '%termo%' que
+buscar_pacientes_por_termo_livre, buscar_pacientes_para_vinculo e listar_animais_tutores_de_laudos faziam a
+cada rerun.
+
+- digitação: cada prefixo de nomes reais ("b", "bo", "bol", ...) consultado pelo SQL antigo (cadastro + laudos)
+  e por sugerir_pacientes; mediana/p99 por tecla
+- carga: tempo para montar o índice e memória (tracemalloc)
+- conferências: para termos de 3+ caracteres o índice devolve os mesmos pacientes que o LIKE (nomes sem
+  acento); "joao" acha "João"; nome igual vem primeiro; par de laudo que já é cadastro não se repete;
+  db_upsert_paciente/db_upsert_tutor, paciente inativado e registrar_laudo_busca aparecem sem remontar;
+  invalidar_busca_pacientes pega gravação feita por fora; TTL vencido remonta em segundo plano sem perder
+  o que foi gravado durante a recarga
+
+Sai com código 1 se alguma conferência falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_busca_pacientes
+  python -m benchmarks.bench_busca_pacientes --pacientes 50000 --laudos 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+_SILABAS = ("bo", "la", "ta", "me", "li", "nu", "ra", "to", "fi", "ca", "ma", "lu", "pe", "ri", "so", "de",
+            "ne", "gui", "xa", "ju", "ve", "pi", "co", "ba", "zi")
+_PRENOMES = ("Francisco", "Maria", "Ana", "Pedro", "Lucas", "Juliana", "Carlos", "Fernanda", "Paulo", "Beatriz",
+             "Rafael", "Camila", "Marcos", "Larissa", "Gustavo", "Patricia", "Rodrigo", "Aline", "Bruno", "Renata")
+_SOBRENOMES = ("Silva", "Souza", "Oliveira", "Santos", "Lima", "Pereira", "Costa", "Rodrigues", "Almeida",
+               "Nascimento", "Carvalho", "Araujo", "Ribeiro", "Martins", "Barbosa", "Gomes", "Rocha", "Freitas")
+
+
+def _animal(rnd: random.Random) -> str:
+    return "".join(rnd.choice(_SILABAS) for _ in range(rnd.randint(2, 3))).capitalize()
+
+
+def _tutor(rnd: random.Random) -> str:
+    return f"{rnd.choice(_PRENOMES)} {rnd.choice(_SOBRENOMES)} {rnd.choice(_SOBRENOMES)}"
+
+
+def _popular(db_path: Path, n_pacientes: int, n_laudos: int, rnd: random.Random) -> list:
+    from app.db import _db_init
+    from app.laudos_banco import _criar_tabelas_laudos_se_nao_existirem
+
+    _db_init()
+    conn = sqlite3.connect(str(db_path))
+    _criar_tabelas_laudos_se_nao_existirem(conn.cursor())
+    n_tutores = max(1, n_pacientes // 2)
+    tutores = [(i, _tutor(rnd) + f" {i}", f"tutor {i}", f"(85) 9{i:08d}") for i in range(1, n_tutores + 1)]
+    conn.executemany("INSERT INTO tutores (id, nome, nome_key, telefone, created_at) VALUES (?, ?, ?, ?, '2025-01-01')",
+                     tutores)
+    pacientes = [(i, rnd.randint(1, n_tutores), _animal(rnd)) for i in range(1, n_pacientes + 1)]
+    conn.executemany("INSERT INTO pacientes (id, tutor_id, nome, nome_key, created_at) VALUES (?, ?, ?, ?, '2025-01-01')",
+                     [(i, t, n, f"{n.lower()} {i}") for i, t, n in pacientes])
+    nomes_tutor = {i: n for i, n, _k, _tel in tutores}
+    laudos = []
+    for i in range(n_laudos):
+        if i % 2:  # metade dos laudos é de paciente cadastrado (mesmo par animal/tutor)
+            _pid, tid, nome = rnd.choice(pacientes)
+            laudos.append((f"b{i}", nome, nomes_tutor[tid]))
+        else:
+            laudos.append((f"b{i}", _animal(rnd), _tutor(rnd)))
+    conn.executemany("INSERT INTO laudos_arquivos (nome_base, data_exame, nome_animal, nome_tutor) VALUES (?, '2025-01-01', ?, ?)",
+                     laudos)
+    conn.executemany("INSERT INTO laudos_ecocardiograma (nome_paciente, data_exame) VALUES (?, '2025-01-01')",
+                     [(_animal(rnd),) for _ in range(n_laudos // 4)])
+    conn.commit()
+    conn.close()
+    return pacientes
+
+
+def _like_antigo(conn: sqlite3.Connection, termo: str, limite: int) -> tuple:
+    """As consultas de antes (termo livre no cadastro + os dois SELECT DISTINCT de laudos), como a página fazia."""
+    t = f"%{termo}%"
+    cad = conn.execute("""
+        SELECT p.id, p.tutor_id, p.nome, t.nome, COALESCE(t.telefone, '')
+        FROM pacientes p JOIN tutores t ON p.tutor_id = t.id
+        WHERE (p.ativo = 1 OR p.ativo IS NULL) AND (UPPER(p.nome) LIKE UPPER(?) OR UPPER(t.nome) LIKE UPPER(?))
+        ORDER BY t.nome, p.nome LIMIT ?
+    """, (t, t, limite)).fetchall()
+    laudos = conn.execute("""
+        SELECT DISTINCT TRIM(COALESCE(nome_animal,'')), TRIM(COALESCE(nome_tutor,''))
+        FROM laudos_arquivos
+        WHERE (UPPER(COALESCE(nome_animal,'')) LIKE UPPER(?) OR UPPER(COALESCE(nome_tutor,'')) LIKE UPPER(?))
+          AND (TRIM(COALESCE(nome_animal,'')) != '' OR TRIM(COALESCE(nome_tutor,'')) != '')
+        LIMIT ?
+    """, (t, t, limite)).fetchall()
+    eco = conn.execute("""
+        SELECT DISTINCT TRIM(COALESCE(nome_paciente,'')), '' FROM laudos_ecocardiograma
+        WHERE UPPER(COALESCE(nome_paciente,'')) LIKE UPPER(?) AND TRIM(COALESCE(nome_paciente,'')) != ''
+        LIMIT ?
+    """, (t, limite)).fetchall()
+    return cad, laudos, eco
+
+
+def _p99(valores: list) -> float:
+    return sorted(valores)[max(0, int(len(valores) * 0.99) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=20000)
+    parser.add_argument("--laudos", type=int, default=20000, help="linhas em laudos_arquivos (e 1/4 disso no eco)")
+    parser.add_argument("--termos", type=int, default=60, help="nomes digitados letra a letra")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="fc_bench_busca_"))
+    db_path = tmp / "bench.db"
+    # Precisa ser definido antes de importar app/* (DB_PATH é lido no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    import app.services.busca_pacientes as busca
+    from app.db import db_upsert_paciente, db_upsert_tutor
+    from app.laudos_banco import listar_animais_tutores_de_laudos
+    from app.services.pacientes import buscar_pacientes_para_vinculo, buscar_pacientes_por_termo_livre
+
+    rnd = random.Random(args.seed)
+    problemas = []
+    pacientes = _popular(db_path, args.pacientes, args.laudos, rnd)
+
+    # 1) Carga do índice
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    indice = busca.obter_indice_busca()
+    t_carga = time.perf_counter() - t0
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"⏱️  índice: {len(indice)} entrada(s) em {t_carga * 1000:.0f} ms, {mem / (1024 * 1024):.1f} MB")
+
+    # 2) Digitação: cada prefixo do nome como uma tecla
+    conn = sqlite3.connect(str(db_path))
+    nomes = [rnd.choice(pacientes)[2] if i % 2 else rnd.choice(_PRENOMES) for i in range(args.termos)]
+    teclas = [nome[:k] for nome in nomes for k in range(1, len(nome) + 1)]
+    t_sql, t_indice = [], []
+    for termo in teclas:
+        t0 = time.perf_counter()
+        _like_antigo(conn, termo, 15)
+        t_sql.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        busca.sugerir_pacientes(termo, limite=30)
+        t_indice.append(time.perf_counter() - t0)
+    relatorio = {
+        "pacientes": args.pacientes, "laudos": args.laudos, "entradas": len(indice),
+        "carga_ms": round(t_carga * 1000, 1), "memoria_mb": round(mem / (1024 * 1024), 1),
+        "teclas": len(teclas),
+        "sql_ms": {"mediana": round(statistics.median(t_sql) * 1000, 3), "p99": round(_p99(t_sql) * 1000, 3)},
+        "indice_ms": {"mediana": round(statistics.median(t_indice) * 1000, 3), "p99": round(_p99(t_indice) * 1000, 3)},
+    }
+    print(f"⏱️  {len(teclas)} tecla(s): LIKE mediana {relatorio['sql_ms']['mediana']:.2f} ms "
+          f"(p99 {relatorio['sql_ms']['p99']:.2f}), índice mediana {relatorio['indice_ms']['mediana']:.3f} ms "
+          f"(p99 {relatorio['indice_ms']['p99']:.3f})")
+
+    # 3) Mesmos pacientes que o LIKE (termos de 3+ caracteres, nomes sem acento)
+    for termo in sorted({t for t in teclas if len(t) >= 3})[:80]:
+        esperado = {r[0] for r in _like_antigo(conn, termo, 10 ** 9)[0]}
+        obtido = {r["id"] for r in buscar_pacientes_por_termo_livre(termo, limite=10 ** 9)}
+        if esperado != obtido:
+            problemas.append(f"'{termo}': LIKE {len(esperado)} paciente(s), índice {len(obtido)}")
+            break
+        esperado_l = {(a, t) for a, t in _like_antigo(conn, termo, 10 ** 9)[1]} | \
+                     {(a, t) for a, t in _like_antigo(conn, termo, 10 ** 9)[2]}
+        obtido_l = {(r["paciente"], r["tutor"]) for r in listar_animais_tutores_de_laudos(termo, limite=10 ** 9)}
+        if esperado_l != obtido_l:
+            problemas.append(f"'{termo}': LIKE {len(esperado_l)} par(es) de laudo, índice {len(obtido_l)}")
+            break
+    conn.close()
+
+    # 4) Acentos, ordem, mescla
+    tid = db_upsert_tutor("João Acentuado Bench")
+    pid = db_upsert_paciente(tid, "Pérola", especie="Canina")
+    if not any(r["id"] == pid for r in busca.sugerir_pacientes("joao acentuado")):
+        problemas.append("'joao acentuado' não achou 'João Acentuado Bench' (ou o cadastro não entrou no índice)")
+    if not any(r["id"] == pid for r in buscar_pacientes_para_vinculo(nome_animal="perola", nome_tutor="joão")):
+        problemas.append("buscar_pacientes_para_vinculo não achou o paciente novo")
+    alvo_pid, alvo_tid, alvo_nome = pacientes[0]
+    primeiro = busca.sugerir_pacientes(alvo_nome, limite=5)
+    if not primeiro or busca._norm_key(primeiro[0]["paciente"]) != busca._norm_key(alvo_nome):
+        problemas.append(f"nome igual não veio primeiro para '{alvo_nome}': {primeiro[:1]}")
+    pares = [(busca._norm_key(r["paciente"]), busca._norm_key(r["tutor"])) for r in busca.sugerir_pacientes(alvo_nome, limite=500)]
+    if len(pares) != len(set(pares)):
+        problemas.append(f"'{alvo_nome}': par animal/tutor repetido entre cadastro e laudo")
+
+    # 5) Atualização sem remontar: telefone do tutor, paciente inativado, laudo novo; invalidação
+    db_upsert_tutor("João Acentuado Bench", telefone="(85) 90000-0000")
+    achado = [r for r in busca.sugerir_pacientes("pérola") if r.get("id") == pid]
+    if not achado or achado[0]["telefone"] != "(85) 90000-0000":
+        problemas.append(f"telefone novo do tutor não apareceu: {achado}")
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("UPDATE pacientes SET ativo = 0 WHERE id = ?", (pid,))
+    conn.commit()
+    busca.registrar_paciente_busca(pid)
+    if any(r.get("id") == pid for r in busca.sugerir_pacientes("pérola")):
+        problemas.append("paciente inativado continua nas sugestões")
+    busca.registrar_laudo_busca("Zequinha Laudonovo", "Tutor Laudonovo")
+    if not any(r["fonte"] == "laudo" for r in busca.sugerir_pacientes("laudonovo")):
+        problemas.append("laudo registrado não apareceu nas sugestões")
+    conn.execute("INSERT INTO tutores (nome, nome_key, created_at) VALUES ('Externo Bench', 'externo bench', '2025-01-01')")
+    conn.execute("INSERT INTO pacientes (tutor_id, nome, nome_key, created_at) VALUES (last_insert_rowid(), 'Forasteiro', 'forasteiro', '2025-01-01')")
+    conn.commit()
+    conn.close()
+    if busca.obter_indice_busca() is not indice:
+        problemas.append("o índice foi remontado sem invalidação")
+    busca.invalidar_busca_pacientes()
+    if not busca.sugerir_pacientes("forasteiro"):
+        problemas.append("gravação feita por fora não apareceu depois de invalidar_busca_pacientes")
+
+    # 6) TTL vencido: a busca segue no índice atual, o novo é montado numa thread e recebe o que foi gravado nesse meio
+    atual = busca.obter_indice_busca()
+    atual.carregado_em -= busca.BUSCA_PACIENTES_TTL_SEGUNDOS + 1
+    t0 = time.perf_counter()
+    busca.sugerir_pacientes("bo")
+    t_ttl = time.perf_counter() - t0
+    busca.registrar_laudo_busca("Durante Recarga", "Tutor Recarga")
+    limite_espera = time.monotonic() + 120
+    while busca._indice is atual and time.monotonic() < limite_espera:
+        time.sleep(0.05)
+    if busca._indice is atual:
+        problemas.append("índice com TTL vencido não foi remontado em segundo plano")
+    elif not busca.sugerir_pacientes("durante recarga"):
+        problemas.append("laudo registrado durante a recarga sumiu do índice novo")
+    if t_ttl > 0.1:
+        problemas.append(f"busca com TTL vencido esperou a recarga ({t_ttl * 1000:.0f} ms)")
+    relatorio["ttl_vencido_ms"] = round(t_ttl * 1000, 3)
+
+    relatorio["problemas"] = problemas
+    for p in problemas:
+        print(f"   ⚠️ {p}")
+    if not problemas:
+        print("   ✅ mesmos pacientes que o LIKE, acentos, ordem, mescla, atualização e invalidação conferidos")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
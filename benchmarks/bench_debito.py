@@ -0,0 +1,122 @@
+"""
+Benchmark dos relatórios de clientes em débito (Financeiro > Clientes em débito).
+
+Gera um banco temporário com N linhas em `financeiro` e compara:
+- legado: listar_financeiro_pendentes() + agrupamento em laço Python
+- atual:  clientes_em_debito() (GROUP BY + janela ROW_NUMBER no SQLite, com aging)
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_debito
+  python -m benchmarks.bench_debito --linhas 100000 --clinicas 300 --repeticoes 5
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+
+def _popular(db_path: Path, linhas: int, clinicas: int, seed: int = 42) -> None:
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO clinicas_parceiras (nome, cidade) VALUES (?, 'Fortaleza')",
+        [(f"Clínica Bench {i:04d}",) for i in range(clinicas)],
+    )
+    cur.execute("SELECT id FROM clinicas_parceiras")
+    ids_cli = [r[0] for r in cur.fetchall()]
+    hoje = date.today()
+    status = ["pendente"] * 6 + ["pago"] * 3 + ["cancelado"]
+    lote = []
+    for i in range(linhas):
+        d = hoje - timedelta(days=rnd.randint(0, 365))
+        v = round(rnd.uniform(60, 900), 2)
+        lote.append((rnd.choice(ids_cli), f"OS-BENCH-{i:07d}", "Ecocardiograma", v, v,
+                     rnd.choice(status), d.isoformat()))
+        if len(lote) >= 10000:
+            cur.executemany("""
+                INSERT INTO financeiro (clinica_id, numero_os, descricao, valor_bruto, valor_final,
+                                        status_pagamento, data_competencia)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, lote)
+            lote = []
+    if lote:
+        cur.executemany("""
+            INSERT INTO financeiro (clinica_id, numero_os, descricao, valor_bruto, valor_final,
+                                    status_pagamento, data_competencia)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, lote)
+    conn.commit()
+    conn.close()
+
+
+def _legado(listar_financeiro_pendentes) -> list:
+    """Implementação anterior: lista todas as OS pendentes e agrupa em Python."""
+    by_clinica = {}
+    for p in listar_financeiro_pendentes():
+        cid = p.get("clinica_id")
+        if cid not in by_clinica:
+            by_clinica[cid] = {"clinica_id": cid, "clinica_nome": p.get("clinica_nome") or "Clínica",
+                               "total_pendente": 0, "qtd_os": 0, "os_list": []}
+        v = float(p.get("valor_final") or 0)
+        by_clinica[cid]["total_pendente"] += v
+        by_clinica[cid]["qtd_os"] += 1
+        by_clinica[cid]["os_list"].append({"id": p.get("id"), "numero_os": p.get("numero_os"), "valor": v,
+                                           "data_competencia": p.get("data_competencia")})
+    return list(by_clinica.values())
+
+
+def _medir(fn, repeticoes: int) -> tuple:
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = fn()
+        tempos.append(time.perf_counter() - t0)
+    return resultado, tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--clinicas", type=int, default=300)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="fc_bench_debito_")
+    db_path = Path(tmpdir) / "bench.db"
+    # Precisa ser definido antes de importar fortcordis_modules.database (o módulo lê o path no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    from fortcordis_modules.database import garantir_tabelas_financeiro_extras, listar_financeiro_pendentes
+    from app.services.financeiro import clientes_em_debito
+
+    garantir_tabelas_financeiro_extras()
+    print(f"📦 Gerando {args.linhas:,} linhas em financeiro ({args.clinicas} clínicas) em {db_path} ...")
+    t0 = time.perf_counter()
+    _popular(db_path, args.linhas, args.clinicas)
+    print(f"   pronto em {time.perf_counter() - t0:.1f}s")
+
+    legado, t_leg = _medir(lambda: _legado(listar_financeiro_pendentes), args.repeticoes)
+    atual, t_sql = _medir(clientes_em_debito, args.repeticoes)
+
+    # Conferência: mesmos totais por clínica
+    tot_leg = {d["clinica_id"]: (round(d["total_pendente"], 2), d["qtd_os"]) for d in legado}
+    tot_sql = {d["clinica_id"]: (round(d["total_pendente"], 2), d["qtd_os"]) for d in atual}
+    assert tot_leg == tot_sql, "Totais divergentes entre legado e SQL"
+
+    med_leg, med_sql = statistics.median(t_leg), statistics.median(t_sql)
+    print(f"\n📊 Clientes em débito ({len(atual)} clínicas, {sum(d['qtd_os'] for d in atual):,} OS pendentes)")
+    print(f"   legado (lista + laço Python): mediana {med_leg * 1000:8.1f} ms")
+    print(f"   SQL (GROUP BY + aging):       mediana {med_sql * 1000:8.1f} ms")
+    print(f"   ganho: {med_leg / med_sql:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
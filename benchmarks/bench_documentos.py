@@ -0,0 +1,75 @@
+"""
+Benchmark de vazão da geração de documentos (receituário, atestado, GTA, termo).
+
+Compara a geração sequencial (como a página fazia, na thread do script) com o lote
+em pool de processos de app.services.documentos (submeter_lote + resultado_lote).
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_documentos
+  python -m benchmarks.bench_documentos --documentos 400 --workers 4 --logo caminho/logo.png
+"""
+
+import argparse
+import time
+
+
+def _itens(n: int, logo_path=None) -> list:
+    texto = "\n".join(f"{i}. Pimobendan 5 mg - 1/2 comprimido VO a cada 12 horas" for i in range(1, 9))
+    base = [
+        ("receituario", {"paciente_nome": "Thor", "tutor_nome": "Maria Silva", "especie": "Canino",
+                         "peso_kg": 12.5, "prescricao_texto": texto}),
+        ("atestado", {"paciente_nome": "Mia", "tutor_nome": "João Souza", "especie": "Felino", "raca": "SRD",
+                      "idade": "4 anos", "finalidade": "Viagem"}),
+        ("gta", {"origem_dados": {"nome": "João", "cidade": "Fortaleza"}, "destino_dados": {"nome": "Ana", "cidade": "Recife"},
+                 "animal_dados": {"especie": "Canino", "raca": "Poodle"}, "finalidade": "Mudança de domicílio"}),
+        ("termo", {"procedimento": "Ecocardiograma sob sedação", "paciente_nome": "Bob", "tutor_nome": "Carla Lima",
+                   "tutor_cpf": "000.000.000-00", "riscos_texto": "Reação à sedação."}),
+    ]
+    out = []
+    for i in range(n):
+        tipo, params = base[i % len(base)]
+        out.append({"tipo": tipo, "parametros": dict(params, logo_path=logo_path), "nome_arquivo": f"{tipo}_{i}.pdf"})
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documentos", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None, help="padrão: DOCUMENTOS_WORKERS do app.config")
+    parser.add_argument("--logo", default=None)
+    args = parser.parse_args()
+
+    import app.config as cfg
+    if args.workers:
+        cfg.DOCUMENTOS_WORKERS = args.workers
+    import app.services.documentos as docs
+    docs.DOCUMENTOS_WORKERS = cfg.DOCUMENTOS_WORKERS
+    from fortcordis_modules.documentos import renderizar_documento
+
+    itens = _itens(args.documentos, args.logo)
+
+    t0 = time.perf_counter()
+    seq = [renderizar_documento(it["tipo"], it["parametros"]) for it in itens]
+    t_seq = time.perf_counter() - t0
+
+    # Aquece o pool (criação dos processos não entra na medida)
+    docs.resultado_lote(docs.submeter_lote(itens[: cfg.DOCUMENTOS_WORKERS]))
+
+    t0 = time.perf_counter()
+    lote_id = docs.submeter_lote(itens)
+    t_submit = time.perf_counter() - t0
+    res = docs.resultado_lote(lote_id)
+    t_pool = time.perf_counter() - t0
+    tam_zip = len(docs.zip_lote(lote_id))
+    erros = sum(1 for r in res if r["erro"])
+    assert len(res) == len(seq) and not erros, f"{erros} documento(s) com erro"
+
+    n = len(itens)
+    print(f"📄 {n} documentos (receituário/atestado/GTA/termo), {cfg.DOCUMENTOS_WORKERS} processo(s)")
+    print(f"   sequencial:      {t_seq:6.2f}s  ({n / t_seq:7.1f} docs/s)")
+    print(f"   lote (pool):     {t_pool:6.2f}s  ({n / t_pool:7.1f} docs/s), submissão {t_submit * 1000:.1f} ms")
+    print(f"   ganho: {t_seq / t_pool:.1f}x   zip: {tam_zip / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Benchmark e conferência do motor de interpretação clínica (app.laudos_interpretacao).
+
+- regras: N exames sintéticos (peso, AE/Ao, DIVEd, Vmax de refluxo, congestão, patologia/grau) interpretados
+  pelo motor e pela regra antiga (cópia da analisar_criterios_clinicos de antes da extração, com a mesma
+  tabela canina); conclusão, valvas e frases de Doppler têm de ser iguais, e o estágio tem de bater com a tabela
+  ACVIM (C com congestão, B2 com AE e VE aumentados, B1 sem aumento)
+- índice: para cada patologia das chaves de data/frases_personalizadas.json e para textos aleatórios, a busca
+  do IndiceFrases devolve a mesma entry da varredura linear antiga
+- lote: interpretar_lote com pool de processos devolve o mesmo que o serial, na mesma ordem; mede exames/s
+- arquivo: reestadiar_arquivo sobre um banco temporário com laudos arquivados (JSON com qualitativa_meta)
+
+Com 1 CPU o pool fica mais lento que o serial (custo de iniciar os processos 'spawn'); é o caso em que
+INTERPRETACAO_WORKERS já vale 1 e interpretar_lote roda serial.
+
+Sai com código 1 se alguma conferência falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_interpretacao
+  python -m benchmarks.bench_interpretacao --exames 200000 --workers 4
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+_PATOLOGIAS = ["Endocardiose Mitral"] * 6 + ["Normal", "Estenose Aórtica", "Estenose Pulmonar",
+                                             "Persistência do Ducto Arterioso (PDA)", "Cardiomiopatia Dilatada",
+                                             "Cardiomiopatia Hipertrófica", "Patologia Inexistente"]
+_GRAUS = ["Leve", "Moderada", "Importante", "Grave", "Discreta", ""]
+
+
+def _exame(rnd: random.Random, i: int) -> dict:
+    medidas = {"LA_Ao": round(rnd.uniform(1.0, 2.6), 2), "LVIDd": round(rnd.uniform(1.2, 6.5), 2)}
+    for p in ("MR_Vmax", "TR_Vmax", "AR_Vmax", "PR_Vmax"):
+        medidas[p] = round(rnd.uniform(0.5, 6.0), 2) if rnd.random() < 0.4 else 0.0
+    return {
+        "id": i,
+        "medidas": medidas,
+        "peso": round(rnd.uniform(1.5, 45.0), 1),
+        "especie": "Canina",
+        "patologia": rnd.choice(_PATOLOGIAS),
+        "grau_refluxo": rnd.choice(_GRAUS),
+        "congestao": rnd.random() < 0.15,
+        "grau_geral": rnd.choice(_GRAUS),
+    }
+
+
+def _regra_antiga(db_frases, df, e) -> dict:
+    """analisar_criterios_clinicos antes da extração, sem a sessão: (textos, frases de Doppler por valva)."""
+    from app.laudos_interpretacao import montar_chave_frase
+    from app.laudos_refs import calcular_referencia_tabela
+
+    patologia, grau_refluxo, dados = e["patologia"], e["grau_refluxo"], e["medidas"]
+    chave = montar_chave_frase(patologia, grau_refluxo, e["grau_geral"])
+    res_base = db_frases.get(chave, {})
+    if not res_base and patologia != "Normal":
+        for k, v in db_frases.items():
+            if patologia in k:
+                res_base = v.copy()
+                break
+    if not res_base:
+        res_base = {"conclusao": f"{patologia}"}
+    txt = res_base.copy()
+    if patologia == "Endocardiose Mitral":
+        conclusao_editor = (txt.get("conclusao") or "").strip()
+        try:
+            r_lvidd = calcular_referencia_tabela("LVIDd", e["peso"], df=df)[0]
+            l_lvidd = r_lvidd[1] if r_lvidd[1] else 999
+            r_laao = calcular_referencia_tabela("LA_Ao", e["peso"], df=df)[0]
+            l_laao = r_laao[1] if r_laao[1] else 1.6
+        except Exception:
+            l_lvidd, l_laao = 999, 1.6
+        aum_ae, aum_ve = (dados.get("LA_Ao", 0) >= l_laao), (dados.get("LVIDd", 0) > l_lvidd)
+        if not (txt.get("valvas") or "").strip():
+            txt["valvas"] = f"Valva mitral espessada. Insuficiência {grau_refluxo.lower()}."
+        if not conclusao_editor:
+            if e["congestao"]:
+                txt["conclusao"] = f"Endocardiose Mitral Estágio C (ACVIM). Refluxo {grau_refluxo}. Sinais de ICC."
+            elif aum_ae and aum_ve:
+                txt["conclusao"] = f"Endocardiose Mitral Estágio B2 (ACVIM). Refluxo {grau_refluxo} com remodelamento."
+            elif aum_ae:
+                txt["conclusao"] = f"Endocardiose Mitral (Refluxo {grau_refluxo}) com aumento atrial esquerdo."
+            else:
+                txt["conclusao"] = f"Endocardiose Mitral Estágio B1 (ACVIM). Refluxo {grau_refluxo}."
+    doppler = {}
+    mr = dados["MR_Vmax"]
+    if mr > 0:
+        doppler["mitral"] = [f"Refluxo mitral presente ao Doppler (Vmax {mr:.2f} m/s)."]
+        if patologia == "Endocardiose Mitral" and grau_refluxo:
+            doppler["mitral"].append(f"Refluxo mitral {grau_refluxo.lower()} ao Doppler (Vmax {mr:.2f} m/s).")
+    for p, valva, rotulo in (("TR_Vmax", "tricuspide", "tricúspide"), ("AR_Vmax", "aortica", "aórtico"),
+                             ("PR_Vmax", "pulmonar", "pulmonar")):
+        if dados[p] > 0:
+            doppler[valva] = [f"Refluxo {rotulo} presente ao Doppler (Vmax {dados[p]:.2f} m/s)."]
+    return {"conclusao": txt.get("conclusao"), "valvas": txt.get("valvas"), "doppler": doppler,
+            "limites": (l_laao, l_lvidd) if patologia == "Endocardiose Mitral" else None}
+
+
+def _estagio_esperado(e, res) -> str:
+    if e["congestao"]:
+        return "C"
+    aum_ae = e["medidas"]["LA_Ao"] >= res["limites"]["LA_Ao"]
+    aum_ve = e["medidas"]["LVIDd"] > res["limites"]["LVIDd"]
+    return "B2" if aum_ae and aum_ve else ("" if aum_ae else "B1")
+
+
+def _banco_arquivo(db_path: Path, exames: list) -> None:
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("CREATE TABLE laudos_arquivos (id INTEGER PRIMARY KEY, tipo_exame TEXT DEFAULT 'ecocardiograma', "
+                 "conteudo_json BLOB)")
+    linhas = []
+    for e in exames:
+        obj = {"paciente": {"nome": f"Animal {e['id']}", "especie": e["especie"]}, "peso": e["peso"],
+               "medidas": e["medidas"], "textos": {"conclusao": "Conclusão antiga."},
+               "qualitativa_meta": {"patologia": e["patologia"], "grau_refluxo": e["grau_refluxo"],
+                                    "congestao": e["congestao"], "grau_geral": e["grau_geral"]}}
+        linhas.append((e["id"], json.dumps(obj, ensure_ascii=False)))
+    linhas.append((len(exames) + 1, json.dumps({"paciente": {}, "medidas": {}})))  # laudo antigo, sem meta
+    conn.executemany("INSERT INTO laudos_arquivos (id, conteudo_json) VALUES (?, ?)", linhas)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exames", type=int, default=50_000)
+    parser.add_argument("--conferir", type=int, default=1000, help="exames comparados com a regra antiga")
+    parser.add_argument("--arquivo", type=int, default=5000, help="laudos no banco do reestadiamento")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--lote", type=int, default=None)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(prefix="fc_bench_interpretacao_")) / "bench.db"
+    # Precisa ser definido antes de importar app/* (DB_PATH é lido no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    from app.config import INTERPRETACAO_LOTE, INTERPRETACAO_WORKERS
+    from app.laudos_interpretacao import (
+        IndiceFrases, interpretar_exame, interpretar_lote, reestadiar_arquivo, separar_patologia_grau,
+    )
+    from app.laudos_medidas import _tabela_referencia
+
+    workers = args.workers or max(2, INTERPRETACAO_WORKERS)
+    lote = args.lote or INTERPRETACAO_LOTE
+    rnd = random.Random(args.seed)
+    raiz = Path(__file__).resolve().parent.parent
+    db_frases = json.loads((raiz / "data" / "frases_personalizadas.json").read_text(encoding="utf-8"))
+    df = _tabela_referencia(False)
+    problemas = []
+    relatorio = {"exames": args.exames, "workers": workers, "lote": lote, "frases": len(db_frases)}
+
+    # 1) Regras: motor x regra antiga, e estágio x tabela ACVIM
+    indice = IndiceFrases(db_frases)
+    exames = [_exame(rnd, i) for i in range(args.conferir)]
+    divergentes, estagios = 0, {}
+    for e in exames:
+        res = interpretar_exame(e["medidas"], e["peso"], e["especie"], e["patologia"], e["grau_refluxo"],
+                                e["congestao"], e["grau_geral"], frases=indice, df_ref=df)
+        antiga = _regra_antiga(db_frases, df, e)
+        sem_df = interpretar_exame(e["medidas"], e["peso"], e["especie"], e["patologia"], e["grau_refluxo"],
+                                   e["congestao"], e["grau_geral"], frases=indice)
+        iguais = (res["textos"].get("conclusao") == antiga["conclusao"] and res["textos"].get("valvas") == antiga["valvas"]
+                  and res["doppler"] == antiga["doppler"] and sem_df == res)
+        if e["patologia"] == "Endocardiose Mitral":
+            iguais = iguais and (res["limites"]["LA_Ao"], res["limites"]["LVIDd"]) == antiga["limites"]
+            iguais = iguais and res["estagio"] == _estagio_esperado(e, res)
+            estagios[res["estagio"] or "AE"] = estagios.get(res["estagio"] or "AE", 0) + 1
+        if not iguais:
+            divergentes += 1
+            if divergentes <= 3:
+                problemas.append(f"exame {e['id']} ({e['patologia']} {e['grau_refluxo']}): motor difere da regra antiga")
+    relatorio["regras"] = {"conferidos": len(exames), "divergentes": divergentes, "estagios": estagios}
+    print(f"⏱️  regras: {len(exames)} exame(s) conferidos com a regra antiga, {divergentes} divergente(s); "
+          f"estágios {estagios}")
+
+    # 2) Índice de frases x varredura linear
+    patologias = {separar_patologia_grau(k)[0] for k in db_frases} | {p for p in _PATOLOGIAS}
+    patologias |= {"".join(rnd.choice("aeiou Mrt") for _ in range(rnd.randint(1, 4))) for _ in range(300)}
+    erros_indice = 0
+    for pat in sorted(patologias):
+        for grau in _GRAUS:
+            chave = f"{pat} ({grau})"
+            esperado = db_frases.get(chave, {})
+            if not esperado and pat != "Normal":
+                esperado = next((v for k, v in db_frases.items() if pat in k), {})
+            if indice.buscar(chave, pat) != esperado:
+                erros_indice += 1
+    if erros_indice:
+        problemas.append(f"índice de frases difere da varredura linear em {erros_indice} consulta(s)")
+    n_busca = 200_000
+    chaves = [f"{rnd.choice(sorted(patologias))} ({rnd.choice(_GRAUS)})" for _ in range(1000)]
+    t0 = time.perf_counter()
+    for i in range(n_busca):
+        c = chaves[i % 1000]
+        indice.buscar(c, separar_patologia_grau(c)[0])
+    t_indice = time.perf_counter() - t0
+    relatorio["indice"] = {"patologias": len(patologias), "erros": erros_indice,
+                           "buscas_s": round(n_busca / t_indice) if t_indice else None}
+    print(f"⏱️  índice: {len(patologias)} patologia(s) conferidas, {erros_indice} erro(s); "
+          f"{relatorio['indice']['buscas_s']} busca(s)/s")
+
+    # 3) Lote: serial x pool de processos
+    exames = [_exame(rnd, i) for i in range(args.exames)]
+    t0 = time.perf_counter()
+    serial = interpretar_lote(exames, db_frases, workers=1, lote=lote)
+    t_serial = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    paralelo = interpretar_lote(exames, db_frases, workers=workers, lote=lote)
+    t_pool = time.perf_counter() - t0
+    if paralelo != serial:
+        problemas.append("interpretar_lote: resultado do pool difere do serial")
+    if [r["id"] for r in paralelo] != [e["id"] for e in exames]:
+        problemas.append("interpretar_lote: ordem dos resultados diferente da entrada")
+    relatorio["lote_serial"] = {"segundos": round(t_serial, 3), "exames_s": round(args.exames / t_serial)}
+    relatorio["lote_pool"] = {"segundos": round(t_pool, 3), "exames_s": round(args.exames / t_pool)}
+    print(f"⏱️  lote: serial {t_serial:.2f}s ({relatorio['lote_serial']['exames_s']} exames/s), "
+          f"pool x{workers} {t_pool:.2f}s ({relatorio['lote_pool']['exames_s']} exames/s)")
+
+    # 4) Reestadiamento do arquivo (somente leitura)
+    arquivados = [_exame(rnd, i + 1) for i in range(args.arquivo)]
+    _banco_arquivo(db_path, arquivados)
+    antes = db_path.stat().st_mtime_ns
+    rel = reestadiar_arquivo(db_frases, db_path=str(db_path), workers=workers, lote=lote)
+    if rel["exames"] != len(arquivados) or rel["ignorados"] != 1:
+        problemas.append(f"reestadiar_arquivo: {rel['exames']} exame(s) e {rel['ignorados']} ignorado(s), "
+                         f"esperado {len(arquivados)} e 1")
+    if db_path.stat().st_mtime_ns != antes:
+        problemas.append("reestadiar_arquivo alterou o banco")
+    esperados = {}
+    for e in arquivados:
+        if e["patologia"] == "Endocardiose Mitral":
+            r = interpretar_exame(e["medidas"], e["peso"], e["especie"], e["patologia"], e["grau_refluxo"],
+                                  e["congestao"], e["grau_geral"], frases=indice)
+            if r["estagio"]:
+                esperados[r["estagio"]] = esperados.get(r["estagio"], 0) + 1
+    if rel["por_estagio"] != esperados:
+        problemas.append(f"reestadiar_arquivo: estágios {rel['por_estagio']}, esperado {esperados}")
+    relatorio["arquivo"] = {k: v for k, v in rel.items() if k != "mudaram"}
+    relatorio["arquivo"]["mudaram"] = len(rel["mudaram"])
+    print(f"⏱️  arquivo: {rel['exames']} laudo(s) reestadiado(s) em {rel['segundos']:.2f}s, "
+          f"{len(rel['mudaram'])} com conclusão diferente da arquivada")
+
+    relatorio["problemas"] = problemas
+    for p in problemas:
+        print(f"   ⚠️ {p}")
+    if not problemas:
+        print("   ✅ motor igual à regra antiga, índice igual à varredura, pool igual ao serial")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark dos jobs em segundo plano (app.services.jobs) e da importação de backup como job
+(app.services.importacao_backup).
+
+- submissão/consulta: tempo de submeter_job e de estado_job (o que a página paga a cada rerun/fragmento)
+  enquanto um job sintético roda
+- ciclo de vida: progresso visível durante a execução, cancelamento no meio, cancelamento de job na fila,
+  erro, job único por tipo e resultado; linhas de jobs_background conferidas no banco
+- reinício: job "executando" deixado por outro processo vira "interrompido"
+- importação: backup sintético (clínicas, tutores, pacientes, laudos) importado como job num banco vazio;
+  a segunda importação do mesmo backup não cria nada novo. Mede o tempo do job e o da página (submeter)
+
+Sai com código 1 se alguma conferência falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_jobs
+  python -m benchmarks.bench_jobs --pacientes 2000 --consultas 2000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+
+def _criar_backup(caminho: Path, n_pacientes: int, rnd: random.Random) -> dict:
+    """Backup no formato do exportar_backup.py (só as tabelas que a importação lê)."""
+    conn = sqlite3.connect(str(caminho))
+    conn.executescript("""
+        CREATE TABLE clinicas (id INTEGER PRIMARY KEY, nome TEXT, nome_key TEXT, created_at TEXT);
+        CREATE TABLE tutores (id INTEGER PRIMARY KEY, nome TEXT, nome_key TEXT, telefone TEXT, created_at TEXT);
+        CREATE TABLE pacientes (id INTEGER PRIMARY KEY, tutor_id INTEGER, nome TEXT, nome_key TEXT, especie TEXT,
+                                raca TEXT, sexo TEXT, nascimento TEXT, created_at TEXT);
+        CREATE TABLE laudos_ecocardiograma (id INTEGER PRIMARY KEY, paciente_id INTEGER, clinica_id INTEGER,
+                                            data_exame TEXT, observacoes TEXT);
+    """)
+    n_clinicas = max(1, n_pacientes // 50)
+    n_tutores = max(1, n_pacientes // 2)
+    conn.executemany("INSERT INTO clinicas VALUES (?, ?, ?, '2025-01-01')",
+                     [(i, f"Clínica {i}", f"clinica {i}") for i in range(1, n_clinicas + 1)])
+    conn.executemany("INSERT INTO tutores VALUES (?, ?, ?, NULL, '2025-01-01')",
+                     [(i, f"Tutor {i}", f"tutor {i}") for i in range(1, n_tutores + 1)])
+    conn.executemany(
+        "INSERT INTO pacientes VALUES (?, ?, ?, ?, ?, NULL, NULL, NULL, '2025-01-01')",
+        [(i, rnd.randint(1, n_tutores), f"Animal {i}", f"animal {i}", rnd.choice(("Canina", "Felina")))
+         for i in range(1, n_pacientes + 1)],
+    )
+    conn.executemany(
+        "INSERT INTO laudos_ecocardiograma VALUES (?, ?, ?, ?, ?)",
+        [(i, i, rnd.randint(1, n_clinicas), f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}", f"obs {i}")
+         for i in range(1, n_pacientes + 1)],
+    )
+    conn.commit()
+    conn.close()
+    return {"clinicas": n_clinicas, "tutores": n_tutores, "pacientes": n_pacientes, "laudos": n_pacientes}
+
+
+def _linha(db_path: Path, job_id: str):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return conn.execute("SELECT status, feitos, total FROM jobs_background WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=1000, help="pacientes (e laudos) no backup sintético")
+    parser.add_argument("--consultas", type=int, default=1000, help="chamadas de estado_job medidas")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="fc_bench_jobs_"))
+    db_path = tmp / "bench.db"
+    # Precisa ser definido antes de importar app/* (DB_PATH é lido no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    import app.services.jobs as jobs
+    from app.db import _db_init
+
+    _db_init()
+    rnd = random.Random(args.seed)
+    problemas = []
+    relatorio = {}
+
+    def _lento(passos: int = 50, passo_s: float = 0.02, progresso=None, cancelar=None) -> dict:
+        feitos = 0
+        for feitos in range(1, passos + 1):
+            if cancelar is not None and cancelar.is_set():
+                return {"feitos": feitos - 1, "cancelado": True}
+            time.sleep(passo_s)
+            progresso(feitos, passos, f"passo {feitos}")
+        return {"feitos": feitos, "cancelado": False}
+
+    def _falha():
+        raise ValueError("falha de propósito")
+
+    jobs.registrar_tipo("bench_lento", _lento)
+    jobs.registrar_tipo("bench_falha", _falha)
+    logging.getLogger("app.services.jobs").setLevel(logging.CRITICAL)  # o traceback da falha de propósito
+
+    # 1) Submissão e consulta com um job rodando
+    t0 = time.perf_counter()
+    jid = jobs.submeter_job("bench_lento", passos=100)
+    t_submeter = time.perf_counter() - t0
+    if jobs.submeter_job("bench_lento") != jid:
+        problemas.append("unico: segundo submeter_job do mesmo tipo criou outro job")
+    tempos, progresso_visto = [], set()
+    for i in range(args.consultas):
+        t0 = time.perf_counter()
+        est = jobs.estado_job(jid)
+        tempos.append(time.perf_counter() - t0)
+        progresso_visto.add(est["feitos"])
+        if i % 20 == 0:
+            time.sleep(0.005)  # como o fragmento da página: consultas espaçadas enquanto o job anda
+    while jobs.estado_job(jid)["feitos"] < 10:
+        time.sleep(0.01)
+    jobs.cancelar_job(jid)
+    final = jobs.aguardar_job(jid, timeout=30)
+    res = jobs.resultado_job(jid)
+    if final["status"] != "cancelado" or not res or not (10 <= res["feitos"] < 100):
+        problemas.append(f"cancelamento no meio: {final['status']}, {res}")
+    if len(progresso_visto) < 2:
+        problemas.append("progresso não mudou durante a execução")
+    linha = _linha(db_path, jid)
+    if not linha or linha[0] != "cancelado":
+        problemas.append(f"jobs_background após cancelar: {linha}")
+    relatorio["consulta"] = {"submeter_ms": round(t_submeter * 1000, 2),
+                             "estado_job_us_mediana": round(statistics.median(tempos) * 1e6, 1),
+                             "estado_job_us_p99": round(sorted(tempos)[int(len(tempos) * 0.99) - 1] * 1e6, 1)}
+    print(f"⏱️  submeter_job {t_submeter * 1000:.2f} ms; estado_job mediana "
+          f"{relatorio['consulta']['estado_job_us_mediana']:.1f} µs, p99 {relatorio['consulta']['estado_job_us_p99']:.1f} µs")
+
+    # 2) Fila (1 worker): o segundo fica pendente e é cancelado antes de começar; erro; conclusão
+    j1 = jobs.submeter_job("bench_lento", passos=20)
+    j2 = jobs.submeter_job("bench_lento", unico=False, passos=5)
+    if jobs.estado_job(j2)["status"] != "pendente":
+        problemas.append(f"segundo job não ficou na fila: {jobs.estado_job(j2)['status']}")
+    jobs.cancelar_job(j2)
+    e1, e2 = jobs.aguardar_job(j1, timeout=30), jobs.aguardar_job(j2, timeout=30)
+    if e1["status"] != "concluido" or jobs.resultado_job(j1) != {"feitos": 20, "cancelado": False}:
+        problemas.append(f"job concluído: {e1['status']}, {jobs.resultado_job(j1)}")
+    if e2["status"] != "cancelado" or e2["iniciado_em"] is not None:
+        problemas.append(f"job cancelado na fila: {e2['status']}, iniciado_em={e2['iniciado_em']}")
+    jf = jobs.submeter_job("bench_falha")
+    ef = jobs.aguardar_job(jf, timeout=30)
+    if ef["status"] != "erro" or "falha de propósito" not in (ef["erro"] or ""):
+        problemas.append(f"job com erro: {ef['status']}, {ef['erro']}")
+    if (_linha(db_path, j1) or (None,))[0] != "concluido" or (_linha(db_path, jf) or (None,))[0] != "erro":
+        problemas.append("jobs_background sem o status final de todos os jobs")
+
+    # 3) Reinício: linha "executando" de outro processo vira "interrompido" na primeira chamada
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("INSERT INTO jobs_background (id, tipo, status, criado_em) VALUES ('orfao', 'bench_lento', 'executando', ?)",
+                 (time.strftime("%Y-%m-%dT%H:%M:%S"),))
+    conn.commit()
+    conn.close()
+    jobs._pool["iniciado"] = False
+    jobs.listar_jobs()
+    orfao = jobs.estado_job("orfao")
+    if not orfao or orfao["status"] != "interrompido":
+        problemas.append(f"job órfão após reinício: {orfao}")
+
+    # 4) Importação de backup como job
+    esperado = _criar_backup(tmp / "backup.db", args.pacientes, rnd)
+    relatorio["importacao"] = {}
+    for rodada in ("primeira", "repetida"):
+        copia = tmp / f"backup_{rodada}.db"
+        copia.write_bytes((tmp / "backup.db").read_bytes())
+        t0 = time.perf_counter()
+        ji = jobs.submeter_job("importar_backup", caminho_backup=str(copia))
+        t_pagina = time.perf_counter() - t0
+        ei = jobs.aguardar_job(ji, timeout=600)
+        t_job = time.perf_counter() - t0
+        rel = jobs.resultado_job(ji) or {}
+        if ei["status"] != "concluido":
+            problemas.append(f"importação ({rodada}): {ei['status']} {ei['erro']}")
+            continue
+        if rel["erros"]:
+            problemas.append(f"importação ({rodada}): erros {rel['erros']}")
+        novos = rel["novos"]
+        if rodada == "primeira" and any(novos[k] != esperado[k] for k in esperado):
+            problemas.append(f"importação (primeira): novos {novos}, esperado {esperado}")
+        if rodada == "repetida" and any(novos[k] for k in esperado):
+            problemas.append(f"importação (repetida) criou registros: {novos}")
+        if copia.exists():
+            problemas.append(f"importação ({rodada}): arquivo temporário não removido")
+        if (ei["feitos"], ei["total"]) != (8, 8):
+            problemas.append(f"importação ({rodada}): progresso final {ei['feitos']}/{ei['total']}")
+        relatorio["importacao"][rodada] = {"pagina_ms": round(t_pagina * 1000, 2), "job_s": round(t_job, 2),
+                                           "novos": novos, "existentes": rel["existentes"]}
+        print(f"⏱️  importação ({rodada}, {args.pacientes} pacientes): página {t_pagina * 1000:.2f} ms, "
+              f"job {t_job:.2f} s; novos {sum(novos.values())}, existentes {sum(rel['existentes'].values())}")
+
+    relatorio["problemas"] = problemas
+    for p in problemas:
+        print(f"   ⚠️ {p}")
+    if not problemas:
+        print("   ✅ fila, progresso, cancelamento, erro, reinício e importação como job conferidos")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark da tabela de medidas de ecocardiograma (laudos_medidas).
+
+Gera um banco temporário com N exames em `laudos_arquivos` (JSON no formato salvo pela página
+Laudos) e mede:
+- backfill: extração de todos os JSON para laudos_medidas (pool de processos)
+- legado: coorte "AE/Ao >= 1,6 em caninos no ano" decodificando todos os JSON em Python
+- atual:  a mesma coorte por buscar_coorte() (índice param/especie/valor)
+- tendência de um paciente (vinculado por nome de tutor/animal) por tendencia_paciente()
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_medidas
+  python -m benchmarks.bench_medidas --exames 20000 --workers 4 --repeticoes 5
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+_ESPECIES = ["Canina"] * 7 + ["Felina"] * 3
+_PARAMS_SINTETICOS = {
+    "Ao": (12, 25), "LA": (12, 40), "LA_Ao": (0.9, 2.4), "IVSd": (5, 12), "LVPWd": (5, 12),
+    "LVIDd": (20, 55), "LVIDs": (10, 40), "EF": (40, 85), "FS": (18, 50), "MV_E": (0.5, 1.6),
+    "MV_A": (0.3, 1.0), "MV_E_A": (0.8, 2.2), "EEp": (5, 18), "Vmax_Ao": (0.8, 2.2),
+}
+
+
+def _popular(db_path: Path, exames: int, pacientes: int, seed: int = 42) -> None:
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    hoje = date.today()
+    lote = []
+    for i in range(exames):
+        pac = rnd.randrange(pacientes)
+        d = (hoje - timedelta(days=rnd.randint(0, 730))).isoformat()
+        medidas = {k: round(rnd.uniform(a, b), 2) for k, (a, b) in _PARAMS_SINTETICOS.items()}
+        obj = {
+            "paciente_id": None,
+            "nome_animal": f"Pet {pac:05d}",
+            "data": d,
+            "especie": _ESPECIES[pac % len(_ESPECIES)],
+            "peso": round(3 + (pac % 40), 1),
+            "paciente": {"nome": f"Pet {pac:05d}", "tutor": f"Tutor {pac:05d}", "data_exame": d},
+            "medidas": medidas,
+            "textos": {"conclusao": "Exame sintético " * 20},
+        }
+        lote.append((d, f"Pet {pac:05d}", f"Tutor {pac:05d}", "Clínica Bench", "ecocardiograma",
+                     f"bench_{i:07d}", json.dumps(obj, indent=4, ensure_ascii=False).encode("utf-8")))
+        if len(lote) >= 5000:
+            cur.executemany(
+                "INSERT INTO laudos_arquivos (data_exame, nome_animal, nome_tutor, nome_clinica, tipo_exame, nome_base, conteudo_json) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", lote)
+            lote = []
+    if lote:
+        cur.executemany(
+            "INSERT INTO laudos_arquivos (data_exame, nome_animal, nome_tutor, nome_clinica, tipo_exame, nome_base, conteudo_json) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", lote)
+    conn.commit()
+    conn.close()
+
+
+def _legado_coorte(db_path: Path, param: str, minimo: float, especie: str, inicio: str, fim: str) -> list:
+    """Sem a tabela: lê e decodifica o JSON de todos os exames."""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        out = []
+        for rid, data, blob in conn.execute("SELECT id, data_exame, conteudo_json FROM laudos_arquivos"):
+            obj = json.loads(blob)
+            v = (obj.get("medidas") or {}).get(param)
+            if v is not None and float(v) >= minimo and obj.get("especie") == especie and inicio <= data[:10] <= fim:
+                out.append(rid)
+        return out
+    finally:
+        conn.close()
+
+
+def _medir(fn, repeticoes: int) -> tuple:
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = fn()
+        tempos.append(time.perf_counter() - t0)
+    return resultado, tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exames", type=int, default=20_000)
+    parser.add_argument("--pacientes", type=int, default=4_000)
+    parser.add_argument("--workers", type=int, default=None, help="processos do backfill (padrão: MEDIDAS_WORKERS)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    from app.laudos_medidas import backfill_medidas, buscar_coorte, tendencia_paciente
+    from app.utils import _norm_key
+
+    tmpdir = tempfile.mkdtemp(prefix="fc_bench_medidas_")
+    db_path = Path(tmpdir) / "bench.db"
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("""
+        CREATE TABLE laudos_arquivos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, data_exame TEXT NOT NULL, nome_animal TEXT, nome_tutor TEXT,
+            nome_clinica TEXT, tipo_exame TEXT DEFAULT 'ecocardiograma', nome_base TEXT UNIQUE,
+            conteudo_json BLOB, conteudo_pdf BLOB, created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Cadastro mínimo para o vínculo exame -> paciente por nome (tutor + animal)
+    conn.execute("CREATE TABLE tutores (id INTEGER PRIMARY KEY, nome TEXT, nome_key TEXT UNIQUE)")
+    conn.execute("CREATE TABLE pacientes (id INTEGER PRIMARY KEY, tutor_id INTEGER, nome TEXT, nome_key TEXT, "
+                 "UNIQUE(tutor_id, nome_key))")
+    conn.executemany("INSERT INTO tutores (id, nome, nome_key) VALUES (?, ?, ?)",
+                     [(i + 1, f"Tutor {i:05d}", _norm_key(f"Tutor {i:05d}")) for i in range(args.pacientes)])
+    conn.executemany("INSERT INTO pacientes (id, tutor_id, nome, nome_key) VALUES (?, ?, ?, ?)",
+                     [(i + 1, i + 1, f"Pet {i:05d}", _norm_key(f"Pet {i:05d}")) for i in range(args.pacientes)])
+    conn.commit()
+    conn.close()
+    print(f"📦 Gerando {args.exames:,} exames em laudos_arquivos em {db_path} ...")
+    t0 = time.perf_counter()
+    _popular(db_path, args.exames, args.pacientes)
+    print(f"   pronto em {time.perf_counter() - t0:.1f}s")
+
+    rel = backfill_medidas(db_path=str(db_path), workers=args.workers)
+    print(f"\n⚙️  Backfill: {rel['exames']:,} exames, {rel['medidas']:,} medidas em {rel['segundos']:.1f}s "
+          f"({rel['exames'] / max(rel['segundos'], 1e-6):,.0f} exames/s)")
+
+    ano = date.today().year
+    inicio, fim = f"{ano}-01-01", f"{ano}-12-31"
+    legado, t_leg = _medir(lambda: _legado_coorte(db_path, "LA_Ao", 1.6, "Canina", inicio, fim), args.repeticoes)
+    atual, t_idx = _medir(
+        lambda: buscar_coorte("LA_Ao", valor_min=1.6, especie="Canina", data_inicio=inicio, data_fim=fim,
+                              limite=args.exames, db_path=str(db_path)),
+        args.repeticoes,
+    )
+    assert sorted(legado) == sorted(r["exame_id"] for r in atual), "Coortes divergentes entre JSON e laudos_medidas"
+
+    serie, t_tend = _medir(lambda: tendencia_paciente(1, ["LA_Ao", "LVIDd"], db_path=str(db_path)), args.repeticoes)
+
+    med_leg, med_idx = statistics.median(t_leg), statistics.median(t_idx)
+    print(f"\n📊 Coorte AE/Ao >= 1,6, caninos, {ano} ({len(atual):,} exames)")
+    print(f"   legado (decodifica todos os JSON): mediana {med_leg * 1000:8.1f} ms")
+    print(f"   laudos_medidas (índice):           mediana {med_idx * 1000:8.1f} ms")
+    print(f"   ganho: {med_leg / med_idx:.1f}x")
+    print(f"\n📈 Tendência de paciente ({len(serie):,} pontos): mediana {statistics.median(t_tend) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
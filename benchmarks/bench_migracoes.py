@@ -0,0 +1,206 @@
+"""
+Benchmark das migrações de esquema (app.migracoes) num banco no formato antigo.
+
+Monta pacientes com microchip UNIQUE e consultas com CHECK/coluna extra/índice (como ficavam antes dos
+scripts corrigir_microchip_pacientes.py e recriar_tabela_consultas.py) e roda executar_migracoes:
+- interrompe a primeira execução no meio da cópia de pacientes (cancelar entre lotes);
+- simula o app gravando entre as execuções (altera, insere e apaga linhas já copiadas);
+- retoma e confere: mesmas linhas (conteúdo comparado coluna a coluna), microchip sem UNIQUE, coluna extra
+  e índice de consultas preservados, nenhuma referência órfã, AUTOINCREMENT sem reaproveitar ids e
+  uma terceira execução sem nada a fazer.
+
+Sai com código 1 se alguma conferência falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_migracoes
+  python -m benchmarks.bench_migracoes --pacientes 500000 --lote 5000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+_PACIENTES_ANTIGA = """
+    CREATE TABLE pacientes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tutor_id INTEGER NOT NULL,
+        nome TEXT NOT NULL,
+        especie TEXT NOT NULL,
+        raca TEXT,
+        microchip TEXT UNIQUE,
+        observacoes TEXT,
+        FOREIGN KEY (tutor_id) REFERENCES tutores(id)
+    )
+"""
+
+_CONSULTAS_ANTIGA = """
+    CREATE TABLE consultas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER NOT NULL,
+        tutor_id INTEGER NOT NULL,
+        data_consulta DATE NOT NULL,
+        motivo_consulta TEXT NOT NULL,
+        veterinario_id INTEGER NOT NULL,
+        status TEXT DEFAULT 'finalizado' CHECK (status IN ('finalizado', 'em_andamento')),
+        valor_cobrado REAL,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+        FOREIGN KEY (tutor_id) REFERENCES tutores(id)
+    )
+"""
+
+
+def montar_banco(db_path: Path, n_pacientes: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE tutores (id INTEGER PRIMARY KEY AUTOINCREMENT, nome TEXT NOT NULL, "
+                 "nome_key TEXT NOT NULL UNIQUE, telefone TEXT, created_at TEXT NOT NULL)")
+    conn.execute(_PACIENTES_ANTIGA)
+    conn.execute(_CONSULTAS_ANTIGA)
+    conn.execute("CREATE INDEX idx_consultas_paciente ON consultas(paciente_id)")
+    n_tutores = max(1, n_pacientes // 2)
+    conn.executemany("INSERT INTO tutores (nome, nome_key, telefone, created_at) VALUES (?, ?, ?, '2024-01-01')",
+                     ((f"Tutor {i}", f"tutor {i}", f"85 9{i:08d}") for i in range(n_tutores)))
+    conn.executemany(
+        "INSERT INTO pacientes (tutor_id, nome, especie, raca, microchip, observacoes) VALUES (?, ?, ?, ?, ?, ?)",
+        ((rnd.randint(1, n_tutores), f"Animal {i}", rnd.choice(["Canina", "Felina"]), rnd.choice(["SRD", "Poodle"]),
+          f"9820000{i:08d}" if rnd.random() < 0.3 else None, "x" * rnd.randint(0, 200))
+         for i in range(n_pacientes)),
+    )
+    conn.executemany(
+        "INSERT INTO consultas (paciente_id, tutor_id, data_consulta, motivo_consulta, veterinario_id, valor_cobrado) "
+        "VALUES (?, (SELECT tutor_id FROM pacientes WHERE id = ?), '2024-05-01', 'Rotina', 1, ?)",
+        ((p, p, rnd.randint(100, 400)) for p in (rnd.randint(1, n_pacientes) for _ in range(n_pacientes // 2))),
+    )
+    # Apagados no fim: a reconstrução não pode reaproveitar esses ids (AUTOINCREMENT)
+    conn.execute("DELETE FROM pacientes WHERE id > ?", (n_pacientes - 5,))
+    conn.execute("DELETE FROM consultas WHERE paciente_id > ?", (n_pacientes - 5,))
+    conn.commit()
+    conn.close()
+
+
+def _assinatura(conn, tabela: str, colunas: list) -> tuple:
+    """(linhas, sha1 do conteúdo em ordem de id) das colunas dadas."""
+    h = hashlib.sha1()
+    n = 0
+    lista = ", ".join(colunas)
+    for row in conn.execute(f"SELECT {lista} FROM {tabela} ORDER BY id"):
+        h.update(repr(row).encode())
+        n += 1
+    return n, h.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=200_000)
+    parser.add_argument("--lote", type=int, default=2000)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(prefix="fc_bench_migracoes_")) / "bench.db"
+    # Precisa ser definido antes de importar app/* (DB_PATH é lido no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    print(f"⏱️  banco antigo: {args.pacientes} paciente(s), {args.pacientes // 2} consulta(s)")
+    montar_banco(db_path, args.pacientes, args.seed)
+
+    from app.migracoes import executar_migracoes, listar_migracoes
+
+    problemas = []
+    relatorio = {"pacientes": args.pacientes, "lote": args.lote}
+    cols_pac = ["id", "tutor_id", "nome", "especie", "raca", "microchip", "observacoes"]
+    cols_con = ["id", "paciente_id", "tutor_id", "data_consulta", "motivo_consulta", "valor_cobrado"]
+
+    # 1) Interrompida na metade da cópia de pacientes
+    cancelar = threading.Event()
+
+    def _progresso(nome, feitas, total):
+        if nome.startswith("0003") and feitas >= total // 2:
+            cancelar.set()
+
+    t0 = time.perf_counter()
+    r1 = executar_migracoes(lote=args.lote, progresso=_progresso, cancelar=cancelar)
+    relatorio["primeira"] = r1
+    estado = {m["nome"]: m for m in listar_migracoes()}
+    print(f"   1ª execução: {len(r1['executadas'])} concluída(s), interrompida={r1['cancelado']} "
+          f"({estado['0003_pacientes_microchip_sem_unique']['linhas']} linha(s) de pacientes copiadas) "
+          f"em {r1['segundos']:.2f}s")
+    if not r1["cancelado"] or estado["0003_pacientes_microchip_sem_unique"]["status"] != "em_andamento":
+        problemas.append("a primeira execução deveria parar em 0003 com status em_andamento")
+
+    # 2) O app grava entre as execuções: altera e apaga linhas já copiadas, insere uma nova
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("UPDATE pacientes SET observacoes = 'alterado durante a migração' WHERE id IN (1, 2, 3)")
+    conn.execute("DELETE FROM consultas WHERE paciente_id = 10")
+    conn.execute("DELETE FROM pacientes WHERE id = 10")
+    conn.execute("INSERT INTO pacientes (tutor_id, nome, especie, microchip) VALUES (1, 'Novo', 'Canina', NULL)")
+    conn.commit()
+    antes_pac = _assinatura(conn, "pacientes", cols_pac)
+    antes_con = _assinatura(conn, "consultas", cols_con)
+    seq_antes = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'pacientes'").fetchone()[0]
+    conn.close()
+
+    # 3) Retomada
+    r2 = executar_migracoes(lote=args.lote)
+    relatorio["retomada"] = r2
+    for m in r2["executadas"]:
+        print(f"   ✅ {m['nome']}: {m['resultado']} ({m['segundos']:.2f}s"
+              + (f", {m['linhas_s']} linhas/s)" if m["linhas"] else ")"))
+    if r2["erro"]:
+        problemas.append(f"erro na retomada: {r2['erro']}")
+    relatorio["segundos_total"] = round(time.perf_counter() - t0, 3)
+
+    conn = sqlite3.connect(str(db_path))
+    if _assinatura(conn, "pacientes", cols_pac) != antes_pac:
+        problemas.append("pacientes: conteúdo diferente do original após a migração")
+    if _assinatura(conn, "consultas", cols_con) != antes_con:
+        problemas.append("consultas: conteúdo diferente do original após a migração")
+    # veterinario_id -> usuarios é chave nova do esquema atual de consultas (o banco de teste não tem usuários)
+    if [r for r in conn.execute("PRAGMA foreign_key_check") if r[2] in ("pacientes", "tutores")]:
+        problemas.append("referências órfãs após a migração")
+    try:
+        conn.execute("INSERT INTO pacientes (tutor_id, nome, especie, microchip) VALUES (1, 'A', 'Canina', '123')")
+        conn.execute("INSERT INTO pacientes (tutor_id, nome, especie, microchip) VALUES (1, 'B', 'Canina', '123')")
+        novo_id = conn.execute("SELECT MIN(id) FROM pacientes WHERE microchip = '123'").fetchone()[0]
+        if novo_id <= seq_antes:
+            problemas.append(f"AUTOINCREMENT reaproveitou o id {novo_id} (seq anterior {seq_antes})")
+        conn.rollback()
+    except sqlite3.IntegrityError as e:
+        problemas.append(f"microchip continua UNIQUE: {e}")
+    if not conn.execute("SELECT 1 FROM pragma_table_info('consultas') WHERE name = 'valor_cobrado'").fetchone():
+        problemas.append("consultas: coluna extra valor_cobrado perdida")
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_consultas_paciente'").fetchone():
+        problemas.append("consultas: índice idx_consultas_paciente não recriado")
+    if "CHECK" in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'consultas'").fetchone()[0]:
+        problemas.append("consultas: CHECK antigo continua no esquema")
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%__nova'").fetchone()[0]:
+        problemas.append("tabela __nova ficou para trás")
+    conn.close()
+
+    # 4) Sem nada pendente
+    r3 = executar_migracoes(lote=args.lote)
+    if r3["executadas"] or any(m["status"] != "concluida" for m in listar_migracoes()):
+        problemas.append("terceira execução deveria encontrar tudo concluído")
+
+    relatorio["problemas"] = problemas
+    for p in problemas:
+        print(f"   ⚠️ {p}")
+    if not problemas:
+        print(f"   ✅ retomada sem perder linhas, esquema corrigido ({relatorio['segundos_total']:.2f}s no total)")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark das miniaturas da aba Imagens (app.laudos_miniaturas) contra o modelo antigo (a imagem completa
+enviada ao st.image a cada rerun).
+
+- payload: bytes por rerun da grade com as imagens completas x com as miniaturas (WebP ou JPEG)
+- CPU: decodificar + reduzir a imagem completa (o que o navegador/servidor refaziam) x gerar a miniatura
+  (com draft do JPEG) x ler a miniatura do cache por sha256
+- conferências: o acerto devolve os mesmos bytes, lado maior <= MINIATURA_PX, PNG e JPEG, conteúdo ilegível
+  retorna None, a poda deixa o cache dentro do limite
+
+Sai com código 1 se alguma conferência falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_miniaturas
+  python -m benchmarks.bench_miniaturas --imagens 40 --largura 3000 --altura 2250
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+
+def _imagem(rnd: random.Random, largura: int, altura: int, formato: str) -> bytes:
+    from PIL import Image
+    img = Image.effect_noise((largura // 8, altura // 8), rnd.randint(20, 80)).convert("RGB").resize((largura, altura))
+    buf = io.BytesIO()
+    img.save(buf, formato, **({"quality": 90} if formato == "JPEG" else {}))
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagens", type=int, default=16, help="imagens na grade (1 em 4 PNG)")
+    parser.add_argument("--largura", type=int, default=1600)
+    parser.add_argument("--altura", type=int, default=1200)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="fc_bench_miniaturas_"))
+    # Precisa ser definido antes de importar app/* (as pastas são lidas no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(tmp / "bench.db")
+    os.environ["FORTCORDIS_PASTA_MINIATURAS"] = str(tmp / "miniaturas")
+
+    from PIL import Image
+
+    from app.config import MINIATURA_PX
+    from app.laudos_miniaturas import (formato_miniatura, gerar_miniatura, miniatura_em_cache, obter_miniatura,
+                                       podar_miniaturas)
+
+    rnd = random.Random(args.seed)
+    problemas = []
+    imagens = [_imagem(rnd, args.largura, args.altura, "PNG" if i % 4 == 3 else "JPEG") for i in range(args.imagens)]
+    kb = 1024
+
+    # 1) Modelo antigo: decodificar a imagem completa e reduzir (sem draft)
+    t_antigo = []
+    for b in imagens:
+        t0 = time.perf_counter()
+        with Image.open(io.BytesIO(b)) as img:
+            img.load()
+            img.thumbnail((MINIATURA_PX, MINIATURA_PX))
+        t_antigo.append(time.perf_counter() - t0)
+
+    # 2) Miniatura: primeira vez (gera e guarda) e depois do cache
+    t_frio, t_cache, minis = [], [], []
+    for b in imagens:
+        t0 = time.perf_counter()
+        mini = obter_miniatura(b)
+        t_frio.append(time.perf_counter() - t0)
+        minis.append(mini)
+    for b, mini in zip(imagens, minis):
+        t0 = time.perf_counter()
+        de_novo = obter_miniatura(b)
+        t_cache.append(time.perf_counter() - t0)
+        if de_novo != mini:
+            problemas.append("miniatura do cache diferente da gerada")
+        if mini is None:
+            problemas.append("imagem legível sem miniatura")
+            continue
+        with Image.open(io.BytesIO(mini)) as m:
+            if max(m.size) > MINIATURA_PX or m.format != formato_miniatura()[0]:
+                problemas.append(f"miniatura {m.format} {m.size} (esperado {formato_miniatura()[0]}, lado <= {MINIATURA_PX})")
+
+    completo = sum(len(b) for b in imagens)
+    reduzido = sum(len(m or b"") for m in minis)
+    relatorio = {
+        "imagens": args.imagens, "formato": formato_miniatura()[0],
+        "payload_kb": {"completo": round(completo / kb, 1), "miniaturas": round(reduzido / kb, 1)},
+        "ms_por_imagem": {"decodificar_completa": round(statistics.median(t_antigo) * 1000, 2),
+                          "gerar": round(statistics.median(t_frio) * 1000, 2),
+                          "cache": round(statistics.median(t_cache) * 1000, 3)},
+    }
+    print(f"📦 grade com {args.imagens} imagem(ns) {args.largura}x{args.altura}: {completo / kb:.0f} KB completas x "
+          f"{reduzido / kb:.0f} KB em miniaturas {formato_miniatura()[0]} ({completo / max(reduzido, 1):.0f}x menos por rerun)")
+    print(f"⏱️  por imagem: decodificar completa {statistics.median(t_antigo) * 1000:.1f} ms, gerar miniatura "
+          f"{statistics.median(t_frio) * 1000:.1f} ms, do cache {statistics.median(t_cache) * 1000:.3f} ms")
+
+    # 3) Conferências de borda
+    import hashlib
+    if miniatura_em_cache(hashlib.sha256(imagens[0]).hexdigest()) != minis[0]:
+        problemas.append("miniatura_em_cache não achou a miniatura pelo sha256")
+    if obter_miniatura(b"isto nao e imagem") is not None or gerar_miniatura(b"") is not None:
+        problemas.append("conteúdo ilegível gerou miniatura")
+    maior = obter_miniatura(imagens[0], lado=MINIATURA_PX * 2)
+    if maior is None or maior == minis[0]:
+        problemas.append("lado diferente devolveu a mesma miniatura")
+    limite_mb = reduzido / 2 / (1024 * 1024)
+    poda = podar_miniaturas(max_mb=limite_mb)
+    if poda["bytes"] > limite_mb * 1024 * 1024 or not poda["removidos"]:
+        problemas.append(f"poda: {poda}")
+    relatorio["poda"] = poda
+
+    relatorio["problemas"] = problemas
+    for p in problemas:
+        print(f"   ⚠️ {p}")
+    if not problemas:
+        print("   ✅ miniaturas no formato e tamanho, cache por sha256, ilegíveis e poda conferidos")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Benchmark das páginas do menu (app.menu.MENU_ITEMS) sem navegador, via streamlit.testing.v1.AppTest.
+
+Gera um banco sintético (benchmarks.dados_sinteticos) e, para cada página:
+- frio: primeiro render numa sessão nova, com st.cache_data/st.cache_resource limpos
+- quente: reruns seguintes na mesma sessão (mediana, p95)
+- memória: pico de alocações Python (tracemalloc) num render frio à parte
+- exceções levantadas pela página (a página continua no relatório; o processo sai com código 1)
+
+O relatório JSON (chaves ordenadas, um bloco por página) pode ser comparado entre commits:
+  python -m benchmarks.bench_paginas --escala media --saida bench_paginas.json
+  python -m benchmarks.bench_paginas --escala media --comparar bench_paginas_main.json
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_paginas
+  python -m benchmarks.bench_paginas --escala grande --repeticoes 10 --paginas Dashboard Financeiro
+  python -m benchmarks.bench_paginas --banco /tmp/bench.db   # reaproveita um banco já gerado
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+VERSAO_RELATORIO = 1
+
+
+def _app_pagina():
+    """Script executado pelo AppTest: o mesmo despacho de fortcordis_app.py para uma página do menu."""
+    import importlib
+
+    import streamlit as st
+    from app.laudos_refs import PARAMS
+    from app.menu import MENU_ITEMS
+
+    # Estado que fortcordis_app.py prepara antes do despacho (usado pela página Laudos)
+    st.session_state.setdefault("dados_atuais", {k: 0.0 for k in PARAMS})
+    st.session_state.setdefault("lista_especies", ["Canina", "Felina"])
+    st.session_state.setdefault("cad_especie", "Canina")
+
+    rotulo = st.session_state["bench_pagina"]
+    for label, module_path, function_name, special in MENU_ITEMS:
+        if label != rotulo:
+            continue
+        if special == "laudos":
+            from app.laudos_deps import build_laudos_deps
+            getattr(importlib.import_module(module_path), function_name)(build_laudos_deps())
+        else:
+            getattr(importlib.import_module(module_path), function_name)()
+        break
+
+
+def _app_importacao():
+    """Script de aquecimento: importa todos os módulos de página (custo único do processo, medido à parte)."""
+    import importlib
+
+    from app.laudos_deps import build_laudos_deps
+    from app.menu import MENU_ITEMS
+
+    build_laudos_deps()
+    for _label, module_path, _function_name, _special in MENU_ITEMS:
+        importlib.import_module(module_path)
+
+
+def _nova_sessao(label: str, usuario_id: int, timeout: float):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(_app_pagina, default_timeout=timeout)
+    at.session_state["bench_pagina"] = label
+    at.session_state["autenticado"] = True
+    at.session_state["usuario_id"] = usuario_id
+    at.session_state["usuario_nome"] = "Bench Admin"
+    return at
+
+
+def _limpar_caches() -> None:
+    import streamlit as st
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def _rodar(at) -> float:
+    t0 = time.perf_counter()
+    at.run()
+    return (time.perf_counter() - t0) * 1000
+
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, -(-len(ordenados) * p // 100) - 1))
+    return ordenados[int(k)]
+
+
+def medir_pagina(label: str, usuario_id: int, repeticoes: int, timeout: float) -> dict:
+    _limpar_caches()
+    at = _nova_sessao(label, usuario_id, timeout)
+    frio = _rodar(at)
+    quentes = [_rodar(at) for _ in range(repeticoes)]
+    excecoes = [str(e.message).splitlines()[0][:300] for e in at.exception]
+
+    _limpar_caches()
+    at_mem = _nova_sessao(label, usuario_id, timeout)
+    tracemalloc.start()
+    try:
+        at_mem.run()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "frio_ms": round(frio, 1),
+        "quente_mediana_ms": round(statistics.median(quentes), 1),
+        "quente_p95_ms": round(_percentil(quentes, 95), 1),
+        "quente_ms": [round(q, 1) for q in quentes],
+        "pico_memoria_kb": round(pico / 1024, 1),
+        "elementos": len(at.main) if hasattr(at, "main") else None,
+        "excecoes": excecoes,
+    }
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent.parent, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _comparar(atual: dict, caminho_anterior: str) -> None:
+    anterior = json.loads(Path(caminho_anterior).read_text(encoding="utf-8"))
+    print(f"\n🔍 Comparação com {caminho_anterior} (commit {anterior.get('commit') or '?'})")
+    print(f"   {'página':28s} {'frio':>18s} {'quente (mediana)':>22s} {'memória':>20s}")
+    for label, m in atual["paginas"].items():
+        a = anterior.get("paginas", {}).get(label)
+        if not a:
+            print(f"   {label:28s} (nova)")
+            continue
+
+        def _delta(chave):
+            antes, depois = a.get(chave) or 0, m.get(chave) or 0
+            pct = (depois - antes) / antes * 100 if antes else 0.0
+            return f"{depois:9.1f} ({pct:+5.1f}%)"
+
+        print(f"   {label:28s} {_delta('frio_ms'):>18s} {_delta('quente_mediana_ms'):>22s} {_delta('pico_memoria_kb'):>20s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escala", default="pequena", help="pequena, media ou grande (benchmarks.dados_sinteticos.ESCALAS)")
+    parser.add_argument("--banco", default=None, help="banco já gerado (pula a geração)")
+    parser.add_argument("--repeticoes", type=int, default=5, help="reruns quentes por página")
+    parser.add_argument("--paginas", nargs="*", default=None, help="parte do rótulo das páginas a medir (padrão: todas)")
+    parser.add_argument("--timeout", type=float, default=300, help="tempo máximo de um render (s)")
+    parser.add_argument("--saida", default="bench_paginas.json", help="arquivo JSON do relatório")
+    parser.add_argument("--comparar", default=None, help="relatório anterior para mostrar a variação")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.banco:
+        db_path = Path(args.banco).resolve()
+    else:
+        db_path = Path(tempfile.mkdtemp(prefix="fc_bench_paginas_")) / "bench.db"
+    # Precisa ser definido antes de importar app/* (DB_PATH é lido no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    from benchmarks.dados_sinteticos import ESCALAS, USUARIO_EMAIL, gerar_banco
+
+    escala = ESCALAS[args.escala]
+    if args.banco and db_path.exists():
+        print(f"📦 Usando banco existente {db_path}")
+        geracao = None
+    else:
+        print(f"📦 Gerando banco sintético ({args.escala}) em {db_path} ...")
+        geracao = gerar_banco(db_path, escala, seed=args.seed)
+        print(f"   pronto em {geracao['segundos']:.1f}s ({geracao['bytes'] / 1024 / 1024:.1f} MB)")
+
+    import sqlite3
+
+    import streamlit
+    from streamlit.logger import set_log_level
+    from streamlit.testing.v1 import AppTest
+    from app.menu import MENU_ITEMS
+
+    conn = sqlite3.connect(str(db_path))
+    usuario_id = conn.execute("SELECT id FROM usuarios WHERE email = ?", (USUARIO_EMAIL,)).fetchone()[0]
+    conn.close()
+
+    # Importação dos módulos fica fora do "frio" da primeira página medida
+    t0 = time.perf_counter()
+    AppTest.from_function(_app_importacao, default_timeout=args.timeout).run()
+    importacao_ms = round((time.perf_counter() - t0) * 1000, 1)
+    # Avisos do Streamlit sem ScriptRunContext/depreciação poluem a saída sem afetar a medida
+    # (o primeiro run do AppTest reaplica o nível de log da configuração, por isso só agora)
+    set_log_level("error")
+
+    rotulos = [item[0] for item in MENU_ITEMS]
+    if args.paginas:
+        rotulos = [r for r in rotulos if any(p.lower() in r.lower() for p in args.paginas)]
+
+    relatorio = {
+        "versao": VERSAO_RELATORIO,
+        "commit": _commit_atual(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {"python": platform.python_version(), "streamlit": streamlit.__version__,
+                     "plataforma": platform.platform(), "cpus": os.cpu_count()},
+        "escala": {"nome": args.escala if not args.banco else None, **(escala if geracao else {})},
+        "repeticoes": args.repeticoes,
+        "importacao_ms": importacao_ms,
+        "paginas": {},
+    }
+    print(f"\n📥 Importação dos módulos de página: {importacao_ms:.1f} ms")
+    print(f"⏱️  {len(rotulos)} página(s), {args.repeticoes} rerun(s) quentes cada")
+    for label in rotulos:
+        m = medir_pagina(label, usuario_id, args.repeticoes, args.timeout)
+        relatorio["paginas"][label] = m
+        aviso = f"  ⚠️ {len(m['excecoes'])} exceção(ões): {m['excecoes'][0][:80]}" if m["excecoes"] else ""
+        print(f"   {label:28s} frio {m['frio_ms']:8.1f} ms | quente {m['quente_mediana_ms']:8.1f} ms "
+              f"(p95 {m['quente_p95_ms']:8.1f}) | pico {m['pico_memoria_kb'] / 1024:6.1f} MB{aviso}")
+
+    Path(args.saida).write_text(json.dumps(relatorio, indent=2, sort_keys=True, ensure_ascii=False) + "\n",
+                                encoding="utf-8")
+    print(f"\n📝 Relatório: {args.saida}")
+    if args.comparar:
+        _comparar(relatorio, args.comparar)
+    sys.exit(1 if any(m["excecoes"] for m in relatorio["paginas"].values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
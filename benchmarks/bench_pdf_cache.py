@@ -0,0 +1,225 @@
+"""
+Benchmark do cache de renderização do PDF de laudo e do arquivamento incremental (app.laudos_pdf_cache,
+app.laudos_banco.sincronizar_imagens_laudo).
+
+- chave: a mesma com os dados em outra ordem (e números numpy); muda com uma medida, um byte de imagem ou
+  PDF_LAUDO_VERSAO
+- render: PDF sintético (tabelas de medidas + N imagens JPEG, como o criar_pdf da página) gerado do zero
+  contra a leitura do cache
+- pasta: sincronizar_arquivos duas vezes com o mesmo laudo (a segunda não grava nada), depois com uma imagem
+  trocada e uma a menos (grava 1, remove a sobra)
+- banco: salvar_laudo_arquivo_no_banco num banco temporário: primeira gravação, regravação igual e com uma
+  imagem trocada; mede tempo e bytes escritos no WAL e confere que as linhas de imagem iguais não são
+  reescritas (mesmo id)
+
+Sai com código 1 se alguma conferência falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_pdf_cache
+  python -m benchmarks.bench_pdf_cache --imagens 12 --repeticoes 5
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+
+def _jpeg(rnd: random.Random, largura=1200, altura=900) -> bytes:
+    from PIL import Image
+    img = Image.effect_noise((largura // 4, altura // 4), rnd.randint(20, 80)).convert("RGB").resize((largura, altura))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _renderizar(dados: dict, imagens: list) -> bytes:
+    """Layout parecido com o criar_pdf da página: cabeçalho, tabela de medidas, textos e grade de imagens."""
+    from fpdf import FPDF
+    warnings.simplefilter("ignore", DeprecationWarning)  # Arial/ln=1, como na página
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, 15)
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "LAUDO ECOCARDIOGRAFICO", ln=1)
+    pdf.set_font("Arial", size=9)
+    for k, v in dados["medidas"].items():
+        pdf.cell(65, 6, f"  {k}", 0)
+        pdf.cell(30, 6, f"{v:.2f}", 0, align="C")
+        pdf.cell(40, 6, "1.00 - 2.00", 0, align="C")
+        pdf.cell(0, 6, "Normal", 0, ln=1, align="C")
+    for txt in dados["textos"].values():
+        pdf.set_x(pdf.l_margin)
+        pdf.multi_cell(0, 5, txt)
+    pdf.add_page()
+    x, y = 10, 50
+    for b in imagens:
+        if y + 65 > 270:
+            pdf.add_page()
+            x, y = 10, 50
+        pdf.image(io.BytesIO(b), x=x, y=y, w=90, h=65)
+        if x == 10:
+            x += 95
+        else:
+            x, y = 10, y + 70
+    out = pdf.output(dest="S")
+    return bytes(out) if isinstance(out, (bytes, bytearray)) else out.encode("latin-1")
+
+
+def _wal(db_path: Path) -> int:
+    try:
+        return (db_path.parent / (db_path.name + "-wal")).stat().st_size
+    except OSError:
+        return 0
+
+
+def _checkpoint(db_path: Path) -> None:
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagens", type=int, default=8)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="fc_bench_pdf_cache_"))
+    db_path = tmp / "bench.db"
+    # Precisa ser definido antes de importar app/* (DB_PATH e as pastas são lidos no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+    os.environ["FORTCORDIS_PASTA_CACHE_PDF"] = str(tmp / "cache")
+
+    import numpy as np
+
+    import app.laudos_pdf_cache as cache
+    from app.db import _db_init
+    from app.laudos_banco import salvar_laudo_arquivo_no_banco
+
+    rnd = random.Random(args.seed)
+    problemas = []
+    relatorio = {"imagens": args.imagens}
+    imagens = [_jpeg(rnd) for _ in range(args.imagens)]
+    medidas = {p: round(rnd.uniform(0.5, 5.0), 2) for p in ("LA", "Ao", "LA_Ao", "LVIDd", "LVIDs", "IVSd", "LVPWd",
+                                                             "EF", "FS", "MV_E", "MV_A", "MV_E_A", "Vmax_Ao", "Vmax_Pulm")}
+    dados = {"paciente": {"nome": "Thor", "tutor": "Maria Silva", "peso": 12.5}, "medidas": medidas,
+             "textos": {"valvas": "Valva mitral espessada.", "conclusao": "Endocardiose Mitral Estágio B1 (ACVIM)."}}
+
+    # 1) Chave
+    chave = cache.chave_render({"dados": dados, "fc": "120"}, imagens=imagens)
+    invertido = {"fc": "120", "dados": {"textos": dados["textos"], "paciente": dict(reversed(dados["paciente"].items())),
+                                        "medidas": {k: np.float64(v) for k, v in reversed(medidas.items())}}}
+    if cache.chave_render(invertido, imagens=imagens) != chave:
+        problemas.append("chave muda com a ordem dos dados ou com números numpy")
+    outra_medida = json.loads(json.dumps(dados))
+    outra_medida["medidas"]["LA_Ao"] += 0.01
+    if cache.chave_render({"dados": outra_medida, "fc": "120"}, imagens=imagens) == chave:
+        problemas.append("chave não muda com uma medida alterada")
+    img_alterada = imagens[:-1] + [imagens[-1][:-3] + b"\x00\xff\xd9"]
+    if cache.chave_render({"dados": dados, "fc": "120"}, imagens=img_alterada) == chave:
+        problemas.append("chave não muda com uma imagem alterada")
+    versao = cache.PDF_LAUDO_VERSAO
+    cache.PDF_LAUDO_VERSAO = versao + 1
+    if cache.chave_render({"dados": dados, "fc": "120"}, imagens=imagens) == chave:
+        problemas.append("chave não muda com PDF_LAUDO_VERSAO")
+    cache.PDF_LAUDO_VERSAO = versao
+
+    # 2) Render do zero x cache
+    t_render, t_cache = [], []
+    pdf_bytes = None
+    for _ in range(args.repeticoes):
+        t0 = time.perf_counter()
+        pdf_bytes = _renderizar(dados, imagens)
+        t_render.append(time.perf_counter() - t0)
+    cache.guardar_pdf_cache(chave, pdf_bytes)
+    for _ in range(args.repeticoes):
+        t0 = time.perf_counter()
+        lido = cache.obter_pdf_cache(chave)
+        t_cache.append(time.perf_counter() - t0)
+        if lido != pdf_bytes:
+            problemas.append("cache devolveu bytes diferentes do PDF guardado")
+            break
+    if cache.obter_pdf_cache("0" * 64) is not None:
+        problemas.append("cache devolveu PDF para chave inexistente")
+    r, c = statistics.median(t_render), statistics.median(t_cache)
+    relatorio["render"] = {"pdf_kb": round(len(pdf_bytes) / 1024), "render_ms": round(r * 1000, 1),
+                           "cache_ms": round(c * 1000, 2), "ganho": round(r / c, 1) if c else None}
+    print(f"⏱️  PDF ({len(pdf_bytes) / 1024:,.0f} KB, {args.imagens} imagem(ns)): render {r * 1000:.1f} ms, "
+          f"cache {c * 1000:.2f} ms ({relatorio['render']['ganho']}x)")
+
+    # 3) Pasta
+    pasta = tmp / "Laudos"
+    pasta.mkdir()
+    base = "20260101__THOR__MARIA__CLINICA"
+    arquivos = {f"{base}.pdf": pdf_bytes, f"{base}.json": json.dumps(dados).encode("utf-8")}
+    arquivos.update({f"{base}__IMG_{i:02d}.jpg": b for i, b in enumerate(imagens, start=1)})
+    padroes = (f"{base}__IMG_*.*", f"{base}__ORIG_*.*")
+    s1 = cache.sincronizar_arquivos(pasta, arquivos, padroes)
+    s2 = cache.sincronizar_arquivos(pasta, arquivos, padroes)
+    menos = dict(arquivos)
+    menos.pop(f"{base}__IMG_{len(imagens):02d}.jpg")
+    menos[f"{base}__IMG_01.jpg"] = imagens[0] + b"\x00"
+    s3 = cache.sincronizar_arquivos(pasta, menos, padroes)
+    if s1["gravados"] != len(arquivos) or s2["gravados"] != 0 or (s3["gravados"], s3["removidos"]) != (1, 1):
+        problemas.append(f"pasta: {s1}, {s2}, {s3}")
+    relatorio["pasta"] = {"primeira": s1, "igual": s2, "uma_trocada": s3}
+    print(f"⏱️  pasta: 1ª {s1['gravados']} gravado(s); igual {s2['gravados']} gravado(s); "
+          f"trocada {s3['gravados']} gravado(s), {s3['removidos']} removido(s)")
+
+    # 4) Banco
+    _db_init()
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+    json_laudo = json.dumps(dados, ensure_ascii=False)
+    nomes = [(f"{base}__IMG_{i:02d}.jpg", b) for i, b in enumerate(imagens, start=1)]
+    etapas = {}
+    for etapa, imgs in (("primeira", nomes), ("igual", nomes),
+                        ("uma_trocada", [nomes[0]] + [(nomes[1][0], nomes[1][1] + b"\x00")] + nomes[2:])):
+        _checkpoint(db_path)
+        conn = sqlite3.connect(str(db_path))
+        ids_antes = [r[0] for r in conn.execute("SELECT id FROM laudos_arquivos_imagens ORDER BY ordem")]
+        conn.close()
+        t0 = time.perf_counter()
+        laudo_id, erro = salvar_laudo_arquivo_no_banco(base, "2026-01-01", "Thor", "Maria Silva", "Clínica",
+                                                       "ecocardiograma", json_laudo, pdf_bytes, imagens=imgs)
+        seg = time.perf_counter() - t0
+        conn = sqlite3.connect(str(db_path))
+        ids_depois = [r[0] for r in conn.execute("SELECT id FROM laudos_arquivos_imagens ORDER BY ordem")]
+        conn.close()
+        if erro:
+            problemas.append(f"banco ({etapa}): {erro}")
+        etapas[etapa] = {"ms": round(seg * 1000, 1), "wal_kb": round(_wal(db_path) / 1024, 1),
+                         "imagens": len(ids_depois)}
+        if etapa != "primeira" and ids_depois != ids_antes:
+            problemas.append(f"banco ({etapa}): linhas de imagem reescritas (ids {ids_antes} -> {ids_depois})")
+    if etapas["igual"]["wal_kb"] >= etapas["primeira"]["wal_kb"] / 4:
+        problemas.append(f"banco: regravação igual escreveu {etapas['igual']['wal_kb']} KB no WAL")
+    relatorio["banco"] = etapas
+    for etapa, e in etapas.items():
+        print(f"⏱️  banco ({etapa}): {e['ms']:.1f} ms, {e['wal_kb']:,.1f} KB no WAL")
+
+    relatorio["problemas"] = problemas
+    for p in problemas:
+        print(f"   ⚠️ {p}")
+    if not problemas:
+        print("   ✅ chave estável e sensível, cache devolve o mesmo PDF, pasta e banco gravam só o que mudou")
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if problemas else 0)
+
+
+if __name__ == "__main__":
+    main()
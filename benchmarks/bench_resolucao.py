@@ -0,0 +1,306 @@
+"""
+Benchmark da resolução de cadastros repetidos (app.resolucao_cadastros).
+
+- motor: N nomes de pessoas sintéticos (padrão 100 mil) com uma fração de variantes de grafia
+  (sem acento, "da"/"de" a menos, Sousa/Souza, Thiago/Tiago, letra trocada, ordem trocada); mede tempo,
+  blocos e pares comparados (contra N²/2 da comparação de todos com todos) e precisão/recall dos grupos
+- banco: banco sintético (benchmarks.dados_sinteticos) com tutores e clínicas repetidos que têm pacientes,
+  consultas, financeiro e agendamentos; planeja e aplica a união e confere que nenhuma referência ficou
+  órfã (PRAGMA foreign_key_check e agendamentos.paciente_id), que nenhuma linha de
+  financeiro/consultas/agendamentos sumiu e que um plano com cadastro editado depois dele é recusado
+
+Sai com código 1 se a conferência do banco falhar.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.bench_resolucao
+  python -m benchmarks.bench_resolucao --registros 200000 --duplicados 0.1
+  python -m benchmarks.bench_resolucao --sem-banco
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import unicodedata
+from pathlib import Path
+
+_PRIMEIROS = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Hugo", "Iara", "João", "Karina", "Lucas",
+              "Mariana", "Nelson", "Olívia", "Paulo", "Quitéria", "Rafael", "Sofia", "Thiago", "Úrsula", "Vinícius",
+              "Wesley", "Yasmin", "Zélia", "Antônio", "Beatriz", "Cícero", "Débora", "Everton", "Francisca",
+              "Gustavo", "Heloísa", "Igor", "Juliana", "Kléber", "Larissa", "Márcio", "Natália", "Otávio"]
+_SOBRENOMES = ["Silva", "Souza", "Oliveira", "Lima", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento",
+               "Ferreira", "Gomes", "Ribeiro", "Carvalho", "Araújo", "Barbosa", "Cavalcante", "Holanda", "Queiroz",
+               "Bezerra", "Freitas", "Moreira", "Mendes", "Teixeira", "Batista", "Pinheiro", "Xavier", "Farias",
+               "Monteiro", "Castro", "Rocha", "Macedo", "Dantas", "Tavares", "Brito", "Sampaio", "Maia", "Aguiar",
+               "Vasconcelos", "Guimarães", "Nogueira"]
+_TROCAS = [("Souza", "Sousa"), ("Thiago", "Tiago"), ("Queiroz", "Keiroz"), ("Luís", "Luiz"), ("ph", "f"),
+           ("Xavier", "Chavier"), ("Cavalcante", "Cavalcanti")]
+
+
+def _sem_acento(s: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+
+
+def _variante(nome: str, rnd: random.Random) -> str:
+    """Outra grafia do mesmo nome, como aparece em cadastros digitados à mão."""
+    tipo = rnd.randrange(5)
+    if tipo == 0:
+        return _sem_acento(nome).upper()
+    if tipo == 1:
+        partes = nome.split()
+        return " ".join([partes[0], "da"] + partes[1:]) if " da " not in nome else nome.replace(" da ", " ")
+    if tipo == 2:
+        for a, b in _TROCAS:
+            if a in nome:
+                return nome.replace(a, b)
+        return nome + " "  # só espaço: mesma chave normalizada
+    if tipo == 3:
+        partes = nome.split()
+        return " ".join(partes[1:] + partes[:1])
+    # Letra trocada no meio de um sobrenome longo
+    partes = nome.split()
+    i = max(range(len(partes)), key=lambda k: len(partes[k]))
+    p = partes[i]
+    j = rnd.randrange(2, len(p) - 1)
+    partes[i] = p[:j] + p[j + 1] + p[j] + p[j + 2:]
+    return " ".join(partes)
+
+
+def gerar_nomes(n: int, fracao_dup: float, seed: int = 42):
+    """(registros [{"id", "nome"}], família de cada id): variantes têm a família do nome original."""
+    rnd = random.Random(seed)
+    vistos = set()
+    registros, familia = [], {}
+    originais = int(n * (1 - fracao_dup))
+    while len(registros) < originais:
+        primeiros = rnd.sample(_PRIMEIROS, 2 if rnd.random() < 0.3 else 1)
+        nome = " ".join(primeiros + rnd.sample(_SOBRENOMES, rnd.choice((1, 2, 2, 3))))
+        # Pessoas diferentes não têm os mesmos nomes só em outra ordem
+        chave = " ".join(sorted(_sem_acento(nome).lower().split()))
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        rid = len(registros) + 1
+        registros.append({"id": rid, "nome": nome})
+        familia[rid] = rid
+    while len(registros) < n:
+        orig = registros[rnd.randrange(originais)]
+        rid = len(registros) + 1
+        registros.append({"id": rid, "nome": _variante(orig["nome"], rnd)})
+        familia[rid] = familia[orig["id"]]
+    rnd.shuffle(registros)
+    return registros, familia
+
+
+def bench_motor(n: int, fracao_dup: float, limiar: float, seed: int) -> dict:
+    from app.resolucao_cadastros import encontrar_duplicados
+
+    registros, familia = gerar_nomes(n, fracao_dup, seed)
+    t0 = time.perf_counter()
+    achados = encontrar_duplicados(registros, limiar=limiar)
+    segundos = time.perf_counter() - t0
+
+    pares_previstos = pares_certos = 0
+    for g in achados["grupos"]:
+        ids = [rid for rid, _ in g]
+        for i in range(len(ids)):
+            for j in range(i + 1, len(ids)):
+                pares_previstos += 1
+                pares_certos += familia[ids[i]] == familia[ids[j]]
+    tamanho_familia = {}
+    for f in familia.values():
+        tamanho_familia[f] = tamanho_familia.get(f, 0) + 1
+    pares_reais = sum(k * (k - 1) // 2 for k in tamanho_familia.values())
+    return {
+        "registros": n,
+        "segundos": round(segundos, 2),
+        "blocos": achados["blocos"],
+        "pares_comparados": achados["pares_comparados"],
+        "pares_todos_com_todos": n * (n - 1) // 2,
+        "grupos": len(achados["grupos"]),
+        "precisao": round(pares_certos / pares_previstos, 4) if pares_previstos else 1.0,
+        "recall": round(pares_certos / pares_reais, 4) if pares_reais else 1.0,
+    }
+
+
+def _injetar_repetidos(db_path: Path, seed: int) -> dict:
+    """Cria variantes de tutores (com pacientes e consultas) e de clínicas (com OS e agendamentos)."""
+    from app.utils import _norm_key
+
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    agora = time.strftime("%Y-%m-%dT%H:%M:%S")
+    # Bancos em uso têm agendamentos.paciente_id (criar_agendamento preenche quando a coluna existe)
+    if "paciente_id" not in {r[1] for r in cur.execute("PRAGMA table_info(agendamentos)")}:
+        cur.execute("ALTER TABLE agendamentos ADD COLUMN paciente_id INTEGER")
+    tutores = cur.execute("SELECT id, nome, telefone FROM tutores ORDER BY id LIMIT 40").fetchall()
+    injetados = {"tutores": 0, "clinicas_parceiras": 0}
+    for tid, nome, telefone in tutores:
+        variante = _sem_acento(nome).upper().replace(" ", "  ", 1) + " "
+        variante = variante.replace("SOUZA", "SOUSA")
+        if _norm_key(variante) == _norm_key(nome):
+            variante = variante.strip() + "."
+        cur.execute("INSERT INTO tutores (nome, nome_key, telefone, created_at) VALUES (?, ?, ?, ?)",
+                    (variante, _norm_key(variante), telefone, agora))
+        novo = cur.lastrowid
+        injetados["tutores"] += 1
+        # Mesmo paciente cadastrado de novo sob o tutor repetido (colide na união) e um paciente só dele
+        pac = cur.execute("SELECT nome, especie FROM pacientes WHERE tutor_id = ? LIMIT 1", (tid,)).fetchone()
+        if pac:
+            cur.execute("INSERT INTO pacientes (tutor_id, nome, nome_key, especie, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (novo, pac[0], _norm_key(pac[0]), pac[1], agora))
+            pid = cur.lastrowid
+            cur.execute("INSERT INTO consultas (paciente_id, tutor_id, data_consulta, veterinario_id) VALUES (?, ?, ?, 1)",
+                        (pid, novo, agora[:10]))
+            cur.execute("INSERT INTO agendamentos (data, hora, paciente, tutor, servico, clinica, status, paciente_id) "
+                        "VALUES (?, '09:00', ?, ?, 'Ecocardiograma', '', 'Agendado', ?)", (agora[:10], pac[0], variante, pid))
+            # Paciente repetido dentro do próprio tutor (sobra para a união de pacientes), com agendamento por id
+            var_pac = _sem_acento(pac[0]).upper() + "."
+            cur.execute("INSERT INTO pacientes (tutor_id, nome, nome_key, especie, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (tid, var_pac, _norm_key(var_pac), pac[1], agora))
+            cur.execute("INSERT INTO agendamentos (data, hora, paciente, tutor, servico, clinica, status, paciente_id) "
+                        "VALUES (?, '09:30', ?, ?, 'Ecocardiograma', '', 'Agendado', ?)",
+                        (agora[:10], var_pac, nome, cur.lastrowid))
+        cur.execute("INSERT INTO pacientes (tutor_id, nome, nome_key, especie, created_at) VALUES (?, ?, ?, 'Canina', ?)",
+                    (novo, f"Pet Extra {novo}", f"pet extra {novo}", agora))
+        cur.execute("INSERT INTO agendamentos (data, hora, paciente, tutor, servico, clinica, status) "
+                    "VALUES (?, '10:00', ?, ?, 'Ecocardiograma', '', 'Agendado')", (agora[:10], f"Pet Extra {novo}", variante))
+    clinicas = cur.execute("SELECT id, nome FROM clinicas_parceiras ORDER BY id LIMIT 3").fetchall()
+    for cid, nome in clinicas:
+        variante = nome.replace("Clínica", "Clinica Veterinaria").upper()
+        cur.execute("INSERT INTO clinicas_parceiras (nome, cidade, saldo_credito) VALUES (?, 'Fortaleza', 10)", (variante,))
+        novo = cur.lastrowid
+        injetados["clinicas_parceiras"] += 1
+        for k in range(rnd.randint(2, 5)):
+            cur.execute("INSERT INTO financeiro (clinica_id, numero_os, descricao, valor_bruto, valor_final, "
+                        "status_pagamento, data_competencia) VALUES (?, ?, 'Ecocardiograma', 350, 350, 'pendente', ?)",
+                        (novo, f"OS-DUP-{novo}-{k}", agora[:10]))
+        cur.execute("INSERT INTO agendamentos (data, hora, paciente, tutor, servico, clinica, status) "
+                    "VALUES (?, '11:00', 'Thor', 'Fulano', 'Ecocardiograma', ?, 'Agendado')", (agora[:10], variante))
+    conn.commit()
+    conn.close()
+    return injetados
+
+
+def bench_banco(db_path: Path, seed: int) -> dict:
+    from app.resolucao_cadastros import ORDEM_ENTIDADES, aplicar_plano, planejar_uniao
+    from benchmarks.dados_sinteticos import ESCALAS, gerar_banco
+
+    gerar_banco(db_path, ESCALAS["pequena"], seed=seed)
+    injetados = _injetar_repetidos(db_path, seed)
+
+    def _contar():
+        conn = sqlite3.connect(str(db_path))
+        try:
+            return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                    for t in ("financeiro", "consultas", "agendamentos", "tutores", "pacientes", "clinicas_parceiras")}
+        finally:
+            conn.close()
+
+    antes = _contar()
+    resultados = {}
+    plano_recusado = None
+    for entidade in ORDEM_ENTIDADES:
+        plano = planejar_uniao(entidade)
+        if entidade == "pacientes" and plano["grupos"]:
+            # Cadastro editado depois do plano: aplicar tem de recusar, sem gravar nada
+            editado = plano["grupos"][0]["unir"][0]["id"]
+            conn = sqlite3.connect(str(db_path))
+            conn.execute("UPDATE pacientes SET especie = COALESCE(especie, '') || ' ' WHERE id = ?", (editado,))
+            conn.commit()
+            conn.close()
+            try:
+                aplicar_plano(plano)
+                plano_recusado = False
+            except ValueError:
+                plano_recusado = True
+            plano = planejar_uniao(entidade)
+        t0 = time.perf_counter()
+        res = aplicar_plano(plano)
+        res["segundos_aplicar"] = round(time.perf_counter() - t0, 3)
+        res["segundos_planejar"] = plano["segundos"]
+        resultados[entidade] = res
+    depois = _contar()
+
+    from app.utils import _norm_key
+
+    conn = sqlite3.connect(str(db_path))
+    orfaos = conn.execute("PRAGMA foreign_key_check").fetchall()
+    # Nomes em texto que ainda apontam para um cadastro apagado na união
+    vivos = {_norm_key(n) for t in ("tutores", "clinicas_parceiras", "clinicas")
+             for (n,) in conn.execute(f"SELECT nome FROM {t}")}
+    apagados = {_norm_key(n) for (n,) in conn.execute("SELECT nome_unido FROM resolucao_cadastros_log")} - vivos
+    sobras_ag = sum(1 for tutor, clinica in conn.execute("SELECT tutor, clinica FROM agendamentos")
+                    if _norm_key(tutor) in apagados or _norm_key(clinica) in apagados)
+    ag_orfaos = conn.execute("SELECT COUNT(*) FROM agendamentos WHERE paciente_id IS NOT NULL "
+                             "AND paciente_id NOT IN (SELECT id FROM pacientes)").fetchone()[0]
+    conn.close()
+    problemas = []
+    if orfaos:
+        problemas.append(f"{len(orfaos)} referência(s) órfã(s): {orfaos[:5]}")
+    for t in ("financeiro", "consultas", "agendamentos"):
+        if depois[t] != antes[t]:
+            problemas.append(f"{t}: {antes[t]} -> {depois[t]} linhas")
+    if resultados["tutores"]["removidos"] < injetados["tutores"]:
+        problemas.append(f"tutores: {resultados['tutores']['removidos']} unido(s) de {injetados['tutores']} injetado(s)")
+    if resultados["clinicas_parceiras"]["removidos"] < injetados["clinicas_parceiras"]:
+        problemas.append(f"clínicas: {resultados['clinicas_parceiras']['removidos']} unida(s) de "
+                         f"{injetados['clinicas_parceiras']} injetada(s)")
+    if sobras_ag:
+        problemas.append(f"{sobras_ag} agendamento(s) ainda com o nome repetido")
+    if ag_orfaos:
+        problemas.append(f"{ag_orfaos} agendamento(s) com paciente_id de paciente apagado")
+    if plano_recusado is not True:
+        problemas.append("plano de pacientes com cadastro editado depois dele não foi recusado"
+                         if plano_recusado is False else "nenhum grupo de pacientes para conferir o plano desatualizado")
+    return {"banco": str(db_path), "injetados": injetados, "antes": antes, "depois": depois,
+            "resultados": resultados, "problemas": problemas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registros", type=int, default=100_000, help="nomes sintéticos no teste do motor")
+    parser.add_argument("--duplicados", type=float, default=0.05, help="fração de variantes entre os nomes")
+    parser.add_argument("--limiar", type=float, default=0.9)
+    parser.add_argument("--sem-banco", action="store_true", help="só o teste do motor")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db_path = Path(tempfile.mkdtemp(prefix="fc_bench_resolucao_")) / "bench.db"
+    # Precisa ser definido antes de importar app/* (DB_PATH é lido no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    relatorio = {}
+    print(f"⏱️  motor: {args.registros} nome(s), {args.duplicados:.0%} variantes, limiar {args.limiar}")
+    m = bench_motor(args.registros, args.duplicados, args.limiar, args.seed)
+    relatorio["motor"] = m
+    print(f"   {m['segundos']:.2f}s | {m['blocos']} bloco(s) | {m['pares_comparados']} par(es) comparado(s) "
+          f"(todos com todos: {m['pares_todos_com_todos']}) | {m['grupos']} grupo(s) | "
+          f"precisão {m['precisao']:.3f} | recall {m['recall']:.3f}")
+
+    if not args.sem_banco:
+        print("\n⏱️  banco: pequena + repetidos injetados, união de todas as entidades")
+        b = bench_banco(db_path, args.seed)
+        relatorio["banco"] = b
+        for entidade, r in b["resultados"].items():
+            print(f"   {entidade:20s} {r['removidos']:4d} unido(s) em {r['grupos']:3d} grupo(s) | "
+                  f"planejar {r['segundos_planejar']:.3f}s | aplicar {r['segundos_aplicar']:.3f}s")
+        for p in b["problemas"]:
+            print(f"   ⚠️ {p}")
+        if not b["problemas"]:
+            print("   ✅ sem referências órfãs e sem linhas perdidas")
+
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False, default=str) + "\n",
+                                    encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    raise SystemExit(1 if relatorio.get("banco", {}).get("problemas") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Gerador de banco sintético para benchmarks: clínicas, tutores, pacientes, agendamentos, financeiro,
+consultas e laudos (JSON + PDF + imagens em BLOB), com o esquema criado pelas próprias rotinas do app.
+
+Uso como módulo (o caminho do banco precisa estar em FORTCORDIS_DB_PATH antes de importar app/*):
+  os.environ["FORTCORDIS_DB_PATH"] = "/tmp/bench.db"
+  from benchmarks.dados_sinteticos import ESCALAS, gerar_banco
+  gerar_banco("/tmp/bench.db", ESCALAS["media"])
+
+Uso direto (na pasta do projeto):
+  python -m benchmarks.dados_sinteticos /tmp/bench.db --escala grande
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# Quantidade de registros por tabela em cada escala
+ESCALAS = {
+    "pequena": {"clinicas": 10, "tutores": 200, "pacientes": 300, "agendamentos": 1_000, "financeiro": 1_000,
+                "consultas": 300, "laudos": 100, "imagens_por_laudo": 2},
+    "media": {"clinicas": 50, "tutores": 2_000, "pacientes": 3_000, "agendamentos": 10_000, "financeiro": 10_000,
+              "consultas": 3_000, "laudos": 1_000, "imagens_por_laudo": 3},
+    "grande": {"clinicas": 300, "tutores": 20_000, "pacientes": 30_000, "agendamentos": 100_000,
+               "financeiro": 100_000, "consultas": 30_000, "laudos": 10_000, "imagens_por_laudo": 4},
+}
+
+USUARIO_EMAIL = "bench@fortcordis.local"
+USUARIO_SENHA = "Bench#2024senha"
+
+_NOMES_PET = ["Thor", "Luna", "Mel", "Bob", "Nina", "Max", "Lola", "Fred", "Belinha", "Simba", "Pipoca", "Zeus"]
+_NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Hugo", "Iara", "João", "Karina", "Lucas"]
+_SOBRENOMES = ["Silva", "Souza", "Oliveira", "Lima", "Pereira", "Costa", "Rodrigues", "Almeida", "Nascimento"]
+_SERVICOS = [("Ecocardiograma", 350.0), ("Eletrocardiograma", 180.0), ("Pressão Arterial", 90.0),
+             ("Consulta Cardiológica", 250.0), ("Holter 24h", 480.0)]
+_STATUS_AG = ["Agendado"] * 3 + ["Confirmado"] * 2 + ["Realizado"] * 4 + ["Cancelado"]
+_STATUS_FIN = ["pendente"] * 4 + ["pago"] * 5 + ["cancelado"]
+_PARAMS_ECO = {"Ao": (12, 25), "LA": (12, 40), "LA_Ao": (0.9, 2.4), "IVSd": (5, 12), "LVPWd": (5, 12),
+               "LVIDd": (20, 55), "LVIDs": (10, 40), "EF": (40, 85), "FS": (18, 50), "MV_E": (0.5, 1.6)}
+
+
+def _imagens_exemplo(qtd: int, seed: int) -> list:
+    """JPEGs de ruído (~tamanho de um quadro de ecocardiograma já recomprimido), gerados uma vez e reaproveitados."""
+    from PIL import Image
+
+    rnd = random.Random(seed)
+    out = []
+    for i in range(max(qtd, 1)):
+        img = Image.frombytes("L", (640, 480), bytes(rnd.getrandbits(8) for _ in range(640 * 480)))
+        buf = io.BytesIO()
+        img.convert("RGB").save(buf, format="JPEG", quality=85)
+        out.append(buf.getvalue())
+    return out
+
+
+def _criar_esquema() -> None:
+    """Esquema completo pelas rotinas do app (mesmas tabelas, colunas e índices da produção)."""
+    from fortcordis_modules.database import (
+        garantir_colunas_agendamentos,
+        garantir_colunas_financeiro,
+        garantir_tabelas_financeiro_extras,
+        inicializar_banco,
+    )
+    from app.db import _db_init
+    from app.laudos_banco import _criar_tabelas_laudos_se_nao_existirem
+    from modules.auth import criar_usuario, inicializar_tabelas_auth, inserir_papeis_padrao
+    from modules.rbac import associar_permissoes_papeis, inicializar_tabelas_permissoes, inserir_permissoes_padrao
+
+    inicializar_banco()
+    garantir_colunas_agendamentos()
+    garantir_colunas_financeiro()
+    garantir_tabelas_financeiro_extras()
+    _db_init()
+    conn = sqlite3.connect(os.environ["FORTCORDIS_DB_PATH"])
+    _criar_tabelas_laudos_se_nao_existirem(conn.cursor())
+    conn.commit()
+    conn.close()
+    inicializar_tabelas_auth()
+    inserir_papeis_padrao()
+    inicializar_tabelas_permissoes()
+    inserir_permissoes_padrao()
+    associar_permissoes_papeis()
+    criar_usuario(nome="Bench Admin", email=USUARIO_EMAIL, senha=USUARIO_SENHA, papel="admin")
+
+
+def _inserir_em_lotes(cur: sqlite3.Cursor, sql: str, linhas, lote: int = 5_000) -> int:
+    buf, n = [], 0
+    for linha in linhas:
+        buf.append(linha)
+        if len(buf) >= lote:
+            cur.executemany(sql, buf)
+            n += len(buf)
+            buf = []
+    if buf:
+        cur.executemany(sql, buf)
+        n += len(buf)
+    return n
+
+
+def gerar_banco(db_path, escala: dict, seed: int = 42) -> dict:
+    """
+    Cria (ou completa) o banco em db_path com os volumes de `escala` (ver ESCALAS).
+    Retorna {tabela: linhas inseridas, ..., "segundos": duração, "bytes": tamanho do arquivo}.
+    """
+    from app.utils import _norm_key
+
+    db_path = Path(db_path)
+    if Path(os.environ.get("FORTCORDIS_DB_PATH", "")).resolve() != db_path.resolve():
+        raise RuntimeError("Defina FORTCORDIS_DB_PATH com o caminho do banco antes de importar o app.")
+    t0 = time.perf_counter()
+    _criar_esquema()
+    rnd = random.Random(seed)
+    hoje = date.today()
+    agora = datetime.now().isoformat(timespec="seconds")
+    contagem = {}
+
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    cur.execute("PRAGMA synchronous=OFF")
+
+    clinicas = [f"Clínica Bench {i:04d}" for i in range(escala["clinicas"])]
+    contagem["clinicas_parceiras"] = _inserir_em_lotes(
+        cur, "INSERT OR IGNORE INTO clinicas_parceiras (nome, cidade, telefone) VALUES (?, 'Fortaleza', '(85) 3000-0000')",
+        ((n,) for n in clinicas))
+    cur.executemany("INSERT OR IGNORE INTO clinicas (nome, nome_key, created_at) VALUES (?, ?, ?)",
+                    [(n, _norm_key(n), agora) for n in clinicas])
+    cur.executemany("INSERT OR IGNORE INTO servicos (nome, valor_base) VALUES (?, ?)", _SERVICOS)
+    ids_clinica = [r[0] for r in cur.execute("SELECT id FROM clinicas_parceiras ORDER BY id")]
+
+    tutores = [f"{rnd.choice(_NOMES)} {rnd.choice(_SOBRENOMES)} {i:05d}" for i in range(escala["tutores"])]
+    contagem["tutores"] = _inserir_em_lotes(
+        cur, "INSERT OR IGNORE INTO tutores (nome, nome_key, telefone, created_at) VALUES (?, ?, ?, ?)",
+        ((n, _norm_key(n), f"(85) 9{i:04d}-{i % 10000:04d}", agora) for i, n in enumerate(tutores)))
+    ids_tutor = {r[1]: r[0] for r in cur.execute("SELECT id, nome_key FROM tutores")}
+
+    pacientes = []
+    for i in range(escala["pacientes"]):
+        tutor = tutores[i % len(tutores)]
+        especie = "Felina" if rnd.random() < 0.3 else "Canina"
+        pacientes.append((ids_tutor[_norm_key(tutor)], f"{rnd.choice(_NOMES_PET)} {i:05d}", especie, tutor))
+    contagem["pacientes"] = _inserir_em_lotes(
+        cur,
+        "INSERT OR IGNORE INTO pacientes (tutor_id, nome, nome_key, especie, raca, sexo, peso_kg, created_at) "
+        "VALUES (?, ?, ?, ?, 'SRD', ?, ?, ?)",
+        ((tid, nome, _norm_key(nome), esp, rnd.choice(["Macho", "Fêmea"]), round(rnd.uniform(2, 40), 1), agora)
+         for tid, nome, esp, _ in pacientes))
+    ids_paciente = [r[0] for r in cur.execute("SELECT id FROM pacientes ORDER BY id")]
+
+    def _agendamentos():
+        for i in range(escala["agendamentos"]):
+            _, pet, _, tutor = pacientes[rnd.randrange(len(pacientes))]
+            d = hoje + timedelta(days=rnd.randint(-365, 60))
+            yield (d.isoformat(), f"{rnd.randint(7, 18):02d}:{rnd.choice(['00', '30'])}", pet, tutor,
+                   "(85) 90000-0000", rnd.choice(_SERVICOS)[0], rnd.choice(clinicas), "", rnd.choice(_STATUS_AG), agora)
+
+    contagem["agendamentos"] = _inserir_em_lotes(
+        cur,
+        "INSERT INTO agendamentos (data, hora, paciente, tutor, telefone, servico, clinica, observacoes, status, criado_em) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        _agendamentos())
+
+    def _financeiro():
+        for i in range(escala["financeiro"]):
+            servico, valor = rnd.choice(_SERVICOS)
+            d = hoje - timedelta(days=rnd.randint(0, 540))
+            status = rnd.choice(_STATUS_FIN)
+            yield (rnd.choice(ids_clinica), f"OS-BENCH-{i:07d}", servico, valor, valor, status, d.isoformat(),
+                   (d + timedelta(days=rnd.randint(0, 30))).isoformat() if status == "pago" else None)
+
+    contagem["financeiro"] = _inserir_em_lotes(
+        cur,
+        "INSERT INTO financeiro (clinica_id, numero_os, descricao, valor_bruto, valor_final, status_pagamento, "
+        "data_competencia, data_pagamento) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        _financeiro())
+
+    id_usuario = cur.execute("SELECT id FROM usuarios WHERE email = ?", (USUARIO_EMAIL,)).fetchone()[0]
+
+    def _consultas():
+        for i in range(escala["consultas"]):
+            k = rnd.randrange(len(pacientes))
+            d = hoje - timedelta(days=rnd.randint(0, 730))
+            yield (ids_paciente[k % len(ids_paciente)], pacientes[k][0], d.isoformat(), "10:00", "Consulta",
+                   "Sopro cardíaco", "Cardiopatia em estadiamento", id_usuario)
+
+    contagem["consultas"] = _inserir_em_lotes(
+        cur,
+        "INSERT INTO consultas (paciente_id, tutor_id, data_consulta, hora_consulta, tipo_atendimento, motivo_consulta, "
+        "diagnostico_presuntivo, veterinario_id, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'finalizado')",
+        _consultas())
+
+    imagens = _imagens_exemplo(escala["imagens_por_laudo"] * 2, seed)
+    pdf_falso = b"%PDF-1.4\n" + bytes(rnd.getrandbits(8) for _ in range(40_000)) + b"\n%%EOF"
+    n_laudos = n_imgs = 0
+    for i in range(escala["laudos"]):
+        k = rnd.randrange(len(pacientes))
+        _, pet, especie, tutor = pacientes[k]
+        clinica = rnd.choice(clinicas)
+        d = (hoje - timedelta(days=rnd.randint(0, 730))).isoformat()
+        obj = {
+            "paciente": {"nome": pet, "tutor": tutor, "clinica": clinica, "especie": especie, "data_exame": d},
+            "especie": especie,
+            "medidas": {k: round(rnd.uniform(a, b), 2) for k, (a, b) in _PARAMS_ECO.items()},
+            "textos": {"conclusao": "Exame sintético para benchmark. " * 10},
+        }
+        cur.execute(
+            "INSERT INTO laudos_arquivos (data_exame, nome_animal, nome_tutor, nome_clinica, tipo_exame, nome_base, "
+            "conteudo_json, conteudo_pdf) VALUES (?, ?, ?, ?, 'ecocardiograma', ?, ?, ?)",
+            (d, pet, tutor, clinica, f"bench_{i:07d}", json.dumps(obj, ensure_ascii=False).encode("utf-8"), pdf_falso),
+        )
+        laudo_id = cur.lastrowid
+        cur.execute(
+            "INSERT INTO laudos_ecocardiograma (paciente_id, data_exame, nome_paciente, especie, conclusao) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (ids_paciente[k], d, pet, especie, obj["textos"]["conclusao"]),
+        )
+        for ordem in range(escala["imagens_por_laudo"]):
+            cur.execute(
+                "INSERT INTO laudos_arquivos_imagens (laudo_arquivo_id, ordem, nome_arquivo, conteudo) VALUES (?, ?, ?, ?)",
+                (laudo_id, ordem, f"bench_{i:07d}__IMG_{ordem + 1:02d}.jpg", imagens[(i + ordem) % len(imagens)]),
+            )
+            n_imgs += 1
+        n_laudos += 1
+        if n_laudos % 1000 == 0:
+            conn.commit()
+    contagem["laudos_arquivos"] = n_laudos
+    contagem["laudos_arquivos_imagens"] = n_imgs
+
+    conn.commit()
+    cur.execute("ANALYZE")
+    conn.close()
+    contagem["segundos"] = round(time.perf_counter() - t0, 2)
+    contagem["bytes"] = db_path.stat().st_size
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("banco", help="caminho do .db a criar (não use o banco de produção)")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="media")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["FORTCORDIS_DB_PATH"] = str(Path(args.banco).resolve())
+    print(f"📦 Gerando banco sintético ({args.escala}) em {args.banco} ...")
+    rel = gerar_banco(Path(args.banco).resolve(), ESCALAS[args.escala], seed=args.seed)
+    print(json.dumps(rel, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Teste de estresse das gravações concorrentes (fortcordis_modules.escritor).
+
+Gera um banco sintético (benchmarks.dados_sinteticos) e simula N usuários, cada um numa thread,
+fazendo gravações reais do app em sequência: criar_agendamento, dar_baixa_os, salvar_laudo_no_banco e,
+de vez em quando, o login (autenticar, que grava o último acesso). Compara:
+- fila:   escritor único com group commit (padrão do app)
+- direto: cada chamada na própria conexão, na thread do usuário (FORTCORDIS_ESCRITOR=0, comportamento anterior)
+
+Mede latência por operação (mediana, p95, máximo), vazão, erros ("database is locked" e outros) e confere
+no banco se cada gravação bem-sucedida ficou lá (agendamentos criados, OS baixadas com o movimento de caixa).
+Sai com código 1 se o modo fila tiver erro ou gravação perdida.
+
+Uso (na pasta do projeto):
+  python -m benchmarks.stress_escrita
+  python -m benchmarks.stress_escrita --usuarios 16 --operacoes 40 --modos fila
+  python -m benchmarks.stress_escrita --banco /tmp/stress.db   # reaproveita um banco já gerado
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+_OPERACOES = ["agendamento"] * 4 + ["baixa"] * 3 + ["laudo"] * 3
+
+
+def _percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    k = max(0, min(len(ordenados) - 1, -(-len(ordenados) * p // 100) - 1))
+    return ordenados[int(k)]
+
+
+def _os_pendentes(db_path: Path) -> list:
+    conn = sqlite3.connect(str(db_path))
+    ids = [r[0] for r in conn.execute(
+        "SELECT id FROM financeiro WHERE status_pagamento = 'pendente' AND valor_final > 0 ORDER BY id"
+    )]
+    conn.close()
+    return ids
+
+
+def _usuario(n: int, operacoes: int, modo: str, os_ids: list, login_cada: int, seed: int, saida: dict, barreira) -> None:
+    from app.laudos_banco import salvar_laudo_no_banco
+    from benchmarks.dados_sinteticos import USUARIO_EMAIL, USUARIO_SENHA
+    from fortcordis_modules.database import criar_agendamento, dar_baixa_os
+    from modules.auth import autenticar
+
+    rnd = random.Random(seed * 1000 + n)
+    hoje = date.today().isoformat()
+    barreira.wait()
+    for i in range(operacoes):
+        tipo = "login" if login_cada and i % login_cada == login_cada - 1 else rnd.choice(_OPERACOES)
+        if tipo == "baixa" and not os_ids:
+            tipo = "agendamento"
+        t0 = time.perf_counter()
+        try:
+            if tipo == "agendamento":
+                ag_id = criar_agendamento(hoje, f"{8 + i % 10:02d}:{(n * 7) % 60:02d}", f"Stress {modo} {n}-{i}",
+                                          f"Tutor Stress {n}", "(85) 90000-0000", "Ecocardiograma", "Clínica Bench 0000")
+                saida["agendamentos"].append(ag_id)
+            elif tipo == "baixa":
+                fid = os_ids.pop()
+                if dar_baixa_os(fid, forma_pagamento="PIX"):
+                    saida["baixas"].append(fid)
+            elif tipo == "laudo":
+                laudo_id, erro = salvar_laudo_no_banco("ecocardiograma", {
+                    "nome_animal": f"Stress {modo} {n}-{i}", "data": hoje, "especie": "Canina",
+                    "conclusao": "Teste de estresse", "peso": round(rnd.uniform(3, 40), 1),
+                }, f"stress_{modo}_{n}_{i}.json", f"stress_{modo}_{n}_{i}.pdf")
+                if erro:
+                    raise RuntimeError(erro)
+            else:
+                ok, _dados, msg = autenticar(USUARIO_EMAIL, USUARIO_SENHA)
+                if not ok:
+                    raise RuntimeError(msg)
+        except Exception as e:
+            saida["erros"].append(f"{tipo}: {str(e)[:120]}")
+        else:
+            saida["latencias"][tipo].append((time.perf_counter() - t0) * 1000)
+
+
+def rodar_modo(modo: str, db_path: Path, usuarios: int, operacoes: int, login_cada: int, seed: int) -> dict:
+    from fortcordis_modules import escritor
+
+    escritor.ATIVO = modo == "fila"
+    os_ids = _os_pendentes(db_path)
+    random.Random(seed).shuffle(os_ids)
+    # Cada usuário baixa as suas OS (sem disputar a mesma linha entre threads)
+    fatias = [os_ids[i::usuarios] for i in range(usuarios)]
+    saidas = [{"latencias": defaultdict(list), "erros": [], "agendamentos": [], "baixas": []} for _ in range(usuarios)]
+    barreira = threading.Barrier(usuarios)
+    threads = [threading.Thread(target=_usuario, args=(n, operacoes, modo, fatias[n], login_cada, seed, saidas[n], barreira))
+               for n in range(usuarios)]
+    antes = escritor.estatisticas_escritores().get(db_path.name, {})
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    segundos = time.perf_counter() - t0
+
+    latencias = defaultdict(list)
+    for s in saidas:
+        for tipo, vals in s["latencias"].items():
+            latencias[tipo].extend(vals)
+    erros = [e for s in saidas for e in s["erros"]]
+    agendamentos = [a for s in saidas for a in s["agendamentos"]]
+    baixas = [b for s in saidas for b in s["baixas"]]
+
+    # Conferência: tudo o que retornou sucesso está no banco
+    conn = sqlite3.connect(str(db_path))
+    ag_no_banco = 0
+    for i in range(0, len(agendamentos), 500):
+        parte = agendamentos[i:i + 500]
+        ag_no_banco += conn.execute(
+            f"SELECT COUNT(*) FROM agendamentos WHERE id IN ({','.join('?' * len(parte))})", parte).fetchone()[0]
+    baixas_ok = 0
+    for i in range(0, len(baixas), 500):
+        parte = baixas[i:i + 500]
+        baixas_ok += conn.execute(f"""
+            SELECT COUNT(*) FROM financeiro f
+            WHERE f.id IN ({','.join('?' * len(parte))}) AND f.status_pagamento = 'pago'
+              AND EXISTS (SELECT 1 FROM movimentos_caixa m WHERE m.origem_tipo = 'receita_os' AND m.origem_id = f.id)
+        """, parte).fetchone()[0]
+    conn.close()
+
+    todas = [v for vals in latencias.values() for v in vals]
+    rel = {
+        "segundos": round(segundos, 2),
+        "operacoes_ok": len(todas),
+        "operacoes_por_s": round(len(todas) / segundos, 1) if segundos else 0.0,
+        "erros": len(erros),
+        "erros_lock": sum("locked" in e for e in erros),
+        "exemplos_erro": erros[:5],
+        "gravacoes_perdidas": (len(agendamentos) - ag_no_banco) + (len(baixas) - baixas_ok),
+        "latencia_ms": {
+            tipo: {"n": len(vals), "mediana": round(statistics.median(vals), 1),
+                   "p95": round(_percentil(vals, 95), 1), "max": round(max(vals), 1)}
+            for tipo, vals in sorted(latencias.items()) if vals
+        },
+    }
+    if modo == "fila":
+        depois = escritor.estatisticas_escritores().get(db_path.name, {})
+        tarefas = depois.get("tarefas", 0) - antes.get("tarefas", 0)
+        lotes = depois.get("lotes", 0) - antes.get("lotes", 0)
+        rel["escritor"] = {"tarefas": tarefas, "lotes": lotes,
+                           "media_por_lote": round(tarefas / lotes, 2) if lotes else 0.0,
+                           "maior_lote": depois.get("maior_lote", 0)}
+    return rel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=8, help="usuários simultâneos (threads)")
+    parser.add_argument("--operacoes", type=int, default=25, help="gravações por usuário")
+    parser.add_argument("--login-cada", type=int, default=10, help="um login a cada N operações (0 desliga; bcrypt é lento)")
+    parser.add_argument("--modos", nargs="*", default=["direto", "fila"], choices=["direto", "fila"])
+    parser.add_argument("--escala", default="pequena", help="pequena, media ou grande (benchmarks.dados_sinteticos.ESCALAS)")
+    parser.add_argument("--banco", default=None, help="banco já gerado (pula a geração)")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.banco:
+        db_path = Path(args.banco).resolve()
+    else:
+        db_path = Path(tempfile.mkdtemp(prefix="fc_stress_escrita_")) / "stress.db"
+    # Precisa ser definido antes de importar app/* e fortcordis_modules/* (DB_PATH é lido no import)
+    os.environ["FORTCORDIS_DB_PATH"] = str(db_path)
+
+    from benchmarks.dados_sinteticos import ESCALAS, gerar_banco
+
+    if not db_path.exists():
+        print(f"📦 Gerando banco sintético ({args.escala}) em {db_path} ...")
+        gerar_banco(db_path, ESCALAS[args.escala], seed=args.seed)
+    else:
+        print(f"📦 Usando banco existente {db_path}")
+
+    relatorio = {"usuarios": args.usuarios, "operacoes_por_usuario": args.operacoes, "modos": {}}
+    for modo in args.modos:
+        print(f"\n⏱️  {modo}: {args.usuarios} usuário(s) x {args.operacoes} gravação(ões)")
+        r = rodar_modo(modo, db_path, args.usuarios, args.operacoes, args.login_cada, args.seed)
+        relatorio["modos"][modo] = r
+        print(f"   {r['operacoes_ok']} ok em {r['segundos']:.2f}s ({r['operacoes_por_s']:.1f}/s) | "
+              f"erros {r['erros']} (lock {r['erros_lock']}) | gravações perdidas {r['gravacoes_perdidas']}")
+        for tipo, m in r["latencia_ms"].items():
+            print(f"   {tipo:12s} n={m['n']:4d}  mediana {m['mediana']:8.1f} ms  p95 {m['p95']:8.1f} ms  máx {m['max']:8.1f} ms")
+        if "escritor" in r:
+            e = r["escritor"]
+            print(f"   escritor: {e['tarefas']} tarefa(s) em {e['lotes']} COMMIT(s), média {e['media_por_lote']} por lote, "
+                  f"maior {e['maior_lote']}")
+        for ex in r["exemplos_erro"]:
+            print(f"   ⚠️ {ex}")
+
+    if args.saida:
+        Path(args.saida).write_text(json.dumps(relatorio, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\n📝 Relatório: {args.saida}")
+    fila = relatorio["modos"].get("fila")
+    raise SystemExit(1 if fila and (fila["erros"] or fila["gravacoes_perdidas"]) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,10 @@ from pathlib import Path
 from datetime import datetime
 
 PASTA = Path(__file__).resolve().parent
+sys.path.insert(0, str(PASTA))
+
+# Conteúdo no object store local (FORTCORDIS_BLOB_BACKEND=local) vai para o backup como bytes
+from app.blob_store import materializar_linha  # noqa: E402
 
 # Ordem de busca do banco de origem (evita confusão entre dois bancos)
 CANDIDATOS_DB = [
@@ -109,7 +113,7 @@ def exportar(db_origem: Path, saida: Path):
             for row in rows:
                 cursor_destino.execute(
                     f"INSERT INTO {tabela} ({cols_str}) VALUES ({placeholders})",
-                    list(row),
+                    materializar_linha(tabela, colunas, row),
                 )
             total_linhas += len(rows)
 
@@ -24,6 +24,10 @@ from pathlib import Path
 from datetime import datetime
 
 PASTA = Path(__file__).resolve().parent
+sys.path.insert(0, str(PASTA))
+
+# Conteúdo no object store local (FORTCORDIS_BLOB_BACKEND=local) vai para o backup como bytes
+from app.blob_store import materializar_linha  # noqa: E402
 
 CANDIDATOS_DB = [
     PASTA / "fortcordis.db",
@@ -186,7 +190,10 @@ def _exportar_laudos_arquivos_em_partes(conn_origem, cursor_origem, pasta_saida,
             ids_lote,
         )
         for row in cursor_origem.fetchall():
-            cur_dest.execute(f"INSERT INTO {TABELA_LAUDOS_ARQUIVOS} ({cols_str}) VALUES ({placeholders})", list(row))
+            cur_dest.execute(
+                f"INSERT INTO {TABELA_LAUDOS_ARQUIVOS} ({cols_str}) VALUES ({placeholders})",
+                materializar_linha(TABELA_LAUDOS_ARQUIVOS, colunas_arq, row),
+            )
         n_arq = len(ids_lote)
 
         # laudos_arquivos_imagens cujo laudo_arquivo_id está neste lote
@@ -208,7 +215,7 @@ def _exportar_laudos_arquivos_em_partes(conn_origem, cursor_origem, pasta_saida,
                 for row in cursor_origem.fetchall():
                     cur_dest.execute(
                         f"INSERT INTO {TABELA_LAUDOS_IMAGENS} ({cols_img_str}) VALUES ({ph_img})",
-                        list(row),
+                        materializar_linha(TABELA_LAUDOS_IMAGENS, colunas_img, row),
                     )
                     n_img += 1
 
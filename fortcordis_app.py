@@ -84,6 +84,10 @@ from app.config import (
     ARQUIVO_REF_FELINOS,
 )
 
+# Instrumentação de desempenho (SQL/páginas/cache) — ver Configurações > Diagnóstico
+from app.desempenho import instalar as _instalar_desempenho, medir_pagina
+_instalar_desempenho()
+
 # Banco de laudos (Fase B)
 from app.laudos_banco import (
     _criar_tabelas_laudos_se_nao_existirem,
@@ -104,6 +108,9 @@ from app.laudos_pdf import (
     montar_nome_base_arquivo,
 )
 
+# Armazém da sessão: imagens do exame e último PDF em arquivos temporários, só miniaturas na memória
+from app.armazem_sessao import LimiteSessaoExcedido, armazem_da_sessao, guardar_imagem
+
 # Referências e tabelas de laudos (Fase B)
 from app.laudos_refs import (
     PARAMS,
@@ -249,13 +256,13 @@ try:
         obter_imagens_laudo_arquivo,
         contar_laudos_do_banco,
         contar_laudos_arquivos_do_banco,
-        montar_chave_frase,
         obter_entry_frase,
         aplicar_entry_salva,
         analisar_criterios_clinicos,
         complementar_regurgitacoes_nas_valvas,
         _split_pat_grau,
     )
+    from app.laudos_interpretacao import montar_chave_frase
 except ImportError:
     # Fallback: deploy com app/laudos_helpers.py antigo (sem funções qualitativas)
     from app.laudos_helpers import (
@@ -766,13 +773,17 @@ def _aplicar_carregamento_exame_pendente():
         if not isinstance(obj, dict):
             st.error("JSON inválido (estrutura inesperada).")
             return
-        if imagens_banco:
-            st.session_state["imagens_carregadas"] = [
-                {"name": (it.get("name") or it.get("nome_arquivo") or f"imagem_{i}.jpg"), "bytes": it.get("bytes") or it.get("conteudo") or b""}
-                for i, it in enumerate(imagens_banco)
-            ]
-        else:
-            st.session_state["imagens_carregadas"] = []
+        # Itens já no armazém da sessão (chave + miniatura); {"bytes"/"conteudo"} de chamadas antigas vão para ele
+        imgs_loaded = []
+        for i, it in enumerate(imagens_banco or []):
+            try:
+                imgs_loaded.append(it if it.get("chave") else guardar_imagem(
+                    it.get("name") or it.get("nome_arquivo") or f"imagem_{i}.jpg", it.get("bytes") or it.get("conteudo") or b""
+                ))
+            except LimiteSessaoExcedido as e:
+                st.error(str(e))
+                break
+        st.session_state["imagens_carregadas"] = imgs_loaded
         # segue para o bloco comum de preenchimento (pac, medidas, etc.) abaixo
     else:
         # 2) Carregamento a partir de arquivo (path)
@@ -798,11 +809,15 @@ def _aplicar_carregamento_exame_pendente():
                 img_path = pasta_json / nome_img
                 if img_path.exists():
                     try:
-                        imgs_loaded.append({"name": nome_img, "bytes": img_path.read_bytes()})
-                    except OSError:
+                        imgs_loaded.append(guardar_imagem(nome_img, img_path.read_bytes()))
+                    except (OSError, LimiteSessaoExcedido):
                         pass
         st.session_state["imagens_carregadas"] = imgs_loaded
 
+    # Imagens do exame anterior saem do armazém da sessão
+    chaves_mantidas = [it.get("chave") for it in st.session_state["imagens_carregadas"]]
+    armazem_da_sessao().manter(c for c in chaves_mantidas + [st.session_state.get("pdf_laudo_chave")] if c)
+
     pac = obj.get("paciente", {}) if isinstance(obj.get("paciente"), dict) else {}
     medidas = obj.get("medidas", {}) if isinstance(obj.get("medidas"), dict) else {}
     textos = obj.get("textos", {}) if isinstance(obj.get("textos"), dict) else {}
@@ -1454,6 +1469,14 @@ if uploaded_xml:
 # Inicializa banco de dados
 inicializar_banco()
 
+# Manutenção periódica do banco (checkpoint do WAL, optimize, vacuum incremental) — ver Configurações > Diagnóstico
+from app.services.manutencao import iniciar_manutencao
+iniciar_manutencao()
+
+# Exames novos/alterados na pasta de laudos entram sozinhos em laudos_arquivos (no sistema online a pasta não existe)
+from app.services.ingestao import iniciar_ingestao
+iniciar_ingestao()
+
 # Garante tabelas de auth e RBAC para Configurações (evita OperationalError no deploy)
 try:
     from auth import inicializar_tabelas_auth, inserir_papeis_padrao
@@ -1539,19 +1562,20 @@ import importlib
 for label, module_path, function_name, special in MENU_ITEMS:
     if menu_principal != label:
         continue
-    if special == "laudos":
-        from app.laudos_deps import build_laudos_deps
-        from app.pages.laudos import render_laudos
-        laudos_deps = build_laudos_deps()
-        try:
-            render_laudos(laudos_deps)
-        except TypeError:
-            st.error(
-                "**Laudos: versão desatualizada no servidor.** O módulo Laudos no deploy não está alinhado com o app. "
-                "Confirme que **app/pages/laudos.py** está commitado com a assinatura `def render_laudos(deps=None)`, "
-                "faça **push** e aguarde o redeploy no Streamlit Cloud (ou use *Manage app* → *Reboot*)."
-            )
-    else:
-        mod = importlib.import_module(module_path)
-        getattr(mod, function_name)()
+    with medir_pagina(label):
+        if special == "laudos":
+            from app.laudos_deps import build_laudos_deps
+            from app.pages.laudos import render_laudos
+            laudos_deps = build_laudos_deps()
+            try:
+                render_laudos(laudos_deps)
+            except TypeError:
+                st.error(
+                    "**Laudos: versão desatualizada no servidor.** O módulo Laudos no deploy não está alinhado com o app. "
+                    "Confirme que **app/pages/laudos.py** está commitado com a assinatura `def render_laudos(deps=None)`, "
+                    "faça **push** e aguarde o redeploy no Streamlit Cloud (ou use *Manage app* → *Reboot*)."
+                )
+        else:
+            mod = importlib.import_module(module_path)
+            getattr(mod, function_name)()
     break
@@ -0,0 +1,156 @@
+"""
+Codec de BLOBs - Fort Cordis
+Compressão transparente dos conteúdos gravados no banco (JSON/PDF de laudos, NFS-e, PDFs de prescrição).
+
+Formato gravado: cabeçalho de 14 bytes + payload comprimido
+  MAGICO (4 bytes: \\x00FCB) | versão (1 byte) | algoritmo (1 byte) | tamanho original (8 bytes, big-endian)
+Conteúdos sem o cabeçalho (gravados antes do codec ou abaixo do limiar) são lidos como estão.
+Nenhum JSON, PDF ou imagem começa com \\x00, então o cabeçalho não colide com dados antigos.
+"""
+
+import lzma
+import os
+import struct
+import zlib
+
+MAGICO = b"\x00FCB"
+VERSAO = 1
+_CABECALHO = struct.Struct(">4sBBQ")
+TAMANHO_CABECALHO = _CABECALHO.size
+
+ALGORITMOS = {"zlib": 1, "lzma": 2}
+_NOMES = {v: k for k, v in ALGORITMOS.items()}
+
+# Abaixo do limiar (bytes) o conteúdo é gravado sem compressão; "nenhum" desliga o codec na gravação
+LIMIAR_COMPRESSAO = int(os.environ.get("FORTCORDIS_BLOB_LIMIAR", "512"))
+ALGORITMO_PADRAO = os.environ.get("FORTCORDIS_BLOB_ALGORITMO", "zlib")
+# Só grava comprimido se economizar pelo menos 10% (PDFs e JPEGs já comprimidos quase não reduzem)
+RAZAO_MAXIMA = 0.9
+
+_ERROS_DESCOMPRESSAO = (zlib.error, lzma.LZMAError, EOFError)
+
+
+def _comprimir(dados, algoritmo):
+    if algoritmo == "zlib":
+        return zlib.compress(dados, 6)
+    if algoritmo == "lzma":
+        return lzma.compress(dados, preset=6)
+    raise ValueError(f"Algoritmo de compressão desconhecido: {algoritmo!r}")
+
+
+def _descompressor(codigo):
+    if codigo == ALGORITMOS["zlib"]:
+        return zlib.decompressobj()
+    if codigo == ALGORITMOS["lzma"]:
+        return lzma.LZMADecompressor()
+    raise ValueError(f"Algoritmo de compressão desconhecido no cabeçalho: {codigo}")
+
+
+def ler_cabecalho(prefixo):
+    """
+    Interpreta o início de um conteúdo gravado. Retorna {"versao", "algoritmo", "tamanho"}
+    ou None se o conteúdo não estiver codificado (dados antigos / abaixo do limiar).
+    """
+    if not isinstance(prefixo, (bytes, bytearray, memoryview)) or len(prefixo) < TAMANHO_CABECALHO:
+        return None
+    magico, versao, codigo, tamanho = _CABECALHO.unpack(bytes(prefixo[:TAMANHO_CABECALHO]))
+    if magico != MAGICO:
+        return None
+    if versao > VERSAO:
+        raise ValueError(f"Versão do codec de BLOB não suportada: {versao}")
+    return {"versao": versao, "algoritmo": _NOMES.get(codigo, str(codigo)), "tamanho": tamanho}
+
+
+def esta_codificado(dados):
+    return ler_cabecalho(dados) is not None
+
+
+def codificar(dados, limiar=None, algoritmo=None):
+    """
+    Conteúdo pronto para gravar: comprimido com cabeçalho se passar do limiar e compensar,
+    senão os próprios bytes. None continua None; texto é gravado como UTF-8; já codificado não muda.
+    """
+    if dados is None:
+        return None
+    if isinstance(dados, str):
+        dados = dados.encode("utf-8")
+    dados = bytes(dados)
+    algoritmo = algoritmo or ALGORITMO_PADRAO
+    limiar = LIMIAR_COMPRESSAO if limiar is None else limiar
+    if algoritmo == "nenhum" or len(dados) < max(limiar, 1) or esta_codificado(dados):
+        return dados
+    payload = _comprimir(dados, algoritmo)
+    if len(payload) + TAMANHO_CABECALHO > len(dados) * RAZAO_MAXIMA:
+        return dados
+    return _CABECALHO.pack(MAGICO, VERSAO, ALGORITMOS[algoritmo], len(dados)) + payload
+
+
+def decodificar(dados):
+    """Conteúdo original de um valor lido do banco. Texto (JSON gravado como TEXT) e None passam direto."""
+    if dados is None or isinstance(dados, str):
+        return dados
+    cab = ler_cabecalho(dados)
+    if cab is None:
+        return bytes(dados)
+    d = _descompressor(ALGORITMOS.get(cab["algoritmo"], -1))
+    try:
+        saida = d.decompress(bytes(dados[TAMANHO_CABECALHO:]))
+        if hasattr(d, "flush"):
+            saida += d.flush()
+    except _ERROS_DESCOMPRESSAO as e:
+        raise ValueError(f"BLOB corrompido: {e}") from e
+    if len(saida) != cab["tamanho"]:
+        raise ValueError(f"BLOB corrompido: {len(saida)} bytes descomprimidos, esperados {cab['tamanho']}")
+    return saida
+
+
+def tamanho_original(dados):
+    """Tamanho em bytes do conteúdo original (sem descomprimir)."""
+    if dados is None:
+        return 0
+    if isinstance(dados, str):
+        return len(dados.encode("utf-8"))
+    cab = ler_cabecalho(dados)
+    return cab["tamanho"] if cab else len(dados)
+
+
+class DecodificadorIncremental:
+    """
+    Decodifica um conteúdo lido em blocos (ex.: Connection.blobopen) sem montá-lo inteiro em memória.
+    alimentar(bloco) devolve os bytes originais disponíveis; finalizar() devolve o restante.
+    """
+
+    def __init__(self):
+        self._inicio = b""
+        self._descompressor = None
+        self._codificado = None
+
+    def alimentar(self, bloco):
+        if self._codificado is None:
+            self._inicio += bytes(bloco)
+            if len(self._inicio) < TAMANHO_CABECALHO and self._inicio[:len(MAGICO)] == MAGICO[:len(self._inicio)]:
+                return b""  # ainda pode ser um cabeçalho: espera o próximo bloco
+            cab = ler_cabecalho(self._inicio)
+            self._codificado = cab is not None
+            bloco, self._inicio = self._inicio, b""
+            if not self._codificado:
+                return bloco
+            self._descompressor = _descompressor(ALGORITMOS.get(cab["algoritmo"], -1))
+            bloco = bloco[TAMANHO_CABECALHO:]
+        if not self._codificado:
+            return bytes(bloco)
+        try:
+            return self._descompressor.decompress(bytes(bloco))
+        except _ERROS_DESCOMPRESSAO as e:
+            raise ValueError(f"BLOB corrompido: {e}") from e
+
+    def finalizar(self):
+        if self._codificado is None:
+            resto, self._inicio = self._inicio, b""
+            return resto
+        if self._codificado and hasattr(self._descompressor, "flush"):
+            try:
+                return self._descompressor.flush()
+            except _ERROS_DESCOMPRESSAO as e:
+                raise ValueError(f"BLOB corrompido: {e}") from e
+        return b""
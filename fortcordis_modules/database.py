@@ -9,6 +9,9 @@ import sqlite3
 from pathlib import Path
 from datetime import datetime
 
+from fortcordis_modules.blob_codec import codificar, decodificar
+from fortcordis_modules.escritor import escrever
+
 # Banco: pasta do projeto (fortcordis_modules/../data/fortcordis.db) ou variável de ambiente
 if os.environ.get("FORTCORDIS_DB_PATH"):
     DB_PATH = Path(os.environ["FORTCORDIS_DB_PATH"])
@@ -263,6 +266,27 @@ def inicializar_banco():
         )
     """)
     
+    # Prescrições: colunas de auditoria e referência ao PDF arquivado por conteúdo (sha256)
+    try:
+        cursor.execute("PRAGMA table_info(prescricoes)")
+        cols_presc = [r[1].lower() for r in cursor.fetchall()]
+        for col, tipo in [("created_at", "TEXT"), ("updated_at", "TEXT"), ("pdf_hash", "TEXT"), ("pdf_tamanho", "INTEGER")]:
+            if col not in cols_presc:
+                cursor.execute(f"ALTER TABLE prescricoes ADD COLUMN {col} {tipo}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_prescricoes_data ON prescricoes(data_prescricao, id)")
+    except sqlite3.OperationalError:
+        pass
+
+    # PDFs de prescrições (um registro por conteúdo; conteudo NULL quando só está em disco)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS prescricoes_pdfs (
+            hash TEXT PRIMARY KEY,
+            tamanho INTEGER NOT NULL,
+            conteudo BLOB,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
     # Tabela de Acompanhamento/Retornos
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS acompanhamentos (
@@ -468,6 +492,18 @@ def inicializar_banco():
             if sid:
                 cursor.execute("INSERT OR IGNORE INTO servico_preco (servico_id, tabela_preco_id, valor) VALUES (?, 4, ?)", (sid, valor))
     
+    # Índice para relatórios de contas a receber (OS pendentes agrupadas por clínica)
+    try:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_financeiro_status_clinica ON financeiro(status_pagamento, clinica_id)")
+    except sqlite3.OperationalError:
+        pass
+
+    # Linha do tempo do paciente
+    try:
+        garantir_tabela_eventos_paciente(conn)
+    except sqlite3.OperationalError:
+        pass
+
     # Migrar dados da tabela legada 'clinicas' para 'clinicas_parceiras'
     _migrar_clinicas_legadas(conn)
 
@@ -546,6 +582,7 @@ def garantir_colunas_financeiro():
         ("data_pagamento", "TEXT"),
         ("forma_pagamento", "TEXT"),
         ("data_competencia", "TEXT"),
+        ("data_vencimento", "TEXT"),
         ("descricao", "TEXT"),
         ("valor_final", "REAL"),
         ("valor_bruto", "REAL"),
@@ -712,12 +749,37 @@ def inserir_financeiro(cursor, *, clinica_id, numero_os, descricao, valor_bruto,
     cursor.execute(f"INSERT INTO financeiro ({', '.join(cols)}) VALUES ({placeholders})", tuple(vals))
 
 
-def calcular_valor_final(servico_id, clinica_id):
+def aplicar_desconto(valor_base, tipo_desconto, valor_desconto, limite_pct=None):
+    """
+    Aplica um desconto ('percentual' ou 'valor_fixo') ao valor base, respeitando o limite
+    percentual da clínica. Função pura (sem banco).
+    Retorna: (valor_base, valor_desconto, valor_final)
+    """
+    if tipo_desconto == 'percentual':
+        desconto_aplicado = valor_base * (valor_desconto / 100)
+        valor_final = valor_base - desconto_aplicado
+    else:  # valor_fixo
+        desconto_aplicado = valor_desconto
+        valor_final = valor_base - valor_desconto
+    # Respeitar limite de desconto da clínica (percentual máximo sobre valor_base)
+    if limite_pct is not None and limite_pct < 100:
+        max_desconto = valor_base * (limite_pct / 100)
+        if desconto_aplicado > max_desconto:
+            desconto_aplicado = max_desconto
+            valor_final = valor_base - desconto_aplicado
+    return (valor_base, desconto_aplicado, max(valor_final, 0.0))
+
+
+def calcular_valor_final(servico_id, clinica_id, referencias=None):
     """
     Calcula o valor final do serviço aplicando descontos da clínica.
     Usa preço da tabela de preço da clínica (servico_preco), com fallback para valor_base.
+    referencias: snapshot de cadastros (app.services.referencias.obter_referencias()); quando
+    informado, o cálculo é feito em memória, sem abrir conexão.
     Retorna: (valor_base, valor_desconto, valor_final)
     """
+    if referencias is not None:
+        return referencias.calcular_valor_final(servico_id, clinica_id)
     conn = get_conn()
     cursor = conn.cursor()
 
@@ -782,20 +844,7 @@ def calcular_valor_final(servico_id, clinica_id):
         return (valor_base, 0.0, valor_base)
     
     tipo_desconto, valor_desconto = desconto
-    
-    if tipo_desconto == 'percentual':
-        desconto_aplicado = valor_base * (valor_desconto / 100)
-        valor_final = valor_base - desconto_aplicado
-    else:  # valor_fixo
-        desconto_aplicado = valor_desconto
-        valor_final = valor_base - valor_desconto
-    # Respeitar limite de desconto da clínica (percentual máximo sobre valor_base)
-    if limite_pct is not None and limite_pct < 100:
-        max_desconto = valor_base * (limite_pct / 100)
-        if desconto_aplicado > max_desconto:
-            desconto_aplicado = max_desconto
-            valor_final = valor_base - desconto_aplicado
-    return (valor_base, desconto_aplicado, max(valor_final, 0.0))
+    return aplicar_desconto(valor_base, tipo_desconto, valor_desconto, limite_pct)
 
 def registrar_cobranca_automatica(agendamento_id, clinica_id, servicos_ids):
     """Registra cobrança automaticamente após conclusão do atendimento. data_competencia = data do agendamento."""
@@ -920,12 +969,9 @@ def _inserir_movimento_caixa(tipo, valor, data_movimento, forma_pagamento=None,
     conn = get_conn()
     cursor = conn.cursor()
     try:
-        cursor.execute("""
-            INSERT INTO movimentos_caixa (tipo, valor, data_movimento, forma_pagamento, origem_tipo, origem_id, descricao, clinica_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (tipo, valor, data_movimento or datetime.now().strftime("%Y-%m-%d"), forma_pagamento, origem_tipo, origem_id, descricao, clinica_id))
+        movimento_id = _gravar_movimento_caixa(cursor, tipo, valor, data_movimento, forma_pagamento, origem_tipo, origem_id, descricao, clinica_id)
         conn.commit()
-        return cursor.lastrowid
+        return movimento_id
     except sqlite3.OperationalError:
         conn.rollback()
         return None
@@ -933,45 +979,56 @@ def _inserir_movimento_caixa(tipo, valor, data_movimento, forma_pagamento=None,
         conn.close()
 
 
+def _gravar_movimento_caixa(cursor, tipo, valor, data_movimento, forma_pagamento=None, origem_tipo=None, origem_id=None, descricao=None, clinica_id=None):
+    """INSERT em movimentos_caixa no cursor de quem chama (sem commit). Retorna o id do movimento."""
+    cursor.execute("""
+        INSERT INTO movimentos_caixa (tipo, valor, data_movimento, forma_pagamento, origem_tipo, origem_id, descricao, clinica_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (tipo, valor, data_movimento or datetime.now().strftime("%Y-%m-%d"), forma_pagamento, origem_tipo, origem_id, descricao, clinica_id))
+    return cursor.lastrowid
+
+
 def dar_baixa_os(financeiro_id, data_pagamento=None, forma_pagamento=None):
     """
     Marca uma OS como paga (dar baixa no pagamento).
-    Registra automaticamente entrada em movimentos_caixa (integração financeira).
+    Registra automaticamente entrada em movimentos_caixa (integração financeira), na mesma transação.
     data_pagamento: str YYYY-MM-DD ou None para hoje.
     forma_pagamento: str (ex: 'PIX', 'Transferência', 'Dinheiro', 'Cartão').
     Retorna True se atualizou, False se não encontrou ou já estava paga.
     """
     garantir_colunas_financeiro()
-    conn = get_conn()
-    cursor = conn.cursor()
-    cursor.execute("SELECT valor_final, clinica_id, numero_os, descricao FROM financeiro WHERE id = ? AND (status_pagamento IS NULL OR status_pagamento = 'pendente')", (financeiro_id,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return False
-    valor_final, clinica_id, numero_os, descricao = float(row[0] or 0), row[1], row[2], row[3]
+    garantir_tabelas_financeiro_extras()
     data_pag = data_pagamento or datetime.now().strftime("%Y-%m-%d")
     forma = forma_pagamento or "Não informado"
-    cursor.execute("""
-        UPDATE financeiro
-        SET status_pagamento = 'pago', data_pagamento = ?, forma_pagamento = ?
-        WHERE id = ? AND (status_pagamento IS NULL OR status_pagamento = 'pendente')
-    """, (data_pag, forma, financeiro_id))
-    ok = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
-    if ok and valor_final > 0:
-        _inserir_movimento_caixa(
-            tipo="entrada",
-            valor=valor_final,
-            data_movimento=data_pag,
-            forma_pagamento=forma,
-            origem_tipo="receita_os",
-            origem_id=financeiro_id,
-            descricao=f"OS {numero_os or financeiro_id}: {descricao or 'Receita'}",
-            clinica_id=clinica_id,
-        )
-    return ok
+
+    def _baixar(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT valor_final, clinica_id, numero_os, descricao FROM financeiro WHERE id = ? AND (status_pagamento IS NULL OR status_pagamento = 'pendente')", (financeiro_id,))
+        row = cursor.fetchone()
+        if not row:
+            return False
+        valor_final, clinica_id, numero_os, descricao = float(row[0] or 0), row[1], row[2], row[3]
+        cursor.execute("""
+            UPDATE financeiro
+            SET status_pagamento = 'pago', data_pagamento = ?, forma_pagamento = ?
+            WHERE id = ? AND (status_pagamento IS NULL OR status_pagamento = 'pendente')
+        """, (data_pag, forma, financeiro_id))
+        ok = cursor.rowcount > 0
+        if ok and valor_final > 0:
+            _gravar_movimento_caixa(
+                cursor,
+                tipo="entrada",
+                valor=valor_final,
+                data_movimento=data_pag,
+                forma_pagamento=forma,
+                origem_tipo="receita_os",
+                origem_id=financeiro_id,
+                descricao=f"OS {numero_os or financeiro_id}: {descricao or 'Receita'}",
+                clinica_id=clinica_id,
+            )
+        return ok
+
+    return escrever(_baixar, db_path=DB_PATH)
 
 
 def excluir_os(financeiro_id):
@@ -1148,7 +1205,7 @@ def inserir_movimento_caixa_manual(tipo, valor, data_movimento, descricao=None,
 
 # ----- NFS-e (armazenamento vinculado à clínica) -----
 def inserir_nfse(clinica_id, numero_nfse=None, arquivo_caminho=None, arquivo_blob=None, data_emissao=None, valor=None, descricao=None):
-    """Registra NFS-e vinculada à clínica. Retorna id ou None."""
+    """Registra NFS-e vinculada à clínica (arquivo_blob gravado pelo codec de BLOBs). Retorna id ou None."""
     garantir_tabelas_financeiro_extras()
     conn = get_conn()
     cursor = conn.cursor()
@@ -1156,7 +1213,7 @@ def inserir_nfse(clinica_id, numero_nfse=None, arquivo_caminho=None, arquivo_blo
         cursor.execute("""
             INSERT INTO nfse_arquivos (clinica_id, numero_nfse, arquivo_caminho, arquivo_blob, data_emissao, valor, descricao)
             VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (clinica_id, numero_nfse or "", arquivo_caminho or "", arquivo_blob, data_emissao or "", valor, descricao or ""))
+        """, (clinica_id, numero_nfse or "", arquivo_caminho or "", codificar(arquivo_blob), data_emissao or "", valor, descricao or ""))
         conn.commit()
         return cursor.lastrowid
     except sqlite3.OperationalError:
@@ -1186,7 +1243,12 @@ def listar_nfse_por_clinica(clinica_id=None):
         """)
     rows = cursor.fetchall()
     conn.close()
-    return [dict(r) for r in rows]
+    out = []
+    for r in rows:
+        item = dict(r)
+        item["arquivo_blob"] = decodificar(item.get("arquivo_blob"))
+        out.append(item)
+    return out
 
 
 # ----- Créditos de clientes (clínicas) -----
@@ -1388,6 +1450,116 @@ def atualizar_status_acompanhamentos():
     conn.commit()
     conn.close()
 
+# ============================================================================
+# EVENTOS DO PACIENTE (linha do tempo: consultas, exames, prescrições, agendamentos)
+# ============================================================================
+
+def garantir_tabela_eventos_paciente(conn):
+    """
+    paciente_eventos: um evento por registro de origem (chave 'consulta:12', 'agendamento:7',
+    'exame:<tipo>:<data>:<animal>:<tutor>' ...). paciente_id pode ficar NULL quando a origem só tem
+    nomes; resolucao registra como foi vinculado ('id', 'exato', 'aproximado', 'nenhum').
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS paciente_eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chave TEXT NOT NULL UNIQUE,
+            paciente_id INTEGER,
+            tipo TEXT NOT NULL,
+            data_evento TEXT NOT NULL,
+            titulo TEXT,
+            resumo TEXT,
+            nome_paciente TEXT,
+            nome_tutor TEXT,
+            origem_tabela TEXT,
+            origem_id INTEGER,
+            resolucao TEXT,
+            atualizado_em TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_eventos_paciente_data ON paciente_eventos(paciente_id, data_evento DESC, id DESC)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_eventos_sem_paciente ON paciente_eventos(resolucao) WHERE paciente_id IS NULL")
+
+
+def registrar_evento_paciente(cursor, chave, tipo, data_evento, titulo, resumo="", paciente_id=None,
+                              nome_paciente="", nome_tutor="", origem_tabela=None, origem_id=None, resolucao=None):
+    """
+    Insere/atualiza o evento da linha do tempo (pela chave). Sem paciente_id, mantém o vínculo anterior
+    se os nomes não mudaram; senão fica pendente para a resolução por nome.
+    Entre duas origens do mesmo exame, prevalece laudos_arquivos (tem o PDF).
+    Não levanta erro se a tabela não existir (a linha do tempo nunca bloqueia a gravação principal).
+    """
+    try:
+        cursor.execute("""
+            INSERT INTO paciente_eventos (chave, paciente_id, tipo, data_evento, titulo, resumo, nome_paciente,
+                                          nome_tutor, origem_tabela, origem_id, resolucao, atualizado_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(chave) DO UPDATE SET
+                paciente_id = CASE
+                    WHEN excluded.paciente_id IS NOT NULL THEN excluded.paciente_id
+                    WHEN paciente_eventos.nome_paciente IS excluded.nome_paciente
+                     AND paciente_eventos.nome_tutor IS excluded.nome_tutor THEN paciente_eventos.paciente_id
+                    ELSE NULL END,
+                resolucao = CASE
+                    WHEN excluded.paciente_id IS NOT NULL THEN excluded.resolucao
+                    WHEN paciente_eventos.nome_paciente IS excluded.nome_paciente
+                     AND paciente_eventos.nome_tutor IS excluded.nome_tutor THEN paciente_eventos.resolucao
+                    ELSE NULL END,
+                tipo = excluded.tipo,
+                data_evento = excluded.data_evento,
+                titulo = excluded.titulo,
+                resumo = CASE WHEN COALESCE(excluded.resumo, '') <> '' THEN excluded.resumo ELSE paciente_eventos.resumo END,
+                nome_paciente = excluded.nome_paciente,
+                nome_tutor = excluded.nome_tutor,
+                origem_tabela = CASE WHEN paciente_eventos.origem_tabela = 'laudos_arquivos'
+                                      AND excluded.origem_tabela <> 'laudos_arquivos'
+                                     THEN paciente_eventos.origem_tabela ELSE excluded.origem_tabela END,
+                origem_id = CASE WHEN paciente_eventos.origem_tabela = 'laudos_arquivos'
+                                  AND excluded.origem_tabela <> 'laudos_arquivos'
+                                 THEN paciente_eventos.origem_id ELSE excluded.origem_id END,
+                atualizado_em = excluded.atualizado_em
+        """, (
+            chave, paciente_id, tipo, str(data_evento or "")[:19], titulo, (resumo or "")[:300],
+            nome_paciente or "", nome_tutor or "", origem_tabela, origem_id,
+            resolucao or ("id" if paciente_id else None), datetime.now().isoformat(),
+        ))
+    except sqlite3.OperationalError:
+        pass
+
+
+def remover_evento_paciente(cursor, chave):
+    try:
+        cursor.execute("DELETE FROM paciente_eventos WHERE chave = ?", (chave,))
+    except sqlite3.OperationalError:
+        pass
+
+
+def evento_de_agendamento(ag):
+    """Argumentos de registrar_evento_paciente para um agendamento (dict da tabela)."""
+    data = ag.get("data") or ag.get("data_agendamento") or ""
+    hora = (ag.get("hora") or "").strip()
+    status = ag.get("status") or "Agendado"
+    return {
+        "chave": f"agendamento:{ag['id']}",
+        "tipo": "agendamento",
+        "data_evento": f"{data}T{hora}" if data and hora else data,
+        "titulo": f"Agendamento — {ag.get('servico') or 'Atendimento'} ({status})",
+        "resumo": ag.get("observacoes") or "",
+        "paciente_id": ag.get("paciente_id"),
+        "nome_paciente": ag.get("paciente") or "",
+        "nome_tutor": ag.get("tutor") or "",
+        "origem_tabela": "agendamentos",
+        "origem_id": ag["id"],
+    }
+
+
+def _registrar_evento_agendamento(cursor, agendamento_id):
+    cursor.execute("SELECT * FROM agendamentos WHERE id = ?", (agendamento_id,))
+    row = cursor.fetchone()
+    if row:
+        registrar_evento_paciente(cursor, **evento_de_agendamento(dict(zip([d[0] for d in cursor.description], row))))
+
+
 # ============================================================================
 # AGENDAMENTOS
 # ============================================================================
@@ -1413,6 +1585,7 @@ def criar_agendamento(data, hora, paciente, tutor, telefone, servico, clinica, o
     # Verificar quais colunas existem na tabela
     cursor.execute("PRAGMA table_info(agendamentos)")
     colunas_existentes = {row[1].lower() for row in cursor.fetchall()}
+    conn.close()
 
     # Construir colunas e valores dinamicamente
     colunas = [col_data, "hora", "paciente", "tutor", "telefone", "servico",
@@ -1442,17 +1615,16 @@ def criar_agendamento(data, hora, paciente, tutor, telefone, servico, clinica, o
     placeholders = ", ".join(["?"] * len(valores))
     col_names = ", ".join(colunas)
 
-    try:
-        cursor.execute(f"""
+    def _inserir(conn_escrita):
+        cur = conn_escrita.cursor()
+        cur.execute(f"""
             INSERT INTO agendamentos ({col_names}) VALUES ({placeholders})
         """, valores)
-    except (sqlite3.OperationalError, sqlite3.IntegrityError):
-        conn.close()
-        raise
-    conn.commit()
-    agendamento_id = cursor.lastrowid
-    conn.close()
-    return agendamento_id
+        agendamento_id = cur.lastrowid
+        _registrar_evento_agendamento(cur, agendamento_id)
+        return agendamento_id
+
+    return escrever(_inserir, db_path=DB_PATH)
 
 
 def listar_agendamentos(data_inicio=None, data_fim=None, status=None, clinica=None):
@@ -1534,8 +1706,10 @@ def atualizar_agendamento(agendamento_id, **kwargs):
     except sqlite3.OperationalError:
         conn.close()
         return False
-    conn.commit()
     sucesso = cursor.rowcount > 0
+    if sucesso:
+        _registrar_evento_agendamento(cursor, agendamento_id)
+    conn.commit()
     conn.close()
     return sucesso
 
@@ -1547,8 +1721,9 @@ def deletar_agendamento(agendamento_id):
     try:
         cursor.execute("DELETE FROM financeiro WHERE agendamento_id = ?", (agendamento_id,))
         cursor.execute("DELETE FROM agendamentos WHERE id = ?", (agendamento_id,))
-        conn.commit()
         sucesso = cursor.rowcount > 0
+        remover_evento_paciente(cursor, f"agendamento:{agendamento_id}")
+        conn.commit()
     except sqlite3.OperationalError:
         conn.rollback()
         sucesso = False
@@ -1594,10 +1769,12 @@ def _mapear_servico_agendamento_para_nome(servico_texto):
     return mapeamento.get(s.lower(), s)
 
 
-def criar_os_ao_marcar_realizado(agendamento_id):
+def criar_os_ao_marcar_realizado(agendamento_id, referencias=None):
     """
     Cria uma OS (ordem de serviço) no financeiro quando o agendamento é marcado como realizado.
     Não cria duplicata: se já existir OS para este agendamento (ex.: gerada pelo laudo), retorna a existente.
+    referencias: snapshot de cadastros (app.services.referencias); quando informado, clínica, serviço e
+    preço são resolvidos em memória (a clínica só é buscada/cadastrada no banco se não estiver no snapshot).
     Retorna (numero_os, None) em sucesso, (numero_os, "already_exists") se já havia OS, ou (None, mensagem_erro) em falha.
     """
     garantir_colunas_financeiro()
@@ -1623,11 +1800,16 @@ def criar_os_ao_marcar_realizado(agendamento_id):
     conn = get_conn()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            "SELECT id, COALESCE(tabela_preco_id, 1) as tabela_preco_id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL) LIMIT 1",
-            (clinica_nome,),
-        )
-        row_cli = cursor.fetchone()
+        row_cli = None
+        cli_ref = referencias.clinica_por_nome(clinica_nome) if referencias is not None else None
+        if cli_ref is not None:
+            row_cli = (cli_ref.id, cli_ref.tabela_preco_id or 1)
+        else:
+            cursor.execute(
+                "SELECT id, COALESCE(tabela_preco_id, 1) as tabela_preco_id FROM clinicas_parceiras WHERE nome = ? AND (ativo = 1 OR ativo IS NULL) LIMIT 1",
+                (clinica_nome,),
+            )
+            row_cli = cursor.fetchone()
         if not row_cli:
             # Cadastrar automaticamente a clínica se não existir
             cursor.execute(
@@ -1640,18 +1822,25 @@ def criar_os_ao_marcar_realizado(agendamento_id):
         else:
             clinica_id, tabela_preco_id = row_cli[0], row_cli[1]
         nome_servico = _mapear_servico_agendamento_para_nome(servico_texto)
-        cursor.execute("SELECT id, valor_base FROM servicos WHERE (ativo = 1 OR ativo IS NULL) AND (nome = ? OR nome LIKE ?) LIMIT 1", (nome_servico, f"%{nome_servico}%"))
-        row_serv = cursor.fetchone()
+        if referencias is not None:
+            serv_ref = referencias.buscar_servico(nome_servico)
+            row_serv = (serv_ref.id, serv_ref.valor_base) if serv_ref else None
+        else:
+            cursor.execute("SELECT id, valor_base FROM servicos WHERE (ativo = 1 OR ativo IS NULL) AND (nome = ? OR nome LIKE ?) LIMIT 1", (nome_servico, f"%{nome_servico}%"))
+            row_serv = cursor.fetchone()
         if not row_serv:
             conn.close()
             return None, f"Serviço '{servico_texto}' não encontrado em Cadastros > Serviços. Cadastre o serviço e a tabela de preço."
         servico_id, valor_base_fallback = row_serv[0], float(row_serv[1] or 0)
-        cursor.execute(
-            "SELECT valor FROM servico_preco WHERE servico_id = ? AND tabela_preco_id = ? LIMIT 1",
-            (servico_id, tabela_preco_id),
-        )
-        row_preco = cursor.fetchone()
-        valor_final = float(row_preco[0]) if row_preco else valor_base_fallback
+        if referencias is not None:
+            valor_final = referencias.valor_servico(servico_id, tabela_preco_id)
+        else:
+            cursor.execute(
+                "SELECT valor FROM servico_preco WHERE servico_id = ? AND tabela_preco_id = ? LIMIT 1",
+                (servico_id, tabela_preco_id),
+            )
+            row_preco = cursor.fetchone()
+            valor_final = float(row_preco[0]) if row_preco else valor_base_fallback
         data_atend = agend.get("data") or agend.get("data_agendamento")
         data_comp = str(data_atend)[:10] if data_atend else datetime.now().strftime("%Y-%m-%d")
         descricao = f"{servico_texto} - {agend.get('paciente', '')}"
@@ -5,9 +5,29 @@ Gera PDFs de receituários, atestados, GTA e termos de consentimento
 
 from fpdf import FPDF
 from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
 import os
 
+
+@lru_cache(maxsize=8)
+def _ler_logo(caminho, mtime):
+    """Bytes do logo, lidos uma vez por processo (a chave inclui mtime: trocar o arquivo invalida)."""
+    with open(caminho, 'rb') as f:
+        return f.read()
+
+
+def _logo_em_cache(caminho):
+    """Retorna os bytes do logo (cache por processo) ou None se não houver logo."""
+    if not caminho:
+        return None
+    try:
+        return _ler_logo(str(caminho), os.path.getmtime(caminho))
+    except OSError:
+        return None
+
+
 class DocumentoVeterinario(FPDF):
     """Classe base para documentos veterinários com cabeçalho padrão"""
     
@@ -16,11 +36,14 @@ class DocumentoVeterinario(FPDF):
         self.logo_path = logo_path
         self.medico = medico
         self.crmv = crmv
+        # Logo resolvido uma vez por documento (não a cada página); o fpdf reaproveita o
+        # mesmo objeto de imagem nas páginas seguintes
+        self._logo_bytes = _logo_em_cache(logo_path)
     
     def header(self):
         # Logo
-        if self.logo_path and os.path.exists(self.logo_path):
-            self.image(self.logo_path, 10, 8, 30)
+        if self._logo_bytes:
+            self.image(BytesIO(self._logo_bytes), 10, 8, 30)
         
         # Informações do médico
         self.set_font('Arial', 'B', 16)
@@ -324,3 +347,24 @@ def formatar_posologia(peso_kg, medicamento_info):
     else:
         dose_total = peso_kg * dose_mg_kg
         return f"{nome} ({concentracao}) - {dose_total:.1f} mg ({dose_mg_kg} mg/kg) - {frequencia} - {via}"
+
+
+# Tipos de documento aceitos por renderizar_documento (usado no processamento em lote)
+RENDERIZADORES = {
+    "receituario": gerar_receituario_pdf,
+    "atestado": gerar_atestado_saude_pdf,
+    "gta": gerar_gta_pdf,
+    "termo": gerar_termo_consentimento_pdf,
+}
+
+
+def renderizar_documento(tipo, parametros):
+    """
+    Gera o PDF de um documento pelo tipo ('receituario', 'atestado', 'gta', 'termo').
+    parametros: dict com os argumentos nomeados da função geradora correspondente.
+    Função de nível de módulo (picklável) para rodar em processos de trabalho.
+    Retorna bytes.
+    """
+    if tipo not in RENDERIZADORES:
+        raise ValueError(f"Tipo de documento desconhecido: {tipo}")
+    return bytes(RENDERIZADORES[tipo](**parametros))
@@ -0,0 +1,311 @@
+"""
+Escritor único do banco - Fort Cordis
+Serializa as gravações do processo numa thread dedicada, em vez de cada função abrir sua própria conexão
+e disputar o lock do SQLite (o "database is locked" com vários usuários simultâneos).
+
+Uso:
+    def _gravar(conn):
+        cur = conn.execute("INSERT INTO ... VALUES (?)", (x,))
+        return cur.lastrowid
+
+    futuro = executar_escrita(_gravar)   # concurrent.futures.Future
+    novo_id = futuro.result()            # ou escrever(_gravar): o mesmo, esperando o resultado
+
+Cada função recebe a conexão do escritor dentro de um SAVEPOINT próprio: se ela levantar exceção, só o
+trabalho dela é desfeito e a exceção vai para o futuro. As funções que chegam enquanto a anterior grava
+entram no mesmo lote e são confirmadas por um único COMMIT (group commit): com a fila vazia o lote tem
+uma função só e a latência é a de sempre. O futuro só é resolvido depois do COMMIT.
+
+Dentro da função, conn.commit() não faz nada (o COMMIT é do lote), conn.rollback() desfaz só o trabalho
+da função e conn.close() é ignorado; assim helpers antigos que recebem uma conexão continuam servindo.
+Uma função que chama executar_escrita de dentro do escritor roda na hora, no mesmo lote.
+
+FORTCORDIS_ESCRITOR=0 desliga a fila: cada chamada grava na própria conexão, na thread de quem chamou
+(comportamento anterior; usado pelo benchmarks/stress_escrita.py para comparar).
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+ATIVO = os.environ.get("FORTCORDIS_ESCRITOR", "1") != "0"
+# Máximo de funções confirmadas num mesmo COMMIT
+LOTE_MAXIMO = int(os.environ.get("FORTCORDIS_ESCRITOR_LOTE", "64"))
+# Espera pelo lock quando outro processo (script de importação, migração) está gravando
+TIMEOUT_LOCK_S = 30
+# Tempo máximo de escrever() esperando o resultado
+TIMEOUT_RESULTADO_S = 60
+
+_FIM = object()
+
+
+def _caminho_padrao():
+    if os.environ.get("FORTCORDIS_DB_PATH"):
+        return Path(os.environ["FORTCORDIS_DB_PATH"])
+    return Path(__file__).resolve().parent.parent / "data" / "fortcordis.db"
+
+
+class _ConexaoDoLote:
+    """Conexão entregue às funções do lote: encaminha tudo para a conexão real, menos commit/rollback/close."""
+
+    def __init__(self, conn, savepoint):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_savepoint", savepoint)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._conn, nome, valor)
+
+    def commit(self):
+        pass  # confirmado pelo COMMIT do lote
+
+    def rollback(self):
+        self._conn.execute(f"ROLLBACK TO {self._savepoint}")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        if tipo is not None:
+            self.rollback()
+        return False
+
+
+class _Tarefa:
+    __slots__ = ("fn", "args", "kwargs", "chaves_estrangeiras", "futuro", "enfileirada")
+
+    def __init__(self, fn, args, kwargs, chaves_estrangeiras):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.chaves_estrangeiras = chaves_estrangeiras
+        self.futuro = Future()
+        self.enfileirada = time.perf_counter()
+
+
+class Escritor:
+    """Thread única de gravação de um arquivo de banco. Use obter_escritor() em vez de instanciar."""
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._laco, name=f"escritor_sqlite:{Path(self.db_path).name}", daemon=True)
+        self._conn = None
+        self._conexao_lote = None
+        self._fk = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"tarefas": 0, "falhas": 0, "lotes": 0, "maior_lote": 0, "espera_ms": 0.0,
+                       "espera_max_ms": 0.0, "commit_ms": 0.0}
+        self._thread.start()
+
+    def na_thread(self):
+        return threading.current_thread() is self._thread
+
+    def enviar(self, fn, args, kwargs, chaves_estrangeiras):
+        tarefa = _Tarefa(fn, args, kwargs, chaves_estrangeiras)
+        if self.na_thread():
+            # Chamada de dentro de outra função do lote: roda já, na mesma transação
+            try:
+                tarefa.futuro.set_result(fn(self._conexao_lote, *args, **kwargs))
+            except Exception as e:
+                tarefa.futuro.set_exception(e)
+            return tarefa.futuro
+        self._fila.put(tarefa)
+        return tarefa.futuro
+
+    def parar(self, timeout=10):
+        self._fila.put(_FIM)
+        self._thread.join(timeout)
+
+    def estatisticas(self):
+        with self._stats_lock:
+            s = dict(self._stats)
+        s["pendentes"] = self._fila.qsize()
+        s["media_por_lote"] = round(s["tarefas"] / s["lotes"], 2) if s["lotes"] else 0.0
+        s["espera_media_ms"] = round(s.pop("espera_ms") / s["tarefas"], 2) if s["tarefas"] else 0.0
+        s["espera_max_ms"] = round(s["espera_max_ms"], 2)
+        s["commit_ms"] = round(s["commit_ms"], 1)
+        return s
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.db_path, timeout=TIMEOUT_LOCK_S, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        self._fk = None
+        return conn
+
+    def _laco(self):
+        pendente = None
+        while True:
+            primeira = pendente if pendente is not None else self._fila.get()
+            pendente = None
+            if primeira is _FIM:
+                break
+            lote = [primeira]
+            # Group commit: junta o que já está na fila, sem esperar, com a mesma configuração de FK
+            while len(lote) < LOTE_MAXIMO:
+                try:
+                    t = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if t is _FIM or t.chaves_estrangeiras != primeira.chaves_estrangeiras:
+                    pendente = t
+                    break
+                lote.append(t)
+            self._executar_lote(lote)
+            if pendente is _FIM:
+                break
+        if self._conn is not None:
+            self._conn.close()
+
+    def _executar_lote(self, lote):
+        inicio = time.perf_counter()
+        concluidas = []
+        try:
+            if self._conn is None:
+                self._conn = self._conectar()
+            fk = lote[0].chaves_estrangeiras
+            if self._fk != fk:
+                # PRAGMA foreign_keys não tem efeito dentro de transação: ajusta entre lotes
+                self._conn.execute(f"PRAGMA foreign_keys = {'ON' if fk else 'OFF'}")
+                self._fk = fk
+            self._conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            self._descartar_conexao()
+            for t in lote:
+                t.futuro.set_exception(e)
+            self._contar(lote, 0, inicio)
+            return
+
+        for i, t in enumerate(lote):
+            sp = f"escrita_{i}"
+            self._conn.row_factory = None
+            self._conexao_lote = _ConexaoDoLote(self._conn, sp)
+            self._conn.execute(f"SAVEPOINT {sp}")
+            try:
+                resultado = t.fn(self._conexao_lote, *t.args, **t.kwargs)
+            except BaseException as e:
+                try:
+                    self._conn.execute(f"ROLLBACK TO {sp}")
+                    self._conn.execute(f"RELEASE {sp}")
+                except sqlite3.Error:
+                    logger.exception("Escritor: falha ao desfazer a tarefa %s", getattr(t.fn, "__name__", t.fn))
+                t.futuro.set_exception(e if isinstance(e, Exception) else RuntimeError(repr(e)))
+                continue
+            finally:
+                self._conexao_lote = None
+            self._conn.execute(f"RELEASE {sp}")
+            concluidas.append((t, resultado))
+
+        t_commit = time.perf_counter()
+        try:
+            self._conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.exception("Escritor: COMMIT de um lote com %d tarefa(s) falhou", len(lote))
+            self._descartar_conexao()
+            for t, _ in concluidas:
+                t.futuro.set_exception(e)
+            self._contar(lote, 0, inicio)
+            return
+        commit_ms = (time.perf_counter() - t_commit) * 1000
+        for t, resultado in concluidas:
+            t.futuro.set_result(resultado)
+        self._contar(lote, commit_ms, inicio, falhas=len(lote) - len(concluidas))
+
+    def _descartar_conexao(self):
+        try:
+            if self._conn is not None:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                self._conn.close()
+        except sqlite3.Error:
+            pass
+        self._conn = None
+
+    def _contar(self, lote, commit_ms, inicio, falhas=None):
+        esperas = [(inicio - t.enfileirada) * 1000 for t in lote]
+        with self._stats_lock:
+            s = self._stats
+            s["tarefas"] += len(lote)
+            s["falhas"] += len(lote) if falhas is None else falhas
+            s["lotes"] += 1
+            s["maior_lote"] = max(s["maior_lote"], len(lote))
+            s["espera_ms"] += sum(esperas)
+            s["espera_max_ms"] = max(s["espera_max_ms"], max(esperas))
+            s["commit_ms"] += commit_ms
+
+
+_escritores = {}
+_escritores_lock = threading.Lock()
+
+
+def obter_escritor(db_path=None):
+    """Escritor (thread única) do arquivo de banco, criado na primeira gravação."""
+    chave = str(Path(db_path or _caminho_padrao()).resolve())
+    with _escritores_lock:
+        esc = _escritores.get(chave)
+        if esc is None:
+            esc = _escritores[chave] = Escritor(chave)
+        return esc
+
+
+def _executar_direto(db_path, fn, args, kwargs, chaves_estrangeiras):
+    futuro = Future()
+    # Timeout padrão do sqlite3 (5 s), como as conexões abertas por cada função antes do escritor
+    conn = sqlite3.connect(str(db_path or _caminho_padrao()))
+    try:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if chaves_estrangeiras else 'OFF'}")
+        resultado = fn(conn, *args, **kwargs)
+        conn.commit()
+        futuro.set_result(resultado)
+    except Exception as e:
+        conn.rollback()
+        futuro.set_exception(e)
+    finally:
+        conn.close()
+    return futuro
+
+
+def executar_escrita(fn, *args, db_path=None, chaves_estrangeiras=True, **kwargs):
+    """
+    Agenda fn(conn, *args, **kwargs) no escritor do banco e retorna um Future com o valor de fn
+    (ou a exceção que ela levantou), resolvido depois do COMMIT. fn não deve guardar a conexão.
+    chaves_estrangeiras: PRAGMA foreign_keys durante fn (padrão ON, como fortcordis_modules.database.get_conn).
+    """
+    if not ATIVO:
+        return _executar_direto(db_path, fn, args, kwargs, chaves_estrangeiras)
+    return obter_escritor(db_path).enviar(fn, args, kwargs, chaves_estrangeiras)
+
+
+def escrever(fn, *args, db_path=None, chaves_estrangeiras=True, timeout=TIMEOUT_RESULTADO_S, **kwargs):
+    """executar_escrita(...) esperando o resultado: retorna o valor de fn ou levanta a exceção dela."""
+    return executar_escrita(fn, *args, db_path=db_path, chaves_estrangeiras=chaves_estrangeiras,
+                            **kwargs).result(timeout)
+
+
+def estatisticas_escritores():
+    """{arquivo: {tarefas, falhas, lotes, maior_lote, media_por_lote, espera_media_ms, espera_max_ms, commit_ms, pendentes}}."""
+    with _escritores_lock:
+        itens = list(_escritores.items())
+    return {Path(caminho).name: esc.estatisticas() for caminho, esc in itens}
+
+
+@atexit.register
+def _parar_escritores():
+    # Confirma o que ainda estiver na fila antes de o processo sair
+    with _escritores_lock:
+        itens = list(_escritores.values())
+    for esc in itens:
+        esc.parar()
@@ -8,6 +8,7 @@ Uso (na pasta do projeto):
 
 O banco usado e o fortcordis.db na mesma pasta do script (FortCordis_Novo).
 Depois execute exportar_backup.py e importe o .db em Configuracoes > Importar dados no sistema online.
+Com o app local aberto, a pasta ja entra sozinha no banco do app (app.services.ingestao).
 """
 
 import json
@@ -17,6 +18,12 @@ from pathlib import Path
 from datetime import datetime
 
 PASTA_PROJETO = Path(__file__).resolve().parent
+sys.path.insert(0, str(PASTA_PROJETO))
+
+from app.blob_store import gravar_blob  # noqa: E402
+from app.laudos_dedup import garantir_fingerprints, upsert_laudo_arquivo  # noqa: E402
+from app.laudos_medidas import backfill_medidas  # noqa: E402
+
 DB_PATH = PASTA_PROJETO / "fortcordis.db"
 PASTA_LAUDOS_PADRAO = Path.home() / "FortCordis" / "Laudos"
 
@@ -70,8 +77,11 @@ def importar_pasta(pasta: Path):
     cur = conn.cursor()
     criar_tabelas(cur)
     conn.commit()
+    # Fingerprint do exame: rodar o script de novo (ou com outra copia da pasta) atualiza em vez de duplicar
+    garantir_fingerprints(conn)
 
     inseridos = 0
+    atualizados = 0
     erros = []
     for p in arquivos_json:
         try:
@@ -94,31 +104,17 @@ def importar_pasta(pasta: Path):
             pdf_path = pasta / (p.stem + ".pdf")
             conteudo_pdf = pdf_path.read_bytes() if pdf_path.exists() else None
 
-            cur.execute("SELECT id FROM laudos_arquivos WHERE nome_base=?", (nome_base,))
-            row_ant = cur.fetchone()
-            if row_ant:
-                cur.execute("DELETE FROM laudos_arquivos_imagens WHERE laudo_arquivo_id=?", (row_ant[0],))
-            cur.execute(
-                """INSERT OR REPLACE INTO laudos_arquivos
-                   (data_exame, nome_animal, nome_tutor, nome_clinica, tipo_exame, nome_base, conteudo_json, conteudo_pdf, created_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    data_exame,
-                    nome_animal,
-                    nome_tutor,
-                    nome_clinica,
-                    tipo_exame,
-                    nome_base,
-                    conteudo_json,
-                    conteudo_pdf,
-                    datetime.now().isoformat(),
-                ),
+            laudo_id, criado = upsert_laudo_arquivo(
+                cur,
+                nome_base,
+                data_exame,
+                nome_animal,
+                nome_tutor,
+                nome_clinica,
+                tipo_exame,
+                conteudo_json,
+                conteudo_pdf,
             )
-            laudo_id = cur.lastrowid
-            if laudo_id == 0:
-                cur.execute("SELECT id FROM laudos_arquivos WHERE nome_base=?", (nome_base,))
-                r = cur.fetchone()
-                laudo_id = r[0] if r else None
             if laudo_id:
                 cur.execute("DELETE FROM laudos_arquivos_imagens WHERE laudo_arquivo_id=?", (laudo_id,))
                 img_ordem = 0
@@ -127,19 +123,26 @@ def importar_pasta(pasta: Path):
                         img_bytes = img_path.read_bytes()
                         cur.execute(
                             "INSERT INTO laudos_arquivos_imagens (laudo_arquivo_id, ordem, nome_arquivo, conteudo) VALUES (?, ?, ?, ?)",
-                            (laudo_id, img_ordem, img_path.name, img_bytes),
+                            (laudo_id, img_ordem, img_path.name, gravar_blob(img_bytes)),
                         )
                         img_ordem += 1
                     except Exception as e:
                         erros.append(f"{img_path.name}: {e}")
-            inseridos += 1
+            if criado:
+                inseridos += 1
+            else:
+                atualizados += 1
         except Exception as e:
             erros.append(f"{p.name}: {e}")
 
     conn.commit()
     conn.close()
 
-    msg = f"Importados {inseridos} exame(s) para {DB_PATH}."
+    # Medidas dos exames (tabela laudos_medidas), em processos paralelos
+    rel_medidas = backfill_medidas(db_path=str(DB_PATH))
+
+    msg = f"Importados {inseridos} exame(s) novos e {atualizados} atualizado(s) para {DB_PATH}."
+    msg += f" Medidas extraidas de {rel_medidas['exames']} exame(s)."
     if erros:
         msg += f" Erros: {'; '.join(erros[:5])}" + ("..." if len(erros) > 5 else "")
     return True, msg
@@ -0,0 +1,99 @@
+"""
+Aplica as migrações de esquema pendentes (app/migracoes.py), em ordem, registrando cada uma em migracoes_banco.
+Tabelas reconstruídas são copiadas em lotes com checkpoint: pode ser interrompido (Ctrl+C, queda de energia)
+e executado de novo, que continua do último lote confirmado. Migrações já concluídas não rodam de novo.
+
+Uso (na pasta do projeto):
+  python migrar_banco.py                                  # aplica todas as pendentes
+  python migrar_banco.py --listar                         # só mostra o registro (pendente/em_andamento/concluida/erro)
+  python migrar_banco.py --ate 0003_pacientes_microchip_sem_unique
+  python migrar_banco.py --lote 5000
+  python migrar_banco.py --banco "C:\\caminho\\fortcordis.db"
+
+Sem --banco usa o banco do app (data/fortcordis.db ou FORTCORDIS_DB_PATH). Faça backup antes de migrar.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+PASTA_PROJETO = Path(__file__).resolve().parent
+sys.path.insert(0, str(PASTA_PROJETO))
+
+
+def _mostrar_registro(migracoes):
+    for m in migracoes:
+        linha = f"  {m['nome']:40s} {m['status']:13s}"
+        if m["status"] == "concluida":
+            linha += f" {m['concluida_em']} | {m['resultado']}"
+        elif m["status"] == "erro":
+            linha += f" {m['erro']}"
+        elif m["status"] == "em_andamento":
+            linha += f" {m['linhas']} linha(s) copiada(s) até agora"
+        print(linha)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    listar = False
+    ate = None
+    lote = None
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--ate" and i + 1 < len(argv):
+            ate = argv[i + 1]
+            i += 2
+            continue
+        if arg == "--lote" and i + 1 < len(argv):
+            lote = int(argv[i + 1])
+            i += 2
+            continue
+        if arg == "--banco" and i + 1 < len(argv):
+            # Antes de importar app/*: DB_PATH é lido no import
+            os.environ["FORTCORDIS_DB_PATH"] = str(Path(argv[i + 1]).resolve())
+            i += 2
+            continue
+        if arg == "--listar":
+            listar = True
+        i += 1
+
+    from app.config import DB_PATH, MIGRACAO_LOTE
+    from app.migracoes import executar_migracoes, listar_migracoes
+
+    print("Banco:", DB_PATH)
+    if not Path(DB_PATH).exists():
+        print("ERRO: banco não encontrado.")
+        sys.exit(1)
+
+    if listar:
+        _mostrar_registro(listar_migracoes())
+        return
+
+    def _progresso(nome, feitas, total):
+        print(f"\r  {nome}: {feitas}/{total} linha(s)", end="", flush=True)
+
+    try:
+        rel = executar_migracoes(ate=ate, lote=lote or MIGRACAO_LOTE, progresso=_progresso)
+    except ValueError as e:
+        print("ERRO:", e)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nInterrompido. Rode de novo para continuar do último lote confirmado.")
+        sys.exit(130)
+
+    print()
+    for m in rel["executadas"]:
+        vazao = f", {m['linhas_s']} linhas/s" if m["linhas"] else ""
+        print(f"  ✅ {m['nome']}: {m['resultado']} ({m['segundos']:.1f}s{vazao})")
+    if rel["ja_concluidas"]:
+        print(f"  ⏭️  {rel['ja_concluidas']} migração(ões) já concluída(s) antes")
+    if rel["erro"]:
+        print(f"  ❌ {rel['erro']['nome']}: {rel['erro']['mensagem']}")
+        print("     Corrija e rode de novo: continua do último checkpoint.")
+        sys.exit(1)
+    print(f"OK em {rel['segundos']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Move o conteúdo dos exames (JSON/PDF/imagens de laudos_arquivos) e os PDFs de prescrição entre o banco
+e o object store local (app.blob_store), para o fortcordis.db ficar pequeno e caber no cache de páginas.
+
+Uso (na pasta do projeto):
+  python migrar_blobs.py                      # tira os BLOBs do banco para PASTA_OBJETOS (padrão --para local)
+  python migrar_blobs.py --para banco         # traz de volta para o banco (ex.: antes de subir para a nuvem)
+  python migrar_blobs.py --banco "C:\\caminho\\para\\fortcordis.db" --objetos "D:\\FortCordis\\Objetos"
+  python migrar_blobs.py --verificar          # só confere se cada objeto referenciado existe e o hash bate
+  python migrar_blobs.py --limpar-orfaos      # apaga objetos que nenhuma linha referencia mais
+
+Pode ser interrompido e executado de novo: linhas já migradas são puladas.
+Depois de migrar para "local", defina FORTCORDIS_BLOB_BACKEND=local (e FORTCORDIS_PASTA_OBJETOS, se usou
+--objetos) no ambiente do app para que as novas gravações também vão para o object store.
+Backups (exportar_backup.py) levam os bytes; restore points do app guardam só o banco.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+PASTA_PROJETO = Path(__file__).resolve().parent
+sys.path.insert(0, str(PASTA_PROJETO))
+
+
+def main():
+    destino = "local"
+    verificar = limpar = False
+    i = 1
+    while i < len(sys.argv):
+        arg = sys.argv[i]
+        if arg == "--para" and i + 1 < len(sys.argv):
+            destino = sys.argv[i + 1]
+            i += 2
+            continue
+        if arg == "--banco" and i + 1 < len(sys.argv):
+            os.environ["FORTCORDIS_DB_PATH"] = str(Path(sys.argv[i + 1]).resolve())
+            i += 2
+            continue
+        if arg == "--objetos" and i + 1 < len(sys.argv):
+            os.environ["FORTCORDIS_PASTA_OBJETOS"] = str(Path(sys.argv[i + 1]).resolve())
+            i += 2
+            continue
+        if arg == "--verificar":
+            verificar = True
+        elif arg == "--limpar-orfaos":
+            limpar = True
+        i += 1
+
+    # Só agora: app.config lê FORTCORDIS_DB_PATH / FORTCORDIS_PASTA_OBJETOS no import
+    from app.blob_store import migrar_blobs, remover_orfaos, verificar_objetos
+    from app.config import DB_PATH, PASTA_OBJETOS
+
+    print("Banco:", DB_PATH)
+    print("Object store:", PASTA_OBJETOS)
+    if not DB_PATH.exists():
+        print("ERRO: banco não encontrado.")
+        sys.exit(1)
+
+    if verificar:
+        rel = verificar_objetos()
+        print(f"Objetos referenciados: {rel['verificados']}")
+        for sha in rel["ausentes"]:
+            print(f"  AUSENTE: {sha}")
+        for sha in rel["corrompidos"]:
+            print(f"  CORROMPIDO: {sha}")
+        sys.exit(1 if rel["ausentes"] or rel["corrompidos"] else 0)
+
+    if limpar:
+        rel = remover_orfaos(aplicar=True)
+        print(f"OK: {rel['removidos']} objeto(s) órfão(s) removido(s) de {rel['objetos']} "
+              f"({rel['bytes'] / (1024 * 1024):.1f} MB)")
+        return
+
+    if destino not in ("local", "banco"):
+        print("ERRO: --para deve ser 'local' ou 'banco'.")
+        sys.exit(1)
+
+    def _progresso(feitos, total):
+        print(f"\r  {feitos}/{total} linha(s)", end="", flush=True)
+
+    rel = migrar_blobs(destino, progresso=_progresso)
+    print()
+    for coluna, s in rel["colunas"].items():
+        print(f"  - {coluna}: {s['movidas']} de {s['linhas']} movida(s)"
+              + (f", {s['ignoradas']} alterada(s) durante a migração (rode de novo)" if s["ignoradas"] else ""))
+    mb = 1024 * 1024
+    print(f"OK: {rel['bytes_movidos'] / mb:.1f} MB movidos para '{rel['destino']}' em {rel['segundos']:.1f}s; "
+          f"banco {rel['arquivo_antes'] / mb:.1f} MB -> {rel['arquivo_depois'] / mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,8 @@ from typing import Optional, Dict, Tuple
 import streamlit as st
 import os
 
+from fortcordis_modules.escritor import TIMEOUT_RESULTADO_S, escrever, executar_escrita
+
 logger = logging.getLogger(__name__)
 
 # Caminho do banco: pasta do projeto (funciona no Streamlit Cloud) ou variável de ambiente
@@ -257,6 +259,27 @@ def criar_usuario(
         conn.close()
 
 
+def _atualizar_tentativas_login(conn, user_id: int, tentativas: int, bloqueado_ate: Optional[str] = None) -> None:
+    if bloqueado_ate:
+        conn.execute(
+            "UPDATE usuarios SET tentativas_login = ?, bloqueado_ate = ? WHERE id = ?",
+            (tentativas, bloqueado_ate, user_id)
+        )
+    else:
+        conn.execute("UPDATE usuarios SET tentativas_login = ? WHERE id = ?", (tentativas, user_id))
+
+
+def _registrar_acesso(conn, user_id: int, quando: str) -> None:
+    conn.execute(
+        """
+        UPDATE usuarios 
+        SET tentativas_login = 0, bloqueado_ate = NULL, ultimo_acesso = ?
+        WHERE id = ?
+        """,
+        (quando, user_id)
+    )
+
+
 def autenticar(email: str, senha: str) -> Tuple[bool, Optional[Dict], str]:
     """
     Autentica um usuário.
@@ -306,29 +329,19 @@ def autenticar(email: str, senha: str) -> Tuple[bool, Optional[Dict], str]:
             if tentativas >= 3:
                 # Bloqueia por 30 minutos
                 bloqueio = datetime.now() + timedelta(minutes=30)
-                cursor.execute(
-                    "UPDATE usuarios SET tentativas_login = ?, bloqueado_ate = ? WHERE id = ?",
-                    (tentativas, bloqueio.isoformat(), user_id)
+                escrever(
+                    _atualizar_tentativas_login, user_id, tentativas, bloqueio.isoformat(),
+                    db_path=DB_PATH, chaves_estrangeiras=False
                 )
-                conn.commit()
                 return False, None, "❌ Muitas tentativas incorretas. Usuário bloqueado por 30 minutos."
             else:
-                cursor.execute(
-                    "UPDATE usuarios SET tentativas_login = ? WHERE id = ?",
-                    (tentativas, user_id)
-                )
-                conn.commit()
+                escrever(_atualizar_tentativas_login, user_id, tentativas, db_path=DB_PATH, chaves_estrangeiras=False)
                 return False, None, f"❌ Email ou senha incorretos ({3-tentativas} tentativas restantes)"
         
         # Login bem-sucedido
-        # Reseta tentativas e atualiza último acesso
-        cursor.execute(
-            """
-            UPDATE usuarios 
-            SET tentativas_login = 0, bloqueado_ate = NULL, ultimo_acesso = ?
-            WHERE id = ?
-            """,
-            (datetime.now().isoformat(), user_id)
+        # Reseta tentativas e atualiza último acesso (no escritor único, em paralelo à leitura dos papéis)
+        futuro_acesso = executar_escrita(
+            _registrar_acesso, user_id, datetime.now().isoformat(), db_path=DB_PATH, chaves_estrangeiras=False
         )
         
         # Busca papéis do usuário
@@ -343,7 +356,7 @@ def autenticar(email: str, senha: str) -> Tuple[bool, Optional[Dict], str]:
         )
         papeis = [{"nome": row[0], "descricao": row[1]} for row in cursor.fetchall()]
         
-        conn.commit()
+        futuro_acesso.result(TIMEOUT_RESULTADO_S)
         
         dados_usuario = {
             "id": user_id,
@@ -0,0 +1,82 @@
+"""
+Reinterpreta os ecocardiogramas arquivados (laudos_arquivos) com o motor de app/laudos_interpretacao.py e as
+tabelas de referência atuais: estadiamento ACVIM da endocardiose mitral e conclusão sugerida para cada laudo
+que guardou a patologia/grau escolhidos (qualitativa_meta). Só lê o banco; nenhum laudo é alterado.
+
+Uso (na pasta do projeto):
+  python reestadiar_laudos.py                                  # resumo por estágio
+  python reestadiar_laudos.py --saida reestadiamento.csv       # lista os laudos com conclusão diferente
+  python reestadiar_laudos.py --workers 4 --lote 1000
+  python reestadiar_laudos.py --banco "C:\\caminho\\fortcordis.db"
+
+Sem --banco usa o banco do app (data/fortcordis.db ou FORTCORDIS_DB_PATH).
+"""
+
+import csv
+import os
+import sys
+from pathlib import Path
+
+PASTA_PROJETO = Path(__file__).resolve().parent
+sys.path.insert(0, str(PASTA_PROJETO))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    saida = None
+    workers = None
+    lote = None
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == "--saida" and i + 1 < len(argv):
+            saida = argv[i + 1]
+            i += 2
+            continue
+        if arg == "--workers" and i + 1 < len(argv):
+            workers = int(argv[i + 1])
+            i += 2
+            continue
+        if arg == "--lote" and i + 1 < len(argv):
+            lote = int(argv[i + 1])
+            i += 2
+            continue
+        if arg == "--banco" and i + 1 < len(argv):
+            # Antes de importar app/*: DB_PATH é lido no import
+            os.environ["FORTCORDIS_DB_PATH"] = str(Path(argv[i + 1]).resolve())
+            i += 2
+            continue
+        i += 1
+
+    from app.config import DB_PATH, INTERPRETACAO_LOTE
+    from app.laudos_helpers import ARQUIVO_FRASES, carregar_frases
+    from app.laudos_interpretacao import reestadiar_arquivo
+
+    print("Banco:", DB_PATH)
+    if not Path(DB_PATH).exists():
+        print("ERRO: banco não encontrado.")
+        sys.exit(1)
+
+    def _progresso(feitos, total):
+        print(f"\r  {feitos}/{total} laudo(s)", end="", flush=True)
+
+    rel = reestadiar_arquivo(carregar_frases(ARQUIVO_FRASES, {}), workers=workers, lote=lote or INTERPRETACAO_LOTE,
+                             progresso=_progresso)
+    print()
+    print(f"{rel['exames']} laudo(s) reinterpretado(s) em {rel['segundos']:.1f}s "
+          f"({rel['ignorados']} sem patologia/grau salvos, ignorados)")
+    for estagio in ("B1", "B2", "C"):
+        print(f"  Estágio {estagio}: {rel['por_estagio'].get(estagio, 0)}")
+    print(f"{len(rel['mudaram'])} laudo(s) de endocardiose com conclusão diferente da arquivada")
+
+    if saida:
+        with open(saida, "w", newline="", encoding="utf-8-sig") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(["id", "estagio", "conclusao_sugerida", "conclusao_arquivada"])
+            for m in rel["mudaram"]:
+                w.writerow([m["id"], m["estagio"], m["conclusao"], m["conclusao_arquivada"]])
+        print("Lista salva em:", saida)
+
+
+if __name__ == "__main__":
+    main()
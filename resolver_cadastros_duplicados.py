@@ -0,0 +1,131 @@
+"""
+Encontra e une cadastros repetidos (clinicas_parceiras, clinicas, tutores, pacientes) com o motor de
+app/resolucao_cadastros.py: nomes comparados só dentro de blocos (tokens/fonética), plano revisável em JSON
+e aplicação numa única transação que reescreve financeiro, consultas, laudos, agendamentos e prescrições.
+Substitui os scripts avulsos de consolidação (migrar_consolidar_clinicas.py, corrigir_laudos_e_clinicas*.py...).
+
+Uso (na pasta do projeto):
+  python resolver_cadastros_duplicados.py                                   # mostra os planos de todas as entidades
+  python resolver_cadastros_duplicados.py --entidade tutores --salvar plano_tutores.json
+  python resolver_cadastros_duplicados.py --aplicar plano_tutores.json      # aplica o plano revisado
+  python resolver_cadastros_duplicados.py --entidade clinicas_parceiras --limiar 0.9 --aplicar-direto
+  python resolver_cadastros_duplicados.py --banco "C:\\caminho\\fortcordis.db" ...
+
+Sem --banco usa o banco do app (data/fortcordis.db ou FORTCORDIS_DB_PATH). Faça backup antes de aplicar.
+Una tutores antes de pacientes: pacientes só são comparados dentro do mesmo tutor.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+PASTA_PROJETO = Path(__file__).resolve().parent
+sys.path.insert(0, str(PASTA_PROJETO))
+
+
+def _mostrar_plano(plano, max_grupos=30):
+    print(f"\n=== {plano['entidade']} ===")
+    print(f"{plano['registros']} cadastro(s), {plano['blocos']} bloco(s), {plano['pares_comparados']} par(es) comparado(s) "
+          f"em {plano['segundos']:.2f}s (limiar {plano['limiar']})")
+    grupos = plano["grupos"]
+    if not grupos:
+        print("Nenhum repetido encontrado.")
+        return
+    print(f"{len(grupos)} grupo(s), {sum(len(g['unir']) for g in grupos)} cadastro(s) a unir:")
+    for g in grupos[:max_grupos]:
+        m = g["manter"]
+        print(f"  manter #{m['id']} {m['nome']!r} ({m['referencias']} ref.)")
+        for u in g["unir"]:
+            print(f"    <- #{u['id']} {u['nome']!r} (score {u['score']}, {u['referencias']} ref.)")
+    if len(grupos) > max_grupos:
+        print(f"  ... e mais {len(grupos) - max_grupos} grupo(s) (use --salvar para ver todos)")
+
+
+def _mostrar_resultado(res):
+    print(f"Unidos {res['removidos']} cadastro(s) de {res['entidade']} em {res['grupos']} grupo(s).")
+    for chave, n in sorted(res["atualizados"].items()):
+        if n:
+            print(f"  {chave}: {n} linha(s)")
+    if res["fingerprints_recalculados"]:
+        print(f"  fingerprints de exames recalculados: {res['fingerprints_recalculados']}")
+
+
+def main():
+    entidades = []
+    limiar = None
+    salvar = None
+    aplicar = None
+    aplicar_direto = False
+    i = 1
+    while i < len(sys.argv):
+        arg = sys.argv[i]
+        if arg == "--entidade" and i + 1 < len(sys.argv):
+            entidades.append(sys.argv[i + 1])
+            i += 2
+            continue
+        if arg == "--limiar" and i + 1 < len(sys.argv):
+            limiar = float(sys.argv[i + 1])
+            i += 2
+            continue
+        if arg == "--salvar" and i + 1 < len(sys.argv):
+            salvar = sys.argv[i + 1]
+            i += 2
+            continue
+        if arg == "--aplicar" and i + 1 < len(sys.argv):
+            aplicar = sys.argv[i + 1]
+            i += 2
+            continue
+        if arg == "--banco" and i + 1 < len(sys.argv):
+            # Antes de importar app/*: DB_PATH é lido no import
+            os.environ["FORTCORDIS_DB_PATH"] = str(Path(sys.argv[i + 1]).resolve())
+            i += 2
+            continue
+        if arg == "--aplicar-direto":
+            aplicar_direto = True
+        i += 1
+
+    from app.config import DB_PATH
+    from app.resolucao_cadastros import (
+        ENTIDADES,
+        ORDEM_ENTIDADES,
+        aplicar_plano,
+        carregar_plano,
+        planejar_uniao,
+        salvar_plano,
+    )
+
+    print("Banco:", DB_PATH)
+    if not Path(DB_PATH).exists():
+        print("Banco não encontrado.")
+        sys.exit(1)
+
+    if aplicar:
+        plano = carregar_plano(aplicar)
+        _mostrar_plano(plano, max_grupos=5)
+        try:
+            _mostrar_resultado(aplicar_plano(plano))
+        except ValueError as e:
+            print("Erro:", e)
+            sys.exit(1)
+        return
+
+    for entidade in entidades:
+        if entidade not in ENTIDADES:
+            print(f"Entidade desconhecida: {entidade} (use {', '.join(ORDEM_ENTIDADES)})")
+            sys.exit(1)
+    if salvar and len(entidades) != 1:
+        print("--salvar precisa de exatamente uma --entidade")
+        sys.exit(1)
+
+    for entidade in entidades or list(ORDEM_ENTIDADES):
+        plano = planejar_uniao(entidade, limiar=limiar)
+        _mostrar_plano(plano)
+        if salvar:
+            salvar_plano(plano, salvar)
+            print(f"Plano salvo em {salvar}. Revise e aplique com --aplicar {salvar}")
+        if aplicar_direto and plano["grupos"]:
+            _mostrar_resultado(aplicar_plano(plano))
+
+
+if __name__ == "__main__":
+    main()